@@ -10,7 +10,13 @@ import subprocess
 from dotenv import load_dotenv
 from pathlib import Path
 from rich.traceback import install
-from src.common.logger import initialize_logging, get_logger, shutdown_logging
+from src.common.startup_profiler import startup_profiler
+
+# --profile-startup：尽早开始统计模块导入耗时（仅Worker进程）
+if os.environ.get("MAIBOT_WORKER_PROCESS") == "1":
+    startup_profiler.install_import_hook()
+
+from src.common.logger import initialize_logging, get_logger, shutdown_logging  # noqa: E402
 
 # 设置工作目录为脚本所在目录
 script_dir = os.path.dirname(os.path.abspath(__file__))
@@ -198,6 +204,25 @@ async def graceful_shutdown():  # sourcery skip: use-named-expression
         # 停止所有异步任务
         await async_task_manager.stop_and_wait_all_tasks()
 
+        # 停止图片识别队列，未识别的图片会在下次出现时重新登记
+        try:
+            from src.chat.utils.image_description_queue import image_description_queue
+
+            metrics = image_description_queue.get_metrics()
+            if metrics["queue_depth"] or metrics["in_progress"]:
+                logger.info(f"图片识别队列中还有 {metrics['queue_depth'] + metrics['in_progress']} 张图片未识别")
+            image_description_queue.stop()
+        except Exception as e:
+            logger.warning(f"停止图片识别队列时出错: {e}")
+
+        # 关闭图片处理进程池
+        try:
+            from src.chat.utils.image_service import image_process_service
+
+            image_process_service.shutdown()
+        except Exception as e:
+            logger.warning(f"关闭图片处理进程池时出错: {e}")
+
         # 获取所有剩余任务，排除当前任务
         remaining_tasks = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
 
@@ -7,8 +7,16 @@ import toml
 from datetime import datetime
 from collections import defaultdict
 import os
+import sys
 import time
 
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.common.log_reader import LogFileIndex  # noqa: E402
+
+# 打开日志文件时最多载入的条数（从文件末尾算起），保证大文件的内存占用有上限
+MAX_LOADED_ENTRIES = 50000
+
 
 class LogIndex:
     """日志索引，用于快速检索和过滤"""
@@ -384,8 +392,10 @@ class VirtualLogDisplay:
 class AsyncLogLoader:
     """异步日志加载器"""
 
-    def __init__(self, callback):
+    def __init__(self, callback, max_entries=MAX_LOADED_ENTRIES):
         self.callback = callback
+        self.max_entries = max_entries
+        self.skipped_lines = 0  # 上次加载时跳过的较早行数
         self.loading = False
         self.should_stop = False
 
@@ -405,37 +415,48 @@ class AsyncLogLoader:
                     self.callback(log_index, "文件不存在")
                     return
 
+                # 先增量刷新稀疏索引（已索引部分不再扫描），进度占前一半
+                def on_index_progress(scanned, total):
+                    if progress_callback and total:
+                        progress_callback(min(50, scanned / total * 50), 0)
+
+                file_index = LogFileIndex(file_path).refresh(on_index_progress)
+
+                # 只载入末尾 MAX_LOADED_ENTRIES 行：由索引定位起始分块的偏移
+                skip_lines = max(0, file_index.line_count - self.max_entries)
+                start_offset, start_line = file_index.offset_for_line(skip_lines)
+                self.skipped_lines = skip_lines
+
                 file_size = os.path.getsize(file_path)
+                remaining = max(1, file_size - start_offset)
                 processed_size = 0
 
-                with open(file_path, "r", encoding="utf-8") as f:
+                with open(file_path, "rb") as f:
+                    f.seek(start_offset)
+                    line_no = start_line
                     line_count = 0
                     batch_size = 1000  # 批量处理
 
                     while not self.should_stop:
-                        lines = []
-                        for _ in range(batch_size):
-                            line = f.readline()
-                            if not line:
-                                break
-                            lines.append(line)
-                            processed_size += len(line.encode("utf-8"))
-
+                        lines = f.readlines(batch_size * 256)
                         if not lines:
                             break
 
-                        # 处理这批数据
                         for line in lines:
+                            processed_size += len(line)
+                            line_no += 1
+                            if line_no <= skip_lines or not line.strip():
+                                continue
                             try:
-                                log_entry = json.loads(line.strip())
+                                log_entry = json.loads(line)
                                 log_index.add_entry(line_count, log_entry)
                                 line_count += 1
-                            except json.JSONDecodeError:
+                            except (json.JSONDecodeError, UnicodeDecodeError):
                                 continue
 
                         # 更新进度
                         if progress_callback:
-                            progress = min(100, (processed_size / file_size) * 100)
+                            progress = min(100, 50 + (processed_size / remaining) * 50)
                             progress_callback(progress, line_count)
 
                 if not self.should_stop:
@@ -1024,7 +1045,11 @@ class LogViewer:
             self.last_file_size = os.path.getsize(self.current_log_file)
         except OSError:
             self.last_file_size = 0
-        self.status_var.set(f"已加载 {log_index.total_entries} 条日志")
+        skipped = self.async_loader.skipped_lines
+        if skipped:
+            self.status_var.set(f"已加载最近 {log_index.total_entries} 条日志（跳过较早的 {skipped} 条）")
+        else:
+            self.status_var.set(f"已加载 {log_index.total_entries} 条日志")
 
         # 更新模块列表
         self.modules = set(log_index.module_index.keys())
@@ -0,0 +1,132 @@
+"""
+KG 增量构建基准测试
+
+在不同规模的已有图上导入同样一批合成三元组，统计 KGManager._update_graph（批量合并边 + 新节点属性）的耗时，
+验证耗时随图规模线性增长（旧实现用列表做成员判断，每条边的判断都是 O(图规模)，整体为平方级）。
+
+可选 --legacy-sample：抽样测量旧实现中 `str((src, tgt)) in 边列表` 的单次判断耗时，并推算整批的判断耗时。
+
+用法：
+    python scripts/benchmark_kg_update.py [--sizes 10000,100000,1000000] [--paragraphs 2000] [--legacy-sample 200]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from types import SimpleNamespace
+from typing import Dict, List, Tuple
+
+# 添加项目根目录到路径
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, project_root)
+
+from src.chat.knowledge.embedding_store import EmbeddingStoreItem  # noqa: E402
+from src.chat.knowledge.kg_manager import KGManager  # noqa: E402
+from src.chat.knowledge.utils.hash import get_sha256  # noqa: E402
+
+
+def entity_name(index: int) -> str:
+    return f"实体{index}"
+
+
+def build_base_graph(kg: KGManager, edge_count: int, vocab_size: int) -> float:
+    """向图中写入 edge_count 条随机实体边，返回耗时"""
+    hashes = ["entity-" + get_sha256(entity_name(i)) for i in range(vocab_size)]
+    edges: Dict[Tuple[str, str], float] = {}
+    while len(edges) < edge_count:
+        src, tgt = random.sample(hashes, 2)
+        edges[(src, tgt)] = 1.0
+    start = time.perf_counter()
+    kg.merge_edges(edges)
+    return time.perf_counter() - start
+
+
+def make_batch(paragraphs: int, triples_per_paragraph: int, vocab_size: int) -> Dict[str, List[List[str]]]:
+    """生成一批合成的 OpenIE 三元组（约一半实体与已有图重合）"""
+    batch = {}
+    for p in range(paragraphs):
+        triples = []
+        for _ in range(triples_per_paragraph):
+            subj = entity_name(random.randrange(vocab_size * 2))
+            obj = entity_name(random.randrange(vocab_size * 2))
+            triples.append([subj, "关联", obj])
+        batch[get_sha256(f"段落{p}-{random.random()}")] = triples
+    return batch
+
+
+def make_embedding_manager(batch: Dict[str, List[List[str]]]) -> SimpleNamespace:
+    """只包含节点文本的嵌入库替身，供 _update_graph 设置新节点属性"""
+    entities = {}
+    paragraphs = {}
+    for pg_hash, triples in batch.items():
+        paragraphs[f"paragraph-{pg_hash}"] = EmbeddingStoreItem(f"paragraph-{pg_hash}", [], f"段落 {pg_hash}")
+        for triple in triples:
+            for name in (triple[0], triple[2]):
+                key = "entity-" + get_sha256(name)
+                entities[key] = EmbeddingStoreItem(key, [], name)
+    return SimpleNamespace(
+        entities_embedding_store=SimpleNamespace(store=entities),
+        paragraphs_embedding_store=SimpleNamespace(store=paragraphs),
+    )
+
+
+def legacy_lookup_estimate(kg: KGManager, node_to_node: Dict[Tuple[str, str], float], sample: int) -> float:
+    """抽样测量旧实现的列表成员判断，推算整批判断耗时（秒）"""
+    existed_edges = [str((edge[0], edge[1])) for edge in kg.graph.get_edge_list()]
+    keys = random.sample(list(node_to_node), min(sample, len(node_to_node)))
+    start = time.perf_counter()
+    for key in keys:
+        _ = str(key) in existed_edges
+    per_lookup = (time.perf_counter() - start) / max(len(keys), 1)
+    return per_lookup * len(node_to_node)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="KG 增量构建基准测试")
+    parser.add_argument("--sizes", default="10000,100000,1000000", help="已有图的边数，逗号分隔")
+    parser.add_argument("--paragraphs", type=int, default=2000, help="导入批次的段落数")
+    parser.add_argument("--triples", type=int, default=5, help="每个段落的三元组数")
+    parser.add_argument("--legacy-sample", type=int, default=0, help="抽样测量旧实现列表查找的次数（0 为不测量）")
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(",") if size.strip()]
+    random.seed(42)
+
+    print(f"导入批次: {args.paragraphs} 段落 x {args.triples} 三元组\n")
+    header = f"{'已有边数':>10}{'建图(s)':>10}{'待合并边':>10}{'合并(s)':>10}{'每边(µs)':>10}"
+    if args.legacy_sample:
+        header += f"{'旧实现查找估算(s)':>20}"
+    print(header)
+
+    for size in sizes:
+        vocab_size = max(1000, size // 10)
+        kg = KGManager()
+        build_seconds = build_base_graph(kg, size, vocab_size)
+
+        batch = make_batch(args.paragraphs, args.triples, vocab_size)
+        embedding_manager = make_embedding_manager(batch)
+        node_to_node: Dict[Tuple[str, str], float] = {}
+        kg._build_edges_between_ent(node_to_node, batch)
+        kg._build_edges_between_ent_pg(node_to_node, batch)
+
+        legacy_seconds = None
+        if args.legacy_sample:
+            legacy_seconds = legacy_lookup_estimate(kg, node_to_node, args.legacy_sample)
+
+        start = time.perf_counter()
+        kg._update_graph(node_to_node, embedding_manager)  # type: ignore[arg-type]
+        merge_seconds = time.perf_counter() - start
+
+        line = (
+            f"{size:>10}{build_seconds:>10.2f}{len(node_to_node):>10}{merge_seconds:>10.3f}"
+            f"{merge_seconds / max(len(node_to_node), 1) * 1e6:>10.2f}"
+        )
+        if legacy_seconds is not None:
+            line += f"{legacy_seconds:>20.1f}"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
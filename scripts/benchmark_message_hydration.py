@@ -0,0 +1,170 @@
+"""
+消息行转换（hydration）基准测试
+
+在临时 SQLite 数据库中生成一个聊天窗口的消息，对比几种把数据库行转换为 DatabaseMessages 的方式：
+1. 模型实例：peewee 模型实例化后 DatabaseMessages(**__data__)，并访问嵌套信息（旧实现的开销）
+2. 元组行（全部列）：.tuples() + DatabaseMessages.row_factory，嵌套信息按需构造
+3. 元组行（构建提示词所需的列）：只选择少量列
+
+输出每行耗时（多次重复取最优）与持有整个窗口时的内存占用（tracemalloc）。
+
+用法：
+    python scripts/benchmark_message_hydration.py [--messages 10000] [--repeat 5]
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, List, Tuple
+
+# 添加项目根目录到路径
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, project_root)
+
+from peewee import SqliteDatabase  # noqa: E402
+
+from src.common.data_models.database_data_model import DatabaseMessages  # noqa: E402
+from src.common.database.database_model import Messages  # noqa: E402
+from src.common.message_repository import select_messages  # noqa: E402
+
+CHAT_ID = "benchmark_chat"
+# 构建可读聊天记录时实际用到的列
+PROMPT_COLUMNS = (
+    "id",
+    "time",
+    "user_id",
+    "user_nickname",
+    "user_cardname",
+    "user_platform",
+    "processed_plain_text",
+    "display_message",
+    "is_command",
+    "intercept_message_level",
+    "chat_info_platform",
+)
+
+
+def populate(count: int) -> None:
+    """写入 count 条模拟消息"""
+    users = [(str(10000 + i), f"用户{i}", f"群名片{i}" if i % 3 else None) for i in range(40)]
+    now = time.time()
+    rows = []
+    for i in range(count):
+        user_id, nickname, cardname = random.choice(users)
+        rows.append(
+            {
+                "message_id": str(i),
+                "time": now - (count - i) * 3.0,
+                "chat_id": CHAT_ID,
+                "reply_to": "",
+                "interest_value": random.random(),
+                "key_words": "[]",
+                "key_words_lite": "[]",
+                "is_mentioned": False,
+                "is_at": False,
+                "reply_probability_boost": 0.0,
+                "chat_info_stream_id": CHAT_ID,
+                "chat_info_platform": "qq",
+                "chat_info_user_platform": "qq",
+                "chat_info_user_id": user_id,
+                "chat_info_user_nickname": nickname,
+                "chat_info_user_cardname": cardname,
+                "chat_info_group_platform": "qq",
+                "chat_info_group_id": "123456",
+                "chat_info_group_name": "测试群",
+                "chat_info_create_time": now - 86400,
+                "chat_info_last_active_time": now,
+                "user_platform": "qq",
+                "user_id": user_id,
+                "user_nickname": nickname,
+                "user_cardname": cardname,
+                "processed_plain_text": "这是一条用于基准测试的消息" * random.randint(1, 4),
+                "display_message": "",
+                "priority_mode": "",
+                "priority_info": "{}",
+            }
+        )
+    with Messages._meta.database.atomic():
+        for start in range(0, len(rows), 500):
+            Messages.insert_many(rows[start : start + 500]).execute()
+
+
+def load_legacy() -> List[DatabaseMessages]:
+    """旧实现：模型实例化 + 构造函数 + 嵌套信息"""
+    messages = [
+        DatabaseMessages(**row.__data__)
+        for row in Messages.select().where(Messages.chat_id == CHAT_ID).order_by(Messages.time.asc())
+    ]
+    for msg in messages:
+        _ = msg.user_info, msg.chat_info
+    return messages
+
+
+def load_tuples(columns=None) -> Callable[[], List[DatabaseMessages]]:
+    """元组行直接转换"""
+
+    def load() -> List[DatabaseMessages]:
+        query, to_instance = select_messages(columns)
+        rows = query.where(Messages.chat_id == CHAT_ID).order_by(Messages.time.asc()).tuples()
+        return [to_instance(row) for row in rows]
+
+    return load
+
+
+def measure(loader: Callable[[], List[DatabaseMessages]], repeat: int) -> Tuple[float, int, int]:
+    """返回 (最优耗时秒, 行数, 持有结果时的内存字节数)"""
+    best = float("inf")
+    count = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = loader()
+        best = min(best, time.perf_counter() - start)
+        count = len(result)
+        del result
+
+    tracemalloc.start()
+    result = loader()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return best, count, current
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="消息行转换基准测试")
+    parser.add_argument("--messages", type=int, default=10000, help="窗口内的消息条数")
+    parser.add_argument("--repeat", type=int, default=5, help="每种方式的重复次数（取最优）")
+    args = parser.parse_args()
+
+    random.seed(42)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        bench_db = SqliteDatabase(os.path.join(tmp_dir, "bench.db"))
+        with bench_db.bind_ctx([Messages]):
+            bench_db.create_tables([Messages])
+            populate(args.messages)
+
+            cases = [
+                ("模型实例 + 嵌套信息（旧）", load_legacy),
+                ("元组行，全部列", load_tuples()),
+                ("元组行，提示词所需列", load_tuples(PROMPT_COLUMNS)),
+            ]
+            print(f"窗口大小: {args.messages} 条消息，重复 {args.repeat} 次取最优\n")
+            print(f"{'方式':<28}{'总耗时(ms)':>12}{'每行(µs)':>12}{'内存(MB)':>12}")
+            baseline = None
+            for name, loader in cases:
+                seconds, count, memory = measure(loader, args.repeat)
+                per_row = seconds / max(count, 1) * 1e6
+                baseline = baseline or seconds
+                print(
+                    f"{name:<28}{seconds * 1000:>12.1f}{per_row:>12.2f}{memory / 1024 / 1024:>12.2f}"
+                    f"   x{baseline / seconds:.2f}"
+                )
+        bench_db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+"""
+感知哈希近似去重基准测试
+
+功能：
+1. 读取本地图片/表情包，模拟QQ转发时常见的变体（重新压缩JPEG、缩放、缩放后再压缩）
+2. 对比仅用MD5精确匹配与加上感知哈希近似匹配时的命中率（即可节省的VLM调用比例）
+3. 将索引扩充到指定规模，对比多索引哈希与线性扫描的查询延迟
+
+用法：
+    python scripts/benchmark_phash_index.py [图片目录 ...] [--index-size 100000] [--queries 2000]
+"""
+
+import argparse
+import base64
+import io
+import os
+import random
+import statistics
+import sys
+import time
+from typing import Callable, Dict, List, Tuple
+
+# 添加项目根目录到路径
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, project_root)
+
+from PIL import Image  # noqa: E402
+
+from src.common import image_worker  # noqa: E402
+from src.chat.utils.phash_index import PHASH_MAX_DISTANCE, PHashIndex, phash_to_int  # noqa: E402
+
+DEFAULT_DIRS = [os.path.join(project_root, "data", "images"), os.path.join(project_root, "data", "emoji_registed")]
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp", ".bmp")
+
+
+def load_images(dirs: List[str], limit: int) -> List[bytes]:
+    """读取目录下的静态图片字节"""
+    images = []
+    for directory in dirs:
+        if not os.path.isdir(directory):
+            print(f"[跳过] 目录不存在: {directory}")
+            continue
+        for name in sorted(os.listdir(directory)):
+            if not name.lower().endswith(IMAGE_EXTENSIONS):
+                continue
+            with open(os.path.join(directory, name), "rb") as f:
+                images.append(f.read())
+            if len(images) >= limit:
+                return images
+    return images
+
+
+def _encode(img: Image.Image, fmt: str, **kwargs) -> bytes:
+    buffer = io.BytesIO()
+    img.save(buffer, format=fmt, **kwargs)
+    return buffer.getvalue()
+
+
+def make_variants(image_bytes: bytes) -> Dict[str, bytes]:
+    """生成转发场景下常见的图片变体"""
+    with Image.open(io.BytesIO(image_bytes)) as img:
+        rgb = img.convert("RGB")
+    width, height = rgb.size
+    half = rgb.resize((max(1, width // 2), max(1, height // 2)), Image.Resampling.BILINEAR)
+    return {
+        "jpeg_q85": _encode(rgb, "JPEG", quality=85),
+        "jpeg_q60": _encode(rgb, "JPEG", quality=60),
+        "resize_50%": _encode(half, "PNG"),
+        "resize_50%_jpeg_q75": _encode(half, "JPEG", quality=75),
+    }
+
+
+def decode(image_bytes: bytes) -> Tuple[str, str]:
+    """返回 (MD5, 感知哈希)"""
+    _, md5, _, phash = image_worker.decode_image(base64.b64encode(image_bytes).decode("ascii"))
+    return md5, phash
+
+
+def measure(func: Callable[[], object], repeat: int) -> Tuple[float, float]:
+    """返回 (平均耗时, p99耗时)，单位微秒"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1e6)
+    samples.sort()
+    return statistics.mean(samples), samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+
+
+def benchmark_hit_rate(images: List[bytes]) -> PHashIndex:
+    """统计变体的精确命中率与近似命中率"""
+    index = PHashIndex()
+    md5_set = set()
+    skipped = 0
+    for i, data in enumerate(images):
+        md5, phash = decode(data)
+        md5_set.add(md5)
+        if phash:
+            index.add(f"orig-{i}", phash)
+        else:
+            skipped += 1
+
+    per_variant: Dict[str, List[int]] = {}
+    false_matches = 0
+    for i, data in enumerate(images):
+        try:
+            variants = make_variants(data)
+        except Exception as e:
+            print(f"[跳过] 生成变体失败: {e}")
+            continue
+        for name, variant in variants.items():
+            md5, phash = decode(variant)
+            exact = md5 in md5_set
+            matches = [key for key, _ in index.search(phash)] if phash else []
+            near = exact or f"orig-{i}" in matches
+            false_matches += sum(1 for key in matches if key != f"orig-{i}")
+            stats = per_variant.setdefault(name, [0, 0, 0])
+            stats[0] += 1
+            stats[1] += exact
+            stats[2] += near
+
+    print(f"\n=== 命中率（原图 {len(images)} 张，其中 {skipped} 张无法计算感知哈希）===")
+    print(f"{'变体':<22}{'数量':>6}{'MD5命中':>10}{'感知哈希命中':>14}")
+    total = exact_total = near_total = 0
+    for name, (count, exact, near) in per_variant.items():
+        print(f"{name:<22}{count:>6}{exact / count:>10.1%}{near / count:>14.1%}")
+        total += count
+        exact_total += exact
+        near_total += near
+    if total:
+        print(
+            f"合计: 仅MD5可节省 {exact_total}/{total} 次VLM调用，"
+            f"加上感知哈希可节省 {near_total}/{total} 次 ({near_total / total:.1%})，"
+            f"误匹配到其他原图 {false_matches} 次"
+        )
+    return index
+
+
+def benchmark_latency(index: PHashIndex, index_size: int, queries: int) -> None:
+    """将索引填充到 index_size，对比多索引哈希与线性扫描"""
+    rng = random.Random(42)
+    while len(index) < index_size:
+        index.add(f"random-{len(index)}", rng.getrandbits(64))
+    hashes = index.items()
+
+    def flip(value: int) -> int:
+        for bit in rng.sample(range(64), rng.randint(0, PHASH_MAX_DISTANCE)):
+            value ^= 1 << bit
+        return value
+
+    query_values = [flip(rng.choice(hashes)[1]) for _ in range(queries)]
+    query_iter = iter(query_values * 2)
+
+    def mih_query():
+        return index.search(next(query_iter))
+
+    def linear_query():
+        value = phash_to_int(next(query_iter))
+        return [key for key, h in hashes if (h ^ value).bit_count() <= PHASH_MAX_DISTANCE]
+
+    mih_mean, mih_p99 = measure(mih_query, queries)
+    linear_repeat = max(1, min(queries, 200))
+    linear_mean, linear_p99 = measure(linear_query, linear_repeat)
+
+    print(f"\n=== 查询延迟（索引规模 {len(index)}，汉明距离 <= {PHASH_MAX_DISTANCE}）===")
+    print(f"多索引哈希: 平均 {mih_mean:.1f}us, p99 {mih_p99:.1f}us ({queries} 次查询)")
+    print(f"线性扫描:   平均 {linear_mean:.1f}us, p99 {linear_p99:.1f}us ({linear_repeat} 次查询)")
+    print(f"加速比: {linear_mean / mih_mean:.0f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="感知哈希近似去重基准测试")
+    parser.add_argument("dirs", nargs="*", default=DEFAULT_DIRS, help="图片目录，默认 data/images 和 data/emoji_registed")
+    parser.add_argument("--limit", type=int, default=500, help="最多读取的原图数量")
+    parser.add_argument("--index-size", type=int, default=100000, help="延迟测试时的索引规模")
+    parser.add_argument("--queries", type=int, default=2000, help="延迟测试的查询次数")
+    args = parser.parse_args()
+
+    images = load_images(args.dirs, args.limit)
+    if images:
+        index = benchmark_hit_rate(images)
+    else:
+        print("[提示] 没有找到图片，跳过命中率测试")
+        index = PHashIndex()
+    benchmark_latency(index, args.index_size, args.queries)
+
+
+if __name__ == "__main__":
+    main()
@@ -5,15 +5,20 @@
 #     print("请安装quick_algo库 - 在lib.quick_algo中，执行命令：python setup.py build_ext --inplace")
 
 import argparse
+import json
+import queue
 import sys
 import os
 import asyncio
+import threading
+import time
+from dataclasses import dataclass, field
 from time import sleep
-from typing import Optional
+from typing import Dict, List, Optional
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 from src.chat.knowledge.embedding_store import EmbeddingManager
-from src.chat.knowledge.open_ie import OpenIE
+from src.chat.knowledge.open_ie import OpenIE, clean_doc, iter_openie_file, list_openie_files
 from src.chat.knowledge.kg_manager import KGManager
 from src.common.logger import get_logger
 from src.chat.knowledge.utils.hash import get_sha256
@@ -25,6 +30,13 @@ OPENIE_DIR = os.path.join(ROOT_PATH, "data", "openie")
 
 logger = get_logger("OpenIE导入")
 
+# 流式导入：每批段落数、每隔多少批保存一次检查点、阶段之间队列的容量（批）
+STREAM_CHUNK_SIZE = 200
+STREAM_CHECKPOINT_EVERY = 5
+STREAM_QUEUE_SIZE = 2
+# 导入进度文件，记录每个OpenIE文件已完成（已写入检查点）的文档数，导入全部完成后删除
+STREAM_PROGRESS_FILE = "openie_import_progress.json"
+
 
 def ensure_openie_dir():
     """确保OpenIE数据目录存在"""
@@ -186,7 +198,258 @@ def handle_import_openie(
     return True
 
 
-async def main_async(non_interactive: bool = False) -> bool:  # sourcery skip: dict-comprehension
+@dataclass
+class ImportChunk:
+    """流式导入中的一批段落"""
+
+    raw_paragraphs: Dict[str, str] = field(default_factory=dict)
+    triple_list_data: Dict[str, List[List[str]]] = field(default_factory=dict)
+    # 文件名 -> 读到本批末尾时已处理的文档数
+    positions: Dict[str, int] = field(default_factory=dict)
+
+
+_STREAM_END = object()
+
+
+def _check_doc(doc: dict) -> List[str]:
+    """检查单个文档的完整性（在过滤无效实体与三元组之后），返回缺失原因列表"""
+    missing = []
+    if not doc.get("passage"):
+        missing.append("passage")
+    if not doc.get("extracted_entities"):
+        missing.append("名词列表为空")
+    if not doc.get("extracted_triples"):
+        missing.append("主谓宾三元组为空")
+    return missing
+
+
+def _load_stream_progress(progress_path: str, data_files: List[str]) -> Dict[str, int]:
+    """读取上次中断时的导入进度：文件名 -> 已完成的文档数
+
+    .json 文件被修改过时从头读取；.jsonl 只会被追加写入，文件变大不影响已完成的部分。
+    即使进度丢失，已导入的段落也会在去重时跳过，进度只用于省去重复读取与校验。
+    """
+    if not os.path.exists(progress_path):
+        return {}
+    try:
+        with open(progress_path, "r", encoding="utf-8") as f:
+            recorded = json.load(f).get("files", {})
+    except (OSError, ValueError) as e:
+        logger.warning(f"读取导入进度失败，将从头开始（已导入的段落仍会被去重跳过）：{e}")
+        return {}
+
+    start_positions = {}
+    for path in data_files:
+        name = os.path.basename(path)
+        entry = recorded.get(name)
+        if not entry:
+            continue
+        size = os.path.getsize(path)
+        unchanged = size == entry.get("size") or (name.endswith(".jsonl") and size >= entry.get("size", 0))
+        if unchanged:
+            start_positions[name] = int(entry.get("done", 0))
+    return start_positions
+
+
+def _save_stream_progress(progress_path: str, data_files: List[str], done: Dict[str, int]) -> None:
+    """原子地写入导入进度"""
+    files = {}
+    for path in data_files:
+        name = os.path.basename(path)
+        if name in done:
+            files[name] = {"size": os.path.getsize(path), "done": done[name]}
+    tmp_path = progress_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"files": files, "updated_at": time.time()}, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, progress_path)
+
+
+def handle_streaming_import(
+    embed_manager: EmbeddingManager,
+    kg_manager: KGManager,
+    chunk_size: int = STREAM_CHUNK_SIZE,
+    checkpoint_every: int = STREAM_CHECKPOINT_EVERY,
+    restart: bool = False,
+) -> bool:
+    """流式导入 data/openie 下的所有OpenIE文件
+
+    三个阶段通过有界队列连接，内存占用只与批大小有关：
+    1. 读取线程：逐个文档读取、过滤、校验与去重，按 chunk_size 个段落组成一批
+    2. 嵌入线程：获取本批新段落/实体/关系的嵌入（只读嵌入库，可与下一阶段并行）
+    3. 主线程：写入嵌入库、增量更新实体索引、合并到KG；每 checkpoint_every 批保存一次嵌入库、KG与导入进度
+
+    嵌入库与KG只在主线程中修改，中断后从最近的检查点继续。不完整的文档会记录日志并跳过。
+    """
+    data_files = list_openie_files()
+    if not data_files:
+        logger.error(f"未在 {OPENIE_DIR} 找到任何OpenIE json/jsonl文件")
+        return False
+    if not embed_manager.check_all_embedding_model_consistency():
+        logger.error("嵌入模型与本地存储不一致，请检查模型设置或清空嵌入库后重试。")
+        return False
+
+    progress_path = os.path.join(kg_manager.dir_path, STREAM_PROGRESS_FILE)
+    start_positions = {} if restart else _load_stream_progress(progress_path, data_files)
+    if start_positions:
+        logger.info(f"从上次的检查点继续导入，已完成的文档数：{start_positions}")
+
+    stop_event = threading.Event()
+    read_queue: "queue.Queue" = queue.Queue(maxsize=STREAM_QUEUE_SIZE)
+    embed_queue: "queue.Queue" = queue.Queue(maxsize=STREAM_QUEUE_SIZE)
+    errors: List[BaseException] = []
+    stats = {"read": 0, "duplicated": 0, "invalid": 0}
+
+    def put(q: "queue.Queue", item) -> bool:
+        """放入队列，下游停止时放弃"""
+        while not stop_event.is_set():
+            try:
+                q.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def read_stage() -> None:
+        seen_hashes = set()
+        chunk = ImportChunk()
+        positions = dict(start_positions)
+        try:
+            for path in data_files:
+                name = os.path.basename(path)
+                for position, doc in iter_openie_file(path, start=positions.get(name, 0)):
+                    if stop_event.is_set():
+                        return
+                    positions[name] = position + 1
+                    stats["read"] += 1
+                    clean_doc(doc)
+                    missing = _check_doc(doc)
+                    if missing:
+                        stats["invalid"] += 1
+                        logger.error(f"跳过不完整的文段 {name}#{position}（{doc.get('idx', '<无idx>')}）：{', '.join(missing)}")
+                        continue
+                    paragraph_hash = get_sha256(doc["passage"])
+                    if paragraph_hash in seen_hashes or (
+                        f"paragraph-{paragraph_hash}" in embed_manager.stored_pg_hashes
+                        and paragraph_hash in kg_manager.stored_paragraph_hashes
+                    ):
+                        stats["duplicated"] += 1
+                        continue
+                    seen_hashes.add(paragraph_hash)
+                    chunk.raw_paragraphs[paragraph_hash] = doc["passage"]
+                    chunk.triple_list_data[paragraph_hash] = doc["extracted_triples"]
+                    if len(chunk.raw_paragraphs) >= chunk_size:
+                        chunk.positions = dict(positions)
+                        if not put(read_queue, chunk):
+                            return
+                        chunk = ImportChunk()
+            chunk.positions = dict(positions)
+            put(read_queue, chunk)
+        except BaseException as e:
+            errors.append(e)
+            stop_event.set()
+        finally:
+            put(read_queue, _STREAM_END)
+
+    def embed_stage() -> None:
+        embedded_keys = set()
+        try:
+            while True:
+                chunk = read_queue.get()
+                if chunk is _STREAM_END or stop_event.is_set():
+                    return
+                embedded = embed_manager.embed_data_set(chunk.raw_paragraphs, chunk.triple_list_data, embedded_keys)
+                if not put(embed_queue, (chunk, embedded)):
+                    return
+        except BaseException as e:
+            errors.append(e)
+            stop_event.set()
+        finally:
+            put(embed_queue, _STREAM_END)
+
+    def checkpoint(done: Dict[str, int]) -> None:
+        checkpoint_start = time.perf_counter()
+        embed_manager.update_faiss_index()
+        embed_manager.save_to_file()
+        kg_manager.save_to_file()
+        _save_stream_progress(progress_path, data_files, done)
+        logger.info(f"检查点已保存，耗时 {time.perf_counter() - checkpoint_start:.1f}s")
+
+    threads = [
+        threading.Thread(target=read_stage, name="openie-read", daemon=True),
+        threading.Thread(target=embed_stage, name="openie-embed", daemon=True),
+    ]
+    for thread in threads:
+        thread.start()
+
+    start_time = time.perf_counter()
+    imported = 0
+    chunk_index = 0
+    pending_checkpoint = False
+    done_positions = dict(start_positions)
+    # 各批之间保持图的节点/边集合与同义连接近似索引，每批只做增量更新
+    with kg_manager.incremental_build():
+        try:
+            while True:
+                try:
+                    item = embed_queue.get(timeout=0.5)
+                except queue.Empty:
+                    if errors:
+                        break
+                    continue
+                if item is _STREAM_END:
+                    break
+                chunk, embedded = item
+                chunk_index += 1
+                if chunk.raw_paragraphs:
+                    embed_manager.store_embedded_data_set(chunk.raw_paragraphs, embedded)
+                    # 同义连接需要检索本批新实体，实体索引每批增量更新；段落与关系索引在检查点时更新
+                    embed_manager.entities_embedding_store.update_faiss_index()
+                    kg_manager.build_kg(chunk.triple_list_data, embed_manager)
+                    imported += len(chunk.raw_paragraphs)
+                done_positions.update(chunk.positions)
+                pending_checkpoint = True
+
+                elapsed = time.perf_counter() - start_time
+                logger.info(
+                    f"第 {chunk_index} 批完成：本批 {len(chunk.raw_paragraphs)} 段，累计导入 {imported} 段，"
+                    f"读取 {stats['read']} 条（重复 {stats['duplicated']}，不完整 {stats['invalid']}），"
+                    f"{imported / max(elapsed, 1e-9) * 60:.1f} 段/分钟"
+                )
+                if chunk_index % checkpoint_every == 0:
+                    checkpoint(done_positions)
+                    pending_checkpoint = False
+        except KeyboardInterrupt:
+            stop_event.set()
+            logger.warning("导入被中断，已完成的批次保存在最近的检查点中，重新运行即可继续导入")
+            return False
+
+    stop_event.set()
+    if errors:
+        logger.error(f"流式导入出错：{errors[0]!r}")
+        if pending_checkpoint:
+            # 主线程处理完的批次是完整的，出错前先保存下来
+            checkpoint(done_positions)
+        return False
+
+    if pending_checkpoint:
+        checkpoint(done_positions)
+    if os.path.exists(progress_path):
+        os.remove(progress_path)
+    elapsed = time.perf_counter() - start_time
+    logger.info(
+        f"流式导入完成：导入 {imported} 段，跳过重复 {stats['duplicated']} 段、不完整 {stats['invalid']} 段，"
+        f"耗时 {elapsed:.1f}s"
+    )
+    return True
+
+
+async def main_async(
+    non_interactive: bool = False,
+    stream: bool = False,
+    chunk_size: int = STREAM_CHUNK_SIZE,
+    checkpoint_every: int = STREAM_CHECKPOINT_EVERY,
+    restart: bool = False,
+) -> bool:  # sourcery skip: dict-comprehension
     # 新增确认提示
     if non_interactive:
         logger.warning(
@@ -246,6 +509,16 @@ async def main_async(non_interactive: bool = False) -> bool:  # sourcery skip: d
         if key not in embed_manager.stored_pg_hashes:
             logger.warning(f"KG中存在Embedding库中不存在的段落：{key}")
 
+    if stream:
+        logger.info("正在以流式模式导入OpenIE数据文件")
+        return handle_streaming_import(
+            embed_manager,
+            kg_manager,
+            chunk_size=chunk_size,
+            checkpoint_every=checkpoint_every,
+            restart=restart,
+        )
+
     logger.info("正在导入OpenIE数据文件")
     try:
         openie_data = OpenIE.load()
@@ -262,7 +535,7 @@ def main(argv: Optional[list[str]] = None) -> None:
     """主函数 - 解析参数并运行异步主流程。"""
     parser = argparse.ArgumentParser(
         description=(
-            "OpenIE 导入脚本：读取 data/openie 中的 OpenIE JSON 批次，"
+            "OpenIE 导入脚本：读取 data/openie 中的 OpenIE JSON/JSONL 批次，"
             "将其导入到 LPMM 的向量库与知识图中。"
         )
     )
@@ -271,6 +544,28 @@ def main(argv: Optional[list[str]] = None) -> None:
         action="store_true",
         help="非交互模式：跳过导入确认提示以及非法文段删除询问，遇到非法文段时直接报错退出。",
     )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="流式导入：分批嵌入并合并到知识图，定期保存检查点，中断后重新运行会从检查点继续；不完整的文段记录日志后跳过。",
+    )
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=STREAM_CHUNK_SIZE,
+        help=f"流式导入每批的段落数（默认 {STREAM_CHUNK_SIZE}）",
+    )
+    parser.add_argument(
+        "--checkpoint-every",
+        type=int,
+        default=STREAM_CHECKPOINT_EVERY,
+        help=f"流式导入每隔多少批保存一次检查点（默认 {STREAM_CHECKPOINT_EVERY}）",
+    )
+    parser.add_argument(
+        "--restart",
+        action="store_true",
+        help="忽略上次中断留下的导入进度，从头读取所有文件（已导入的段落仍会被去重跳过）",
+    )
     args = parser.parse_args(argv)
 
     # 检查是否有现有的事件循环
@@ -288,7 +583,15 @@ def main(argv: Optional[list[str]] = None) -> None:
     ok: bool = False
     try:
         # 在新的事件循环中运行异步主函数
-        ok = loop.run_until_complete(main_async(non_interactive=args.non_interactive))
+        ok = loop.run_until_complete(
+            main_async(
+                non_interactive=args.non_interactive,
+                stream=args.stream,
+                chunk_size=max(1, args.chunk_size),
+                checkpoint_every=max(1, args.checkpoint_every),
+                restart=args.restart,
+            )
+        )
         print(
             "\n[NOTICE] OpenIE 导入脚本执行完毕。如主程序（聊天 / WebUI）已在运行，"
             "请重启主程序，或在主程序内部调用一次 lpmm_start_up() 以应用最新 LPMM 知识库。"
@@ -1,12 +1,14 @@
 import argparse
+import asyncio
+import dataclasses
 import json
 import os
-import signal
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from threading import Lock, Event
+import random
 import sys
 import datetime
-from typing import Optional
+import time
+from collections import deque
+from typing import Deque, Dict, Iterator, List, Optional, Tuple
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 # 添加项目根目录到 sys.path
@@ -16,8 +18,9 @@ from rich.progress import Progress  # 替换为 rich 进度条
 from src.common.logger import get_logger
 
 # from src.chat.knowledge.lpmmconfig import global_config
-from src.chat.knowledge.ie_process import info_extract_from_str
-from src.chat.knowledge.open_ie import OpenIE
+from src.chat.knowledge import prompt_template
+from src.chat.knowledge.ie_process import parse_entity_response, parse_packed_response, parse_rdf_response
+from src.chat.knowledge.open_ie import iter_openie_file, write_openie_jsonl
 from rich.progress import (
     BarColumn,
     TimeElapsedColumn,
@@ -28,7 +31,10 @@ from rich.progress import (
     TextColumn,
 )
 from raw_data_preprocessor import RAW_DATA_PATH, load_raw_data
+from src.config.api_ada_configs import TaskConfig
 from src.config.config import global_config, model_config
+from src.llm_models.exceptions import NetworkConnectionError, RespNotOkException
+from src.llm_models.request_scheduler import llm_scheduler
 from src.llm_models.utils_model import LLMRequest
 
 logger = get_logger("LPMM知识库-信息提取")
@@ -38,6 +44,17 @@ ROOT_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 TEMP_DIR = os.path.join(ROOT_PATH, "temp")
 # IMPORTED_DATA_PATH = os.path.join(ROOT_PATH, "data", "imported_lpmm_data")
 OPENIE_OUTPUT_DIR = os.path.join(ROOT_PATH, "data", "openie")
+# 追加写入的提取结果日志（OpenIE jsonl 格式），同时作为断点续跑的缓存
+RESULTS_LOG_PATH = os.path.join(TEMP_DIR, "info_extraction_results.jsonl")
+
+MAX_ATTEMPTS = 3  # 单个段落在每个阶段的最大尝试次数
+MAX_RATE_LIMITED_ATTEMPTS = 10  # 因限流/网络错误失败时的最大尝试次数（这类失败由提供商退避处理）
+RETRY_DELAY_SECONDS = 5.0  # 解析失败等非限流错误的重试间隔
+MAX_PACK_SIZE = 8  # 合并提示中最多包含的段落数
+TOKEN_WINDOW_SECONDS = 60.0
+BACKOFF_BASE_SECONDS = 2.0
+BACKOFF_MAX_SECONDS = 60.0
+REPORT_INTERVAL_SECONDS = 30.0
 
 
 def ensure_dirs():
@@ -53,73 +70,455 @@ def ensure_dirs():
         logger.info(f"已创建原始数据目录: {RAW_DATA_PATH}")
 
 
-# 创建一个线程安全的锁，用于保护文件操作和共享数据
-file_lock = Lock()
-open_ie_doc_lock = Lock()
-
-# 创建一个事件标志，用于控制程序终止
-shutdown_event = Event()
-
-lpmm_entity_extract_llm = LLMRequest(
-    model_set=model_config.model_task_config.lpmm_entity_extract, request_type="lpmm.entity_extract"
-)
-lpmm_rdf_build_llm = LLMRequest(model_set=model_config.model_task_config.lpmm_rdf_build, request_type="lpmm.rdf_build")
-
+def estimate_tokens(text: str) -> int:
+    """粗略估算token数（仅用于请求发出前的token预算准入）：中日韩字符按每字1个token，其余字符按每4个字符1个token"""
+    cjk = sum(1 for ch in text if "\u2e80" <= ch <= "\u9fff" or "\uac00" <= ch <= "\ud7af")
+    return cjk + (len(text) - cjk) // 4 + 1
+
+
+def _used_tokens(llm: LLMRequest) -> int:
+    """LLMRequest 实例累计消耗的token数（接口返回的实际用量）"""
+    return sum(total_tokens for total_tokens, _, _ in llm.model_usage.values())
+
+
+class ProviderLimiter:
+    """单个API提供商的并发与token速率限制
+
+    并发上限从 max_concurrency 开始按 AIMD 自适应：遇到429/5xx/网络错误时减半并暂停一段指数退避时间，
+    之后每连续成功“当前上限”次请求恢复1个并发。tokens_per_minute 为0时不限制token速率。
+    """
+
+    def __init__(self, name: str, max_concurrency: int, tokens_per_minute: int):
+        self.name = name
+        self.max_concurrency = max(1, max_concurrency)
+        self.tokens_per_minute = max(0, tokens_per_minute)
+        self.limit = self.max_concurrency
+        self.active = 0
+        self.paused_until = 0.0
+        self.backoff_level = 0
+        self.success_streak = 0
+        self.token_window: Deque[Tuple[float, int]] = deque()
+        self.window_tokens = 0
+        self.avg_prompt_tokens = 0.0
+        self.condition = asyncio.Condition()
+
+        self.requests = 0
+        self.rate_limited = 0
+
+    def _record_tokens(self, now: float, tokens: int) -> None:
+        if self.tokens_per_minute and tokens:
+            self.token_window.append((now, tokens))
+            self.window_tokens += tokens
+
+    def _token_wait(self, now: float, tokens: int) -> float:
+        """距离token预算足够发出本次请求还需等待的秒数"""
+        if not self.tokens_per_minute:
+            return 0.0
+        while self.token_window and now - self.token_window[0][0] >= TOKEN_WINDOW_SECONDS:
+            self.window_tokens -= self.token_window.popleft()[1]
+        # 窗口为空时总是放行，避免单个超大请求永远无法发出
+        if not self.token_window or self.window_tokens + tokens <= self.tokens_per_minute:
+            return 0.0
+        excess = self.window_tokens + tokens - self.tokens_per_minute
+        released = 0
+        for timestamp, window_tokens in self.token_window:
+            released += window_tokens
+            if released >= excess:
+                return max(0.0, timestamp + TOKEN_WINDOW_SECONDS - now)
+        return TOKEN_WINDOW_SECONDS
+
+    async def _wait_until_admissible(self, prompt_tokens: int) -> None:
+        """在持有condition的情况下等待并发、token预算与退避都允许发出请求"""
+        while True:
+            now = time.monotonic()
+            wait = max(self.paused_until - now, self._token_wait(now, prompt_tokens))
+            if self.active < self.limit and wait <= 0:
+                return
+            try:
+                await asyncio.wait_for(self.condition.wait(), timeout=wait if wait > 0 else None)
+            except asyncio.TimeoutError:
+                pass
+
+    async def wait_ready(self) -> None:
+        """等待提供商可以接受新请求（不占用槽位），工作协程据此决定何时从队列取任务，
+        避免受限的提供商先取走任务再长时间等待，而其他提供商空闲"""
+        async with self.condition:
+            await self._wait_until_admissible(int(self.avg_prompt_tokens))
+
+    async def acquire(self, prompt_tokens: int) -> None:
+        """等待并发、token预算与退避都允许后占用一个请求槽位（提示词token预先计入窗口）"""
+        async with self.condition:
+            await self._wait_until_admissible(prompt_tokens)
+            self.active += 1
+            self.requests += 1
+            self._record_tokens(time.monotonic(), prompt_tokens)
+            self.avg_prompt_tokens = prompt_tokens if not self.avg_prompt_tokens else (
+                0.8 * self.avg_prompt_tokens + 0.2 * prompt_tokens
+            )
 
-def process_single_text(pg_hash, raw_data):
-    """处理单个文本的函数，用于线程池"""
-    temp_file_path = f"{TEMP_DIR}/{pg_hash}.json"
+    async def release(self, ok: bool, rate_limited: bool, extra_tokens: int) -> None:
+        """归还槽位，补记实际用量超出预计入部分的token（extra_tokens），并根据请求结果调整并发上限"""
+        async with self.condition:
+            self.active -= 1
+            self._record_tokens(time.monotonic(), extra_tokens)
+            if rate_limited:
+                self.rate_limited += 1
+                self.success_streak = 0
+                self.limit = max(1, self.limit // 2)
+                delay = min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2**self.backoff_level)
+                delay *= random.uniform(0.8, 1.2)
+                self.backoff_level = min(self.backoff_level + 1, 10)
+                self.paused_until = max(self.paused_until, time.monotonic() + delay)
+                logger.warning(f"[{self.name}] 请求被限流或服务端出错，并发上限降为 {self.limit}，暂停 {delay:.1f}s")
+            elif ok:
+                self.backoff_level = max(0, self.backoff_level - 1)
+                self.success_streak += 1
+                if self.limit < self.max_concurrency and self.success_streak >= self.limit:
+                    self.limit += 1
+                    self.success_streak = 0
+            self.condition.notify_all()
+
+
+class SingleAttemptLLMRequest(LLMRequest):
+    """提供商层面不重试的LLMRequest
+
+    LLMRequest 默认在持有 ProviderLimiter 槽位期间对429/5xx/网络错误按 max_retry × retry_interval 重试，
+    限流器要等这些重试用尽才会察觉，退避来得太晚。这里把 max_retry 固定为1，错误立即抛给工作协程，由限流器退避后重新排队。
+    """
+
+    def _select_model(self, exclude_models=None):
+        model_info, api_provider, client = super()._select_model(exclude_models)
+        return model_info, dataclasses.replace(api_provider, max_retry=1), client
+
+
+@dataclasses.dataclass
+class ExtractionItem:
+    """待提取的段落"""
+
+    pg_hash: str
+    passage: str
+    entities: Optional[List[str]] = None
+    attempts: int = 0
+    rate_limited_attempts: int = 0
+    finished: bool = False
+
+
+class ExtractionEngine:
+    """基于asyncio的信息提取引擎
+
+    实体提取与RDF构建是两个阶段，各自有任务队列：段落完成实体提取后立即进入RDF队列，两阶段流水线并行。
+    每个阶段为任务模型列表中的每个模型启动工作协程，请求前经过该模型所属提供商的ProviderLimiter。
+    提取成功的段落立即追加写入结果日志。
+    """
+
+    def __init__(
+        self,
+        items: List[ExtractionItem],
+        results_log,
+        limiters: Dict[str, ProviderLimiter],
+        pack_chars: int = 0,
+    ):
+        self.items = items
+        self.results_log = results_log
+        self.limiters = limiters
+        self.pack_chars = pack_chars
+        self.queues: Dict[str, asyncio.Queue] = {"entity": asyncio.Queue(), "rdf": asyncio.Queue()}
+        self.remaining = len(items)
+        self.finished = asyncio.Event()
+        self.failed: List[str] = []
+        self.completed = 0
+        self.llms: List[LLMRequest] = []
+        self.packed_requests = 0
+        self.start_time = time.monotonic()
+        self.progress_callback = None
+
+    @property
+    def tokens(self) -> int:
+        """所有工作协程的LLMRequest上报的实际token总用量"""
+        return sum(_used_tokens(llm) for llm in self.llms)
+
+    def _lanes(self, task: TaskConfig) -> List[Tuple[TaskConfig, ProviderLimiter]]:
+        """把任务拆成单模型的任务配置，以便按提供商限流"""
+        lanes = []
+        for model_name in task.model_list:
+            provider = model_config.get_model_info(model_name).api_provider
+            limiter = self.limiters.get(provider)
+            if limiter is None:
+                limiter = self.limiters[provider] = ProviderLimiter(
+                    provider, global_config.lpmm_knowledge.info_extraction_workers, 0
+                )
+            lanes.append((dataclasses.replace(task, model_list=[model_name]), limiter))
+        return lanes
+
+    def _worker_llm(self, model_set: TaskConfig, request_type: str) -> LLMRequest:
+        """为工作协程创建独占的LLMRequest，请求前后 model_usage 的差值即为该次请求的实际token用量"""
+        llm = SingleAttemptLLMRequest(model_set=model_set, request_type=request_type)
+        self.llms.append(llm)
+        return llm
+
+    def _initial_jobs(self) -> Iterator[List[ExtractionItem]]:
+        """按 pack_chars 把短段落贪心地合并成一组，长段落单独一组"""
+        if self.pack_chars <= 0:
+            for item in self.items:
+                yield [item]
+            return
+        pack: List[ExtractionItem] = []
+        pack_len = 0
+        for item in self.items:
+            if len(item.passage) >= self.pack_chars:
+                yield [item]
+                continue
+            if pack and (pack_len + len(item.passage) > self.pack_chars or len(pack) >= MAX_PACK_SIZE):
+                yield pack
+                pack, pack_len = [], 0
+            pack.append(item)
+            pack_len += len(item.passage)
+        if pack:
+            yield pack
+
+    @staticmethod
+    def _build_prompt(stage: str, job: List[ExtractionItem]) -> str:
+        if stage == "entity":
+            if len(job) == 1:
+                return prompt_template.build_entity_extract_context(job[0].passage)
+            return prompt_template.build_packed_entity_extract_context([item.passage for item in job])
+        entities = [json.dumps(item.entities, ensure_ascii=False) for item in job]
+        if len(job) == 1:
+            return prompt_template.build_rdf_triple_extract_context(job[0].passage, entities=entities[0])
+        return prompt_template.build_packed_rdf_triple_extract_context([item.passage for item in job], entities)
+
+    def _finish(self, item: ExtractionItem, failed: bool) -> None:
+        if item.finished:
+            return
+        item.finished = True
+        if failed:
+            self.failed.append(item.pg_hash)
+            logger.error(f"提取失败：{item.pg_hash}")
+        else:
+            self.completed += 1
+        self.remaining -= 1
+        if self.progress_callback:
+            self.progress_callback()
+        if self.remaining <= 0:
+            self.finished.set()
+
+    def _retry(self, stage: str, job: List[ExtractionItem], reason: str, rate_limited: bool = False) -> None:
+        """合并的请求失败时拆成单个段落重试；单个段落超过最大尝试次数则记为失败"""
+        if len(job) > 1:
+            for item in job:
+                self.queues[stage].put_nowait([item])
+            return
+        item = job[0]
+        stage_name = "实体提取" if stage == "entity" else "RDF构建"
+        if rate_limited:
+            # 限流由提供商退避处理，立即放回队列
+            item.rate_limited_attempts += 1
+            if item.rate_limited_attempts < MAX_RATE_LIMITED_ATTEMPTS:
+                self.queues[stage].put_nowait(job)
+                return
+        else:
+            item.attempts += 1
+        if item.attempts >= MAX_ATTEMPTS or item.rate_limited_attempts >= MAX_RATE_LIMITED_ATTEMPTS:
+            logger.error(f"{stage_name}失败，已达最大重试次数：{reason}")
+            self._finish(item, failed=True)
+            return
+        logger.warning(f"{stage_name}失败，将于{RETRY_DELAY_SECONDS:.0f}秒后重试：{reason}")
+        asyncio.get_running_loop().call_later(RETRY_DELAY_SECONDS, self.queues[stage].put_nowait, job)
+
+    def _write_result(self, item: ExtractionItem, triples: List[List[str]]) -> None:
+        doc_item = {
+            "idx": item.pg_hash,
+            "passage": item.passage,
+            "extracted_entities": item.entities,
+            "extracted_triples": triples,
+        }
+        self.results_log.write(json.dumps(doc_item, ensure_ascii=False) + "\n")
+        self.results_log.flush()
+        self._finish(item, failed=False)
 
-    # 使用文件锁检查和读取缓存文件
-    with file_lock:
-        if os.path.exists(temp_file_path):
+    def _handle_response(self, stage: str, job: List[ExtractionItem], response: str) -> None:
+        if len(job) == 1:
             try:
-                # 存在对应的提取结果
-                logger.info(f"找到缓存的提取结果：{pg_hash}")
-                with open(temp_file_path, "r", encoding="utf-8") as f:
-                    return json.load(f), None
-            except json.JSONDecodeError:
-                # 如果JSON文件损坏，删除它并重新处理
-                logger.warning(f"缓存文件损坏，重新处理：{pg_hash}")
-                os.remove(temp_file_path)
-
-    entity_list, rdf_triple_list = info_extract_from_str(
-        lpmm_entity_extract_llm,
-        lpmm_rdf_build_llm,
-        raw_data,
-    )
-    if entity_list is None or rdf_triple_list is None:
-        return None, pg_hash
-    doc_item = {
-        "idx": pg_hash,
-        "passage": raw_data,
-        "extracted_entities": entity_list,
-        "extracted_triples": rdf_triple_list,
-    }
-    # 保存临时提取结果
-    with file_lock:
+                results = [parse_entity_response(response) if stage == "entity" else parse_rdf_response(response)]
+            except ValueError as e:
+                self._retry(stage, job, str(e))
+                return
+        else:
+            results = parse_packed_response(response, len(job), stage)
+
+        done: List[ExtractionItem] = []
+        for item, result in zip(job, results, strict=True):
+            if result is None:
+                # 合并提示中缺失或格式错误的段落单独重试
+                self._retry(stage, [item], "合并提示中该段落的结果缺失或格式错误")
+                continue
+            if stage == "entity":
+                item.entities = result
+                item.attempts = item.rate_limited_attempts = 0
+                done.append(item)
+            else:
+                self._write_result(item, result)
+        if done:
+            # 同一组完成实体提取的段落一起进入RDF构建
+            self.queues["rdf"].put_nowait(done)
+
+    async def _worker(self, stage: str, llm: LLMRequest, limiter: ProviderLimiter) -> None:
+        queue = self.queues[stage]
+        while True:
+            await limiter.wait_ready()
+            # 之前因异常被记为失败的段落可能还留在队列中
+            job = [item for item in await queue.get() if not item.finished]
+            if not job:
+                continue
+            try:
+                await self._process(stage, job, llm, limiter)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # 工作协程不能因为单个任务的异常退出，否则队列中的段落可能永远得不到处理
+                logger.error(f"处理段落时出现异常，本组段落记为失败：{e!r}")
+                for item in job:
+                    self._finish(item, failed=True)
+
+    async def _process(self, stage: str, job: List[ExtractionItem], llm: LLMRequest, limiter: ProviderLimiter) -> None:
+        """发出一次请求并处理结果"""
+        prompt = self._build_prompt(stage, job)
+        prompt_tokens = estimate_tokens(prompt)
+        await limiter.acquire(prompt_tokens)
+        used_before = _used_tokens(llm)
+        response = ""
+        ok = rate_limited = False
+        error = ""
         try:
-            with open(temp_file_path, "w", encoding="utf-8") as f:
-                json.dump(doc_item, f, ensure_ascii=False, indent=4)
+            response, _ = await llm.generate_response_async(prompt)
+            ok = True
+        except RespNotOkException as e:
+            rate_limited = e.status_code == 429 or e.status_code >= 500
+            error = str(e)
+        except NetworkConnectionError as e:
+            rate_limited = True
+            error = str(e)
         except Exception as e:
-            logger.error(f"保存缓存文件失败：{pg_hash}, 错误：{e}")
-            # 如果保存失败，确保不会留下损坏的文件
-            if os.path.exists(temp_file_path):
-                os.remove(temp_file_path)
-            sys.exit(0)
-            return None, pg_hash
-    return doc_item, None
-
-
-def signal_handler(_signum, _frame):
-    """处理Ctrl+C信号"""
-    logger.info("\n接收到中断信号，正在优雅地关闭程序...")
-    sys.exit(0)
-
+            error = str(e)
+        finally:
+            # 发出前按估算值预占了token窗口，这里补记实际用量超出估算的部分；失败的请求没有用量
+            used_tokens = _used_tokens(llm) - used_before
+            await limiter.release(ok, rate_limited, max(0, used_tokens - prompt_tokens))
+        if len(job) > 1:
+            self.packed_requests += 1
+        if ok:
+            self._handle_response(stage, job, response)
+        else:
+            self._retry(stage, job, error, rate_limited)
+
+    def report(self) -> str:
+        elapsed_minutes = max(time.monotonic() - self.start_time, 1e-9) / 60
+        providers = "，".join(
+            f"{limiter.name} 并发{limiter.limit}/{limiter.max_concurrency} 请求{limiter.requests} 限流{limiter.rate_limited}"
+            for limiter in self.limiters.values()
+        )
+        return (
+            f"已完成 {self.completed}/{len(self.items)} 段（失败 {len(self.failed)}），"
+            f"{self.completed / elapsed_minutes:.1f} 段/分钟，{self.tokens / elapsed_minutes:.0f} tokens/分钟；{providers}"
+        )
 
-def _run(non_interactive: bool = False) -> None:  # sourcery skip: comprehension-to-generator, extract-method
-    # 设置信号处理器
-    signal.signal(signal.SIGINT, signal_handler)
+    async def _reporter(self) -> None:
+        while True:
+            await asyncio.sleep(REPORT_INTERVAL_SECONDS)
+            logger.info(self.report())
+
+    async def run(self) -> None:
+        if not self.items:
+            return
+        stages = {
+            "entity": (model_config.model_task_config.lpmm_entity_extract, "lpmm.entity_extract"),
+            "rdf": (model_config.model_task_config.lpmm_rdf_build, "lpmm.rdf_build"),
+        }
+        for job in self._initial_jobs():
+            self.queues["entity"].put_nowait(job)
+
+        tasks = [asyncio.create_task(self._reporter())]
+        for stage, (task_config, request_type) in stages.items():
+            for model_set, limiter in self._lanes(task_config):
+                for _ in range(limiter.max_concurrency):
+                    llm = self._worker_llm(model_set, request_type)
+                    tasks.append(asyncio.create_task(self._worker(stage, llm, limiter)))
+        try:
+            await self.finished.wait()
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def load_done_hashes() -> set:
+    """读取结果日志中已提取完成的段落hash"""
+    if not os.path.exists(RESULTS_LOG_PATH):
+        return set()
+    return {doc.get("idx") for _, doc in iter_openie_file(RESULTS_LOG_PATH)}
+
+
+def migrate_legacy_cache(pending_hashes: List[str], results_log) -> int:
+    """把旧版每段落一个的缓存文件（temp/<hash>.json）并入结果日志，返回迁移的数量"""
+    migrated = 0
+    for pg_hash in pending_hashes:
+        temp_file_path = os.path.join(TEMP_DIR, f"{pg_hash}.json")
+        if not os.path.exists(temp_file_path):
+            continue
+        try:
+            with open(temp_file_path, "r", encoding="utf-8") as f:
+                doc_item = json.load(f)
+        except (OSError, ValueError):
+            logger.warning(f"缓存文件损坏，重新处理：{pg_hash}")
+            continue
+        results_log.write(json.dumps(doc_item, ensure_ascii=False) + "\n")
+        os.remove(temp_file_path)
+        migrated += 1
+    results_log.flush()
+    return migrated
+
+
+def export_results(pg_hashes: set) -> Optional[str]:
+    """从结果日志中导出本次原始数据对应的提取结果为OpenIE jsonl批次文件"""
+
+    def select_docs():
+        seen = set()
+        for _, doc in iter_openie_file(RESULTS_LOG_PATH):
+            idx = doc.get("idx")
+            if idx in pg_hashes and idx not in seen:
+                seen.add(idx)
+                yield doc
+
+    # 输出文件名格式：MM-DD-HH-ss-openie.jsonl
+    now = datetime.datetime.now()
+    output_path = os.path.join(OPENIE_OUTPUT_DIR, now.strftime("%m-%d-%H-%S-openie.jsonl"))
+    count = write_openie_jsonl(output_path, select_docs())
+    if not count:
+        os.remove(output_path)
+        return None
+    return output_path
+
+
+def _parse_provider_limits(values: List[str]) -> Dict[str, Tuple[int, Optional[int]]]:
+    """解析 NAME=并发[:每分钟token] 形式的提供商限制"""
+    limits = {}
+    for value in values:
+        name, _, spec = value.partition("=")
+        concurrency, _, tpm = spec.partition(":")
+        try:
+            limits[name.strip()] = (int(concurrency), int(tpm) if tpm else None)
+        except ValueError:
+            raise SystemExit(f"无效的 --provider-limit 参数：{value}，格式应为 提供商名=并发[:每分钟token]") from None
+    return limits
+
+
+def _run(
+    non_interactive: bool = False,
+    concurrency: Optional[int] = None,
+    tokens_per_minute: int = 0,
+    provider_limits: Optional[Dict[str, Tuple[int, Optional[int]]]] = None,
+    pack_chars: int = 0,
+) -> None:  # sourcery skip: comprehension-to-generator, extract-method
     ensure_dirs()  # 确保目录存在
     # 新增用户确认提示
     if non_interactive:
@@ -153,15 +552,51 @@ def _run(non_interactive: bool = False) -> None:  # sourcery skip: comprehension
     logger.info("正在加载原始数据")
     all_sha256_list, all_raw_datas = load_raw_data()
 
-    failed_sha256 = []
-    open_ie_doc = []
-
-    workers = global_config.lpmm_knowledge.info_extraction_workers
-    with ThreadPoolExecutor(max_workers=workers) as executor:
-        future_to_hash = {
-            executor.submit(process_single_text, pg_hash, raw_data): pg_hash
-            for pg_hash, raw_data in zip(all_sha256_list, all_raw_datas, strict=False)
-        }
+    done_hashes = load_done_hashes()
+    pending = [
+        (pg_hash, raw_data)
+        for pg_hash, raw_data in zip(all_sha256_list, all_raw_datas, strict=False)
+        if pg_hash not in done_hashes
+    ]
+
+    # 并发与token速率按提供商限制
+    default_concurrency = concurrency or global_config.lpmm_knowledge.info_extraction_workers
+    limiters: Dict[str, ProviderLimiter] = {}
+    for task in (model_config.model_task_config.lpmm_entity_extract, model_config.model_task_config.lpmm_rdf_build):
+        for model_name in task.model_list:
+            provider = model_config.get_model_info(model_name).api_provider
+            if provider not in limiters:
+                provider_concurrency, provider_tpm = (provider_limits or {}).get(provider, (default_concurrency, None))
+                limiters[provider] = ProviderLimiter(
+                    provider, provider_concurrency, tokens_per_minute if provider_tpm is None else provider_tpm
+                )
+    # 脚本自行按提供商限流，不再经过主程序的优先级调度
+    llm_scheduler.config.enable = False
+
+    # 上次写入中断时最后一行可能不完整，先补一个换行，避免与新记录粘连
+    needs_newline = False
+    if os.path.exists(RESULTS_LOG_PATH) and os.path.getsize(RESULTS_LOG_PATH) > 0:
+        with open(RESULTS_LOG_PATH, "rb") as f:
+            f.seek(-1, os.SEEK_END)
+            needs_newline = f.read(1) != b"\n"
+
+    with open(RESULTS_LOG_PATH, "a", encoding="utf-8") as results_log:
+        if needs_newline:
+            results_log.write("\n")
+
+        migrated = migrate_legacy_cache([pg_hash for pg_hash, _ in pending], results_log)
+        if migrated:
+            logger.info(f"已将 {migrated} 个旧版缓存文件并入结果日志")
+            done_hashes = load_done_hashes()
+            pending = [(pg_hash, raw_data) for pg_hash, raw_data in pending if pg_hash not in done_hashes]
+
+        logger.info(f"共 {len(all_sha256_list)} 段，其中 {len(all_sha256_list) - len(pending)} 段已有提取结果，待提取 {len(pending)} 段")
+        engine = ExtractionEngine(
+            [ExtractionItem(pg_hash, raw_data) for pg_hash, raw_data in pending],
+            results_log,
+            limiters,
+            pack_chars=pack_chars,
+        )
 
         with Progress(
             SpinnerColumn(),
@@ -175,65 +610,35 @@ def _run(non_interactive: bool = False) -> None:  # sourcery skip: comprehension
             TimeRemainingColumn(),
             transient=False,
         ) as progress:
-            task = progress.add_task("正在进行提取：", total=len(future_to_hash))
+            task = progress.add_task("正在进行提取：", total=len(pending))
+            engine.progress_callback = lambda: progress.update(task, advance=1)
             try:
-                for future in as_completed(future_to_hash):
-                    if shutdown_event.is_set():
-                        for f in future_to_hash:
-                            if not f.done():
-                                f.cancel()
-                        break
-
-                    doc_item, failed_hash = future.result()
-                    if failed_hash:
-                        failed_sha256.append(failed_hash)
-                        logger.error(f"提取失败：{failed_hash}")
-                    elif doc_item:
-                        with open_ie_doc_lock:
-                            open_ie_doc.append(doc_item)
-                        logger.info('已处理"%s"', doc_item.get("passage", ""))
-                    progress.update(task, advance=1)
+                asyncio.run(engine.run())
             except KeyboardInterrupt:
-                logger.info("\n接收到中断信号，正在优雅地关闭程序...")
-                shutdown_event.set()
-                for f in future_to_hash:
-                    if not f.done():
-                        f.cancel()
-
-    # 合并所有文件的提取结果并保存
-    if open_ie_doc:
-        sum_phrase_chars = sum([len(e) for chunk in open_ie_doc for e in chunk["extracted_entities"]])
-        sum_phrase_words = sum([len(e.split()) for chunk in open_ie_doc for e in chunk["extracted_entities"]])
-        num_phrases = sum([len(chunk["extracted_entities"]) for chunk in open_ie_doc])
-        openie_obj = OpenIE(
-            open_ie_doc,
-            round(sum_phrase_chars / num_phrases, 4) if num_phrases else 0,
-            round(sum_phrase_words / num_phrases, 4) if num_phrases else 0,
-        )
-        # 输出文件名格式：MM-DD-HH-ss-openie.json
-        now = datetime.datetime.now()
-        filename = now.strftime("%m-%d-%H-%S-openie.json")
-        output_path = os.path.join(OPENIE_OUTPUT_DIR, filename)
-        with open(output_path, "w", encoding="utf-8") as f:
-            json.dump(
-                openie_obj.to_dict() if hasattr(openie_obj, "to_dict") else openie_obj.__dict__,
-                f,
-                ensure_ascii=False,
-                indent=4,
-            )
+                logger.info("\n接收到中断信号，已完成的提取结果保存在结果日志中，重新运行会跳过这些段落")
+                sys.exit(0)
+
+    if pending:
+        logger.info(engine.report())
+        if engine.packed_requests:
+            logger.info(f"合并提示请求数：{engine.packed_requests}")
+
+    # 导出本次原始数据对应的全部提取结果（包括之前已提取的）
+    output_path = export_results(set(all_sha256_list))
+    if output_path:
         logger.info(f"信息提取结果已保存到: {output_path}")
     else:
         logger.warning("没有可保存的信息提取结果")
 
     logger.info("--------信息提取完成--------")
-    logger.info(f"提取失败的文段SHA256：{failed_sha256}")
+    logger.info(f"提取失败的文段SHA256：{engine.failed}")
 
 
 def main(argv: Optional[list[str]] = None) -> None:
     parser = argparse.ArgumentParser(
         description=(
             "LPMM 信息提取脚本：从 data/lpmm_raw_data/*.txt 中读取原始段落，"
-            "调用 LLM 提取实体和三元组，并生成 OpenIE JSON 批次文件。"
+            "调用 LLM 提取实体和三元组，并生成 OpenIE JSONL 批次文件。"
         )
     )
     parser.add_argument(
@@ -241,9 +646,40 @@ def main(argv: Optional[list[str]] = None) -> None:
         action="store_true",
         help="非交互模式：跳过费用确认提示，直接开始执行；适用于 CI / 定时任务等场景。",
     )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=None,
+        help="每个API提供商的最大并发请求数（默认使用 lpmm_knowledge.info_extraction_workers），遇到限流时会自动下调",
+    )
+    parser.add_argument(
+        "--tokens-per-minute",
+        type=int,
+        default=0,
+        help="每个API提供商每分钟的token上限（按字符数估算），0为不限制",
+    )
+    parser.add_argument(
+        "--provider-limit",
+        action="append",
+        default=[],
+        metavar="NAME=并发[:每分钟token]",
+        help="单独设置某个提供商的并发与token上限，可重复指定，例如 --provider-limit SiliconFlow=8:200000",
+    )
+    parser.add_argument(
+        "--pack-chars",
+        type=int,
+        default=0,
+        help=f"将短段落合并到同一个提示中，每个提示的段落总字数上限（最多 {MAX_PACK_SIZE} 段），0为不合并",
+    )
     args = parser.parse_args(argv)
 
-    _run(non_interactive=args.non_interactive)
+    _run(
+        non_interactive=args.non_interactive,
+        concurrency=args.concurrency,
+        tokens_per_minute=args.tokens_per_minute,
+        provider_limits=_parse_provider_limits(args.provider_limit),
+        pack_chars=args.pack_chars,
+    )
 
 
 if __name__ == "__main__":
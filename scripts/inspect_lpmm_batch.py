@@ -1,5 +1,4 @@
 import argparse
-import json
 import os
 import sys
 from pathlib import Path
@@ -11,25 +10,23 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 from src.chat.knowledge.utils.hash import get_sha256
 from src.chat.knowledge.embedding_store import EmbeddingManager
 from src.chat.knowledge.kg_manager import KGManager
+from src.chat.knowledge.open_ie import iter_openie_file
 from src.common.logger import get_logger
 
 logger = get_logger("inspect_lpmm_batch")
 
 
 def load_openie_hashes(path: Path) -> Tuple[List[str], List[str], List[str]]:
-    """从 OpenIE JSON 中提取段落 / 实体 / 关系的哈希
+    """从 OpenIE 文件（.json 或 .jsonl）中提取段落 / 实体 / 关系的哈希
 
     注意：实体既包括 extracted_entities 中的条目，也包括三元组中的主语/宾语，
     以与 KG 构图逻辑保持一致。
     """
-    with path.open("r", encoding="utf-8") as f:
-        data = json.load(f)
-
     pg_hashes: List[str] = []
     ent_hashes: List[str] = []
     rel_hashes: List[str] = []
 
-    for doc in data.get("docs", []):
+    for _, doc in iter_openie_file(str(path)):
         if not isinstance(doc, dict):
             continue
         idx = doc.get("idx")
@@ -66,7 +63,7 @@ def main() -> None:
     parser = argparse.ArgumentParser(
         description="检查指定 OpenIE 文件对应批次在当前向量库与 KG 中的存在情况（用于验证删除效果）。"
     )
-    parser.add_argument("--openie-file", required=True, help="OpenIE 输出 JSON 文件路径")
+    parser.add_argument("--openie-file", required=True, help="OpenIE 输出文件路径（.json 或 .jsonl）")
     args = parser.parse_args()
 
     openie_path = Path(args.openie_file)
@@ -87,7 +87,7 @@ def _check_before_info_extract(non_interactive: bool = False) -> bool:
 def _check_before_import_openie(non_interactive: bool = False) -> bool:
     """导入 OpenIE 前的轻量级检查。"""
     openie_dir = Path(PROJECT_ROOT) / "data" / "openie"
-    json_files = list(openie_dir.glob("*.json"))
+    json_files = list(openie_dir.glob("*.json")) + list(openie_dir.glob("*.jsonl"))
     if not json_files:
         msg = (
             f"[WARN] 未在 {openie_dir} 下找到任何 OpenIE JSON 文件，"
@@ -3,8 +3,11 @@
 .mmipkg 表情包打包工具
 用于导入/导出 MaiBot 已注册表情包
 
-版本：1.0
-日期：2025-11-13
+版本：2.0
+日期：2026-10-19
+
+文件布局（v2）：Header(32) | 逐张独立压缩的图片帧 | 索引（msgpack manifest，含各帧偏移与大小）| Footer(56)
+导出与导入都由进程池并行处理图片，内存占用与表情包数量无关；仍可导入整体压缩的 v1 包。
 """
 
 import hashlib
@@ -14,9 +17,11 @@ import struct
 import sys
 import time
 import uuid
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
 from datetime import datetime
 from pathlib import Path
-from typing import BinaryIO, Dict, List, Optional, Tuple
+from typing import BinaryIO, Deque, Dict, List, Optional, Set, Tuple
 
 try:
     import msgpack
@@ -59,8 +64,18 @@ from src.common.database.database_model import Emoji
 # 常量定义
 MAGIC = b"MMIP"
 FOOTER_MAGIC = b"MMFF"
-VERSION = 1
-FOOTER_VERSION = 1
+VERSION = 2
+LEGACY_VERSION = 1  # 整体压缩的 payload + 末尾 SHA256
+FOOTER_VERSION = 2
+HEADER_SIZE = 32
+FOOTER_SIZE = 56
+LEGACY_FOOTER_SIZE = 40
+
+# 流式处理参数
+STREAM_CHUNK_SIZE = 1024 * 1024  # 流式读取的块大小
+PENDING_FRAMES_PER_WORKER = 4  # 导出时每个进程在途的图片数，限制内存占用
+QUERY_CHUNK_SIZE = 500  # 批量查重时每条查询的哈希数
+INSERT_CHUNK_SIZE = 50  # 每条 INSERT 的行数（受 SQLite 变量数限制）
 
 # 安全限制
 MAX_MANIFEST_SIZE = 200 * 1024 * 1024  # 200 MB
@@ -154,6 +169,92 @@ def reencode_image(file_path: str, output_format: str = "webp", quality: int = 8
         raise MMIPKGError(f"重新编码图片失败 {file_path}: {e}") from e
 
 
+def _compress_frame(data: bytes, zstd_level: Optional[int]) -> Tuple[bytes, bool]:
+    """独立压缩一个帧；压缩后没有变小（如本身已压缩的图片格式）时保留原始数据
+
+    Returns:
+        (帧数据, 是否压缩)
+    """
+    if zstd_level is None or zstd is None:
+        return data, False
+    compressed = zstd.ZstdCompressor(level=zstd_level).compress(data)
+    if len(compressed) < len(data):
+        return compressed, True
+    return data, False
+
+
+def _prepare_frame(task: Tuple[str, Optional[str], int, Optional[int]]) -> Dict:
+    """（工作进程）读取或重新编码一张图片，计算校验信息并压缩为独立的帧"""
+    file_path, reencode, quality, zstd_level = task
+    if not os.path.exists(file_path):
+        return {"error": "文件不存在"}
+
+    warning = None
+    img_bytes = None
+    if reencode:
+        try:
+            img_bytes = reencode_image(file_path, reencode, quality)
+        except Exception as e:
+            warning = f"重新编码失败，使用原始文件: {e}"
+    if img_bytes is None:
+        with open(file_path, "rb") as f:
+            img_bytes = f.read()
+
+    width, height, mime_type = get_image_info(file_path)
+    frame, compressed = _compress_frame(img_bytes, zstd_level)
+    return {
+        "frame": frame,
+        "z": compressed,
+        "s": len(img_bytes),
+        "h": calculate_sha256(img_bytes),
+        "w": width,
+        "ht": height,
+        "m": mime_type,
+        "warning": warning,
+    }
+
+
+def _extract_frame(task: Tuple[str, int, int, bool, Optional[bytes], int, str]) -> Optional[str]:
+    """（工作进程）从包中读取一个帧，解压、校验后写入目标文件
+
+    Returns:
+        错误信息，成功时为 None
+    """
+    package_path, offset, length, compressed, expected_sha, raw_size, file_path = task
+    try:
+        with open(package_path, "rb") as f:
+            f.seek(offset)
+            data = f.read(length)
+        if len(data) != length:
+            return "图片数据不完整"
+        if compressed:
+            if zstd is None:
+                return "需要 zstandard 库来解压此包"
+            data = zstd.ZstdDecompressor().decompress(data, max_output_size=raw_size)
+        if expected_sha and calculate_sha256(data) != expected_sha:
+            return "图片 SHA256 不匹配，跳过"
+        with open(file_path, "wb") as img_file:
+            img_file.write(data)
+        return None
+    except Exception as e:
+        return f"处理失败: {e}"
+
+
+def _default_workers() -> int:
+    return max(1, min(os.cpu_count() or 1, 32))
+
+
+def _new_progress(*extra_columns) -> Progress:
+    return Progress(
+        SpinnerColumn(),
+        TextColumn("[progress.description]{task.description}"),
+        BarColumn(),
+        TextColumn("[progress.percentage]{task.percentage:>3.0f}%"),
+        *extra_columns,
+        console=console,
+    )
+
+
 class MMIPKGPacker:
     """MMIPKG 打包器"""
 
@@ -163,11 +264,13 @@ class MMIPKGPacker:
         zstd_level: int = 3,
         reencode: Optional[str] = None,
         reencode_quality: int = 80,
+        workers: Optional[int] = None,
     ):
         self.use_compression = use_compression and zstd is not None
         self.zstd_level = zstd_level
         self.reencode = reencode
         self.reencode_quality = reencode_quality
+        self.workers = workers or _default_workers()
 
         if use_compression and zstd is None:
             print("警告: zstandard 未安装，将不使用压缩")
@@ -188,95 +291,14 @@ class MMIPKGPacker:
             if db.is_closed():
                 db.connect()
 
-            # 查询所有已注册的表情包
-            emojis = Emoji.select().where(Emoji.is_registered)
-            emoji_count = emojis.count()
+            # 查询所有已注册的表情包（只有元数据，图片由工作进程读取）
+            emojis = list(Emoji.select().where(Emoji.is_registered))
 
-            if emoji_count == 0:
+            if not emojis:
                 print("错误: 数据库中没有已注册的表情包")
                 return False
 
-            print(f"找到 {emoji_count} 个已注册的表情包")
-
-            # 准备 items
-            items = []
-            image_data_list = []
-
-            # 使用进度条处理表情包
-            with Progress(
-                SpinnerColumn(),
-                TextColumn("[progress.description]{task.description}"),
-                BarColumn(),
-                TextColumn("[progress.percentage]{task.percentage:>3.0f}%"),
-                TimeElapsedColumn(),
-                console=console,
-            ) as progress:
-                task = progress.add_task("[cyan]扫描表情包...", total=emoji_count)
-
-                for idx, emoji in enumerate(emojis, 1):
-                    progress.update(
-                        task, description=f"[cyan]处理 {idx}/{emoji_count}: {os.path.basename(emoji.full_path)}"
-                    )
-
-                    # 检查文件是否存在
-                    if not os.path.exists(emoji.full_path):
-                        console.print("  [yellow]警告: 文件不存在，跳过[/yellow]")
-                        progress.advance(task)
-                        continue
-
-                    # 读取或重新编码图片
-                    if self.reencode:
-                        try:
-                            img_bytes = reencode_image(emoji.full_path, self.reencode, self.reencode_quality)
-                        except Exception as e:
-                            console.print(f"  [yellow]警告: 重新编码失败，使用原始文件: {e}[/yellow]")
-                            with open(emoji.full_path, "rb") as f:
-                                img_bytes = f.read()
-                    else:
-                        with open(emoji.full_path, "rb") as f:
-                            img_bytes = f.read()
-
-                    # 计算 SHA256
-                    img_sha = calculate_sha256(img_bytes)
-
-                    # 获取图片信息
-                    width, height, mime_type = get_image_info(emoji.full_path)
-
-                    # 构建 item（使用短字段名）
-                    filename = os.path.basename(emoji.full_path)
-                    item = {
-                        "i": str(idx).zfill(5),  # id
-                        "fn": filename,  # filename
-                        "s": len(img_bytes),  # size
-                        "h": img_sha,  # sha256 (binary)
-                        "m": mime_type,  # mime
-                        "w": width,  # width
-                        "ht": height,  # height
-                        "opt": {
-                            # 存储 MaiBot 特有的元数据 - 完整的数据库信息
-                            "desc": emoji.description or "",
-                            "emotion": emoji.emotion or "",
-                            "usage_count": emoji.usage_count or 0,
-                            "last_used_time": emoji.last_used_time or time.time(),
-                            "register_time": emoji.register_time or time.time(),
-                            "record_time": emoji.record_time or time.time(),
-                            "query_count": emoji.query_count or 0,
-                            "format": emoji.format or "",
-                            "emoji_hash": emoji.emoji_hash or "",
-                            "is_registered": True,
-                            "is_banned": emoji.is_banned or False,
-                        },
-                    }
-
-                    items.append(item)
-                    image_data_list.append(img_bytes)
-                    progress.advance(task)
-
-            if not items:
-                print("错误: 没有有效的表情包可以打包")
-                return False
-
-            print(f"找到 {len(items)} 个表情包可以打包...")
+            print(f"找到 {len(emojis)} 个已注册的表情包，使用 {self.workers} 个进程处理")
 
             # 准备打包
             pack_id = str(uuid.uuid4())
@@ -287,7 +309,7 @@ class MMIPKGPacker:
                 "p": pack_id,  # pack_id
                 "n": pack_name,  # pack_name
                 "t": datetime.now().isoformat(),  # created_at
-                "a": items,  # items array
+                "a": [],  # items array，写入帧时填充
             }
 
             # 添加自定义字段
@@ -296,20 +318,7 @@ class MMIPKGPacker:
                     if key not in manifest:  # 不覆盖核心字段
                         manifest[key] = value
 
-            # 序列化 manifest
-            manifest_bytes = msgpack.packb(manifest, use_bin_type=True)
-            manifest_len = len(manifest_bytes)
-
-            # 计算 payload 大小
-            payload_size = 4 + manifest_len  # manifest_len + manifest_bytes
-            for img_bytes in image_data_list:
-                payload_size += 4 + len(img_bytes)  # img_len + img_bytes
-
-            print(f"Manifest 大小: {manifest_len / 1024:.2f} KB")
-            print(f"Payload 未压缩大小: {payload_size / 1024 / 1024:.2f} MB")
-
-            # 写入文件
-            return self._write_package(output_path, manifest_bytes, image_data_list, payload_size)
+            return self._write_package(output_path, emojis, manifest)
 
         except Exception as e:
             print(f"打包失败: {e}")
@@ -321,108 +330,124 @@ class MMIPKGPacker:
             if not db.is_closed():
                 db.close()
 
-    def _write_package(
-        self, output_path: str, manifest_bytes: bytes, image_data_list: List[bytes], payload_size: int
-    ) -> bool:
-        """写入打包文件"""
+    def _build_header(self, payload_size: int, manifest_size: int) -> bytes:
+        flags = 0x01 if self.use_compression else 0x00
+        header = MAGIC  # 4 bytes
+        header += struct.pack("B", VERSION)  # 1 byte
+        header += struct.pack("B", flags)  # 1 byte
+        header += b"\x00\x00"  # 2 bytes reserved
+        header += struct.pack(">Q", payload_size)  # 8 bytes，图片未压缩总大小
+        header += struct.pack(">Q", manifest_size)  # 8 bytes，索引未压缩大小
+        header += b"\x00" * 8  # 8 bytes reserved
+        assert len(header) == HEADER_SIZE, f"Header size mismatch: {len(header)}"
+        return header
+
+    @staticmethod
+    def _build_item(index: int, emoji: Emoji, result: Dict, offset: int) -> Dict:
+        """构建 item（使用短字段名）"""
+        return {
+            "i": str(index).zfill(5),  # id
+            "fn": os.path.basename(emoji.full_path),  # filename
+            "s": result["s"],  # size
+            "h": result["h"],  # sha256 (binary)
+            "m": result["m"],  # mime
+            "w": result["w"],  # width
+            "ht": result["ht"],  # height
+            "o": offset,  # 帧在文件中的偏移
+            "c": len(result["frame"]),  # 帧大小
+            "z": result["z"],  # 帧是否压缩
+            "opt": {
+                # 存储 MaiBot 特有的元数据 - 完整的数据库信息
+                "desc": emoji.description or "",
+                "emotion": emoji.emotion or "",
+                "usage_count": emoji.usage_count or 0,
+                "last_used_time": emoji.last_used_time or time.time(),
+                "register_time": emoji.register_time or time.time(),
+                "record_time": emoji.record_time or time.time(),
+                "query_count": emoji.query_count or 0,
+                "format": emoji.format or "",
+                "emoji_hash": emoji.emoji_hash or "",
+                "is_registered": True,
+                "is_banned": emoji.is_banned or False,
+            },
+        }
+
+    def _write_package(self, output_path: str, emojis: List[Emoji], manifest: Dict) -> bool:
+        """写入打包文件：图片由进程池并行读取/重新编码/压缩，主进程按顺序写入帧，最后写入索引"""
+        zstd_level = self.zstd_level if self.use_compression else None
+        items = manifest["a"]
+        payload_size = 0
         try:
-            with open(output_path, "wb") as f:
-                # 写入 Header (32 bytes)
-                flags = 0x01 if self.use_compression else 0x00
-                header = MAGIC  # 4 bytes
-                header += struct.pack("B", VERSION)  # 1 byte
-                header += struct.pack("B", flags)  # 1 byte
-                header += b"\x00\x00"  # 2 bytes reserved
-                header += struct.pack(">Q", payload_size)  # 8 bytes
-                header += struct.pack(">Q", len(manifest_bytes))  # 8 bytes
-                header += b"\x00" * 8  # 8 bytes reserved
-
-                assert len(header) == 32, f"Header size mismatch: {len(header)}"
-                f.write(header)
-
-                # 准备 payload 并计算 SHA256
-                payload_sha = hashlib.sha256()
-
-                # 写入 payload（可能压缩）
+            with open(output_path, "wb") as f, ProcessPoolExecutor(max_workers=self.workers) as pool:
+                # Header 占位，写完后回填大小
+                f.write(self._build_header(0, 0))
                 if self.use_compression:
-                    console.print(f"[cyan]使用 Zstd 压缩 (level={self.zstd_level})...[/cyan]")
-                    compressor = zstd.ZstdCompressor(level=self.zstd_level)
-
-                    with compressor.stream_writer(f, closefd=False) as writer:
-                        # 写入 manifest
-                        manifest_len_bytes = struct.pack(">I", len(manifest_bytes))
-                        writer.write(manifest_len_bytes)
-                        writer.write(manifest_bytes)
-                        payload_sha.update(manifest_len_bytes)
-                        payload_sha.update(manifest_bytes)
-
-                        # 使用进度条写入所有图片
-                        with Progress(
-                            SpinnerColumn(),
-                            TextColumn("[progress.description]{task.description}"),
-                            BarColumn(),
-                            TextColumn("[progress.percentage]{task.percentage:>3.0f}%"),
-                            TimeRemainingColumn(),
-                            console=console,
-                        ) as progress:
-                            task = progress.add_task("[green]压缩写入图片...", total=len(image_data_list))
-
-                            for idx, img_bytes in enumerate(image_data_list, 1):
-                                progress.update(task, description=f"[green]压缩写入 {idx}/{len(image_data_list)}")
-                                img_len_bytes = struct.pack(">I", len(img_bytes))
-                                writer.write(img_len_bytes)
-                                writer.write(img_bytes)
-                                payload_sha.update(img_len_bytes)
-                                payload_sha.update(img_bytes)
-                                progress.advance(task)
-                else:
-                    # 不压缩，直接写入
-                    # 写入 manifest
-                    manifest_len_bytes = struct.pack(">I", len(manifest_bytes))
-                    f.write(manifest_len_bytes)
-                    f.write(manifest_bytes)
-                    payload_sha.update(manifest_len_bytes)
-                    payload_sha.update(manifest_bytes)
-
-                    # 使用进度条写入所有图片
-                    with Progress(
-                        SpinnerColumn(),
-                        TextColumn("[progress.description]{task.description}"),
-                        BarColumn(),
-                        TextColumn("[progress.percentage]{task.percentage:>3.0f}%"),
-                        TimeRemainingColumn(),
-                        console=console,
-                    ) as progress:
-                        task = progress.add_task("[green]写入图片...", total=len(image_data_list))
-
-                        for idx, img_bytes in enumerate(image_data_list, 1):
-                            progress.update(task, description=f"[green]写入 {idx}/{len(image_data_list)}")
-                            img_len_bytes = struct.pack(">I", len(img_bytes))
-                            f.write(img_len_bytes)
-                            f.write(img_bytes)
-                            payload_sha.update(img_len_bytes)
-                            payload_sha.update(img_bytes)
-                            progress.advance(task)
-
-                # 写入 Footer (40 bytes)
-                file_sha256 = payload_sha.digest()
+                    console.print(f"[cyan]使用 Zstd 逐帧压缩 (level={self.zstd_level})...[/cyan]")
+
+                with _new_progress(TimeRemainingColumn()) as progress:
+                    task = progress.add_task("[cyan]处理表情包...", total=len(emojis))
+
+                    def write_frame(emoji: Emoji, future: Future) -> None:
+                        nonlocal payload_size
+                        filename = os.path.basename(emoji.full_path)
+                        try:
+                            result = future.result()
+                        except Exception as e:
+                            result = {"error": str(e)}
+                        progress.update(task, description=f"[cyan]处理: {filename}")
+                        progress.advance(task)
+                        if "error" in result:
+                            console.print(f"  [yellow]警告: {filename} {result['error']}，跳过[/yellow]")
+                            return
+                        if result["warning"]:
+                            console.print(f"  [yellow]警告: {filename} {result['warning']}[/yellow]")
+                        items.append(self._build_item(len(items) + 1, emoji, result, f.tell()))
+                        f.write(result["frame"])
+                        payload_size += result["s"]
+
+                    # 只保持有限数量的任务在途，内存占用与表情包总数无关
+                    pending: Deque[Tuple[Emoji, Future]] = deque()
+                    for emoji in emojis:
+                        task_args = (emoji.full_path, self.reencode, self.reencode_quality, zstd_level)
+                        pending.append((emoji, pool.submit(_prepare_frame, task_args)))
+                        if len(pending) >= self.workers * PENDING_FRAMES_PER_WORKER:
+                            write_frame(*pending.popleft())
+                    while pending:
+                        write_frame(*pending.popleft())
+
+                if not items:
+                    print("错误: 没有有效的表情包可以打包")
+                    return False
+
+                # 写入索引（manifest）与 Footer
+                manifest_bytes = msgpack.packb(manifest, use_bin_type=True)
+                index_frame, index_compressed = _compress_frame(manifest_bytes, zstd_level)
+                index_offset = f.tell()
+                f.write(index_frame)
+
                 footer = FOOTER_MAGIC  # 4 bytes
-                footer += file_sha256  # 32 bytes
+                footer += struct.pack(">QQ", index_offset, len(index_frame))  # 16 bytes
+                footer += calculate_sha256(manifest_bytes)  # 32 bytes
                 footer += struct.pack("B", FOOTER_VERSION)  # 1 byte
-                footer += b"\x00" * 3  # 3 bytes reserved
-
-                assert len(footer) == 40, f"Footer size mismatch: {len(footer)}"
+                footer += struct.pack("B", 0x01 if index_compressed else 0x00)  # 1 byte
+                footer += b"\x00" * 2  # 2 bytes reserved
+                assert len(footer) == FOOTER_SIZE, f"Footer size mismatch: {len(footer)}"
                 f.write(footer)
 
                 file_size = f.tell()
-                print("\n打包完成!")
-                print(f"输出文件: {output_path}")
-                print(f"文件大小: {file_size / 1024 / 1024:.2f} MB")
-                if self.use_compression:
-                    ratio = (1 - file_size / (payload_size + 32 + 40)) * 100
-                    print(f"压缩率: {ratio:.1f}%")
+                f.seek(0)
+                f.write(self._build_header(payload_size, len(manifest_bytes)))
 
-                return True
+            print("\n打包完成!")
+            print(f"输出文件: {output_path}")
+            print(f"表情包数量: {len(items)}")
+            print(f"Manifest 大小: {len(manifest_bytes) / 1024:.2f} KB")
+            print(f"文件大小: {file_size / 1024 / 1024:.2f} MB")
+            if self.use_compression:
+                ratio = (1 - file_size / (payload_size + len(manifest_bytes) + HEADER_SIZE + FOOTER_SIZE)) * 100
+                print(f"压缩率: {ratio:.1f}%")
+
+            return True
 
         except Exception as e:
             print(f"写入文件失败: {e}")
@@ -432,11 +457,200 @@ class MMIPKGPacker:
             return False
 
 
+class _BoundedReader:
+    """只读取底层文件中指定长度的数据（用于未压缩的旧版 payload）"""
+
+    def __init__(self, f: BinaryIO, size: int):
+        self.f = f
+        self.remaining = size
+
+    def read(self, size: int = -1) -> bytes:
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.f.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def __enter__(self) -> "_BoundedReader":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        return None
+
+
+def _read_exact(reader, size: int) -> bytes:
+    """从流中读取恰好 size 字节（流式解压时单次 read 可能返回更少的数据）"""
+    chunks = []
+    remaining = size
+    while remaining > 0:
+        chunk = reader.read(min(remaining, STREAM_CHUNK_SIZE))
+        if not chunk:
+            break
+        chunks.append(chunk)
+        remaining -= len(chunk)
+    data = b"".join(chunks)
+    if len(data) != size:
+        raise MMIPKGError(f"数据不完整: 期望 {size} bytes，实际 {len(data)} bytes")
+    return data
+
+
+class _BatchImporter:
+    """按批次查重、分配文件名，并批量写入数据库"""
+
+    def __init__(self, output_dir: str, replace_existing: bool):
+        self.output_dir = output_dir
+        self.replace_existing = replace_existing
+        self.reserved_paths: Set[str] = set()
+        # 分配时已经存在、会被覆盖的文件（替换模式），写库失败时不能删除
+        self.overwritten_paths: Set[str] = set()
+        self.seen_hashes: Set[str] = set()
+        self.imported_count = 0
+        self.skipped_count = 0
+        self.error_count = 0
+
+    @staticmethod
+    def _emoji_hash(item: Dict) -> str:
+        # 使用 or 提供回退值，如果 emoji_hash 为空则使用图片数据的 SHA256
+        sha = item.get("h")
+        return item.get("opt", {}).get("emoji_hash") or (sha.hex() if isinstance(sha, bytes) else "")
+
+    def _existing(self, hashes: List[str]) -> Dict[str, Emoji]:
+        existing: Dict[str, Emoji] = {}
+        for start in range(0, len(hashes), QUERY_CHUNK_SIZE):
+            for emoji in Emoji.select().where(Emoji.emoji_hash.in_(hashes[start : start + QUERY_CHUNK_SIZE])):
+                existing.setdefault(emoji.emoji_hash, emoji)
+        return existing
+
+    def _target_path(self, filename: str) -> str:
+        """如果文件已存在且不替换（或本次导入已使用该文件名），生成新文件名"""
+        file_path = os.path.join(self.output_dir, filename)
+        base, ext = os.path.splitext(filename)
+        counter = 1
+        while (os.path.exists(file_path) and not self.replace_existing) or file_path in self.reserved_paths:
+            file_path = os.path.join(self.output_dir, f"{base}_{counter}{ext}")
+            counter += 1
+        self.reserved_paths.add(file_path)
+        if os.path.exists(file_path):
+            self.overwritten_paths.add(file_path)
+        return file_path
+
+    def _discard_file(self, file_path: str) -> None:
+        """删除写库失败的记录对应的图片文件，避免留下没有记录指向的文件"""
+        if file_path in self.overwritten_paths:
+            return
+        try:
+            os.remove(file_path)
+        except OSError as e:
+            console.print(f"[yellow]警告: 无法删除未导入的文件 {file_path}: {e}[/yellow]")
+
+    def plan(self, batch: List[Dict]) -> List[Optional[Tuple[Dict, str, str, Optional[Emoji]]]]:
+        """为一批 item 查重并分配文件路径
+
+        Returns:
+            与 batch 一一对应的列表，需要导入的为 (item, emoji_hash, file_path, 已存在的记录)，跳过或出错的为 None
+        """
+        hashes = [self._emoji_hash(item) for item in batch]
+        existing = self._existing(list({emoji_hash for emoji_hash in hashes if emoji_hash}))
+        plans: List[Optional[Tuple[Dict, str, str, Optional[Emoji]]]] = []
+        for item, emoji_hash in zip(batch, hashes, strict=True):
+            if not emoji_hash:
+                console.print(f"[red]错误: 缺少图片哈希 (item {item.get('i')})[/red]")
+                self.error_count += 1
+                plans.append(None)
+                continue
+            current = existing.get(emoji_hash)
+            if emoji_hash in self.seen_hashes or (current and not self.replace_existing):
+                self.skipped_count += 1
+                plans.append(None)
+                continue
+            self.seen_hashes.add(emoji_hash)
+            opt = item.get("opt", {})
+            filename = os.path.basename(item.get("fn") or f"{emoji_hash[:8]}.{opt.get('format', 'png')}")
+            plans.append((item, emoji_hash, self._target_path(filename), current))
+        return plans
+
+    @staticmethod
+    def _fields(opt: Dict, file_path: str, current_time: float) -> Dict:
+        """恢复完整的数据库信息"""
+        return {
+            "full_path": file_path,
+            "format": opt.get("format", ""),
+            "description": opt.get("desc", ""),
+            "emotion": opt.get("emotion", ""),
+            "usage_count": opt.get("usage_count", 0),
+            "last_used_time": opt.get("last_used_time", current_time),
+            "register_time": opt.get("register_time", current_time),
+            "record_time": opt.get("record_time", current_time),
+            "query_count": opt.get("query_count", 0),
+            "is_registered": opt.get("is_registered", True),
+            "is_banned": opt.get("is_banned", False),
+        }
+
+    def commit(self, written: List[Tuple[Dict, str, str, Optional[Emoji]]]) -> None:
+        """将一批已写入文件的表情包批量写入数据库，写库失败的记录会删除对应的图片文件"""
+        current_time = time.time()
+        new_rows = []
+        updates = []
+        for item, emoji_hash, file_path, current in written:
+            fields = self._fields(item.get("opt", {}), file_path, current_time)
+            if current is not None:
+                updates.append((current.id, fields))
+            else:
+                new_rows.append({"emoji_hash": emoji_hash, **fields})
+
+        failed_paths: List[str] = []
+        imported = 0
+        try:
+            with db.atomic():
+                for start in range(0, len(new_rows), INSERT_CHUNK_SIZE):
+                    chunk = new_rows[start : start + INSERT_CHUNK_SIZE]
+                    try:
+                        with db.atomic():
+                            Emoji.insert_many(chunk).execute()
+                        imported += len(chunk)
+                    except Exception:
+                        # 批量插入失败时逐条重试，定位出错的记录
+                        for row in chunk:
+                            try:
+                                with db.atomic():
+                                    Emoji.insert(row).execute()
+                                imported += 1
+                            except Exception as e:
+                                console.print(f"[red]写入 {os.path.basename(row['full_path'])} 失败: {e}[/red]")
+                                failed_paths.append(row["full_path"])
+                for emoji_id, fields in updates:
+                    try:
+                        with db.atomic():
+                            Emoji.update(**fields).where(Emoji.id == emoji_id).execute()
+                        imported += 1
+                    except Exception as e:
+                        console.print(f"[red]更新 {os.path.basename(fields['full_path'])} 失败: {e}[/red]")
+                        failed_paths.append(fields["full_path"])
+        except Exception as e:
+            # 事务提交失败，本批没有任何记录写入
+            console.print(f"[red]提交本批 {len(written)} 个表情包失败: {e}[/red]")
+            imported = 0
+            failed_paths = [file_path for _, _, file_path, _ in written]
+
+        self.imported_count += imported
+        self.error_count += len(failed_paths)
+        for file_path in failed_paths:
+            self._discard_file(file_path)
+
+    def report(self) -> bool:
+        console.print(f"\n[green]✓ 成功导入 {self.imported_count} 个表情包[/green]")
+        console.print(f"  [yellow]跳过 {self.skipped_count} 个[/yellow]")
+        if self.error_count > 0:
+            console.print(f"  [red]错误 {self.error_count} 个[/red]")
+        return self.error_count == 0
+
+
 class MMIPKGUnpacker:
     """MMIPKG 解包器"""
 
-    def __init__(self, verify_sha: bool = True):
+    def __init__(self, verify_sha: bool = True, workers: Optional[int] = None):
         self.verify_sha = verify_sha
+        self.workers = workers or _default_workers()
 
     def import_to_db(
         self, package_path: str, output_dir: Optional[str] = None, replace_existing: bool = False, batch_size: int = 500
@@ -461,8 +675,8 @@ class MMIPKGUnpacker:
 
             with open(package_path, "rb") as f:
                 # 读取 Header
-                header = f.read(32)
-                if len(header) != 32:
+                header = f.read(HEADER_SIZE)
+                if len(header) != HEADER_SIZE:
                     raise MMIPKGError("Header 大小不正确")
 
                 magic = header[:4]
@@ -470,9 +684,6 @@ class MMIPKGUnpacker:
                     raise MMIPKGError(f"无效的 MAGIC: {magic}")
 
                 version = struct.unpack("B", header[4:5])[0]
-                if version != VERSION:
-                    print(f"警告: 包版本 {version} 与当前版本 {VERSION} 不匹配")
-
                 flags = struct.unpack("B", header[5:6])[0]
                 is_compressed = bool(flags & 0x01)
 
@@ -485,85 +696,19 @@ class MMIPKGUnpacker:
                 if payload_uncompressed_len > MAX_PAYLOAD_SIZE:
                     raise MMIPKGError(f"Payload 过大: {payload_uncompressed_len} bytes")
 
+                print(f"格式版本: {version}")
                 print(f"压缩: {'是' if is_compressed else '否'}")
                 print(f"Payload 大小: {payload_uncompressed_len / 1024 / 1024:.2f} MB")
 
-                # 读取 payload
-                payload_start = f.tell()
-
-                # 找到 footer 位置
-                f.seek(-40, 2)  # 从文件末尾向前 40 bytes
-                footer = f.read(40)
-
-                if footer[:4] != FOOTER_MAGIC:
-                    raise MMIPKGError("无效的 Footer MAGIC")
-
-                expected_sha = footer[4:36]
-
-                # 回到 payload 开始
-                f.seek(payload_start)
-
-                # 读取整个 payload（用于计算 SHA）
-                footer_start = os.path.getsize(package_path) - 40
-                payload_data_size = footer_start - payload_start
-
-                # 解压或直接读取
-                if is_compressed:
-                    if zstd is None:
-                        raise MMIPKGError("需要 zstandard 库来解压此包")
+                if version == LEGACY_VERSION:
+                    return self._import_legacy(f, is_compressed, output_dir, replace_existing, batch_size)
+                if version != VERSION:
+                    raise MMIPKGError(f"不支持的包版本: {version}（当前版本 {VERSION}）")
 
-                    print("解压 payload...")
-                    compressed_data = f.read(payload_data_size)
+                manifest = self._read_index(f)
 
-                    # 使用流式解压，不需要预知解压后大小
-                    decompressor = zstd.ZstdDecompressor()
-                    try:
-                        # 方法1：使用 stream_reader（推荐）
-                        dctx = zstd.ZstdDecompressor()
-                        with io.BytesIO(compressed_data) as compressed_stream:
-                            with dctx.stream_reader(compressed_stream) as reader:
-                                payload_data = reader.read()
-                    except Exception as e:
-                        # 方法2：如果流式失败，尝试直接解压（兼容旧格式）
-                        print(f"  流式解压失败，尝试直接解压: {e}")
-                        try:
-                            payload_data = decompressor.decompress(
-                                compressed_data, max_output_size=payload_uncompressed_len
-                            )
-                        except Exception as e2:
-                            raise MMIPKGError(f"解压失败: {e2}") from e2
-                else:
-                    payload_data = f.read(payload_data_size)
-
-                # 验证 SHA256
-                actual_sha = calculate_sha256(payload_data)
-                if self.verify_sha and actual_sha != expected_sha:
-                    raise MMIPKGError("SHA256 校验失败!")
-                if self.verify_sha:
-                    print("✓ SHA256 校验通过")
-
-                # 解析 payload
-                payload_stream = io.BytesIO(payload_data)
-
-                # 读取 manifest
-                manifest_len_bytes = payload_stream.read(4)
-                manifest_len = struct.unpack(">I", manifest_len_bytes)[0]
-                manifest_bytes = payload_stream.read(manifest_len)
-                manifest = msgpack.unpackb(manifest_bytes, raw=False)
-
-                pack_id = manifest.get("p", "unknown")
-                pack_name = manifest.get("n", "unknown")
-                created_at = manifest.get("t", "unknown")
-                items = manifest.get("a", [])
-
-                print("\n包信息:")
-                print(f"  ID: {pack_id}")
-                print(f"  名称: {pack_name}")
-                print(f"  创建时间: {created_at}")
-                print(f"  表情包数量: {len(items)}")
-
-                # 导入表情包
-                return self._import_items(payload_stream, items, output_dir, replace_existing, batch_size)
+            self._print_pack_info(manifest)
+            return self._import_frames(package_path, manifest.get("a", []), output_dir, replace_existing, batch_size)
 
         except Exception as e:
             print(f"导入失败: {e}")
@@ -575,138 +720,81 @@ class MMIPKGUnpacker:
             if not db.is_closed():
                 db.close()
 
-    def _import_items(
-        self, payload_stream: BinaryIO, items: List[Dict], output_dir: str, replace_existing: bool, batch_size: int
+    @staticmethod
+    def _print_pack_info(manifest: Dict) -> None:
+        print("\n包信息:")
+        print(f"  ID: {manifest.get('p', 'unknown')}")
+        print(f"  名称: {manifest.get('n', 'unknown')}")
+        print(f"  创建时间: {manifest.get('t', 'unknown')}")
+        print(f"  表情包数量: {len(manifest.get('a', []))}")
+
+    def _read_index(self, f: BinaryIO) -> Dict:
+        """读取文件末尾的 Footer 与索引"""
+        file_size = f.seek(0, 2)
+        if file_size < HEADER_SIZE + FOOTER_SIZE:
+            raise MMIPKGError("文件过小，不是有效的包")
+        f.seek(-FOOTER_SIZE, 2)
+        footer = f.read(FOOTER_SIZE)
+        if footer[:4] != FOOTER_MAGIC:
+            raise MMIPKGError("无效的 Footer MAGIC")
+
+        index_offset, index_len = struct.unpack(">QQ", footer[4:20])
+        expected_sha = footer[20:52]
+        index_compressed = bool(footer[53] & 0x01)
+        if index_len > MAX_MANIFEST_SIZE or index_offset + index_len > file_size - FOOTER_SIZE:
+            raise MMIPKGError("索引位置或大小无效")
+
+        f.seek(index_offset)
+        manifest_bytes = f.read(index_len)
+        if index_compressed:
+            if zstd is None:
+                raise MMIPKGError("需要 zstandard 库来解压此包")
+            manifest_bytes = zstd.ZstdDecompressor().decompress(manifest_bytes, max_output_size=MAX_MANIFEST_SIZE)
+        # 索引很小，总是校验
+        if calculate_sha256(manifest_bytes) != expected_sha:
+            raise MMIPKGError("索引 SHA256 校验失败!")
+        print("✓ 索引校验通过")
+        return msgpack.unpackb(manifest_bytes, raw=False)
+
+    def _import_frames(
+        self, package_path: str, items: List[Dict], output_dir: str, replace_existing: bool, batch_size: int
     ) -> bool:
-        """导入 items 到数据库"""
+        """按批次导入：工作进程并行读取、解压、校验并写出图片，主进程批量写入数据库"""
+        importer = _BatchImporter(output_dir, replace_existing)
         try:
-            imported_count = 0
-            skipped_count = 0
-            error_count = 0
-
-            # 开始事务，使用进度条
-            with db.atomic():
-                with Progress(
-                    SpinnerColumn(),
-                    TextColumn("[progress.description]{task.description}"),
-                    BarColumn(),
-                    TextColumn("[progress.percentage]{task.percentage:>3.0f}%"),
-                    TimeRemainingColumn(),
-                    console=console,
-                ) as progress:
-                    task = progress.add_task("[cyan]导入表情包...", total=len(items))
-
-                    for idx, item in enumerate(items, 1):
-                        try:
-                            progress.update(task, description=f"[cyan]导入 {idx}/{len(items)}")
-
-                            # 读取图片数据
-                            img_len_bytes = payload_stream.read(4)
-                            if len(img_len_bytes) != 4:
-                                console.print(f"[red]错误: 读取图片长度失败 (item {idx})[/red]")
-                                error_count += 1
-                                progress.advance(task)
-                                continue
-
-                            img_len = struct.unpack(">I", img_len_bytes)[0]
-                            img_bytes = payload_stream.read(img_len)
-
-                            if len(img_bytes) != img_len:
-                                console.print(f"[red]错误: 图片数据不完整 (item {idx})[/red]")
-                                error_count += 1
-                                progress.advance(task)
-                                continue
-
-                            # 验证图片 SHA
-                            if self.verify_sha and (expected_sha := item.get("h")):
-                                actual_sha = calculate_sha256(img_bytes)
-                                if actual_sha != expected_sha:
-                                    console.print(f"[yellow]警告: 图片 SHA256 不匹配 (item {idx}), 跳过[/yellow]")
-                                    error_count += 1
-                                    progress.advance(task)
-                                    continue
-
-                            # 获取元数据
-                            opt = item.get("opt", {})
-                            # 使用 or 提供回退值，如果 emoji_hash 为空则使用后续计算的值
-                            emoji_hash = opt.get("emoji_hash") or calculate_sha256(img_bytes).hex()
-
-                            # 检查是否已存在
-                            existing = Emoji.get_or_none(Emoji.emoji_hash == emoji_hash)
-
-                            if existing and not replace_existing:
-                                skipped_count += 1
-                                progress.advance(task)
-                                continue
-
-                            # 保存图片文件
-                            filename = item.get("fn", f"{emoji_hash[:8]}.{opt.get('format', 'png')}")
-                            file_path = os.path.join(output_dir, filename)
-
-                            # 如果文件已存在且不替换，生成新文件名
-                            if os.path.exists(file_path) and not replace_existing:
-                                base, ext = os.path.splitext(filename)
-                                counter = 1
-                                while os.path.exists(file_path):
-                                    filename = f"{base}_{counter}{ext}"
-                                    file_path = os.path.join(output_dir, filename)
-                                    counter += 1
-
-                            with open(file_path, "wb") as img_file:
-                                img_file.write(img_bytes)
-
-                            # 准备数据库记录
-                            current_time = time.time()
-                            emotion_str = opt.get("emotion", "")
-
-                            if existing and replace_existing:
-                                # 更新现有记录 - 恢复完整的数据库信息
-                                existing.full_path = file_path
-                                existing.format = opt.get("format", "")
-                                existing.description = opt.get("desc", "")
-                                existing.emotion = emotion_str
-                                existing.usage_count = opt.get("usage_count", 0)
-                                existing.last_used_time = opt.get("last_used_time", current_time)
-                                existing.register_time = opt.get("register_time", current_time)
-                                existing.record_time = opt.get("record_time", current_time)
-                                existing.query_count = opt.get("query_count", 0)
-                                existing.is_registered = opt.get("is_registered", True)
-                                existing.is_banned = opt.get("is_banned", False)
-                                existing.save()
-                            else:
-                                # 创建新记录 - 恢复完整的数据库信息
-                                Emoji.create(
-                                    emoji_hash=emoji_hash,
-                                    full_path=file_path,
-                                    format=opt.get("format", ""),
-                                    description=opt.get("desc", ""),
-                                    emotion=emotion_str,
-                                    usage_count=opt.get("usage_count", 0),
-                                    last_used_time=opt.get("last_used_time", current_time),
-                                    register_time=opt.get("register_time", current_time),
-                                    record_time=opt.get("record_time", current_time),
-                                    query_count=opt.get("query_count", 0),
-                                    is_registered=opt.get("is_registered", True),
-                                    is_banned=opt.get("is_banned", False),
-                                )
-
-                            imported_count += 1
-                            progress.advance(task)
-
-                        except Exception as e:
-                            console.print(f"[red]处理 item {idx} 时出错: {e}[/red]")
-                            error_count += 1
-                            progress.advance(task)
-                            continue
-
-            # 输出统计
+            with ProcessPoolExecutor(max_workers=self.workers) as pool, _new_progress(TimeRemainingColumn()) as progress:
+                task = progress.add_task(f"[cyan]导入表情包（{self.workers} 进程）...", total=len(items))
+                for start in range(0, len(items), batch_size):
+                    batch = items[start : start + batch_size]
+                    planned = [plan for plan in self._plan_batch(importer, batch) if plan is not None]
+                    progress.advance(task, len(batch) - len(planned))
+
+                    jobs = [
+                        (
+                            package_path,
+                            item["o"],
+                            item["c"],
+                            bool(item.get("z")),
+                            item.get("h") if self.verify_sha else None,
+                            item.get("s", 0),
+                            file_path,
+                        )
+                        for item, _, file_path, _ in planned
+                    ]
+                    chunksize = max(1, len(jobs) // (self.workers * 4))
+                    written = []
+                    for plan, error in zip(planned, pool.map(_extract_frame, jobs, chunksize=chunksize), strict=True):
+                        if error:
+                            console.print(f"[red]错误: {error} (item {plan[0].get('i')})[/red]")
+                            importer.error_count += 1
+                        else:
+                            written.append(plan)
+                        progress.advance(task)
 
-            console.print(f"\n[green]✓ 成功导入 {imported_count} 个表情包[/green]")
-            console.print(f"  [yellow]跳过 {skipped_count} 个[/yellow]")
-            if error_count > 0:
-                console.print(f"  [red]错误 {error_count} 个[/red]")
+                    importer.commit(written)
+                    progress.update(task, description=f"[cyan]导入 {min(start + batch_size, len(items))}/{len(items)}")
 
-            return error_count == 0
+            return importer.report()
 
         except Exception as e:
             console.print(f"[red]导入 items 失败: {e}[/red]")
@@ -715,6 +803,84 @@ class MMIPKGUnpacker:
             traceback.print_exc()
             return False
 
+    @staticmethod
+    def _plan_batch(importer: _BatchImporter, batch: List[Dict]) -> List[Optional[Tuple[Dict, str, str, Optional[Emoji]]]]:
+        """为一批 item 分配导入计划；缺少帧位置的 item 记为错误"""
+        valid = []
+        for item in batch:
+            if isinstance(item.get("o"), int) and isinstance(item.get("c"), int):
+                valid.append(item)
+            else:
+                console.print(f"[red]错误: 索引中缺少帧位置 (item {item.get('i')})[/red]")
+                importer.error_count += 1
+        return importer.plan(valid)
+
+    def _open_legacy_payload(self, f: BinaryIO, payload_size: int, is_compressed: bool):
+        f.seek(HEADER_SIZE)
+        if is_compressed:
+            return zstd.ZstdDecompressor().stream_reader(f, read_size=STREAM_CHUNK_SIZE, closefd=False)
+        return _BoundedReader(f, payload_size)
+
+    def _import_legacy(
+        self, f: BinaryIO, is_compressed: bool, output_dir: str, replace_existing: bool, batch_size: int
+    ) -> bool:
+        """导入旧版（整体压缩的）包：流式解压，校验与导入各读一遍，内存只保留单张图片"""
+        file_size = f.seek(0, 2)
+        f.seek(-LEGACY_FOOTER_SIZE, 2)
+        footer = f.read(LEGACY_FOOTER_SIZE)
+        if footer[:4] != FOOTER_MAGIC:
+            raise MMIPKGError("无效的 Footer MAGIC")
+        expected_sha = footer[4:36]
+        payload_size = file_size - LEGACY_FOOTER_SIZE - HEADER_SIZE
+
+        if is_compressed and zstd is None:
+            raise MMIPKGError("需要 zstandard 库来解压此包")
+
+        # 第一遍：流式计算整个 payload 的 SHA256
+        if self.verify_sha:
+            print("校验 payload...")
+            payload_sha = hashlib.sha256()
+            with self._open_legacy_payload(f, payload_size, is_compressed) as reader:
+                for chunk in iter(lambda: reader.read(STREAM_CHUNK_SIZE), b""):
+                    payload_sha.update(chunk)
+            if payload_sha.digest() != expected_sha:
+                raise MMIPKGError("SHA256 校验失败!")
+            print("✓ SHA256 校验通过")
+
+        # 第二遍：解析 manifest 并逐张导入
+        importer = _BatchImporter(output_dir, replace_existing)
+        with self._open_legacy_payload(f, payload_size, is_compressed) as reader:
+            manifest_len = struct.unpack(">I", _read_exact(reader, 4))[0]
+            if manifest_len > MAX_MANIFEST_SIZE:
+                raise MMIPKGError(f"Manifest 过大: {manifest_len} bytes")
+            manifest = msgpack.unpackb(_read_exact(reader, manifest_len), raw=False)
+            self._print_pack_info(manifest)
+            items = manifest.get("a", [])
+
+            with _new_progress(TimeRemainingColumn()) as progress:
+                task = progress.add_task("[cyan]导入表情包...", total=len(items))
+                for start in range(0, len(items), batch_size):
+                    batch = items[start : start + batch_size]
+                    written = []
+                    for item, plan in zip(batch, importer.plan(batch), strict=True):
+                        # 图片按顺序存放，跳过的图片也要读出
+                        img_len = struct.unpack(">I", _read_exact(reader, 4))[0]
+                        img_bytes = _read_exact(reader, img_len)
+                        progress.advance(task)
+                        if plan is None:
+                            continue
+                        # 验证图片 SHA
+                        if self.verify_sha and (item_sha := item.get("h")) and calculate_sha256(img_bytes) != item_sha:
+                            console.print(f"[yellow]警告: 图片 SHA256 不匹配 (item {item.get('i')}), 跳过[/yellow]")
+                            importer.error_count += 1
+                            continue
+                        with open(plan[2], "wb") as img_file:
+                            img_file.write(img_bytes)
+                        written.append(plan)
+                    importer.commit(written)
+
+        return importer.report()
+
 
 def print_header():
     """打印欢迎信息"""
@@ -906,6 +1072,10 @@ def interactive_export():
         reencode = None
         quality = 80
 
+    # 并行设置
+    console.print("\n[yellow]5. 性能设置[/yellow]")
+    workers = get_int("  并行处理进程数", _default_workers(), 1, 64)
+
     # 确认导出
     console.print("\n[cyan]" + "-" * 70 + "[/cyan]")
     console.print("[bold]导出配置:[/bold]")
@@ -921,6 +1091,7 @@ def interactive_export():
     console.print(f"  重新编码: {reencode or '否'}")
     if reencode:
         console.print(f"  编码质量: {quality}")
+    console.print(f"  并行进程: {workers}")
     console.print(f"  表情包数量: {emoji_count}")
     console.print("[cyan]" + "-" * 70 + "[/cyan]")
 
@@ -931,7 +1102,11 @@ def interactive_export():
     # 开始导出
     console.print("\n[cyan]开始导出...[/cyan]")
     packer = MMIPKGPacker(
-        use_compression=use_compression, zstd_level=zstd_level, reencode=reencode, reencode_quality=quality
+        use_compression=use_compression,
+        zstd_level=zstd_level,
+        reencode=reencode,
+        reencode_quality=quality,
+        workers=workers,
     )
 
     success = packer.pack_from_db(output_path, pack_name, custom_manifest)
@@ -1011,6 +1186,7 @@ def interactive_import():
     console.print("    500-1000: 快速导入大量表情包")
     console.print("    1000+:    极速模式，但内存占用更高")
     batch_size = get_int("  批量提交大小", 500, 100, 5000)
+    workers = get_int("  并行处理进程数", _default_workers(), 1, 64)
 
     # 确认导入
     console.print("\n[cyan]" + "-" * 70 + "[/cyan]")
@@ -1021,6 +1197,7 @@ def interactive_import():
     console.print(f"  替换已存在: {'是' if replace_existing else '否'}")
     console.print(f"  SHA256 验证: {'是' if verify_sha else '否'}")
     console.print(f"  批量大小: {batch_size}")
+    console.print(f"  并行进程: {workers}")
     console.print("[cyan]" + "-" * 70 + "[/cyan]")
 
     if not get_yes_no("\n确认导入", True):
@@ -1028,7 +1205,7 @@ def interactive_import():
         return False
 
     # 开始导入
-    unpacker = MMIPKGUnpacker(verify_sha=verify_sha)
+    unpacker = MMIPKGUnpacker(verify_sha=verify_sha, workers=workers)
 
     total_success = 0
     total_failed = 0
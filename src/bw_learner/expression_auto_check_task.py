@@ -3,16 +3,21 @@
 
 功能：
 1. 定期随机选取指定数量的表达方式
-2. 使用LLM进行评估
+2. 使用LLM进行评估（多条表达方式打包进一个提示词，逐条输出结果，多个批次并发）
 3. 通过评估的：rejected=0, checked=1
 4. 未通过评估的：rejected=1, checked=1
+5. 评估结果一次性批量写回数据库
 """
 
 import asyncio
 import json
-import random
-from typing import List
+import time
+from typing import Dict, List, Optional, Tuple
 
+from json_repair import repair_json
+from peewee import Case, fn
+
+from src.common.database.database import db_writer
 from src.common.database.database_model import Expression
 from src.common.logger import get_logger
 from src.config.config import global_config
@@ -23,17 +28,12 @@ from src.manager.async_task_manager import AsyncTask
 logger = get_logger("expression_auto_check_task")
 
 
-def create_evaluation_prompt(situation: str, style: str) -> str:
-    """
-    创建评估提示词
-    
-    Args:
-        situation: 情境
-        style: 风格
-        
-    Returns:
-        评估提示词
-    """
+# 批量写回时每条UPDATE语句包含的ID数量上限（SQLite变量数限制）
+_UPDATE_CHUNK_SIZE = 500
+
+
+def _build_criteria_list() -> str:
+    """构建编号的评估标准列表（基础标准 + 配置中的自定义标准）"""
     # 基础评估标准
     base_criteria = [
         "表达方式或言语风格 是否与使用条件或使用情景 匹配",
@@ -51,7 +51,21 @@ def create_evaluation_prompt(situation: str, style: str) -> str:
         all_criteria.extend(custom_criteria)
     
     # 构建评估标准列表字符串
-    criteria_list = "\n".join([f"{i+1}. {criterion}" for i, criterion in enumerate(all_criteria)])
+    return "\n".join([f"{i+1}. {criterion}" for i, criterion in enumerate(all_criteria)])
+
+
+def create_evaluation_prompt(situation: str, style: str) -> str:
+    """
+    创建评估提示词
+    
+    Args:
+        situation: 情境
+        style: 风格
+        
+    Returns:
+        评估提示词
+    """
+    criteria_list = _build_criteria_list()
     
     prompt = f"""请评估以下表达方式或语言风格以及使用条件或使用情景是否合适：
 使用条件或使用情景：{situation}
@@ -71,18 +85,101 @@ def create_evaluation_prompt(situation: str, style: str) -> str:
     
     return prompt
 
+
+def create_batch_evaluation_prompt(expressions: List[Tuple[str, str]]) -> str:
+    """
+    创建批量评估提示词，评估标准只出现一次，每条表达方式按编号输出结果
+    
+    Args:
+        expressions: [(situation, style), ...]
+        
+    Returns:
+        评估提示词
+    """
+    criteria_list = _build_criteria_list()
+    items = "\n".join(
+        f"{i}. 使用条件或使用情景：{situation}\n   表达方式或言语风格：{style}"
+        for i, (situation, style) in enumerate(expressions, 1)
+    )
+    
+    return f"""请逐条评估以下 {len(expressions)} 条表达方式或语言风格以及使用条件或使用情景是否合适：
+{items}
+
+请从以下方面进行评估：
+{criteria_list}
+
+请以JSON数组格式输出每一条的评估结果，id为上面的编号，每条都必须输出：
+[
+    {{"id": 1, "suitable": true/false, "reason": "简短的评估理由（不超过20字）"}}
+]
+如果合适，suitable设为true；如果不合适，suitable设为false，并在reason中说明原因。
+请严格按照JSON格式输出，不要包含其他内容。"""
+
+
+def parse_batch_evaluation(response: str, count: int) -> Dict[int, Tuple[bool, str]]:
+    """
+    解析批量评估结果
+    
+    Args:
+        response: LLM响应
+        count: 本批表达方式数量
+        
+    Returns:
+        {编号(从1开始): (suitable, reason)}，缺失或格式错误的条目不包含在内
+    """
+    try:
+        parsed = json.loads(repair_json(response))
+    except Exception as e:
+        logger.warning(f"批量评估结果解析失败: {e}")
+        return {}
+    if isinstance(parsed, dict):
+        # 兼容 {"results": [...]} 或 {"1": {...}} 形式
+        parsed = parsed.get("results", parsed)
+        if isinstance(parsed, dict):
+            parsed = [dict(v, id=k) for k, v in parsed.items() if isinstance(v, dict)]
+    if not isinstance(parsed, list):
+        return {}
+
+    verdicts: Dict[int, Tuple[bool, str]] = {}
+    for item in parsed:
+        if not isinstance(item, dict):
+            continue
+        try:
+            index = int(item.get("id"))
+        except (TypeError, ValueError):
+            continue
+        suitable = item.get("suitable")
+        if 1 <= index <= count and isinstance(suitable, bool):
+            verdicts[index] = (suitable, str(item.get("reason") or "未提供理由"))
+    return verdicts
+
+
 judge_llm = LLMRequest(
     model_set=model_config.model_task_config.tool_use,
     request_type="expression_check"
 )
 
-async def single_expression_check(situation: str, style: str) -> tuple[bool, str, str]:
+# 定时任务使用独立实例，便于按 model_usage 统计本轮消耗的token
+batch_judge_llm = LLMRequest(
+    model_set=model_config.model_task_config.tool_use,
+    request_type="expression_check"
+)
+
+
+def _used_tokens(llm: LLMRequest) -> int:
+    """LLMRequest 实例累计消耗的token数"""
+    return sum(total_tokens for total_tokens, _, _ in llm.model_usage.values())
+
+async def single_expression_check(
+    situation: str, style: str, llm: Optional[LLMRequest] = None
+) -> tuple[bool, str, str]:
     """
     执行单次LLM评估
     
     Args:
         situation: 情境
         style: 风格
+        llm: 使用的LLMRequest，默认为 judge_llm
         
     Returns:
         (suitable, reason, error) 元组，如果出错则 suitable 为 False，error 包含错误信息
@@ -91,7 +188,7 @@ async def single_expression_check(situation: str, style: str) -> tuple[bool, str
         prompt = create_evaluation_prompt(situation, style)
         logger.debug(f"正在评估表达方式: situation={situation}, style={style}")
         
-        response, (reasoning, model_name, _) = await judge_llm.generate_response_async(
+        response, (reasoning, model_name, _) = await (llm or judge_llm).generate_response_async(
             prompt=prompt,
             temperature=0.6,
             max_tokens=1024
@@ -144,65 +241,79 @@ class ExpressionAutoCheckTask(AsyncTask):
             选中的表达方式列表
         """
         try:
-            # 查询所有未检查的表达方式（checked=False）
-            unevaluated_expressions = list(
-                Expression.select().where(~Expression.checked)
-            )
+            # 在数据库中随机抽样，避免把全部未检查的表达方式读入内存
+            unevaluated_query = Expression.select().where(~Expression.checked)
+            total = unevaluated_query.count()
             
-            if not unevaluated_expressions:
+            if not total:
                 logger.info("没有未检查的表达方式")
                 return []
             
-            # 随机选择指定数量
-            selected_count = min(count, len(unevaluated_expressions))
-            selected = random.sample(unevaluated_expressions, selected_count)
+            selected = list(
+                unevaluated_query.select(Expression.id, Expression.situation, Expression.style)
+                .order_by(fn.Random())
+                .limit(count)
+            )
             
-            logger.info(f"从 {len(unevaluated_expressions)} 条未检查表达方式中随机选择了 {selected_count} 条")
+            logger.info(f"从 {total} 条未检查表达方式中随机选择了 {len(selected)} 条")
             return selected
             
         except Exception as e:
             logger.error(f"选择表达方式时出错: {e}")
             return []
 
-    async def _evaluate_expression(self, expression: Expression) -> bool:
+    async def _evaluate_batch(self, batch: List[Expression]) -> Dict[int, Tuple[bool, str]]:
         """
-        评估单个表达方式
+        评估一批表达方式
         
         Args:
-            expression: 要评估的表达方式
+            batch: 要评估的表达方式
             
         Returns:
-            True表示通过，False表示不通过
+            {表达方式ID: (suitable, reason)}，评估失败的表达方式不包含在内（保持未检查，下次再选）
         """
-        
-        suitable, reason, error = await single_expression_check(
-            expression.situation,
-            expression.style,
-        )
-        
-        # 更新数据库
-        try:
-            expression.checked = True
-            expression.rejected = not suitable  # 通过则rejected=0，不通过则rejected=1
-            expression.modified_by = 'ai'  # 标记为AI检查
-            expression.save()
-            
-            status = "通过" if suitable else "不通过"
-            logger.info(
-                f"表达方式评估完成 [ID: {expression.id}] - {status} | "
-                f"Situation: {expression.situation}... | "
-                f"Style: {expression.style}... | "
-                f"Reason: {reason[:50]}..."
+        if len(batch) == 1:
+            expression = batch[0]
+            suitable, reason, error = await single_expression_check(
+                expression.situation, expression.style, batch_judge_llm
             )
-            
             if error:
                 logger.warning(f"表达方式评估时出现错误 [ID: {expression.id}]: {error}")
-            
-            return suitable
-            
+                return {}
+            return {expression.id: (suitable, reason)}
+
+        prompt = create_batch_evaluation_prompt([(e.situation, e.style) for e in batch])
+        try:
+            response, _ = await batch_judge_llm.generate_response_async(
+                prompt=prompt,
+                temperature=0.6,
+                max_tokens=256 + 96 * len(batch)
+            )
         except Exception as e:
-            logger.error(f"更新表达方式状态失败 [ID: {expression.id}]: {e}")
-            return False
+            logger.error(f"批量评估表达方式时出错: {e}")
+            return {}
+
+        verdicts = parse_batch_evaluation(response, len(batch))
+        if len(verdicts) < len(batch):
+            logger.warning(f"批量评估结果不完整: {len(verdicts)}/{len(batch)} 条，缺失的表达方式将在之后重新评估")
+        return {batch[index - 1].id: verdict for index, verdict in verdicts.items()}
+
+    def _save_results(self, results: Dict[int, Tuple[bool, str]]) -> None:
+        """将评估结果批量写回数据库（每批ID一条UPDATE语句），在写线程中执行，所有语句属于同一个事务"""
+        ids = list(results)
+        rejected_ids = [expression_id for expression_id, (suitable, _) in results.items() if not suitable]
+        for start in range(0, len(ids), _UPDATE_CHUNK_SIZE):
+            chunk = ids[start : start + _UPDATE_CHUNK_SIZE]
+            chunk_set = set(chunk)
+            chunk_rejected = [expression_id for expression_id in rejected_ids if expression_id in chunk_set]
+            Expression.update(
+                checked=True,
+                # 通过则rejected=0，不通过则rejected=1
+                rejected=Case(None, [(Expression.id.in_(chunk_rejected), True)], False)
+                if chunk_rejected
+                else False,
+                modified_by="ai",  # 标记为AI检查
+            ).where(Expression.id.in_(chunk)).execute()
 
     async def run(self):
         """执行检查任务"""
@@ -227,26 +338,53 @@ class ExpressionAutoCheckTask(AsyncTask):
                 logger.info("没有需要检查的表达方式")
                 return
             
-            # 逐个评估
-            passed_count = 0
-            failed_count = 0
-            
-            for i, expression in enumerate(expressions, 1):
-                logger.info(f"正在评估 [{i}/{len(expressions)}]: ID={expression.id}")
-                
-                if await self._evaluate_expression(expression):
-                    passed_count += 1
-                else:
-                    failed_count += 1
-                
-                # 避免请求过快
-                await asyncio.sleep(0.3)
+            batch_size = max(1, global_config.expression.expression_auto_check_batch_size)
+            concurrency = max(1, global_config.expression.expression_auto_check_concurrency)
+            batches = [expressions[i : i + batch_size] for i in range(0, len(expressions), batch_size)]
+            semaphore = asyncio.Semaphore(concurrency)
+            
+            async def evaluate(batch: List[Expression]) -> Dict[int, Tuple[bool, str]]:
+                async with semaphore:
+                    return await self._evaluate_batch(batch)
+            
+            start_time = time.monotonic()
+            start_tokens = _used_tokens(batch_judge_llm)
+            # 请求经过LLM调度器，按后台优先级排队并受其并发与token预算限制
+            batch_results = await asyncio.gather(*(evaluate(batch) for batch in batches))
+            used_tokens = _used_tokens(batch_judge_llm) - start_tokens
+            
+            results: Dict[int, Tuple[bool, str]] = {}
+            for batch_result in batch_results:
+                results.update(batch_result)
+            
+            if results:
+                try:
+                    await db_writer.write(self._save_results, results, label="Expression.auto_check")
+                except Exception as e:
+                    logger.error(f"批量更新表达方式状态失败: {e}")
+                    return
+            
+            expression_map = {expression.id: expression for expression in expressions}
+            for expression_id, (suitable, reason) in results.items():
+                expression = expression_map[expression_id]
+                logger.debug(
+                    f"表达方式评估完成 [ID: {expression_id}] - {'通过' if suitable else '不通过'} | "
+                    f"Situation: {expression.situation}... | "
+                    f"Style: {expression.style}... | "
+                    f"Reason: {reason[:50]}..."
+                )
+            
+            passed_count = sum(1 for suitable, _ in results.values() if suitable)
+            failed_count = len(results) - passed_count
+            skipped_count = len(expressions) - len(results)
+            per_k_tokens = f"{len(results) / used_tokens * 1000:.2f}" if used_tokens else "未知"
             
             logger.info(
-                f"表达方式自动检查完成: 总计 {len(expressions)} 条，"
-                f"通过 {passed_count} 条，不通过 {failed_count} 条"
+                f"表达方式自动检查完成: 总计 {len(expressions)} 条（{len(batches)} 批），"
+                f"通过 {passed_count} 条，不通过 {failed_count} 条，未得到结果 {skipped_count} 条，"
+                f"耗时 {time.monotonic() - start_time:.1f}s，消耗 {used_tokens} tokens，"
+                f"每千token检查 {per_k_tokens} 条"
             )
             
         except Exception as e:
             logger.error(f"执行表达方式自动检查任务时出错: {e}", exc_info=True)
-
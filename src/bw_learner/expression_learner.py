@@ -5,6 +5,7 @@ import re
 import asyncio
 from typing import List, Optional, Tuple, Any, Dict
 from src.common.logger import get_logger
+from src.common.database.database import db_writer
 from src.common.database.database_model import Expression
 from src.llm_models.utils_model import LLMRequest
 from src.config.config import model_config, global_config
@@ -327,7 +328,8 @@ class ExpressionLearner:
         # 创建新记录时，直接使用原始的 situation，不进行总结
         formatted_situation = situation
 
-        Expression.create(
+        await db_writer.write(
+            Expression.create,
             situation=formatted_situation,
             style=style,
             content_list=json.dumps(content_list, ensure_ascii=False),
@@ -369,7 +371,7 @@ class ExpressionLearner:
             )
             expr_obj.situation = new_situation
 
-        expr_obj.save()
+        await db_writer.write(expr_obj.save)
 
         # count 增加后，立即进行一次检查
         await self._check_expression_immediately(expr_obj)
@@ -477,7 +479,7 @@ class ExpressionLearner:
             # 更新数据库
             expr_obj.checked = True
             expr_obj.rejected = not suitable  # 通过则 rejected=False，不通过则 rejected=True
-            expr_obj.save()
+            await db_writer.write(expr_obj.save)
 
             status = "通过" if suitable else "不通过"
             logger.info(
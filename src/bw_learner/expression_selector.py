@@ -7,10 +7,10 @@ from json_repair import repair_json
 from src.llm_models.utils_model import LLMRequest
 from src.config.config import global_config, model_config
 from src.common.logger import get_logger
+from src.common.database.database import db_writer
 from src.common.database.database_model import Expression
 from src.chat.utils.prompt_builder import Prompt, global_prompt_manager
 from src.bw_learner.learner_utils import weighted_sample
-from src.chat.message_receive.chat_stream import get_chat_manager
 
 logger = get_logger("expression_selector")
 
@@ -65,47 +65,9 @@ class ExpressionSelector:
             logger.error(f"检查表达使用权限失败: {e}")
             return False
 
-    @staticmethod
-    def _parse_stream_config_to_chat_id(stream_config_str: str) -> Optional[str]:
-        """解析'platform:id:type'为chat_id，直接使用 ChatManager 提供的接口"""
-        try:
-            parts = stream_config_str.split(":")
-            if len(parts) != 3:
-                return None
-            platform = parts[0]
-            id_str = parts[1]
-            stream_type = parts[2]
-            is_group = stream_type == "group"
-            # 统一通过 chat_manager 生成 stream_id，避免各处自行实现哈希逻辑
-            return get_chat_manager().get_stream_id(platform, str(id_str), is_group=is_group)
-        except Exception:
-            return None
-
     def get_related_chat_ids(self, chat_id: str) -> List[str]:
         """根据expression_groups配置，获取与当前chat_id相关的所有chat_id（包括自身）"""
-        groups = global_config.expression.expression_groups
-
-        # 检查是否存在全局共享组（包含"*"的组）
-        global_group_exists = any("*" in group for group in groups)
-
-        if global_group_exists:
-            # 如果存在全局共享组，则返回所有可用的chat_id
-            all_chat_ids = set()
-            for group in groups:
-                for stream_config_str in group:
-                    if chat_id_candidate := self._parse_stream_config_to_chat_id(stream_config_str):
-                        all_chat_ids.add(chat_id_candidate)
-            return list(all_chat_ids) if all_chat_ids else [chat_id]
-
-        # 否则使用现有的组逻辑
-        for group in groups:
-            group_chat_ids = []
-            for stream_config_str in group:
-                if chat_id_candidate := self._parse_stream_config_to_chat_id(stream_config_str):
-                    group_chat_ids.append(chat_id_candidate)
-            if chat_id in group_chat_ids:
-                return group_chat_ids
-        return [chat_id]
+        return global_config.expression.get_related_chat_ids(chat_id)
 
     def _select_expressions_simple(self, chat_id: str, max_num: int) -> Tuple[List[Dict[str, Any]], List[int]]:
         """
@@ -478,7 +440,7 @@ class ExpressionSelector:
             if query.exists():
                 expr_obj = query.get()
                 expr_obj.last_active_time = time.time()
-                expr_obj.save()
+                db_writer.submit(expr_obj.save)
                 logger.debug("表达方式激活: 更新last_active_time in db")
 
 
@@ -1,18 +1,15 @@
-import re
 import time
 from typing import List, Dict, Optional, Any
 
 from src.common.logger import get_logger
-from src.common.database.database_model import Jargon
 from src.llm_models.utils_model import LLMRequest
 from src.config.config import model_config, global_config
 from src.chat.utils.prompt_builder import Prompt, global_prompt_manager
+from src.bw_learner.jargon_matcher import jargon_matcher
 from src.bw_learner.jargon_miner import search_jargon
 from src.bw_learner.learner_utils import (
     is_bot_message,
     contains_bot_self_name,
-    parse_chat_id_list,
-    chat_id_list_contains,
 )
 
 logger = get_logger("jargon")
@@ -83,68 +80,23 @@ class JargonExplainer:
         # 合并所有消息文本
         combined_text = " ".join(message_texts)
 
-        # 查询所有有meaning的jargon记录
-        query = Jargon.select().where((Jargon.meaning.is_null(False)) & (Jargon.meaning != ""))
-
-        # 根据all_global配置决定查询逻辑
-        if global_config.expression.all_global_jargon:
-            # 开启all_global：只查询is_global=True的记录
-            query = query.where(Jargon.is_global)
-        else:
-            # 关闭all_global：查询is_global=True或chat_id列表包含当前chat_id的记录
-            # 这里先查询所有，然后在Python层面过滤
-            pass
-
-        # 按count降序排序，优先匹配出现频率高的
-        query = query.order_by(Jargon.count.desc())
-
-        # 执行查询并匹配
+        # 开启all_global时只匹配全局黑话；否则匹配全局黑话与在当前聊天中出现过的黑话
+        prepare_time = time.time()
+        chat_id = None if global_config.expression.all_global_jargon else self.chat_id
         matched_jargon: Dict[str, Dict[str, str]] = {}
-        query_time = time.time()
-
-        for jargon in query:
-            content = jargon.content or ""
-            if not content or not content.strip():
-                continue
-
+        for content in jargon_matcher.match(combined_text, chat_id):
             # 跳过包含机器人昵称的词条
             if contains_bot_self_name(content):
                 continue
-
-            # 检查chat_id（如果all_global=False）
-            if not global_config.expression.all_global_jargon:
-                if jargon.is_global:
-                    # 全局黑话，包含
-                    pass
-                else:
-                    # 检查chat_id列表是否包含当前chat_id
-                    chat_id_list = parse_chat_id_list(jargon.chat_id)
-                    if not chat_id_list_contains(chat_id_list, self.chat_id):
-                        continue
-
-            # 在文本中查找匹配（大小写不敏感）
-            pattern = re.escape(content)
-            # 使用单词边界或中文字符边界来匹配，避免部分匹配
-            # 对于中文，使用Unicode字符类；对于英文，使用单词边界
-            if re.search(r"[\u4e00-\u9fff]", content):
-                # 包含中文，使用更宽松的匹配
-                search_pattern = pattern
-            else:
-                # 纯英文/数字，使用单词边界
-                search_pattern = r"\b" + pattern + r"\b"
-
-            if re.search(search_pattern, combined_text, re.IGNORECASE):
-                # 找到匹配，记录（去重）
-                if content not in matched_jargon:
-                    matched_jargon[content] = {"content": content}
+            matched_jargon[content] = {"content": content}
 
         match_time = time.time()
         total_time = match_time - start_time
-        query_duration = query_time - start_time
-        match_duration = match_time - query_time
+        prepare_duration = prepare_time - start_time
+        match_duration = match_time - prepare_time
 
         logger.debug(
-            f"黑话匹配完成: 查询耗时 {query_duration:.3f}s, 匹配耗时 {match_duration:.3f}s, "
+            f"黑话匹配完成: 文本整理耗时 {prepare_duration:.3f}s, 匹配耗时 {match_duration:.3f}s, "
             f"总耗时 {total_time:.3f}s, 匹配到 {len(matched_jargon)} 个黑话"
         )
 
@@ -269,36 +221,12 @@ def match_jargon_from_text(chat_text: str, chat_id: str) -> List[str]:
     if not chat_text or not chat_text.strip():
         return []
 
-    query = Jargon.select().where((Jargon.meaning.is_null(False)) & (Jargon.meaning != ""))
-    if global_config.expression.all_global_jargon:
-        query = query.where(Jargon.is_global)
-
-    query = query.order_by(Jargon.count.desc())
-
-    matched: Dict[str, None] = {}
-
-    for jargon in query:
-        content = (jargon.content or "").strip()
-        if not content:
-            continue
-
-        if not global_config.expression.all_global_jargon and not jargon.is_global:
-            chat_id_list = parse_chat_id_list(jargon.chat_id)
-            if not chat_id_list_contains(chat_id_list, chat_id):
-                continue
-
-        pattern = re.escape(content)
-        if re.search(r"[\u4e00-\u9fff]", content):
-            search_pattern = pattern
-        else:
-            search_pattern = r"\b" + pattern + r"\b"
-
-        if re.search(search_pattern, chat_text, re.IGNORECASE):
-            matched[content] = None
+    chat_scope = None if global_config.expression.all_global_jargon else chat_id
+    matched = jargon_matcher.match(chat_text, chat_scope)
 
     logger.info(f"匹配到 {len(matched)} 个黑话")
 
-    return list(matched.keys())
+    return matched
 
 
 async def retrieve_concepts_with_jargon(concepts: List[str], chat_id: str) -> str:
@@ -0,0 +1,287 @@
+"""
+黑话词典自动机
+
+回复前需要判断上下文中出现了哪些已知黑话。逐条构建正则再 re.search 的代价是 O(词条数 × 文本长度)，
+这里为每个作用域（全局 / 单个聊天）在内存中维护一个 Aho-Corasick 多模式自动机，
+匹配只需对文本做一次线性扫描，与词典大小无关。
+
+- 全局作用域：is_global=True 的黑话
+- 聊天作用域：在该聊天中出现过、且不是全局的黑话（与全局作用域的匹配结果合并，即 jargon_visible_in_chat 的语义）
+
+只有含义（meaning）非空的词条参与匹配。匹配大小写不敏感；不含中文的词条要求两端为单词边界（与正则 \\b 的语义一致）。
+JargonMiner / WebUI 写入或删除黑话后调用 upsert / remove，自动机增量更新（新词插入字典树，失败指针在下次匹配前重建）。
+"""
+
+import re
+import threading
+
+from collections import OrderedDict, deque
+from typing import Dict, Iterable, List, Optional, Set
+
+from src.common.database.database_model import Jargon, JargonChat
+from src.common.logger import get_logger
+from src.bw_learner.learner_utils import jargon_ids_in_chat
+
+logger = get_logger("jargon")
+
+# 最多同时缓存的聊天作用域数量，超出后淘汰最久未使用的
+JARGON_MATCHER_MAX_CHATS = 256
+# 已删除但仍留在字典树中的模式数超过该值且超过有效模式数时，整体重建
+_STALE_REBUILD_THRESHOLD = 64
+
+_CJK_RE = re.compile(r"[\u4e00-\u9fff]")
+
+
+def _fold(text: str) -> str:
+    """逐字符转小写（保持长度不变，匹配位置与原文一一对应）"""
+    lowered = text.lower()
+    if len(lowered) == len(text):
+        return lowered
+    return "".join(lower if len(lower := char.lower()) == 1 else char for char in text)
+
+
+def _is_word_char(char: str) -> bool:
+    """与正则 \\w 一致"""
+    return char.isalnum() or char == "_"
+
+
+class AhoCorasick:
+    """支持增量插入的 Aho-Corasick 自动机，模式与文本都应先经过 _fold"""
+
+    __slots__ = ("goto", "fail", "own", "out", "_dirty")
+
+    def __init__(self, patterns: Iterable[str] = ()):
+        self.goto: List[Dict[str, int]] = [{}]
+        self.fail: List[int] = [0]
+        self.own: List[Optional[str]] = [None]  # 以该节点结尾的模式
+        self.out: List[List[str]] = [[]]  # 以该节点结尾的所有模式（含失败链上的后缀）
+        self._dirty = False
+        for pattern in patterns:
+            self.add(pattern)
+
+    def add(self, pattern: str) -> None:
+        node = 0
+        for char in pattern:
+            nxt = self.goto[node].get(char)
+            if nxt is None:
+                nxt = len(self.goto)
+                self.goto.append({})
+                self.fail.append(0)
+                self.own.append(None)
+                self.out.append([])
+                self.goto[node][char] = nxt
+            node = nxt
+        if node and self.own[node] is None:
+            self.own[node] = pattern
+            self._dirty = True
+
+    def _build(self) -> None:
+        """按 BFS 重建失败指针与输出表"""
+        queue = deque()
+        self.out[0] = []
+        for child in self.goto[0].values():
+            self.fail[child] = 0
+            queue.append(child)
+        while queue:
+            node = queue.popleft()
+            own = self.own[node]
+            inherited = self.out[self.fail[node]]
+            self.out[node] = [own, *inherited] if own is not None else inherited
+            for char, child in self.goto[node].items():
+                state = self.fail[node]
+                while state and char not in self.goto[state]:
+                    state = self.fail[state]
+                self.fail[child] = self.goto[state].get(char, 0)
+                queue.append(child)
+        self._dirty = False
+
+    def iter_matches(self, text: str):
+        """产出 (模式, 结束位置（不含）)"""
+        if self._dirty:
+            self._build()
+        goto, fail, out = self.goto, self.fail, self.out
+        node = 0
+        for end, char in enumerate(text, start=1):
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            for pattern in out[node]:
+                yield pattern, end
+
+
+class _JargonScope:
+    """一个作用域内的词条与自动机"""
+
+    __slots__ = ("entries", "by_pattern", "bounded", "automaton", "stale")
+
+    def __init__(self) -> None:
+        self.entries: Dict[int, tuple] = {}  # jargon_id -> (content, pattern, count)
+        self.by_pattern: Dict[str, Set[int]] = {}
+        self.bounded: Set[str] = set()  # 不含中文、需要单词边界的模式
+        self.automaton = AhoCorasick()
+        self.stale = 0
+
+    def put(self, jargon_id: int, content: str, count: int) -> None:
+        pattern = _fold(content)
+        old = self.entries.get(jargon_id)
+        if old is not None and old[1] != pattern:
+            self.discard(jargon_id)
+        self.entries[jargon_id] = (content, pattern, count)
+        ids = self.by_pattern.get(pattern)
+        if ids is None:
+            self.by_pattern[pattern] = {jargon_id}
+            if not _CJK_RE.search(pattern):
+                self.bounded.add(pattern)
+            self.automaton.add(pattern)
+        else:
+            if not ids:
+                self.stale -= 1
+            ids.add(jargon_id)
+
+    def discard(self, jargon_id: int) -> None:
+        old = self.entries.pop(jargon_id, None)
+        if old is None:
+            return
+        ids = self.by_pattern.get(old[1])
+        if ids is not None:
+            ids.discard(jargon_id)
+            if not ids:
+                # 自动机不支持删除，留作失效模式，过多时整体重建
+                self.stale += 1
+                if self.stale > _STALE_REBUILD_THRESHOLD and self.stale > len(self.by_pattern) - self.stale:
+                    self._rebuild()
+
+    def _rebuild(self) -> None:
+        self.by_pattern = {pattern: ids for pattern, ids in self.by_pattern.items() if ids}
+        self.bounded &= self.by_pattern.keys()
+        self.automaton = AhoCorasick(self.by_pattern)
+        self.stale = 0
+
+    def match(self, folded_text: str, found: Dict[int, tuple]) -> None:
+        """在已转小写的文本中查找词条，结果写入 found"""
+        for pattern, end in self.automaton.iter_matches(folded_text):
+            ids = self.by_pattern.get(pattern)
+            if not ids:
+                continue
+            if pattern in self.bounded:
+                start = end - len(pattern)
+                before = folded_text[start - 1] if start > 0 else ""
+                after = folded_text[end] if end < len(folded_text) else ""
+                if _is_word_char(before) == _is_word_char(pattern[0]) or _is_word_char(after) == _is_word_char(
+                    pattern[-1]
+                ):
+                    continue
+            for jargon_id in ids:
+                found[jargon_id] = self.entries[jargon_id]
+
+
+def _is_matchable(jargon: Jargon) -> bool:
+    """含义非空（与原查询条件一致）且内容非空的词条才参与匹配"""
+    return jargon.meaning is not None and jargon.meaning != "" and bool((jargon.content or "").strip())
+
+
+class JargonMatcherCache:
+    """所有作用域的黑话自动机，按需从数据库加载"""
+
+    def __init__(self, max_chats: int = JARGON_MATCHER_MAX_CHATS):
+        self.max_chats = max_chats
+        self._global: Optional[_JargonScope] = None
+        self._chats: "OrderedDict[str, _JargonScope]" = OrderedDict()
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def _load(query) -> _JargonScope:
+        scope = _JargonScope()
+        query = query.where(Jargon.meaning.is_null(False) & (Jargon.meaning != ""))
+        for jargon_id, content, count in query.select(Jargon.id, Jargon.content, Jargon.count).tuples():
+            content = (content or "").strip()
+            if content:
+                scope.put(jargon_id, content, count or 0)
+        return scope
+
+    def _global_scope(self) -> _JargonScope:
+        if self._global is None:
+            self._global = self._load(Jargon.select().where(Jargon.is_global))
+            logger.debug(f"全局黑话自动机已加载: {len(self._global.entries)} 个词条")
+        return self._global
+
+    def _chat_scope(self, chat_id: str) -> _JargonScope:
+        scope = self._chats.get(chat_id)
+        if scope is None:
+            scope = self._load(Jargon.select().where(~Jargon.is_global & Jargon.id.in_(jargon_ids_in_chat(chat_id))))
+            self._chats[chat_id] = scope
+            while len(self._chats) > self.max_chats:
+                self._chats.popitem(last=False)
+        else:
+            self._chats.move_to_end(chat_id)
+        return scope
+
+    def match(self, text: str, chat_id: Optional[str] = None) -> List[str]:
+        """
+        匹配文本中出现的黑话
+
+        Args:
+            text: 要匹配的文本
+            chat_id: 聊天ID；为 None 时只匹配全局黑话
+
+        Returns:
+            List[str]: 匹配到的黑话内容（去重，按出现次数降序）
+        """
+        if not text:
+            return []
+        folded = _fold(text)
+        found: Dict[int, tuple] = {}
+        with self._lock:
+            self._global_scope().match(folded, found)
+            if chat_id is not None:
+                self._chat_scope(chat_id).match(folded, found)
+        contents: Dict[str, None] = {}
+        for content, _, _ in sorted(found.values(), key=lambda entry: -entry[2]):
+            contents[content] = None
+        return list(contents)
+
+    def upsert(self, jargon: Jargon) -> None:
+        """黑话新增或更新（含义、全局标记、聊天关联、计数）后调用，同步已加载的作用域"""
+        with self._lock:
+            matchable = _is_matchable(jargon)
+            content = (jargon.content or "").strip()
+            count = jargon.count or 0
+            if self._global is not None:
+                if matchable and jargon.is_global:
+                    self._global.put(jargon.id, content, count)
+                else:
+                    self._global.discard(jargon.id)
+            if not self._chats:
+                return
+            linked: Set[str] = set()
+            if matchable and not jargon.is_global:
+                linked = {
+                    chat_id
+                    for (chat_id,) in JargonChat.select(JargonChat.chat_id)
+                    .where(JargonChat.jargon_id == jargon.id)
+                    .tuples()
+                }
+            for chat_id, scope in self._chats.items():
+                if chat_id in linked:
+                    scope.put(jargon.id, content, count)
+                else:
+                    scope.discard(jargon.id)
+
+    def remove(self, jargon_ids: Iterable[int]) -> None:
+        """黑话被删除后调用"""
+        with self._lock:
+            scopes = list(self._chats.values())
+            if self._global is not None:
+                scopes.append(self._global)
+            for jargon_id in jargon_ids:
+                for scope in scopes:
+                    scope.discard(jargon_id)
+
+    def invalidate(self) -> None:
+        """丢弃所有自动机，用于绕过 upsert/remove 批量修改 Jargon 表之后"""
+        with self._lock:
+            self._global = None
+            self._chats.clear()
+
+
+jargon_matcher = JargonMatcherCache()
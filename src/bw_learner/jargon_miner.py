@@ -7,15 +7,18 @@ from json_repair import repair_json
 from peewee import fn
 
 from src.common.logger import get_logger
+from src.common.database.database import db_writer
 from src.common.database.database_model import Jargon
 from src.llm_models.utils_model import LLMRequest
 from src.config.config import model_config, global_config
 from src.chat.message_receive.chat_stream import get_chat_manager
 from src.chat.utils.prompt_builder import Prompt, global_prompt_manager
+from src.bw_learner.jargon_matcher import jargon_matcher
 from src.bw_learner.learner_utils import (
-    parse_chat_id_list,
-    chat_id_list_contains,
-    update_chat_id_list,
+    jargon_ids_in_chat,
+    jargon_visible_in_chat,
+    add_jargon_chat,
+    dump_jargon_chat_ids,
 )
 
 
@@ -327,7 +330,7 @@ class JargonMiner:
                 logger.info(f"jargon {content} 推断1表示信息不足无法推断，放弃本次推断，待下次更新")
                 # 更新最后一次判定的count值，避免在同一阈值重复尝试
                 jargon_obj.last_inference_count = jargon_obj.count or 0
-                jargon_obj.save()
+                await db_writer.write(jargon_obj.save)
                 return
 
             # 步骤2: 仅基于content推断
@@ -424,7 +427,8 @@ class JargonMiner:
             if (jargon_obj.count or 0) >= 100:
                 jargon_obj.is_complete = True
 
-            jargon_obj.save()
+            await db_writer.write(jargon_obj.save)
+            jargon_matcher.upsert(jargon_obj)
             logger.debug(
                 f"jargon {content} 推断完成: is_jargon={is_jargon}, meaning={jargon_obj.meaning}, last_inference_count={jargon_obj.last_inference_count}, is_complete={jargon_obj.is_complete}"
             )
@@ -499,22 +503,13 @@ class JargonMiner:
                 raw_content_list = entry["raw_content"]  # 已经是列表
 
                 try:
-                    # 查询所有content匹配的记录
+                    # 查询content匹配的记录
                     query = Jargon.select().where(Jargon.content == content)
-
-                    # 查找匹配的记录
-                    matched_obj = None
-                    for obj in query:
-                        if global_config.expression.all_global_jargon:
-                            # 开启all_global：所有content匹配的记录都可以
-                            matched_obj = obj
-                            break
-                        else:
-                            # 关闭all_global：需要检查chat_id列表是否包含目标chat_id
-                            chat_id_list = parse_chat_id_list(obj.chat_id)
-                            if chat_id_list_contains(chat_id_list, self.chat_id):
-                                matched_obj = obj
-                                break
+                    if not global_config.expression.all_global_jargon:
+                        # 关闭all_global：只匹配在当前聊天中出现过的记录
+                        query = query.where(Jargon.id.in_(jargon_ids_in_chat(self.chat_id)))
+                    # 开启all_global：所有content匹配的记录都可以
+                    matched_obj = query.order_by(Jargon.id).first()
 
                     if matched_obj:
                         obj = matched_obj
@@ -539,17 +534,17 @@ class JargonMiner:
                         merged_list = list(dict.fromkeys(existing_raw_content + raw_content_list))
                         obj.raw_content = json.dumps(merged_list, ensure_ascii=False)
 
-                        # 更新chat_id列表：增加当前chat_id的计数
-                        chat_id_list = parse_chat_id_list(obj.chat_id)
-                        updated_chat_id_list = update_chat_id_list(chat_id_list, self.chat_id, increment=1)
-                        obj.chat_id = json.dumps(updated_chat_id_list, ensure_ascii=False)
+                        # 更新聊天关联：增加当前chat_id的计数，并同步旧的chat_id字段
+                        await db_writer.write(add_jargon_chat, obj.id, self.chat_id, increment=1)
+                        obj.chat_id = dump_jargon_chat_ids(obj.id)
 
                         # 开启all_global时，确保记录标记为is_global=True
                         if global_config.expression.all_global_jargon:
                             obj.is_global = True
                         # 关闭all_global时，保持原有is_global不变（不修改）
 
-                        obj.save()
+                        await db_writer.write(obj.save)
+                        jargon_matcher.upsert(obj)
 
                         # 检查是否需要推断（达到阈值且超过上次判定值）
                         if _should_infer_meaning(obj):
@@ -572,13 +567,15 @@ class JargonMiner:
                         chat_id_list = [[self.chat_id, 1]]
                         chat_id_json = json.dumps(chat_id_list, ensure_ascii=False)
 
-                        Jargon.create(
+                        new_obj = await db_writer.write(
+                            Jargon.create,
                             content=content,
                             raw_content=json.dumps(raw_content_list, ensure_ascii=False),
                             chat_id=chat_id_json,
                             is_global=is_global_new,
                             count=1,
                         )
+                        await db_writer.write(add_jargon_chat, new_obj.id, self.chat_id, increment=1)
                         saved += 1
                 except Exception as e:
                     logger.error(f"保存jargon失败: chat_id={self.chat_id}, content={content}, err={e}")
@@ -637,8 +634,8 @@ def search_jargon(
 
     keyword = keyword.strip()
 
-    # 构建查询（选择所有需要的字段，以便后续过滤）
-    query = Jargon.select()
+    # 构建查询（只选择返回所需的字段）
+    query = Jargon.select(Jargon.content, Jargon.meaning)
 
     # 构建搜索条件
     if case_sensitive:
@@ -660,38 +657,20 @@ def search_jargon(
 
     query = query.where(search_condition)
 
+    # 只返回有meaning的记录
+    query = query.where(Jargon.meaning.is_null(False) & (fn.TRIM(Jargon.meaning) != ""))
+
     # 根据all_global配置决定查询逻辑
     if global_config.expression.all_global_jargon:
         # 开启all_global：所有记录都是全局的，查询所有is_global=True的记录（无视chat_id）
         query = query.where(Jargon.is_global)
-    # 注意：对于all_global=False的情况，chat_id过滤在Python层面进行，以便兼容新旧格式
-
-    # 注意：meaning的过滤移到Python层面，因为我们需要先过滤chat_id
+    elif chat_id:
+        # 关闭all_global：只查询全局黑话或在该聊天中出现过的黑话
+        query = query.where(jargon_visible_in_chat(chat_id))
 
-    # 按count降序排序，优先返回出现频率高的
-    query = query.order_by(Jargon.count.desc())
+    # 按count降序排序，优先返回出现频率高的；过滤都在SQL中完成，limit即为精确的结果数
+    query = query.order_by(Jargon.count.desc()).limit(limit)
 
-    # 限制结果数量（先多取一些，因为后面可能过滤）
-    query = query.limit(limit * 2)
-
-    # 执行查询并返回结果，过滤chat_id
-    results = []
-    for jargon in query:
-        # 如果提供了chat_id且all_global=False，需要检查chat_id列表是否包含目标chat_id
-        if chat_id and not global_config.expression.all_global_jargon:
-            chat_id_list = parse_chat_id_list(jargon.chat_id)
-            # 如果记录是is_global=True，或者chat_id列表包含目标chat_id，则包含
-            if not jargon.is_global and not chat_id_list_contains(chat_id_list, chat_id):
-                continue
-
-        # 只返回有meaning的记录
-        if not jargon.meaning or jargon.meaning.strip() == "":
-            continue
-
-        results.append({"content": jargon.content or "", "meaning": jargon.meaning or ""})
-
-        # 达到限制数量后停止
-        if len(results) >= limit:
-            break
+    results = [{"content": content or "", "meaning": meaning or ""} for content, meaning in query.tuples()]
 
     return results
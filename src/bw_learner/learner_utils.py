@@ -5,6 +5,8 @@ import json
 from typing import Optional, List, Dict, Any, Tuple
 
 from src.common.logger import get_logger
+from src.common.database.database import db
+from src.common.database.database_model import Jargon, JargonChat
 from src.config.config import global_config
 from src.chat.utils.chat_message_builder import (
     build_readable_messages,
@@ -160,99 +162,110 @@ def weighted_sample(population: List[Dict], k: int) -> List[Dict]:
     return selected
 
 
-def parse_chat_id_list(chat_id_value: Any) -> List[List[Any]]:
+def jargon_ids_in_chat(chat_id: str):
     """
-    解析chat_id字段，兼容旧格式（字符串）和新格式（JSON列表）
+    在指定聊天中出现过的黑话ID子查询（走 jargon_chat 的 (chat_id, jargon_id) 索引）
 
     Args:
-        chat_id_value: 可能是字符串（旧格式）或JSON字符串（新格式）
+        chat_id: 聊天ID
 
     Returns:
-        List[List[Any]]: 格式为 [[chat_id, count], ...] 的列表
+        可用于 Jargon.id.in_() 的子查询
     """
-    if not chat_id_value:
-        return []
+    return JargonChat.select(JargonChat.jargon_id).where(JargonChat.chat_id == chat_id)
 
-    # 如果是字符串，尝试解析为JSON
-    if isinstance(chat_id_value, str):
-        # 尝试解析JSON
-        try:
-            parsed = json.loads(chat_id_value)
-            if isinstance(parsed, list):
-                # 新格式：已经是列表
-                return parsed
-            elif isinstance(parsed, str):
-                # 解析后还是字符串，说明是旧格式
-                return [[parsed, 1]]
-            else:
-                # 其他类型，当作旧格式处理
-                return [[str(chat_id_value), 1]]
-        except (json.JSONDecodeError, TypeError):
-            # 解析失败，当作旧格式（纯字符串）
-            return [[str(chat_id_value), 1]]
-    elif isinstance(chat_id_value, list):
-        # 已经是列表格式
-        return chat_id_value
-    else:
-        # 其他类型，转换为旧格式
-        return [[str(chat_id_value), 1]]
 
+def jargon_visible_in_chat(chat_id: str):
+    """
+    黑话在指定聊天中可见的查询条件：全局黑话，或在该聊天中出现过
+
+    Args:
+        chat_id: 聊天ID
 
-def update_chat_id_list(chat_id_list: List[List[Any]], target_chat_id: str, increment: int = 1) -> List[List[Any]]:
+    Returns:
+        可直接用于 Jargon.select().where() 的条件表达式
+    """
+    return Jargon.is_global | Jargon.id.in_(jargon_ids_in_chat(chat_id))
+
+
+def add_jargon_chat(jargon_id: int, chat_id: str, increment: int = 1) -> None:
     """
-    更新chat_id列表，如果target_chat_id已存在则增加计数，否则添加新条目
+    增加黑话在指定聊天中的出现次数，不存在关联记录时新建（单条 UPSERT 语句）
 
     Args:
-        chat_id_list: 当前的chat_id列表，格式为 [[chat_id, count], ...]
-        target_chat_id: 要更新或添加的chat_id
+        jargon_id: 黑话ID
+        chat_id: 聊天ID
         increment: 增加的计数，默认为1
+    """
+    JargonChat.insert(jargon_id=jargon_id, chat_id=chat_id, count=increment).on_conflict(
+        conflict_target=[JargonChat.jargon_id, JargonChat.chat_id],
+        update={JargonChat.count: JargonChat.count + increment},
+    ).execute()
 
-    Returns:
-        List[List[Any]]: 更新后的chat_id列表
+
+def set_jargon_chats(jargon_id: int, chat_ids: List[str]) -> None:
     """
-    item = _find_chat_id_item(chat_id_list, target_chat_id)
-    if item is not None:
-        # 找到匹配的chat_id，增加计数
-        if len(item) >= 2:
-            item[1] = (item[1] if isinstance(item[1], (int, float)) else 0) + increment
-        else:
-            item.append(increment)
-    else:
-        # 未找到，添加新条目
-        chat_id_list.append([target_chat_id, increment])
+    将黑话关联的聊天设置为给定列表：移除不在列表中的关联，保留已有关联的计数，新增关联计数为0
+
+    Args:
+        jargon_id: 黑话ID
+        chat_ids: 聊天ID列表
+    """
+    chat_ids = list(dict.fromkeys(chat_ids))
+    with db.atomic():
+        JargonChat.delete().where(
+            (JargonChat.jargon_id == jargon_id) & (JargonChat.chat_id.not_in(chat_ids))
+        ).execute()
+        if chat_ids:
+            JargonChat.insert_many(
+                [{"jargon_id": jargon_id, "chat_id": chat_id, "count": 0} for chat_id in chat_ids]
+            ).on_conflict_ignore().execute()
+
+
+def delete_jargon_chats(jargon_ids: List[int]) -> int:
+    """
+    删除黑话的所有聊天关联（删除黑话时调用）
+
+    Args:
+        jargon_ids: 黑话ID列表
 
-    return chat_id_list
+    Returns:
+        int: 删除的关联记录数
+    """
+    if not jargon_ids:
+        return 0
+    return JargonChat.delete().where(JargonChat.jargon_id.in_(jargon_ids)).execute()
 
 
-def _find_chat_id_item(chat_id_list: List[List[Any]], target_chat_id: str) -> Optional[List[Any]]:
+def get_jargon_chat_counts(jargon_id: int) -> List[Tuple[str, int]]:
     """
-    在chat_id列表中查找匹配的项（辅助函数）
+    获取黑话在各聊天中的出现次数
 
     Args:
-        chat_id_list: chat_id列表，格式为 [[chat_id, count], ...]
-        target_chat_id: 要查找的chat_id
+        jargon_id: 黑话ID
 
     Returns:
-        如果找到则返回匹配的项，否则返回None
+        List[Tuple[str, int]]: [(chat_id, count), ...]，按次数降序
     """
-    for item in chat_id_list:
-        if isinstance(item, list) and len(item) >= 1 and str(item[0]) == str(target_chat_id):
-            return item
-    return None
+    query = (
+        JargonChat.select(JargonChat.chat_id, JargonChat.count)
+        .where(JargonChat.jargon_id == jargon_id)
+        .order_by(JargonChat.count.desc(), JargonChat.id)
+    )
+    return list(query.tuples())
 
 
-def chat_id_list_contains(chat_id_list: List[List[Any]], target_chat_id: str) -> bool:
+def dump_jargon_chat_ids(jargon_id: int) -> str:
     """
-    检查chat_id列表中是否包含指定的chat_id
+    按关联表生成 Jargon.chat_id 字段的 JSON（[[chat_id, count], ...]），用于保持旧字段的展示与兼容
 
     Args:
-        chat_id_list: chat_id列表，格式为 [[chat_id, count], ...]
-        target_chat_id: 要查找的chat_id
+        jargon_id: 黑话ID
 
     Returns:
-        bool: 如果包含则返回True
+        str: JSON字符串
     """
-    return _find_chat_id_item(chat_id_list, target_chat_id) is not None
+    return json.dumps([[chat_id, count] for chat_id, count in get_jargon_chat_counts(jargon_id)], ensure_ascii=False)
 
 
 def contains_bot_self_name(content: str) -> bool:
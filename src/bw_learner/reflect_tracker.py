@@ -1,6 +1,7 @@
 import time
 from typing import Optional, Dict, TYPE_CHECKING
 from src.common.logger import get_logger
+from src.common.database.database import db_writer
 from src.common.database.database_model import Expression
 from src.llm_models.utils_model import LLMRequest
 from src.chat.utils.prompt_builder import Prompt, global_prompt_manager
@@ -135,7 +136,7 @@ class ReflectTracker:
                 self.expression.checked = True
                 self.expression.rejected = False
                 self.expression.modified_by = 'ai'  # 通过LLM判断也标记为ai
-                self.expression.save()
+                await db_writer.write(self.expression.save)
                 logger.info(f"Expression {self.expression.id} approved by operator.")
                 return True
 
@@ -159,7 +160,7 @@ class ReflectTracker:
                 else:
                     self.expression.rejected = False
 
-                self.expression.save()
+                await db_writer.write(self.expression.save)
 
                 if has_update:
                     logger.info(
@@ -22,10 +22,8 @@ from src.person_info.person_info import Person
 from src.plugin_system.base.component_types import EventType, ActionInfo
 from src.plugin_system.core import events_manager
 from src.plugin_system.apis import generator_api, send_api, message_api, database_api
-from src.chat.utils.chat_message_builder import (
-    build_readable_messages_with_id,
-    get_raw_msg_before_timestamp_with_chat,
-)
+from src.chat.utils.message_window import MessageWindow
+from src.chat.utils.image_description_queue import image_description_queue
 
 if TYPE_CHECKING:
     from src.common.data_models.database_data_model import DatabaseMessages
@@ -251,6 +249,9 @@ class BrainChatting:
             recent_messages_list = []
         _reply_text = ""  # 初始化reply_text变量，避免UnboundLocalError
 
+        # 即将为这个聊天思考/回复，优先识别其中还在排队的图片
+        image_description_queue.prioritize_chat(self.stream_id)
+
         # -------------------------------------------------------------------------
         # ReflectTracker Check
         # 在每次回复前检查一次上下文，看是否有反思问题得到了解答
@@ -281,10 +282,13 @@ class BrainChatting:
             cycle_timers, thinking_id = self.start_cycle()
             logger.info(f"{self.log_prefix} 开始第{self._cycle_counter}次思考")
 
+            # 本次循环共享的消息窗口：只查询一次，动作修改、规划器和回复器按需切片
+            message_window = MessageWindow(chat_id=self.stream_id)
+
             # 第一步：动作检查
             available_actions: Dict[str, ActionInfo] = {}
             try:
-                await self.action_modifier.modify_actions()
+                await self.action_modifier.modify_actions(message_window=message_window)
                 available_actions = self.action_manager.get_using_actions()
             except Exception as e:
                 logger.error(f"{self.log_prefix} 动作修改失败: {e}")
@@ -294,14 +298,8 @@ class BrainChatting:
 
             # 一次思考迭代：Think - Act - Observe
             # 获取聊天上下文
-            message_list_before_now = get_raw_msg_before_timestamp_with_chat(
-                chat_id=self.stream_id,
-                timestamp=time.time(),
-                limit=int(global_config.chat.max_context_size * 0.6),
-                filter_intercept_message_level=1,
-            )
-            chat_content_block, message_id_list = build_readable_messages_with_id(
-                messages=message_list_before_now,
+            chat_content_block, message_id_list = message_window.build_readable_with_id(
+                int(global_config.chat.max_context_size * 0.6),
                 timestamp_mode="normal_no_YMD",
                 read_mark=self.action_planner.last_obs_time_mark,
                 truncate=True,
@@ -327,6 +325,7 @@ class BrainChatting:
                 action_to_use_info = await self.action_planner.plan(
                     loop_start_time=self.last_read_time,
                     available_actions=available_actions,
+                    message_window=message_window,
                 )
 
             # 检查是否有 complete_talk 动作（会停止后续迭代）
@@ -335,7 +334,9 @@ class BrainChatting:
             # 并行执行所有动作
             action_tasks = [
                 asyncio.create_task(
-                    self._execute_action(action, action_to_use_info, thinking_id, available_actions, cycle_timers)
+                    self._execute_action(
+                        action, action_to_use_info, thinking_id, available_actions, cycle_timers, message_window
+                    )
                 )
                 for action in action_to_use_info
             ]
@@ -577,6 +578,7 @@ class BrainChatting:
         thinking_id: str,
         available_actions: Dict[str, ActionInfo],
         cycle_timers: Dict[str, float],
+        message_window: Optional[MessageWindow] = None,
     ):
         """执行单个动作的通用函数"""
         try:
@@ -624,6 +626,7 @@ class BrainChatting:
                             enable_tool=global_config.tool.enable_tool,
                             request_type="replyer",
                             from_plugin=False,
+                            message_window=message_window,
                         )
 
                         if not success or not llm_response or not llm_response.reply_set:
@@ -0,0 +1,245 @@
+import heapq
+import random
+
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Set, Tuple
+
+if TYPE_CHECKING:
+    from src.chat.emoji_system.emoji_manager import MaiEmoji
+
+
+def levenshtein_distance(s1: str, s2: str) -> int:
+    """计算两个字符串的编辑距离
+
+    Args:
+        s1: 第一个字符串
+        s2: 第二个字符串
+
+    Returns:
+        int: 编辑距离
+    """
+    if len(s1) < len(s2):
+        s1, s2 = s2, s1
+    if not s2:
+        return len(s1)
+
+    previous_row = list(range(len(s2) + 1))
+    for i, c1 in enumerate(s1):
+        current_row = [i + 1]
+        for j, c2 in enumerate(s2):
+            current_row.append(min(previous_row[j + 1] + 1, current_row[j] + 1, previous_row[j] + (c1 != c2)))
+        previous_row = current_row
+    return previous_row[-1]
+
+
+def tag_similarity(query: str, tag: str) -> float:
+    """基于编辑距离的相似度，范围 [0, 1]"""
+    max_len = max(len(query), len(tag))
+    if max_len == 0:
+        return 1.0
+    return 1 - levenshtein_distance(query, tag) / max_len
+
+
+class _WeightTree:
+    """
+    树状数组维护的权重表，支持 O(log n) 的单点更新和按权重抽样
+
+    槽位释放后会被复用，因此树的大小只与同时存在的表情包数量有关。
+    """
+
+    def __init__(self):
+        self._tree: List[float] = [0.0]  # 1-based
+        self._weights: List[float] = []
+        self._free: List[int] = []
+
+    @property
+    def total(self) -> float:
+        return self._prefix(len(self._weights))
+
+    def _prefix(self, i: int) -> float:
+        s = 0.0
+        while i > 0:
+            s += self._tree[i]
+            i -= i & -i
+        return s
+
+    def _add(self, slot: int, delta: float) -> None:
+        i = slot + 1
+        while i < len(self._tree):
+            self._tree[i] += delta
+            i += i & -i
+
+    def allocate(self, weight: float) -> int:
+        if self._free:
+            slot = self._free.pop()
+        else:
+            slot = len(self._weights)
+            self._weights.append(0.0)
+            # 追加节点：其值为覆盖区间 (i - lowbit(i), i] 内已有权重之和
+            i = slot + 1
+            self._tree.append(self._prefix(i - 1) - self._prefix(i - (i & -i)))
+        self.set(slot, weight)
+        return slot
+
+    def release(self, slot: int) -> None:
+        self.set(slot, 0.0)
+        self._free.append(slot)
+
+    def set(self, slot: int, weight: float) -> None:
+        delta = weight - self._weights[slot]
+        if delta:
+            self._weights[slot] = weight
+            self._add(slot, delta)
+
+    def sample(self, rng: random.Random) -> Optional[int]:
+        """按权重抽取一个槽位，总权重为0时返回None"""
+        total = self.total
+        if total <= 0:
+            return None
+        target = rng.random() * total
+        pos = 0
+        step = 1 << (len(self._tree) - 1).bit_length()
+        while step:
+            nxt = pos + step
+            if nxt < len(self._tree) and self._tree[nxt] <= target:
+                pos = nxt
+                target -= self._tree[nxt]
+            step >>= 1
+        # pos 为前缀和不超过 target 的最大位置，对应的0-based槽位即 pos；
+        # 浮点误差可能使其越过末尾，此时回退到最后一个有效槽位
+        pos = min(pos, len(self._weights) - 1)
+        while pos > 0 and self._weights[pos] <= 0:
+            pos -= 1
+        return pos
+
+
+class EmotionTagIndex:
+    """
+    表情包情感标签索引
+
+    - 去重后的标签词表 -> 表情包哈希，选择表情包的代价只与不同标签的数量有关
+    - 查询文本与标签的相似度按查询缓存（LRU），词表新增标签时只补算新标签
+    - 按使用次数维护的抽样权重（1 / (usage_count + 1)），增量更新
+    """
+
+    def __init__(self, similarity_cache_size: int = 512, rng: Optional[random.Random] = None):
+        self._emojis: Dict[str, "MaiEmoji"] = {}
+        self._emoji_tags: Dict[str, Tuple[str, ...]] = {}
+        self._tag_to_hashes: Dict[str, Set[str]] = {}
+        self._similarity_cache: "OrderedDict[str, Dict[str, float]]" = OrderedDict()
+        self._similarity_cache_size = similarity_cache_size
+        self._weights = _WeightTree()
+        self._slots: Dict[str, int] = {}
+        self._slot_to_hash: Dict[int, str] = {}
+        self._rng = rng or random.Random()
+
+    def __len__(self) -> int:
+        return len(self._emojis)
+
+    def __contains__(self, emoji_hash: str) -> bool:
+        return emoji_hash in self._emojis
+
+    @property
+    def tag_count(self) -> int:
+        return len(self._tag_to_hashes)
+
+    def get(self, emoji_hash: str) -> Optional["MaiEmoji"]:
+        return self._emojis.get(emoji_hash)
+
+    def rebuild(self, emojis: Iterable["MaiEmoji"]) -> None:
+        """清空并重新建立索引"""
+        self._emojis.clear()
+        self._emoji_tags.clear()
+        self._tag_to_hashes.clear()
+        self._weights = _WeightTree()
+        self._slots.clear()
+        self._slot_to_hash.clear()
+        for emoji in emojis:
+            self.add(emoji)
+
+    def add(self, emoji: "MaiEmoji") -> None:
+        """添加或更新一个表情包，已删除的表情包会被忽略"""
+        if emoji.is_deleted or not emoji.hash:
+            return
+        if emoji.hash in self._emojis:
+            self.remove(emoji.hash)
+        self._emojis[emoji.hash] = emoji
+        tags = tuple(dict.fromkeys(tag.strip() for tag in emoji.emotion if tag and tag.strip()))
+        self._emoji_tags[emoji.hash] = tags
+        for tag in tags:
+            self._tag_to_hashes.setdefault(tag, set()).add(emoji.hash)
+        slot = self._weights.allocate(self._usage_weight(emoji.usage_count))
+        self._slots[emoji.hash] = slot
+        self._slot_to_hash[slot] = emoji.hash
+
+    def remove(self, emoji_hash: str) -> None:
+        if self._emojis.pop(emoji_hash, None) is None:
+            return
+        for tag in self._emoji_tags.pop(emoji_hash, ()):
+            hashes = self._tag_to_hashes.get(tag)
+            if hashes is not None:
+                hashes.discard(emoji_hash)
+                if not hashes:
+                    del self._tag_to_hashes[tag]
+        slot = self._slots.pop(emoji_hash)
+        del self._slot_to_hash[slot]
+        self._weights.release(slot)
+
+    @staticmethod
+    def _usage_weight(usage_count: int) -> float:
+        return 1 / ((usage_count or 0) + 1)
+
+    def update_usage(self, emoji_hash: str) -> None:
+        """表情包使用次数变化后更新其抽样权重"""
+        if (emoji := self._emojis.get(emoji_hash)) is not None:
+            self._weights.set(self._slots[emoji_hash], self._usage_weight(emoji.usage_count))
+
+    def _similarities(self, query: str) -> Dict[str, float]:
+        """获取查询与词表中每个标签的相似度，结果按查询缓存"""
+        cached = self._similarity_cache.get(query)
+        if cached is None:
+            cached = {}
+            self._similarity_cache[query] = cached
+            while len(self._similarity_cache) > self._similarity_cache_size:
+                self._similarity_cache.popitem(last=False)
+        else:
+            self._similarity_cache.move_to_end(query)
+        for tag in self._tag_to_hashes.keys() - cached.keys():
+            cached[tag] = tag_similarity(query, tag)
+        return cached
+
+    def top_k(self, query: str, k: int = 10) -> List[Tuple["MaiEmoji", float, str]]:
+        """查找与查询最相似的k个表情包
+
+        每个表情包取其标签中相似度最高的一个；按标签相似度从高到低出堆，
+        表情包第一次出现时就是它的最佳标签，收集满k个即可停止。
+
+        Returns:
+            List[Tuple[MaiEmoji, float, str]]: (表情包, 相似度, 匹配的标签)，按相似度降序
+        """
+        similarities = self._similarities(query)
+        heap = [(-sim, tag) for tag, sim in similarities.items() if sim > 0 and tag in self._tag_to_hashes]
+        heapq.heapify(heap)
+
+        results: List[Tuple["MaiEmoji", float, str]] = []
+        seen: Set[str] = set()
+        while heap and len(results) < k:
+            neg_sim, tag = heapq.heappop(heap)
+            for emoji_hash in self._tag_to_hashes[tag]:
+                if emoji_hash in seen:
+                    continue
+                seen.add(emoji_hash)
+                results.append((self._emojis[emoji_hash], -neg_sim, tag))
+                if len(results) >= k:
+                    break
+        return results
+
+    def sample_by_usage(self, k: int) -> List["MaiEmoji"]:
+        """按使用次数的倒数为权重有放回地抽取k个表情包（与 random.choices 语义一致）"""
+        results = []
+        for _ in range(min(k, len(self._emojis))):
+            slot = self._weights.sample(self._rng)
+            if slot is None or slot not in self._slot_to_hash:
+                break
+            results.append(self._emojis[self._slot_to_hash[slot]])
+        return results
@@ -1,23 +1,22 @@
 import asyncio
-import base64
-import hashlib
 import os
 import random
 import time
 import traceback
-import io
 import re
 import binascii
 
 from typing import Optional, Tuple, List, Any
-from PIL import Image
 from rich.traceback import install
 
 from src.common.database.database_model import Emoji, EmojiDescriptionCache
-from src.common.database.database import db as peewee_db
+from src.common.database.database import db as peewee_db, db_writer
 from src.common.logger import get_logger
 from src.config.config import global_config, model_config
-from src.chat.utils.utils_image import image_path_to_base64, get_image_manager
+from src.chat.utils.utils_image import image_path_to_base64
+from src.chat.utils.image_service import image_process_service
+from src.chat.utils.phash_index import PHashIndex
+from src.chat.emoji_system.emoji_index import EmotionTagIndex
 from src.llm_models.utils_model import LLMRequest
 
 install(extra_lines=3)
@@ -46,6 +45,7 @@ class MaiEmoji:
         self.filename = os.path.basename(full_path)  # 文件名
         self.embedding = []
         self.hash = ""  # 初始为空，在创建实例时会计算
+        self.phash = ""  # 感知哈希，动图或无法计算时为空
         self.description = ""
         self.emotion: List[str] = []
         self.usage_count = 0
@@ -72,26 +72,19 @@ class MaiEmoji:
                 return None
             logger.debug(f"[初始化] 文件读取成功 (Base64预览: {image_base64[:50]}...)")
 
-            # 计算哈希值
-            logger.debug(f"[初始化] 正在解码Base64并计算哈希: {self.filename}")
-            # 确保base64字符串只包含ASCII字符
-            if isinstance(image_base64, str):
-                image_base64 = image_base64.encode("ascii", errors="ignore").decode("ascii")
-            image_bytes = base64.b64decode(image_base64)
-            self.hash = hashlib.md5(image_bytes).hexdigest()
+            # 解码、计算哈希值和获取图片格式（在图片处理进程池中进行）
+            logger.debug(f"[初始化] 正在解码Base64并计算哈希和格式: {self.filename}")
+            decoded = await image_process_service.decode(image_base64)
+            self.hash = decoded.hash
+            self.phash = decoded.phash
             logger.debug(f"[初始化] 哈希计算成功: {self.hash}")
 
-            # 获取图片格式
-            logger.debug(f"[初始化] 正在使用Pillow获取格式: {self.filename}")
-            try:
-                with Image.open(io.BytesIO(image_bytes)) as img:
-                    self.format = img.format.lower()  # type: ignore
-                logger.debug(f"[初始化] 格式获取成功: {self.format}")
-            except Exception as pil_error:
-                logger.error(f"[初始化错误] Pillow无法处理图片 ({self.filename}): {pil_error}")
-                logger.error(traceback.format_exc())
+            if not decoded.format:
+                logger.error(f"[初始化错误] Pillow无法处理图片 ({self.filename})")
                 self.is_deleted = True
                 return None
+            self.format = decoded.format
+            logger.debug(f"[初始化] 格式获取成功: {self.format}")
 
             # 如果所有步骤成功，返回 True
             return True
@@ -151,8 +144,10 @@ class MaiEmoji:
                 # 准备数据库记录 for emoji collection
                 emotion_str = ",".join(self.emotion) if self.emotion else ""
 
-                Emoji.create(
+                await db_writer.write(
+                    Emoji.create,
                     emoji_hash=self.hash,
+                    phash=self.phash or None,
                     full_path=self.full_path,
                     format=self.format,
                     description=self.description,
@@ -269,6 +264,7 @@ def _to_emoji_objects(data: Any) -> Tuple[List["MaiEmoji"], int]:
                 load_errors += 1
                 continue
 
+            emoji.phash = emoji_data.phash or ""
             emoji.description = emoji_data.description
             # Deserialize emotion string from DB to list
             emoji.emotion = emoji_data.emotion.replace("，", ",").split(",") if emoji_data.emotion else []
@@ -388,6 +384,9 @@ class EmojiManager:
         self.emoji_num_max = global_config.emoji.max_reg_num
         self.emoji_num_max_reach_deletion = global_config.emoji.do_replace
         self.emoji_objects: list[MaiEmoji] = []  # 存储MaiEmoji对象的列表，使用类型注解明确列表元素类型
+        self.phash_index = PHashIndex()  # 已注册表情包的感知哈希索引，键为表情包哈希
+        self.tag_index = EmotionTagIndex()  # 情感标签索引，用于按文本选择表情包和按使用次数抽样
+        self._phash_checked: set[str] = set()  # 已尝试补全感知哈希的表情包，避免重复计算
 
         logger.info("启动表情包管理器")
 
@@ -401,6 +400,22 @@ class EmojiManager:
         EmojiDescriptionCache.create_table(safe=True)
         self._initialized = True
 
+    def _index_emoji(self, emoji: MaiEmoji) -> None:
+        """将新注册的表情包加入内存索引"""
+        self.phash_index.add(emoji.hash, emoji.phash)
+        self.tag_index.add(emoji)
+
+    def _unindex_emoji(self, emoji_hash: str) -> None:
+        """从内存索引中移除表情包"""
+        self.phash_index.remove(emoji_hash)
+        self.tag_index.remove(emoji_hash)
+
+    def _rebuild_index(self) -> None:
+        """根据 self.emoji_objects 重建内存索引"""
+        self.phash_index.clear()
+        self.phash_index.add_many((emoji.hash, emoji.phash) for emoji in self.emoji_objects)
+        self.tag_index.rebuild(self.emoji_objects)
+
     def _ensure_db(self) -> None:
         """确保数据库已初始化"""
         if not self._initialized:
@@ -414,7 +429,13 @@ class EmojiManager:
             emoji_update = Emoji.get(Emoji.emoji_hash == emoji_hash)
             emoji_update.usage_count += 1
             emoji_update.last_used_time = time.time()  # Update last used time
-            emoji_update.save()  # Persist changes to DB
+            db_writer.submit(emoji_update.save)  # Persist changes to DB
+
+            # 同步内存中的对象和抽样权重
+            if emoji := self.tag_index.get(emoji_hash):
+                emoji.usage_count = emoji_update.usage_count
+                emoji.last_used_time = emoji_update.last_used_time
+                self.tag_index.update_usage(emoji_hash)
         except Emoji.DoesNotExist:  # type: ignore
             logger.error(f"记录表情使用失败: 未找到 hash 为 {emoji_hash} 的表情包")
         except Exception as e:
@@ -431,44 +452,12 @@ class EmojiManager:
             self._ensure_db()
             _time_start = time.time()
 
-            # 获取所有表情包 (从内存缓存中获取)
-            all_emojis = self.emoji_objects
-
-            if not all_emojis:
+            if not len(self.tag_index):
                 logger.warning("内存中没有任何表情包对象")
                 return None
 
-            # 计算每个表情包与输入文本的最大情感相似度
-            emoji_similarities = []
-            for emoji in all_emojis:
-                # 跳过已标记为删除的对象
-                if emoji.is_deleted:
-                    continue
-
-                emotions = emoji.emotion
-                if not emotions:
-                    continue
-
-                # 计算与每个emotion标签的相似度，取最大值
-                max_similarity = 0
-                best_matching_emotion = ""
-                for emotion in emotions:
-                    # 使用编辑距离计算相似度
-                    distance = self._levenshtein_distance(text_emotion, emotion)
-                    max_len = max(len(text_emotion), len(emotion))
-                    similarity = 1 - (distance / max_len if max_len > 0 else 0)
-                    if similarity > max_similarity:
-                        max_similarity = similarity
-                        best_matching_emotion = emotion
-
-                if best_matching_emotion:
-                    emoji_similarities.append((emoji, max_similarity, best_matching_emotion))
-
-            # 按相似度降序排序
-            emoji_similarities.sort(key=lambda x: x[1], reverse=True)
-
-            # 获取前10个最相似的表情包
-            top_emojis = emoji_similarities[:10] if len(emoji_similarities) > 10 else emoji_similarities
+            # 通过情感标签索引获取前10个最相似的表情包（每个表情包取最相似的标签）
+            top_emojis = self.tag_index.top_k(text_emotion, k=10)
 
             if not top_emojis:
                 logger.warning("未找到匹配的表情包")
@@ -492,35 +481,6 @@ class EmojiManager:
             logger.error(f"[错误] 获取表情包失败: {str(e)}")
             return None
 
-    def _levenshtein_distance(self, s1: str, s2: str) -> int:
-        # sourcery skip: simplify-empty-collection-comparison, simplify-len-comparison, simplify-str-len-comparison
-        """计算两个字符串的编辑距离
-
-        Args:
-            s1: 第一个字符串
-            s2: 第二个字符串
-
-        Returns:
-            int: 编辑距离
-        """
-        if len(s1) < len(s2):
-            return self._levenshtein_distance(s2, s1)
-
-        if len(s2) == 0:
-            return len(s1)
-
-        previous_row = range(len(s2) + 1)
-        for i, c1 in enumerate(s1):
-            current_row = [i + 1]
-            for j, c2 in enumerate(s2):
-                insertions = previous_row[j + 1] + 1
-                deletions = current_row[j] + 1
-                substitutions = previous_row[j] + (c1 != c2)
-                current_row.append(min(insertions, deletions, substitutions))
-            previous_row = current_row
-
-        return previous_row[-1]
-
     async def check_emoji_file_integrity(self) -> None:
         """检查表情包文件完整性
         遍历self.emoji_objects中的所有对象，检查文件是否存在
@@ -571,6 +531,10 @@ class EmojiManager:
             # 从 self.emoji_objects 中移除标记的对象
             if objects_to_remove:
                 self.emoji_objects = [e for e in self.emoji_objects if e not in objects_to_remove]
+                for emoji in objects_to_remove:
+                    self._unindex_emoji(emoji.hash)
+
+            await self._backfill_emoji_phash()
 
             # 清理 EMOJI_REGISTERED_DIR 目录中未被追踪的文件
             removed_count = await clean_unused_emojis(EMOJI_REGISTERED_DIR, self.emoji_objects, removed_count)
@@ -586,6 +550,48 @@ class EmojiManager:
             logger.error(f"[错误] 检查表情包完整性失败: {str(e)}")
             logger.error(traceback.format_exc())
 
+    async def _backfill_emoji_phash(self, limit: int = 50) -> None:
+        """为缺少感知哈希的旧表情包补全，每次最多处理 limit 个，避免占用过久"""
+        pending = [
+            e
+            for e in self.emoji_objects
+            if not e.phash and not e.is_deleted and e.hash not in self._phash_checked
+        ][:limit]
+        filled = 0
+        for emoji in pending:
+            self._phash_checked.add(emoji.hash)
+            try:
+                decoded = await image_process_service.decode(image_path_to_base64(emoji.full_path))
+            except Exception as e:
+                logger.debug(f"[感知哈希] 计算失败 ({emoji.filename}): {e}")
+                continue
+            if not decoded.phash:
+                # 动图或纯色图不计算感知哈希
+                continue
+            emoji.phash = decoded.phash
+            await db_writer.write(
+                Emoji.update(phash=decoded.phash).where(Emoji.emoji_hash == emoji.hash).execute, label="Emoji.update"
+            )
+            self.phash_index.add(emoji.hash, decoded.phash)
+            filled += 1
+        if filled:
+            logger.info(f"[感知哈希] 已为 {filled} 个旧表情包补全感知哈希")
+
+    def find_similar_emoji(self, phash: str) -> Optional["MaiEmoji"]:
+        """根据感知哈希查找近似的已注册表情包（重新压缩、缩放后的同一表情包）
+
+        Args:
+            phash: 感知哈希
+
+        Returns:
+            Optional[MaiEmoji]: 距离最近的已注册表情包，没有则返回None
+        """
+        for emoji_hash, _distance in self.phash_index.search(phash):
+            emoji = self.tag_index.get(emoji_hash)
+            if emoji and not emoji.is_deleted:
+                return emoji
+        return None
+
     async def start_periodic_check_register(self) -> None:
         """定期检查表情包完整性和数量"""
         await self.get_all_emoji_from_db()
@@ -653,6 +659,7 @@ class EmojiManager:
             # 更新内存中的列表和数量
             self.emoji_objects = emoji_objects
             self.emoji_num = len(emoji_objects)
+            self._rebuild_index()
 
             logger.info(f"[数据库] 加载完成: 共加载 {self.emoji_num} 个表情包记录。")
             if load_errors > 0:
@@ -661,6 +668,7 @@ class EmojiManager:
         except Exception as e:
             logger.error(f"[错误] 从数据库加载所有表情包对象失败: {str(e)}")
             self.emoji_objects = []  # 加载失败则清空列表
+            self._rebuild_index()
             self.emoji_num = 0
 
     async def get_emoji_from_db(self, emoji_hash: Optional[str] = None) -> List["MaiEmoji"]:
@@ -704,11 +712,9 @@ class EmojiManager:
         返回:
             MaiEmoji 或 None: 如果找到则返回 MaiEmoji 对象，否则返回 None
         """
-        for emoji in self.emoji_objects:
-            # 确保对象未被标记为删除且哈希值匹配
-            if not emoji.is_deleted and emoji.hash == emoji_hash:
-                return emoji
-        return None  # 如果循环结束还没找到，则返回 None
+        emoji = self.tag_index.get(emoji_hash)
+        # 确保对象未被标记为删除
+        return emoji if emoji and not emoji.is_deleted else None
 
     async def get_emoji_tag_by_hash(self, emoji_hash: str) -> Optional[List[str]]:
         """根据哈希值获取已注册表情包的情感标签列表
@@ -799,6 +805,7 @@ class EmojiManager:
             if success:
                 # 从emoji_objects列表中移除该对象
                 self.emoji_objects = [e for e in self.emoji_objects if e.hash != emoji_hash]
+                self._unindex_emoji(emoji_hash)
                 # 更新计数
                 self.emoji_num -= 1
                 logger.info(f"[统计] 当前表情包数量: {self.emoji_num}")
@@ -826,18 +833,8 @@ class EmojiManager:
         try:
             self._ensure_db()
 
-            # 获取所有表情包对象
-            emoji_objects = self.emoji_objects
-            # 计算每个表情包的选择概率
-            probabilities = [1 / (emoji.usage_count + 1) for emoji in emoji_objects]
-            # 归一化概率，确保总和为1
-            total_probability = sum(probabilities)
-            normalized_probabilities = [p / total_probability for p in probabilities]
-
-            # 使用概率分布选择最多20个表情包
-            selected_emojis = random.choices(
-                emoji_objects, weights=normalized_probabilities, k=min(MAX_EMOJI_FOR_PROMPT, len(emoji_objects))
-            )
+            # 按使用次数的倒数为权重选择最多20个表情包（权重在索引中增量维护）
+            selected_emojis = self.tag_index.sample_by_usage(MAX_EMOJI_FOR_PROMPT)
 
             # 将表情包信息转换为可读的字符串
             emoji_info_list = _emoji_objects_to_readable_list(selected_emojis)
@@ -880,6 +877,7 @@ class EmojiManager:
                         register_success = await new_emoji.register_to_db()
                         if register_success:
                             self.emoji_objects.append(new_emoji)
+                            self._index_emoji(new_emoji)
                             self.emoji_num += 1
                             logger.info(f"[成功] 注册: {new_emoji.filename}")
                             return True
@@ -911,13 +909,10 @@ class EmojiManager:
             Tuple[str, list]: 返回表情包描述和情感列表
         """
         try:
-            # 解码图片并获取格式
-            # 确保base64字符串只包含ASCII字符
-            if isinstance(image_base64, str):
-                image_base64 = image_base64.encode("ascii", errors="ignore").decode("ascii")
-            image_bytes = base64.b64decode(image_base64)
-            image_hash = hashlib.md5(image_bytes).hexdigest()
-            image_format = Image.open(io.BytesIO(image_bytes)).format.lower()  # type: ignore
+            # 解码图片并获取格式（在图片处理进程池中进行）
+            decoded = await image_process_service.decode(image_base64)
+            image_hash = decoded.hash
+            image_format = decoded.format
 
             # 尝试从 EmojiDescriptionCache 表获取已有的详细描述
             existing_description = None
@@ -926,6 +921,17 @@ class EmojiManager:
                 if cache_record and cache_record.description:
                     existing_description = cache_record.description
                     logger.info(f"[复用描述] 表情描述缓存命中: {existing_description[:50]}...")
+                elif decoded.phash:
+                    for similar_hash, distance in image_process_service.emoji_phash_index.search(decoded.phash):
+                        similar_record = EmojiDescriptionCache.get_or_none(
+                            EmojiDescriptionCache.emoji_hash == similar_hash
+                        )
+                        if similar_hash != image_hash and similar_record and similar_record.description:
+                            existing_description = similar_record.description
+                            logger.info(
+                                f"[近似命中] 复用相似表情包的描述 (距离: {distance}): {existing_description[:50]}..."
+                            )
+                            break
             except Exception as e:
                 logger.debug(f"查询表情描述缓存时出错: {e}")
 
@@ -936,7 +942,7 @@ class EmojiManager:
             else:
                 logger.info("[VLM分析] 生成新的详细描述")
                 if image_format in ["gif", "GIF"]:
-                    image_base64 = get_image_manager().transform_gif(image_base64)  # type: ignore
+                    image_base64 = await image_process_service.transform_gif(image_base64)  # type: ignore
                     if not image_base64:
                         raise RuntimeError("GIF表情包转换失败")
                     prompt = "这是一个动态图表情包，每一张图代表了动态图的某一帧，黑色背景代表透明，简短描述一下表情包表达的情感和内容，从互联网梗,meme的角度去分析，精简回答"
@@ -949,20 +955,23 @@ class EmojiManager:
                         prompt, image_base64, image_format, temperature=0.5
                     )
 
-            # 若是新生成的描述，写入缓存表（此时还没有情感标签，稍后会更新）
-            if not existing_description:
-                try:
-                    cache_record, created = EmojiDescriptionCache.get_or_create(
-                        emoji_hash=image_hash,
-                        defaults={"description": description, "timestamp": time.time()},
-                    )
-                    if not created:
-                        # 更新描述，但保留已有的情感标签（如果有）
-                        cache_record.description = description
-                        cache_record.timestamp = time.time()
-                        cache_record.save()
-                except Exception as cache_error:
-                    logger.debug(f"写入表情描述缓存失败: {cache_error}")
+            # 写入缓存表（此时还没有情感标签，稍后会更新），近似命中的描述也以当前哈希保存一份
+            try:
+                cache_record, created = EmojiDescriptionCache.get_or_create(
+                    emoji_hash=image_hash,
+                    defaults={"phash": decoded.phash or None, "description": description, "timestamp": time.time()},
+                )
+                if not created and not existing_description:
+                    # 更新描述，但保留已有的情感标签（如果有）
+                    cache_record.description = description
+                    cache_record.timestamp = time.time()
+                    cache_record.save()
+                if not created and decoded.phash and not cache_record.phash:
+                    cache_record.phash = decoded.phash
+                    cache_record.save()
+                image_process_service.emoji_phash_index.add(image_hash, decoded.phash)
+            except Exception as cache_error:
+                logger.debug(f"写入表情描述缓存失败: {cache_error}")
 
             # 审核表情包
             if global_config.emoji.content_filtration:
@@ -1019,6 +1028,7 @@ class EmojiManager:
                     # 如果缓存不存在，创建新记录（包含描述和情感标签）
                     EmojiDescriptionCache.create(
                         emoji_hash=image_hash,
+                        phash=decoded.phash or None,
                         description=description,
                         emotion_tags=emotion_tags_str,
                         timestamp=time.time(),
@@ -1067,6 +1077,16 @@ class EmojiManager:
                     logger.error(f"[错误] 删除重复文件失败: {str(e)}")
                 return False  # 返回 False 表示未注册新表情
 
+            # 2.1 检查是否为已注册表情包重新压缩/缩放后的副本
+            if new_emoji.phash and (similar_emoji := self.find_similar_emoji(new_emoji.phash)):
+                logger.warning(f"[注册跳过] 与已注册表情包近似 ({similar_emoji.filename}): {filename}")
+                try:
+                    os.remove(file_full_path)
+                    logger.info(f"[清理] 删除近似重复的待注册文件: {filename}")
+                except Exception as e:
+                    logger.error(f"[错误] 删除重复文件失败: {str(e)}")
+                return False
+
             # 3. 构建描述和情感
             try:
                 emoji_base64 = image_path_to_base64(file_full_path)
@@ -1116,6 +1136,7 @@ class EmojiManager:
                 if register_success:
                     # 注册成功后，添加到内存列表
                     self.emoji_objects.append(new_emoji)
+                    self._index_emoji(new_emoji)
                     self.emoji_num += 1
                     logger.info(f"[成功] 注册新表情包: {filename} (当前: {self.emoji_num}/{self.emoji_num_max})")
                     return True
@@ -25,10 +25,8 @@ from src.person_info.person_info import Person
 from src.plugin_system.base.component_types import EventType, ActionInfo
 from src.plugin_system.core import events_manager
 from src.plugin_system.apis import generator_api, send_api, message_api, database_api
-from src.chat.utils.chat_message_builder import (
-    build_readable_messages_with_id,
-    get_raw_msg_before_timestamp_with_chat,
-)
+from src.chat.utils.message_window import MessageWindow
+from src.chat.utils.image_description_queue import image_description_queue
 from src.chat.utils.utils import record_replyer_action_temp
 from src.memory_system.chat_history_summarizer import ChatHistorySummarizer
 
@@ -297,6 +295,9 @@ class HeartFChatting:
             recent_messages_list = []
         _reply_text = ""  # 初始化reply_text变量，避免UnboundLocalError
 
+        # 即将为这个聊天思考/回复，优先识别其中还在排队的图片
+        image_description_queue.prioritize_chat(self.stream_id)
+
         # -------------------------------------------------------------------------
         # ReflectTracker Check
         # 在每次回复前检查一次上下文，看是否有反思问题得到了解答
@@ -328,10 +329,13 @@ class HeartFChatting:
                 f"{self.log_prefix} 开始第{self._cycle_counter}次思考(频率: {global_config.chat.get_talk_value(self.stream_id)})"
             )
 
+            # 本次循环共享的消息窗口：只查询一次，动作修改、规划器和回复器按需切片
+            message_window = MessageWindow(chat_id=self.stream_id)
+
             # 第一步：动作检查
             available_actions: Dict[str, ActionInfo] = {}
             try:
-                await self.action_modifier.modify_actions()
+                await self.action_modifier.modify_actions(message_window=message_window)
                 available_actions = self.action_manager.get_using_actions()
             except Exception as e:
                 logger.error(f"{self.log_prefix} 动作修改失败: {e}")
@@ -339,14 +343,8 @@ class HeartFChatting:
             # 执行planner
             is_group_chat, chat_target_info, _ = self.action_planner.get_necessary_info()
 
-            message_list_before_now = get_raw_msg_before_timestamp_with_chat(
-                chat_id=self.stream_id,
-                timestamp=time.time(),
-                limit=int(global_config.chat.max_context_size * 0.6),
-                filter_intercept_message_level=1,
-            )
-            chat_content_block, message_id_list = build_readable_messages_with_id(
-                messages=message_list_before_now,
+            chat_content_block, message_id_list = message_window.build_readable_with_id(
+                int(global_config.chat.max_context_size * 0.6),
                 timestamp_mode="normal_no_YMD",
                 read_mark=self.action_planner.last_obs_time_mark,
                 truncate=True,
@@ -373,6 +371,7 @@ class HeartFChatting:
                     loop_start_time=self.last_read_time,
                     available_actions=available_actions,
                     force_reply_message=force_reply_message,
+                    message_window=message_window,
                 )
 
             logger.info(
@@ -382,7 +381,9 @@ class HeartFChatting:
             # 3. 并行执行所有动作
             action_tasks = [
                 asyncio.create_task(
-                    self._execute_action(action, action_to_use_info, thinking_id, available_actions, cycle_timers)
+                    self._execute_action(
+                        action, action_to_use_info, thinking_id, available_actions, cycle_timers, message_window
+                    )
                 )
                 for action in action_to_use_info
             ]
@@ -585,6 +586,7 @@ class HeartFChatting:
         thinking_id: str,
         available_actions: Dict[str, ActionInfo],
         cycle_timers: Dict[str, float],
+        message_window: Optional[MessageWindow] = None,
     ):
         """执行单个动作的通用函数"""
         try:
@@ -691,6 +693,7 @@ class HeartFChatting:
                         from_plugin=False,
                         reply_time_point=action_planner_info.action_data.get("loop_start_time", time.time()),
                         think_level=think_level,
+                        message_window=message_window,
                     )
 
                     if not success or not llm_response or not llm_response.reply_set:
@@ -11,6 +11,7 @@ from src.chat.utils.chat_message_builder import replace_user_references
 from src.common.logger import get_logger
 from src.person_info.person_info import Person
 from src.common.database.database_model import Images
+from src.chat.utils.image_description_queue import PENDING_DESCRIPTION
 
 if TYPE_CHECKING:
     pass
@@ -74,6 +75,9 @@ class HeartFCMessageReceiver:
                     if image and image.description:
                         # 将[picid:xxxx]替换成图片描述
                         processed_text = processed_text.replace(f"[picid:{picid}]", f"[图片：{image.description}]")
+                    elif image:
+                        # 图片已登记，描述还在后台识别中
+                        processed_text = processed_text.replace(f"[picid:{picid}]", f"[图片：{PENDING_DESCRIPTION}]")
                     else:
                         # 如果没有找到图片描述，则移除[picid:xxxx]标记
                         processed_text = processed_text.replace(f"[picid:{picid}]", "[图片：网络不好，图片无法加载]")
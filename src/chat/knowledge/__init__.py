@@ -1,9 +1,10 @@
-from src.chat.knowledge.embedding_store import EmbeddingManager
-from src.chat.knowledge.qa_manager import QAManager
-from src.chat.knowledge.kg_manager import KGManager
+import asyncio
+import os
+import threading
+from typing import Optional
+
 from src.chat.knowledge.global_logger import logger
 from src.config.config import global_config
-import os
 
 INVALID_ENTITY = [
     "",
@@ -30,14 +31,78 @@ DATA_PATH = os.path.join(ROOT_PATH, "data")
 qa_manager = None
 inspire_manager = None
 
+# Embedding库与KG依赖faiss/pandas且加载耗时，改为首次查询时（或启动后的后台预热中）在线程里加载
+_load_lock = threading.Lock()
+_loaded = False
+# 加载失败后记录异常，之后的查询不再反复在线程中重新加载（可调用 lpmm_start_up 重试）
+_load_error: Optional[BaseException] = None
+# 后台预热任务，保留强引用避免任务被回收
+_warmup_task: Optional[asyncio.Task] = None
+
 
 def get_qa_manager():
+    """获取已加载的问答管理器，知识库尚未加载时返回None；查询时请使用 ensure_qa_manager"""
+    return qa_manager
+
+
+async def ensure_qa_manager():
+    """获取问答管理器，知识库尚未加载时在线程中加载（并发调用只加载一次；加载失败后返回None，不再重试）"""
+    if not _loaded and _load_error is None and global_config.lpmm_knowledge.enable:
+        await asyncio.to_thread(_load_once)
     return qa_manager
 
 
-def lpmm_start_up():  # sourcery skip: extract-duplicate-method
+def _load_once():
+    global _loaded, _load_error
+    with _load_lock:
+        if _loaded or _load_error is not None:
+            return
+        try:
+            _load_lpmm()
+        except Exception as e:
+            _load_error = e
+            raise
+        _loaded = True
+
+
+def start_lpmm_warmup():
+    """在后台预热LPMM知识库，不阻塞启动；首次查询会等待预热完成"""
+    global _warmup_task
+    if not global_config.lpmm_knowledge.enable or _loaded or _warmup_task is not None:
+        return _warmup_task
+    logger.info("LPMM知识库将在后台加载")
+    _warmup_task = asyncio.create_task(ensure_qa_manager())
+    _warmup_task.add_done_callback(_on_warmup_done)
+    return _warmup_task
+
+
+def _on_warmup_done(task: asyncio.Task) -> None:
+    if task.cancelled():
+        return
+    if (error := task.exception()) is not None:
+        logger.error(f"LPMM知识库后台加载失败，之后的查询将跳过知识库：{error!r}")
+
+
+def lpmm_start_up():
+    """同步加载LPMM知识库，重复调用会从文件重新加载"""
+    global _loaded, _load_error
+    with _load_lock:
+        try:
+            _load_lpmm()
+        except Exception as e:
+            _load_error = e
+            raise
+        _loaded = True
+        _load_error = None
+
+
+def _load_lpmm():  # sourcery skip: extract-duplicate-method
     # 检查LPMM知识库是否启用
     if global_config.lpmm_knowledge.enable:
+        from src.chat.knowledge.embedding_store import EmbeddingManager
+        from src.chat.knowledge.kg_manager import KGManager
+        from src.chat.knowledge.qa_manager import QAManager
+
         logger.info("正在初始化Mai-LPMM")
         logger.info("创建LLM客户端")
 
@@ -4,7 +4,7 @@ import os
 import math
 import asyncio
 from concurrent.futures import ThreadPoolExecutor, as_completed
-from typing import Dict, List, Tuple
+from typing import Dict, List, Set, Tuple
 
 import numpy as np
 import pandas as pd
@@ -63,6 +63,11 @@ EMBEDDING_TEST_STRINGS = [
 EMBEDDING_TEST_FILE = os.path.join(ROOT_PATH, "data", "embedding_model_test.json")
 EMBEDDING_SIM_THRESHOLD = 0.99
 
+# 近似检索（HNSW）索引参数
+ANN_HNSW_M = 32  # 每个节点的邻居数
+ANN_HNSW_EF_CONSTRUCTION = 80  # 建图时的搜索宽度
+ANN_HNSW_EF_SEARCH = 128  # 查询时的搜索宽度，越大越接近精确检索
+
 
 def cosine_similarity(a, b):
     # 计算余弦相似度
@@ -388,40 +393,52 @@ class EmbeddingStore:
                 progress.update(task, advance=already_processed)
 
             if new_strs:
-                # 使用实例配置的参数，智能调整分块和线程数
-                optimal_chunk_size = max(
-                    MIN_CHUNK_SIZE,
-                    min(
-                        self.chunk_size, len(new_strs) // self.max_workers if self.max_workers > 0 else self.chunk_size
-                    ),
-                )
-                optimal_max_workers = min(
-                    self.max_workers,
-                    max(MIN_WORKERS, len(new_strs) // optimal_chunk_size if optimal_chunk_size > 0 else 1),
-                )
-
-                logger.debug(f"使用多线程处理: chunk_size={optimal_chunk_size}, max_workers={optimal_max_workers}")
-
                 # 定义进度更新回调函数
                 def update_progress(count):
                     progress.update(task, advance=count)
 
                 # 批量获取嵌入，并实时更新进度
-                embedding_results = self._get_embeddings_batch_threaded(
-                    new_strs,
-                    chunk_size=optimal_chunk_size,
-                    max_workers=optimal_max_workers,
-                    progress_callback=update_progress,
-                )
+                embedding_results = self.embed_strs(new_strs, progress_callback=update_progress)
 
                 # 存入结果（不再需要在这里更新进度，因为已经在回调中更新了）
-                for s, embedding in embedding_results:
-                    item_hash = self.namespace + "-" + get_sha256(s)
-                    if embedding:  # 只有成功获取到嵌入才存入
-                        self.store[item_hash] = EmbeddingStoreItem(item_hash, embedding, s)
-                        self.dirty = True
-                    else:
-                        logger.warning(f"跳过存储失败的嵌入: {s[:50]}...")
+                self.insert_embeddings(embedding_results)
+
+    def embed_strs(self, strs: List[str], progress_callback=None) -> List[Tuple[str, List[float]]]:
+        """多线程获取一批字符串的嵌入，不写入库
+
+        Returns:
+            (原始字符串, 嵌入向量)列表，获取失败的向量为空列表
+        """
+        if not strs:
+            return []
+        # 使用实例配置的参数，智能调整分块和线程数
+        optimal_chunk_size = max(
+            MIN_CHUNK_SIZE,
+            min(self.chunk_size, len(strs) // self.max_workers if self.max_workers > 0 else self.chunk_size),
+        )
+        optimal_max_workers = min(
+            self.max_workers,
+            max(MIN_WORKERS, len(strs) // optimal_chunk_size if optimal_chunk_size > 0 else 1),
+        )
+
+        logger.debug(f"使用多线程处理: chunk_size={optimal_chunk_size}, max_workers={optimal_max_workers}")
+
+        return self._get_embeddings_batch_threaded(
+            strs,
+            chunk_size=optimal_chunk_size,
+            max_workers=optimal_max_workers,
+            progress_callback=progress_callback,
+        )
+
+    def insert_embeddings(self, embedding_results: List[Tuple[str, List[float]]]) -> None:
+        """将embed_strs的结果存入库，跳过获取失败的嵌入"""
+        for s, embedding in embedding_results:
+            item_hash = self.namespace + "-" + get_sha256(s)
+            if embedding:  # 只有成功获取到嵌入才存入
+                self.store[item_hash] = EmbeddingStoreItem(item_hash, embedding, s)
+                self.dirty = True
+            else:
+                logger.warning(f"跳过存储失败的嵌入: {s[:50]}...")
 
     def save_to_file(self) -> None:
         """保存到文件"""
@@ -526,6 +543,35 @@ class EmbeddingStore:
         self.faiss_index.add(embeddings)
         self.dirty = False
 
+    def update_faiss_index(self) -> None:
+        """增量更新Faiss索引：只把建索引之后新加入库的向量追加到索引中
+
+        新项总是追加在store末尾，因此索引中的前ntotal项与store的前ntotal个键一一对应；
+        对应关系不成立（如删除过数据）时退回完整重建。
+        """
+        if self.faiss_index is None or self.idx2hash is None:
+            self.build_faiss_index()
+            return
+        ntotal = self.faiss_index.ntotal
+        keys = list(self.store)
+        if (
+            ntotal != len(self.idx2hash)
+            or ntotal > len(keys)
+            or (ntotal and keys[ntotal - 1] != self.idx2hash.get(str(ntotal - 1)))
+        ):
+            self.build_faiss_index()
+            return
+
+        new_keys = keys[ntotal:]
+        if new_keys:
+            embeddings = np.array([self.store[key].embedding for key in new_keys], dtype=np.float32)
+            # L2归一化
+            faiss.normalize_L2(embeddings)
+            self.faiss_index.add(embeddings)
+            for offset, key in enumerate(new_keys):
+                self.idx2hash[str(ntotal + offset)] = key
+        self.dirty = False
+
     def delete_items(self, hashes: List[str]) -> Tuple[int, int]:
         """删除指定键的嵌入并重建 idx2hash（不直接重建 faiss）
 
@@ -583,6 +629,62 @@ class EmbeddingStore:
 
         return result
 
+    def build_ann_index(self):
+        """基于当前Faiss索引的向量构建HNSW近似索引（内积度量），向量顺序与idx2hash一致
+
+        用于大批量检索（如同义连接），不会替换或持久化原有的精确索引。
+        Returns:
+            HNSW索引；精确索引尚未构建时返回None
+        """
+        if self.faiss_index is None or self.faiss_index.ntotal == 0:
+            return None
+        # 精确索引中的向量已经归一化，直接复用
+        embeddings = self.faiss_index.reconstruct_n(0, self.faiss_index.ntotal)
+        ann_index = faiss.IndexHNSWFlat(embeddings.shape[1], ANN_HNSW_M, faiss.METRIC_INNER_PRODUCT)
+        ann_index.hnsw.efConstruction = ANN_HNSW_EF_CONSTRUCTION
+        ann_index.hnsw.efSearch = ANN_HNSW_EF_SEARCH
+        ann_index.add(embeddings)
+        return ann_index
+
+    def extend_ann_index(self, ann_index) -> None:
+        """把精确索引中新追加的向量（update_faiss_index 增量加入的部分）补充到已有的HNSW近似索引中
+
+        仅适用于基于同一个精确索引对象构建的近似索引；精确索引重建过（对象已替换）时应重新调用 build_ann_index。
+        """
+        if self.faiss_index is None or ann_index.ntotal >= self.faiss_index.ntotal:
+            return
+        start = ann_index.ntotal
+        ann_index.add(self.faiss_index.reconstruct_n(start, self.faiss_index.ntotal - start))
+
+    def search_top_k_batch(self, queries: np.ndarray, k: int, index=None) -> List[List[Tuple[str, float]]]:
+        """一次检索多个查询向量，以余弦相似度为度量
+        Args:
+            queries: 查询向量矩阵，形状为 (查询数, 维度)
+            k: 每个查询返回的最相似的k个项
+            index: 使用的Faiss索引，默认为精确索引（可传入build_ann_index的结果）
+        Returns:
+            result: 与queries逐行对应的 (hash, 余弦相似度) 列表
+        """
+        index = index if index is not None else self.faiss_index
+        if index is None or self.idx2hash is None:
+            logger.debug("FaissIndex尚未构建,返回空结果")
+            return [[] for _ in range(len(queries))]
+
+        queries = np.array(queries, dtype=np.float32)
+        # L2归一化（原地）
+        faiss.normalize_L2(queries)
+        distances, indices = index.search(queries, k)
+
+        total = len(self.idx2hash)
+        return [
+            [
+                (self.idx2hash[str(int(idx))], float(sim))
+                for idx, sim in zip(row_indices, row_distances, strict=False)
+                if 0 <= idx < total
+            ]
+            for row_indices, row_distances in zip(indices, distances, strict=False)
+        ]
+
 
 class EmbeddingManager:
     def __init__(self, max_workers: int | None = None, chunk_size: int | None = None):
@@ -661,6 +763,64 @@ class EmbeddingManager:
         self._store_rel_into_embedding(triple_list_data)
         self.stored_pg_hashes.update(raw_paragraphs.keys())
 
+    def embed_data_set(
+        self,
+        raw_paragraphs: Dict[str, str],
+        triple_list_data: Dict[str, List[List[str]]],
+        embedded_keys: Set[str],
+    ) -> List[Tuple[EmbeddingStore, List[Tuple[str, List[float]]]]]:
+        """获取数据集中新段落/实体/关系的嵌入，不写入嵌入库（流式导入的嵌入阶段）
+
+        只读访问嵌入库，可以与写入嵌入库的线程并行执行。
+
+        Args:
+            raw_paragraphs: 段落hash -> 段落原文
+            triple_list_data: 段落hash -> 三元组列表
+            embedded_keys: 本次导入中已经获取过嵌入的键，成功获取的新键会加入其中，避免相邻批次重复请求
+
+        Returns:
+            [(嵌入库, embed_strs的结果), ...]，交给store_embedded_data_set写入
+        """
+        entities = set()
+        relations = set()
+        for triple_list in triple_list_data.values():
+            for triple in triple_list:
+                entities.add(triple[0])
+                entities.add(triple[2])
+                relations.add(str(tuple(triple)))
+
+        embedded = []
+        for store, strs in (
+            (self.paragraphs_embedding_store, list(raw_paragraphs.values())),
+            (self.entities_embedding_store, list(entities)),
+            (self.relation_embedding_store, list(relations)),
+        ):
+            new_strs = []
+            for s in strs:
+                item_hash = store.namespace + "-" + get_sha256(s)
+                if item_hash not in store.store and item_hash not in embedded_keys:
+                    new_strs.append(s)
+            results = store.embed_strs(new_strs)
+            embedded_keys.update(store.namespace + "-" + get_sha256(s) for s, embedding in results if embedding)
+            embedded.append((store, results))
+        return embedded
+
+    def store_embedded_data_set(
+        self,
+        raw_paragraphs: Dict[str, str],
+        embedded: List[Tuple[EmbeddingStore, List[Tuple[str, List[float]]]]],
+    ) -> None:
+        """将embed_data_set的结果写入嵌入库"""
+        for store, results in embedded:
+            store.insert_embeddings(results)
+        self.stored_pg_hashes.update(raw_paragraphs.keys())
+
+    def update_faiss_index(self):
+        """增量更新所有嵌入库的Faiss索引"""
+        self.paragraphs_embedding_store.update_faiss_index()
+        self.entities_embedding_store.update_faiss_index()
+        self.relation_embedding_store.update_faiss_index()
+
     def save_to_file(self):
         """保存到文件"""
         self.paragraphs_embedding_store.save_to_file()
@@ -1,7 +1,7 @@
 import asyncio
 import json
 import time
-from typing import List, Union
+from typing import List, Optional, Union
 
 from .global_logger import logger
 from . import prompt_template
@@ -46,24 +46,8 @@ def _extract_json_from_text(text: str):
         return []
 
 
-def _entity_extract(llm_req: LLMRequest, paragraph: str) -> List[str]:
-    # sourcery skip: reintroduce-else, swap-if-else-branches, use-named-expression
-    """对段落进行实体提取，返回提取出的实体列表（JSON格式）"""
-    entity_extract_context = prompt_template.build_entity_extract_context(paragraph)
-
-    # 使用 asyncio.run 来运行异步方法
-    try:
-        # 如果当前已有事件循环在运行，使用它
-        loop = asyncio.get_running_loop()
-        future = asyncio.run_coroutine_threadsafe(llm_req.generate_response_async(entity_extract_context), loop)
-        response, _ = future.result()
-    except RuntimeError:
-        # 如果没有运行中的事件循环，直接使用 asyncio.run
-        response, _ = asyncio.run(llm_req.generate_response_async(entity_extract_context))
-
-    # 添加调试日志
-    logger.debug(f"LLM返回的原始响应: {response}")
-
+def parse_entity_response(response: str) -> List[str]:
+    """解析实体提取的LLM响应，返回过滤后的实体列表；格式错误或结果为空时抛出ValueError"""
     entity_extract_result = _extract_json_from_text(response)
 
     # 检查返回的是否为有效的实体列表
@@ -79,6 +63,10 @@ def _entity_extract(llm_req: LLMRequest, paragraph: str) -> List[str]:
         else:
             # 如果找不到合适的列表，抛出异常
             raise ValueError(f"实体提取结果格式错误，期望列表但得到: {type(entity_extract_result)}")
+    return _validate_entities(entity_extract_result)
+
+
+def _validate_entities(entity_extract_result: list) -> List[str]:
     # 过滤无效实体
     entity_extract_result = [
         entity
@@ -92,25 +80,8 @@ def _entity_extract(llm_req: LLMRequest, paragraph: str) -> List[str]:
     return entity_extract_result
 
 
-def _rdf_triple_extract(llm_req: LLMRequest, paragraph: str, entities: list) -> List[List[str]]:
-    """对段落进行实体提取，返回提取出的实体列表（JSON格式）"""
-    rdf_extract_context = prompt_template.build_rdf_triple_extract_context(
-        paragraph, entities=json.dumps(entities, ensure_ascii=False)
-    )
-
-    # 使用 asyncio.run 来运行异步方法
-    try:
-        # 如果当前已有事件循环在运行，使用它
-        loop = asyncio.get_running_loop()
-        future = asyncio.run_coroutine_threadsafe(llm_req.generate_response_async(rdf_extract_context), loop)
-        response, _ = future.result()
-    except RuntimeError:
-        # 如果没有运行中的事件循环，直接使用 asyncio.run
-        response, _ = asyncio.run(llm_req.generate_response_async(rdf_extract_context))
-
-    # 添加调试日志
-    logger.debug(f"RDF LLM返回的原始响应: {response}")
-
+def parse_rdf_response(response: str) -> List[List[str]]:
+    """解析RDF三元组提取的LLM响应；格式错误时抛出ValueError"""
     rdf_triple_result = _extract_json_from_text(response)
 
     # 检查返回的是否为有效的三元组列表
@@ -126,6 +97,10 @@ def _rdf_triple_extract(llm_req: LLMRequest, paragraph: str, entities: list) ->
         else:
             # 如果找不到合适的列表，抛出异常
             raise ValueError(f"RDF三元组提取结果格式错误，期望列表但得到: {type(rdf_triple_result)}")
+    return _validate_triples(rdf_triple_result)
+
+
+def _validate_triples(rdf_triple_result: list) -> List[List[str]]:
     # 验证三元组格式
     for triple in rdf_triple_result:
         if (
@@ -139,6 +114,78 @@ def _rdf_triple_extract(llm_req: LLMRequest, paragraph: str, entities: list) ->
     return rdf_triple_result
 
 
+def parse_packed_response(response: str, count: int, kind: str) -> List[Optional[list]]:
+    """解析多段落合并提示的响应（{"1": 结果, "2": 结果, ...}）
+
+    Args:
+        response: LLM响应
+        count: 合并的段落数
+        kind: "entity" 或 "rdf"
+
+    Returns:
+        与段落一一对应的结果列表，缺失或格式错误的段落为None（由调用方单独重试）
+    """
+    parsed = _extract_json_from_text(response)
+    if isinstance(parsed, list) and len(parsed) == count:
+        # 部分模型会直接输出按顺序排列的列表
+        parsed = {str(i + 1): item for i, item in enumerate(parsed)}
+    if not isinstance(parsed, dict):
+        return [None] * count
+
+    validate = _validate_entities if kind == "entity" else _validate_triples
+    results: List[Optional[list]] = []
+    for i in range(count):
+        item = parsed.get(str(i + 1))
+        try:
+            results.append(validate(item) if isinstance(item, list) else None)
+        except ValueError:
+            results.append(None)
+    return results
+
+
+def _entity_extract(llm_req: LLMRequest, paragraph: str) -> List[str]:
+    # sourcery skip: reintroduce-else, swap-if-else-branches, use-named-expression
+    """对段落进行实体提取，返回提取出的实体列表（JSON格式）"""
+    entity_extract_context = prompt_template.build_entity_extract_context(paragraph)
+
+    # 使用 asyncio.run 来运行异步方法
+    try:
+        # 如果当前已有事件循环在运行，使用它
+        loop = asyncio.get_running_loop()
+        future = asyncio.run_coroutine_threadsafe(llm_req.generate_response_async(entity_extract_context), loop)
+        response, _ = future.result()
+    except RuntimeError:
+        # 如果没有运行中的事件循环，直接使用 asyncio.run
+        response, _ = asyncio.run(llm_req.generate_response_async(entity_extract_context))
+
+    # 添加调试日志
+    logger.debug(f"LLM返回的原始响应: {response}")
+
+    return parse_entity_response(response)
+
+
+def _rdf_triple_extract(llm_req: LLMRequest, paragraph: str, entities: list) -> List[List[str]]:
+    """对段落进行实体提取，返回提取出的实体列表（JSON格式）"""
+    rdf_extract_context = prompt_template.build_rdf_triple_extract_context(
+        paragraph, entities=json.dumps(entities, ensure_ascii=False)
+    )
+
+    # 使用 asyncio.run 来运行异步方法
+    try:
+        # 如果当前已有事件循环在运行，使用它
+        loop = asyncio.get_running_loop()
+        future = asyncio.run_coroutine_threadsafe(llm_req.generate_response_async(rdf_extract_context), loop)
+        response, _ = future.result()
+    except RuntimeError:
+        # 如果没有运行中的事件循环，直接使用 asyncio.run
+        response, _ = asyncio.run(llm_req.generate_response_async(rdf_extract_context))
+
+    # 添加调试日志
+    logger.debug(f"RDF LLM返回的原始响应: {response}")
+
+    return parse_rdf_response(response)
+
+
 def info_extract_from_str(
     llm_client_for_ner: LLMRequest, llm_client_for_rdf: LLMRequest, paragraph: str
 ) -> Union[tuple[None, None], tuple[list[str], list[list[str]]]]:
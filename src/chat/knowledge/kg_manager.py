@@ -1,7 +1,9 @@
 import json
 import os
 import time
-from typing import Dict, List, Tuple, Set
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Set
 import xml.etree.ElementTree as ET
 
 import numpy as np
@@ -26,6 +28,20 @@ from src.config.config import global_config
 from .global_logger import logger
 
 
+@dataclass
+class _IncrementalBuildState:
+    """incremental_build 期间在多次 build_kg 之间保持的状态"""
+
+    nodes: Set[str]
+    """图中已有的节点"""
+    edges: Set[Tuple[str, str]]
+    """图中已有的边"""
+    ann_index: Any = None
+    """同义连接使用的HNSW近似索引"""
+    ann_source: Any = None
+    """构建 ann_index 时实体库的精确索引对象，精确索引被替换（重建）后需要重新构建近似索引"""
+
+
 def _get_kg_dir():
     """
     安全地获取KG数据目录路径
@@ -52,6 +68,8 @@ class KGManager:
         self.ent_appear_cnt = {}
         # KG
         self.graph = di_graph.DiGraph()
+        # incremental_build 期间的节点/边集合与近似索引
+        self._incremental: Optional[_IncrementalBuildState] = None
 
         # 持久化相关 - 使用延迟初始化的路径
         self.dir_path = get_kg_dir_str()
@@ -157,31 +175,79 @@ class KGManager:
                 pg_hash_key = "paragraph" + "-" + str(idx)
                 node_to_node[(ent_hash_key, pg_hash_key)] = node_to_node.get((ent_hash_key, pg_hash_key), 0) + 1.0
 
-    @staticmethod
+    @contextmanager
+    def incremental_build(self) -> Iterator[None]:
+        """连续多次调用 build_kg（如流式导入的每一批）时使用
+
+        期间图中已有的节点/边集合只在开始时读取一次，同义连接的HNSW近似索引也只构建一次，
+        之后每批只把新增的节点、边和实体向量增量加入，每批耗时与本批规模相关而不是与整个图的规模相关。
+        期间不应通过 build_kg 以外的方式修改图。
+        """
+        self._incremental = _IncrementalBuildState(
+            nodes=set(self.graph.get_node_list()),
+            edges={(edge[0], edge[1]) for edge in self.graph.get_edge_list()},
+        )
+        try:
+            yield
+        finally:
+            self._incremental = None
+
+    def _get_synonym_ann_index(self, entities_store) -> Any:
+        """获取同义连接使用的HNSW近似索引；incremental_build 期间复用并增量更新"""
+        state = self._incremental
+        if state is not None and state.ann_index is not None and state.ann_source is entities_store.faiss_index:
+            entities_store.extend_ann_index(state.ann_index)
+            return state.ann_index
+
+        ann_start = time.perf_counter()
+        ann_index = entities_store.build_ann_index()
+        logger.info(
+            f"实体库共 {entities_store.faiss_index.ntotal} 个实体，同义连接使用HNSW近似索引"
+            f"（构建耗时 {time.perf_counter() - ann_start:.2f}s）"
+        )
+        if state is not None:
+            state.ann_index = ann_index
+            state.ann_source = entities_store.faiss_index
+        return ann_index
+
     def _synonym_connect(
+        self,
         node_to_node: Dict[Tuple[str, str], float],
         triple_list_data: Dict[str, List[List[str]]],
         embedding_manager: EmbeddingManager,
     ) -> int:
-        """同义词连接"""
+        """同义词连接
+
+        新实体的向量按块组成矩阵，每块只做一次多查询Faiss检索；块大小（max_synonym_entities）限制了
+        查询矩阵与结果矩阵的内存占用。实体库规模达到 synonym_ann_min_entities 时改用HNSW近似索引。
+        """
         new_edge_cnt = 0
+        entities_store = embedding_manager.entities_embedding_store
         # 获取所有实体节点的hash值
         ent_hash_list = set()
         for triple_list in triple_list_data.values():
             for triple in triple_list:
                 ent_hash_list.add("entity" + "-" + get_sha256(triple[0]))
                 ent_hash_list.add("entity" + "-" + get_sha256(triple[2]))
-        ent_hash_list = list(ent_hash_list)
-        # 性能保护：限制同义连接的实体数量
-        max_synonym_entities = global_config.lpmm_knowledge.max_synonym_entities
-        if max_synonym_entities and len(ent_hash_list) > max_synonym_entities:
-            logger.warning(
-                f"同义连接实体数 {len(ent_hash_list)} 超过阈值 {max_synonym_entities}，跳过同义边构建以保护性能"
-            )
+        ent_hash_list = [ent_hash for ent_hash in ent_hash_list if ent_hash in entities_store.store]
+        if not ent_hash_list:
             return 0
+        if entities_store.faiss_index is None:
+            logger.warning("实体嵌入库的FaissIndex尚未构建，跳过同义边构建")
+            return 0
+
+        lpmm_config = global_config.lpmm_knowledge
+        top_k = lpmm_config.rag_synonym_search_top_k
+        threshold = lpmm_config.rag_synonym_threshold
+        chunk_size = lpmm_config.max_synonym_entities or 2000
+
+        search_index = None
+        ann_min_entities = lpmm_config.synonym_ann_min_entities
+        if ann_min_entities and entities_store.faiss_index.ntotal >= ann_min_entities:
+            search_index = self._get_synonym_ann_index(entities_store)
 
         synonym_hash_set = set()
-        synonym_result = {}
+        start_time = time.perf_counter()
 
         # rich 进度条
         total = len(ent_hash_list)
@@ -198,72 +264,78 @@ class KGManager:
             transient=False,
         ) as progress:
             task = progress.add_task("同义词连接", total=total)
-            for ent_hash in ent_hash_list:
-                if ent_hash in synonym_hash_set:
-                    progress.update(task, advance=1)
-                    continue
-                ent = embedding_manager.entities_embedding_store.store.get(ent_hash)
-                if ent is None:
-                    progress.update(task, advance=1)
-                    continue
-                assert isinstance(ent, EmbeddingStoreItem)
-                # 查询相似实体
-                similar_ents = embedding_manager.entities_embedding_store.search_top_k(
-                    ent.embedding, global_config.lpmm_knowledge.rag_synonym_search_top_k
-                )
-                res_ent = []  # Debug
-                for res_ent_hash, similarity in similar_ents:
-                    if res_ent_hash == ent_hash:
-                        # 避免自连接
-                        continue
-                    if similarity < global_config.lpmm_knowledge.rag_synonym_threshold:
-                        # 相似度阈值
-                        continue
-                    node_to_node[(res_ent_hash, ent_hash)] = similarity
-                    node_to_node[(ent_hash, res_ent_hash)] = similarity
-                    synonym_hash_set.add(res_ent_hash)
-                    new_edge_cnt += 1
-                    res_ent.append(
-                        (
-                            embedding_manager.entities_embedding_store.store[res_ent_hash].str,
-                            similarity,
-                        )
-                    )  # Debug
-                    synonym_result[ent.str] = res_ent
-                progress.update(task, advance=1)
-
-        for k, v in synonym_result.items():
-            print(f'"{k}"的相似实体为：{v}')
+            for chunk_start in range(0, total, chunk_size):
+                chunk = ent_hash_list[chunk_start : chunk_start + chunk_size]
+                # 已作为其他实体的同义词连接过的实体无需再查询
+                query_hashes = [ent_hash for ent_hash in chunk if ent_hash not in synonym_hash_set]
+                if query_hashes:
+                    query_matrix = np.array(
+                        [entities_store.store[ent_hash].embedding for ent_hash in query_hashes], dtype=np.float32
+                    )
+                    results = entities_store.search_top_k_batch(query_matrix, top_k, index=search_index)
+                    for ent_hash, similar_ents in zip(query_hashes, results, strict=True):
+                        # 与逐个查询时一致：本块中先处理的实体已把它连为同义词时跳过
+                        if ent_hash in synonym_hash_set:
+                            continue
+                        for res_ent_hash, similarity in similar_ents:
+                            if res_ent_hash == ent_hash:
+                                # 避免自连接
+                                continue
+                            if similarity < threshold:
+                                # 相似度阈值
+                                continue
+                            node_to_node[(res_ent_hash, ent_hash)] = similarity
+                            node_to_node[(ent_hash, res_ent_hash)] = similarity
+                            synonym_hash_set.add(res_ent_hash)
+                            new_edge_cnt += 1
+                            logger.debug(
+                                f'"{entities_store.store[ent_hash].str}"的相似实体：'
+                                f"{entities_store.store[res_ent_hash].str}（{similarity:.3f}）"
+                            )
+                progress.update(task, advance=len(chunk))
+
+        elapsed = time.perf_counter() - start_time
+        logger.info(
+            f"同义连接完成：{total} 个实体，新增 {new_edge_cnt} 条同义边，耗时 {elapsed:.2f}s"
+            f"（{total / max(elapsed, 1e-9):.0f} 实体/秒）"
+        )
         return new_edge_cnt
 
-    def _update_graph(
+    def merge_edges(
         self,
-        node_to_node: Dict[Tuple[str, str], float],
-        embedding_manager: EmbeddingManager,
-    ):
-        """更新KG图结构
+        edges: Dict[Tuple[str, str], float],
+        now_time: float | None = None,
+    ) -> Tuple[int, int, Set[str]]:
+        """批量合并边：新边插入，已存在的边累加权重
 
-        流程：
-        1. 更新图结构：遍历所有待添加的新边
-            - 若是新边，则添加到图中
-            - 若是已存在的边，则更新边的权重
-        2. 更新新节点的属性
-        """
-        existed_nodes = self.graph.get_node_list()
-        existed_edges = [str((edge[0], edge[1])) for edge in self.graph.get_edge_list()]
+        已有边与节点只在开始时各读取一次并放入哈希集合，之后每条待合并边的判断都是 O(1)，
+        整体耗时与 (图规模 + 待合并边数) 成线性关系；incremental_build 期间复用其中的集合，只与待合并边数相关。
 
-        now_time = time.time()
+        Args:
+            edges: (源节点, 目标节点) -> 权重增量
+            now_time: 创建/更新时间，默认当前时间
 
-        # 更新图结构
-        for src_tgt, weight in node_to_node.items():
-            key = str(src_tgt)
-            # 检查边是否已存在
-            if key not in existed_edges:
-                # 新边
+        Returns:
+            (新增边数, 更新边数, 新出现的节点集合)
+        """
+        now_time = time.time() if now_time is None else now_time
+        if self._incremental is not None:
+            existed_nodes = self._incremental.nodes
+            existed_edges = self._incremental.edges
+        else:
+            existed_nodes = set(self.graph.get_node_list())
+            existed_edges = {(edge[0], edge[1]) for edge in self.graph.get_edge_list()}
+
+        new_edge_cnt = 0
+        updated_edge_cnt = 0
+        new_nodes: Set[str] = set()
+        for (src, tgt), weight in edges.items():
+            if (src, tgt) not in existed_edges:
+                # 新边（quick_algo 只提供逐条插入的接口）
                 self.graph.add_edge(
                     di_graph.DiEdge(
-                        src_tgt[0],
-                        src_tgt[1],
+                        src,
+                        tgt,
                         {
                             "weight": weight,
                             "create_time": now_time,
@@ -271,42 +343,69 @@ class KGManager:
                         },
                     )
                 )
+                existed_edges.add((src, tgt))
+                new_edge_cnt += 1
             else:
                 # 已存在的边
-                edge_item = self.graph[src_tgt[0], src_tgt[1]]
+                edge_item = self.graph[src, tgt]
                 edge_item["weight"] += weight
                 edge_item["update_time"] = now_time
                 self.graph.update_edge(edge_item)
+                updated_edge_cnt += 1
 
-        # 更新新节点属性
-        for src_tgt in node_to_node.keys():
-            for node_hash in src_tgt:
+            for node_hash in (src, tgt):
                 if node_hash not in existed_nodes:
-                    if node_hash.startswith("entity"):
-                        # 新增实体节点
-                        node = embedding_manager.entities_embedding_store.store.get(node_hash)
-                        if node is None:
-                            logger.warning(f"实体节点 {node_hash} 在嵌入库中不存在，跳过")
-                            continue
-                        assert isinstance(node, EmbeddingStoreItem)
-                        node_item = self.graph[node_hash]
-                        node_item["content"] = node.str
-                        node_item["type"] = "ent"
-                        node_item["create_time"] = now_time
-                        self.graph.update_node(node_item)
-                    elif node_hash.startswith("paragraph"):
-                        # 新增文段节点
-                        node = embedding_manager.paragraphs_embedding_store.store.get(node_hash)
-                        if node is None:
-                            logger.warning(f"段落节点 {node_hash} 在嵌入库中不存在，跳过")
-                            continue
-                        assert isinstance(node, EmbeddingStoreItem)
-                        content = node.str.replace("\n", " ")
-                        node_item = self.graph[node_hash]
-                        node_item["content"] = content if len(content) < 8 else content[:8] + "..."
-                        node_item["type"] = "pg"
-                        node_item["create_time"] = now_time
-                        self.graph.update_node(node_item)
+                    new_nodes.add(node_hash)
+
+        existed_nodes.update(new_nodes)
+        return new_edge_cnt, updated_edge_cnt, new_nodes
+
+    def _update_graph(
+        self,
+        node_to_node: Dict[Tuple[str, str], float],
+        embedding_manager: EmbeddingManager,
+    ):
+        """更新KG图结构
+
+        流程：
+        1. 更新图结构：批量合并所有待添加的新边
+            - 若是新边，则添加到图中
+            - 若是已存在的边，则更新边的权重
+        2. 更新新节点的属性（每个新节点只处理一次）
+        """
+        now_time = time.time()
+
+        # 更新图结构
+        new_edge_cnt, updated_edge_cnt, new_nodes = self.merge_edges(node_to_node, now_time)
+        logger.info(f"KG边合并完成：新增 {new_edge_cnt} 条，更新 {updated_edge_cnt} 条，新节点 {len(new_nodes)} 个")
+
+        # 更新新节点属性
+        for node_hash in new_nodes:
+            if node_hash.startswith("entity"):
+                # 新增实体节点
+                node = embedding_manager.entities_embedding_store.store.get(node_hash)
+                if node is None:
+                    logger.warning(f"实体节点 {node_hash} 在嵌入库中不存在，跳过")
+                    continue
+                assert isinstance(node, EmbeddingStoreItem)
+                node_item = self.graph[node_hash]
+                node_item["content"] = node.str
+                node_item["type"] = "ent"
+                node_item["create_time"] = now_time
+                self.graph.update_node(node_item)
+            elif node_hash.startswith("paragraph"):
+                # 新增文段节点
+                node = embedding_manager.paragraphs_embedding_store.store.get(node_hash)
+                if node is None:
+                    logger.warning(f"段落节点 {node_hash} 在嵌入库中不存在，跳过")
+                    continue
+                assert isinstance(node, EmbeddingStoreItem)
+                content = node.str.replace("\n", " ")
+                node_item = self.graph[node_hash]
+                node_item["content"] = content if len(content) < 8 else content[:8] + "..."
+                node_item["type"] = "pg"
+                node_item["create_time"] = now_time
+                self.graph.update_node(node_item)
 
     def build_kg(
         self,
@@ -363,7 +462,7 @@ class KGManager:
             logger.info("PPR 已禁用，使用纯向量检索结果")
             return paragraph_search_result, None
         # 图中存在的节点总集
-        existed_nodes = self.graph.get_node_list()
+        existed_nodes = set(self.graph.get_node_list())
 
         # 准备PPR使用的数据
         # 节点权重：实体
@@ -1,12 +1,15 @@
 import json
 import os
 import glob
-from typing import Any, Dict, List
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
 
 
 from . import INVALID_ENTITY, ROOT_PATH, DATA_PATH
+from .global_logger import logger
 # from src.manager.local_store_manager import local_storage
 
+OPENIE_DIR = os.path.join(DATA_PATH, "openie")
+
 
 def _filter_invalid_entities(entities: List[str]) -> List[str]:
     """过滤无效的实体"""
@@ -42,6 +45,71 @@ def _filter_invalid_triples(triples: List[List[str]]) -> List[List[str]]:
     return valid_triples
 
 
+def clean_doc(doc: Dict[str, Any]) -> Dict[str, Any]:
+    """过滤单个文档中的无效实体与三元组（原地修改并返回）"""
+    doc["extracted_entities"] = _filter_invalid_entities(doc.get("extracted_entities") or [])
+    doc["extracted_triples"] = _filter_invalid_triples(doc.get("extracted_triples") or [])
+    return doc
+
+
+def list_openie_files(openie_dir: Optional[str] = None) -> List[str]:
+    """列出OpenIE目录下所有数据文件（旧版 .json 与逐行 .jsonl），按文件名排序"""
+    openie_dir = openie_dir or OPENIE_DIR
+    files = glob.glob(os.path.join(openie_dir, "*.json")) + glob.glob(os.path.join(openie_dir, "*.jsonl"))
+    return sorted(files)
+
+
+def iter_openie_file(path: str, start: int = 0) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """逐个读取OpenIE文件中的文档
+
+    .jsonl 文件每行一个文档，逐行读取，内存占用与文件大小无关；
+    旧版 .json 文件只能整体解析，但文档会逐个产出，不与其他文件合并。
+
+    Args:
+        path: 文件路径
+        start: 跳过前start个文档（断点续传）
+
+    Yields:
+        (文档在文件中的序号, 文档)
+    """
+    if path.endswith(".jsonl"):
+        position = 0
+        with open(path, "r", encoding="utf-8") as f:
+            for line_no, line in enumerate(f, start=1):
+                if not line.strip():
+                    continue
+                if position < start:
+                    position += 1
+                    continue
+                try:
+                    doc = json.loads(line)
+                except json.JSONDecodeError as e:
+                    # 写入中断时最后一行可能不完整
+                    logger.warning(f"跳过无法解析的OpenIE行 {os.path.basename(path)}:{line_no}：{e}")
+                    continue
+                yield position, doc
+                position += 1
+        return
+
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    docs = data.get("docs", [])
+    del data
+    for position in range(start, len(docs)):
+        yield position, docs[position]
+
+
+def write_openie_jsonl(path: str, docs: Iterable[Dict[str, Any]]) -> int:
+    """以逐行格式追加写入OpenIE文档，返回写入的文档数"""
+    count = 0
+    with open(path, "a", encoding="utf-8") as f:
+        for doc in docs:
+            f.write(json.dumps(doc, ensure_ascii=False) + "\n")
+            count += 1
+        f.flush()
+    return count
+
+
 class OpenIE:
     """
     OpenIE规约的数据格式为如下
@@ -58,6 +126,8 @@ class OpenIE:
         "avg_ent_chars": "实体平均字符数",
         "avg_ent_words": "实体平均词数"
     }
+
+    也支持逐行的 .jsonl 格式：每行是一个上面 docs 中的文档对象，适合追加写入与流式导入。
     """
 
     def __init__(
@@ -105,20 +175,16 @@ class OpenIE:
 
     @staticmethod
     def load() -> "OpenIE":
-        """从OPENIE_DIR下所有json文件合并加载OpenIE数据"""
-        openie_dir = os.path.join(DATA_PATH, "openie")
+        """从OPENIE_DIR下所有json/jsonl文件合并加载OpenIE数据（全部载入内存，大数据量请使用流式导入）"""
+        openie_dir = OPENIE_DIR
         if not os.path.exists(openie_dir):
             raise Exception(f"OpenIE数据目录不存在: {openie_dir}")
-        json_files = sorted(glob.glob(os.path.join(openie_dir, "*.json")))
-        data_list = []
-        for file in json_files:
-            with open(file, "r", encoding="utf-8") as f:
-                data = json.load(f)
-                data_list.append(data)
-        if not data_list:
+        data_files = list_openie_files(openie_dir)
+        if not data_files:
             # print(f"111111111111111111111Root Path : \n{ROOT_PATH}")
             raise Exception(f"未在 {openie_dir} 找到任何OpenIE json文件")
-        openie_data = OpenIE._from_dict(data_list)
+        docs = [doc for file in data_files for _, doc in iter_openie_file(file)]
+        openie_data = OpenIE._from_dict([{"docs": docs}])
         return openie_data
 
     def extract_entity_dict(self):
@@ -1,3 +1,5 @@
+from typing import List
+
 entity_extract_system_prompt = """你是一个性能优异的实体提取系统。请从段落中提取出所有实体，并以JSON列表的形式输出。
 
 输出格式示例：
@@ -51,6 +53,32 @@ def build_rdf_triple_extract_context(paragraph: str, entities: str) -> str:
 ```"""
 
 
+def _numbered_paragraphs(paragraphs: List[str]) -> str:
+    return "\n\n".join(f"段落{i}：\n```\n{paragraph}\n```" for i, paragraph in enumerate(paragraphs, start=1))
+
+
+def build_packed_entity_extract_context(paragraphs: List[str]) -> str:
+    """构建多段落合并的实体提取提示文本，按段落编号输出"""
+    return f"""{entity_extract_system_prompt}
+下面有{len(paragraphs)}个互相独立的段落，请分别提取每个段落的实体，以JSON对象输出，键为段落编号，值为该段落的实体列表：
+{{ "1": [ "实体A", "实体B" ], "2": [ "实体C" ] }}
+
+{_numbered_paragraphs(paragraphs)}"""
+
+
+def build_packed_rdf_triple_extract_context(paragraphs: List[str], entities: List[str]) -> str:
+    """构建多段落合并的RDF三元组提取提示文本，entities为每个段落的实体列表（JSON字符串）"""
+    numbered = "\n\n".join(
+        f"段落{i}：\n```\n{paragraph}\n```\n段落{i}的实体列表：\n```\n{entity_list}\n```"
+        for i, (paragraph, entity_list) in enumerate(zip(paragraphs, entities, strict=True), start=1)
+    )
+    return f"""{rdf_triple_extract_system_prompt}
+下面有{len(paragraphs)}个互相独立的段落，请分别构建每个段落的RDF图，以JSON对象输出，键为段落编号，值为该段落的三元组列表：
+{{ "1": [ ["某实体","关系","某属性"] ], "2": [ ["某实体","关系","某实体"] ] }}
+
+{numbered}"""
+
+
 qa_system_prompt = """
 你是一个性能优异的QA系统。请根据给定的问题和一些可能对你有帮助的信息作出回答。
 
@@ -6,6 +6,7 @@ from typing import Dict, Any, Optional
 from maim_message import UserInfo, Seg, GroupInfo
 
 from src.common.logger import get_logger
+from src.common.startup_profiler import startup_profiler
 from src.config.config import global_config
 from src.chat.message_receive.chat_stream import get_chat_manager
 from src.chat.message_receive.message import MessageRecv
@@ -217,7 +218,7 @@ class ChatBot:
             return
         mmc_message_id = message_data.get("echo")
         actual_message_id = message_data.get("actual_id")
-        if MessageStorage.update_message(mmc_message_id, actual_message_id):
+        if await MessageStorage.update_message(mmc_message_id, actual_message_id):
             logger.debug(f"更新消息ID成功: {mmc_message_id} -> {actual_message_id}")
         else:
             logger.warning(f"更新消息ID失败: {mmc_message_id} -> {actual_message_id}")
@@ -236,6 +237,7 @@ class ChatBot:
         - 表情包处理
         - 性能计时
         """
+        startup_profiler.mark("first_message")
         try:
             # 确保所有任务已启动
             await self._ensure_started()
@@ -2,13 +2,14 @@ import asyncio
 import hashlib
 import time
 import copy
-from typing import Dict, Optional, TYPE_CHECKING
+from typing import Dict, List, Optional, TYPE_CHECKING
 from rich.traceback import install
 from maim_message import GroupInfo, UserInfo
 
 from src.common.logger import get_logger
-from src.common.database.database import db
+from src.common.database.database import db, db_writer
 from src.common.database.database_model import ChatStreams  # 新增导入
+from .recent_messages import RecentMessageCache
 
 # 避免循环导入，使用TYPE_CHECKING进行类型提示
 if TYPE_CHECKING:
@@ -128,6 +129,7 @@ class ChatManager:
         if not self._initialized:
             self.streams: Dict[str, ChatStream] = {}  # stream_id -> ChatStream
             self.last_messages: Dict[str, "MessageRecv"] = {}  # stream_id -> last_message
+            self.recent_messages = RecentMessageCache()  # stream_id -> 最近消息缓冲区
             try:
                 db.connect(reuse_if_open=True)
                 # 确保 ChatStreams 表存在
@@ -345,7 +347,7 @@ class ChatManager:
             ChatStreams.replace(stream_id=s_data_dict["stream_id"], **fields_to_save).execute()
 
         try:
-            await asyncio.to_thread(_db_save_stream_sync, stream_data_dict)
+            await db_writer.write(_db_save_stream_sync, stream_data_dict, label="ChatStreams.replace")
             stream.saved = True
         except Exception as e:
             logger.error(f"保存聊天流 {stream.stream_id} 到数据库失败 (Peewee): {e}", exc_info=True)
@@ -356,11 +358,11 @@ class ChatManager:
             await self._save_stream(stream)
 
     async def load_all_streams(self):
-        """从数据库加载所有聊天流"""
+        """从数据库加载所有聊天流，查询和构建 ChatStream 都在工作线程中进行，不阻塞事件循环"""
         logger.info("正在从数据库加载所有聊天流")
 
-        def _db_load_all_streams_sync():
-            loaded_streams_data = []
+        def _db_load_all_streams_sync() -> List[ChatStream]:
+            loaded_streams = []
             for model_instance in ChatStreams.select():
                 user_info_data = {
                     "platform": model_instance.user_platform,
@@ -384,15 +386,15 @@ class ChatManager:
                     "create_time": model_instance.create_time,
                     "last_active_time": model_instance.last_active_time,
                 }
-                loaded_streams_data.append(data_for_from_dict)
-            return loaded_streams_data
+                stream = ChatStream.from_dict(data_for_from_dict)
+                stream.saved = True
+                loaded_streams.append(stream)
+            return loaded_streams
 
         try:
-            all_streams_data_list = await asyncio.to_thread(_db_load_all_streams_sync)
+            loaded_streams = await asyncio.to_thread(_db_load_all_streams_sync)
             self.streams.clear()
-            for data in all_streams_data_list:
-                stream = ChatStream.from_dict(data)
-                stream.saved = True
+            for stream in loaded_streams:
                 self.streams[stream.stream_id] = stream
                 if stream.stream_id in self.last_messages:
                     stream.set_context(self.last_messages[stream.stream_id])
@@ -12,7 +12,7 @@ from src.common.logger import get_logger
 from src.config.config import global_config
 from src.chat.utils.utils_image import get_image_manager
 from src.chat.utils.utils_voice import get_voice_text
-from .chat_stream import ChatStream
+from .chat_stream import ChatStream, ChatManager
 
 install(extra_lines=3)
 
@@ -163,6 +163,19 @@ class MessageRecv(Message):
     def update_chat_stream(self, chat_stream: "ChatStream"):
         self.chat_stream = chat_stream
 
+    def _get_chat_id(self) -> Optional[str]:
+        """获取消息所属的聊天流ID，聊天流尚未绑定时根据消息信息计算"""
+        if self.chat_stream:
+            return self.chat_stream.stream_id
+        try:
+            return ChatManager._generate_stream_id(
+                self.message_info.platform,  # type: ignore
+                self.message_info.user_info,
+                self.message_info.group_info,
+            )
+        except Exception:
+            return None
+
     async def process(self) -> None:
         """处理消息内容，生成纯文本和详细文本
 
@@ -192,9 +205,8 @@ class MessageRecv(Message):
                     self.is_picid = True
                     self.is_emoji = False
                     image_manager = get_image_manager()
-                    # 使用 semaphore 限制 VLM 并发，避免同时处理太多图片
-                    async with _vlm_semaphore:
-                        _, processed_text = await image_manager.process_image(segment.data)
+                    # 图片只登记不等待识别，VLM并发由后台识别队列控制
+                    _, processed_text = await image_manager.process_image(segment.data, chat_id=self._get_chat_id())
                     return processed_text
                 return "[发了一张图片，网卡了加载不出来]"
             elif segment.type == "emoji":
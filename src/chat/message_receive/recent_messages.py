@@ -0,0 +1,244 @@
+"""
+聊天流最近消息缓存
+
+每个聊天流在内存中保留最近 RECENT_MESSAGE_CAPACITY 条消息（按时间排序的环形缓冲区），
+由消息存储路径（MessageStorage.store_message）实时追加，首次访问某个聊天流时从数据库回填。
+
+缓冲区维护一个覆盖下界 covered_after：数据库中该聊天流 time > covered_after 的消息一定都在缓冲区中。
+查询的时间范围完全落在覆盖区间内时不访问数据库；只有更早的部分才回落到 SQLite 查询。
+
+缓冲区中的 DatabaseMessages 对象会被多个调用方共享，调用方应将其视为只读。
+"""
+
+import threading
+
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from typing import Any, Callable, Iterable, List, Optional, Set
+
+from peewee import Model
+
+from src.config.config import global_config
+from src.common.data_models.database_data_model import DatabaseMessages
+from src.common.database.database_model import Messages
+from src.common.logger import get_logger
+from src.common.message_repository import MESSAGE_COLUMNS, select_messages
+
+logger = get_logger("recent_messages")
+
+# 每个聊天流缓存的消息条数
+RECENT_MESSAGE_CAPACITY = 400
+# 最多同时缓存的聊天流数量，超出后淘汰最久未访问的聊天流
+RECENT_MESSAGE_MAX_STREAMS = 256
+
+# 数据库查询回调：(时间上界（包含）, limit, limit_mode) -> 下界与过滤条件同原查询的消息列表
+OlderFetcher = Callable[[float, int, str], List[DatabaseMessages]]
+
+
+def message_from_model(model_instance: Model) -> DatabaseMessages:
+    """
+    将刚写入的 Messages 模型实例转换为 DatabaseMessages
+
+    字段值经过一次 db_value/python_value 转换，与之后从数据库读出的结果保持一致（例如字典被存为字符串）。
+    """
+    data = model_instance.__data__
+    fields = Messages._meta.fields
+    row = []
+    for name in MESSAGE_COLUMNS:
+        value = data.get(name)
+        row.append(fields[name].python_value(fields[name].db_value(value)) if value is not None else None)
+    return DatabaseMessages.row_factory(MESSAGE_COLUMNS)(row)
+
+
+class MessageFilter:
+    """与 find_messages 的过滤参数语义一致的内存过滤器（包括 SQL 中 NULL 比较恒为假的行为）"""
+
+    __slots__ = ("bot_user_id", "filter_command", "max_intercept_level", "user_ids")
+
+    def __init__(
+        self,
+        filter_bot: bool = False,
+        filter_command: bool = False,
+        filter_intercept_message_level: Optional[int] = None,
+        user_ids: Optional[Iterable[Any]] = None,
+    ):
+        self.bot_user_id = str(global_config.bot.qq_account) if filter_bot else None
+        self.filter_command = filter_command
+        self.max_intercept_level = filter_intercept_message_level
+        self.user_ids: Optional[Set[str]] = {str(uid) for uid in user_ids} if user_ids is not None else None
+
+    def __call__(self, message: DatabaseMessages) -> bool:
+        user_id = message.user_info.user_id
+        if self.bot_user_id is not None and (user_id is None or user_id == self.bot_user_id):
+            return False
+        if self.filter_command and (message.is_command is None or message.is_command):
+            return False
+        if self.max_intercept_level is not None and (
+            message.intercept_message_level is None or message.intercept_message_level > self.max_intercept_level
+        ):
+            return False
+        if self.user_ids is not None and user_id not in self.user_ids:
+            return False
+        return True
+
+
+class _StreamBuffer:
+    """单个聊天流的最近消息缓冲区"""
+
+    __slots__ = ("messages", "times", "row_ids", "covered_after")
+
+    def __init__(self, messages: List[DatabaseMessages], covered_after: float):
+        self.messages = messages  # 按 time 升序
+        self.times = [msg.time for msg in messages]
+        self.row_ids = {getattr(msg, "id", None) for msg in messages}
+        self.covered_after = covered_after
+
+    def insert(self, message: DatabaseMessages, capacity: int) -> None:
+        row_id = getattr(message, "id", None)
+        if message.time <= self.covered_after or (row_id is not None and row_id in self.row_ids):
+            return
+        # 绝大多数消息按时间顺序到达，直接追加；乱序时插入到同一时间的最后（与数据库按插入顺序一致）
+        if not self.times or message.time >= self.times[-1]:
+            self.messages.append(message)
+            self.times.append(message.time)
+        else:
+            pos = bisect_right(self.times, message.time)
+            self.messages.insert(pos, message)
+            self.times.insert(pos, message.time)
+        self.row_ids.add(row_id)
+
+        overflow = len(self.messages) - capacity
+        if overflow > 0:
+            evicted = self.messages[:overflow]
+            del self.messages[:overflow]
+            del self.times[:overflow]
+            for msg in evicted:
+                self.row_ids.discard(getattr(msg, "id", None))
+            self.covered_after = max(self.covered_after, evicted[-1].time)
+
+    def select(
+        self, start: float, end: float, start_inclusive: bool, end_inclusive: bool, accept: MessageFilter
+    ) -> List[DatabaseMessages]:
+        """返回覆盖区间内（time > covered_after）落在时间范围内且通过过滤的消息"""
+        if start > self.covered_after:
+            lo = bisect_left(self.times, start) if start_inclusive else bisect_right(self.times, start)
+        else:
+            lo = bisect_right(self.times, self.covered_after)
+        hi = bisect_right(self.times, end) if end_inclusive else bisect_left(self.times, end)
+        return [msg for msg in self.messages[lo:hi] if accept(msg)]
+
+
+class RecentMessageCache:
+    """所有聊天流的最近消息缓存，由 ChatManager 持有"""
+
+    def __init__(self, capacity: int = RECENT_MESSAGE_CAPACITY, max_streams: int = RECENT_MESSAGE_MAX_STREAMS):
+        self.capacity = capacity
+        self.max_streams = max_streams
+        self._buffers: "OrderedDict[str, _StreamBuffer]" = OrderedDict()
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.db_fallbacks = 0
+
+    def _load(self, chat_id: str) -> _StreamBuffer:
+        """从数据库回填某个聊天流最近的消息"""
+        query, to_instance = select_messages()
+        rows = list(
+            query.where((Messages.chat_id == chat_id) & (Messages.message_id != "notice"))
+            .order_by(Messages.time.desc(), Messages.id.desc())
+            .limit(self.capacity)
+            .tuples()
+        )
+        rows.reverse()
+        messages = [to_instance(row) for row in rows]
+        # 取满 capacity 条时，最早一条之前可能还有更早的消息；否则数据库中的全部消息都已在缓冲区中
+        covered_after = messages[0].time if len(messages) >= self.capacity else float("-inf")
+        return _StreamBuffer(messages, covered_after)
+
+    def _get_buffer(self, chat_id: str) -> _StreamBuffer:
+        buffer = self._buffers.get(chat_id)
+        if buffer is None:
+            buffer = self._load(chat_id)
+            self._buffers[chat_id] = buffer
+            while len(self._buffers) > self.max_streams:
+                self._buffers.popitem(last=False)
+        else:
+            self._buffers.move_to_end(chat_id)
+        return buffer
+
+    def add(self, model_instance: Model) -> None:
+        """存储路径写入数据库后调用；聊天流尚未加载时不做处理，首次访问时会从数据库回填"""
+        if model_instance.message_id == "notice":
+            return
+        with self._lock:
+            buffer = self._buffers.get(model_instance.chat_id)
+            if buffer is not None:
+                buffer.insert(message_from_model(model_instance), self.capacity)
+
+    def update_message_id(self, chat_id: str, row_id: int, new_message_id: str) -> None:
+        """同步数据库中对消息 ID 的更新"""
+        with self._lock:
+            buffer = self._buffers.get(chat_id)
+            if buffer is None or row_id not in buffer.row_ids:
+                return
+            for msg in reversed(buffer.messages):
+                if getattr(msg, "id", None) == row_id:
+                    msg.message_id = new_message_id
+                    return
+
+    def invalidate(self, chat_id: Optional[str] = None) -> None:
+        """使某个聊天流（或全部）的缓存失效，用于绕过存储路径直接修改 Messages 表之后"""
+        with self._lock:
+            if chat_id is None:
+                self._buffers.clear()
+            else:
+                self._buffers.pop(chat_id, None)
+
+    def query(
+        self,
+        chat_id: str,
+        start: float,
+        end: float,
+        fetch_older: OlderFetcher,
+        *,
+        start_inclusive: bool = False,
+        end_inclusive: bool = False,
+        limit: int = 0,
+        limit_mode: str = "latest",
+        accept: Optional[MessageFilter] = None,
+    ) -> List[DatabaseMessages]:
+        """
+        查询某个聊天流在时间范围内的消息，按时间升序返回，语义与 find_messages 一致
+
+        覆盖区间之外（更早）的部分通过 fetch_older(covered_after, ...) 从数据库查询。
+        """
+        accept = accept or MessageFilter()
+        with self._lock:
+            buffer = self._get_buffer(chat_id)
+            covered_after = buffer.covered_after
+            recent = buffer.select(start, end, start_inclusive, end_inclusive, accept)
+
+        # 查询范围完全在覆盖区间内，或最新的 limit 条已经全部在缓冲区中
+        fully_covered = start > covered_after or (start == covered_after and not start_inclusive)
+        if fully_covered or (limit > 0 and limit_mode != "earliest" and len(recent) >= limit):
+            self.hits += 1
+            if limit > 0:
+                return recent[:limit] if limit_mode == "earliest" else recent[-limit:]
+            return recent
+
+        self.db_fallbacks += 1
+        if limit <= 0:
+            return fetch_older(covered_after, 0, limit_mode) + recent
+        if limit_mode == "earliest":
+            older = fetch_older(covered_after, limit, "earliest")
+            return older + recent[: limit - len(older)] if len(older) < limit else older
+        older = fetch_older(covered_after, limit - len(recent), "latest")
+        return older + recent
+
+    def count(self, chat_id: str, start: float, end: float) -> Optional[int]:
+        """统计时间范围 (start, end) 内的消息数；范围超出覆盖区间时返回 None，由调用方查询数据库"""
+        with self._lock:
+            buffer = self._get_buffer(chat_id)
+            if start < buffer.covered_after:
+                return None
+            self.hits += 1
+            return len(buffer.select(start, end, False, False, MessageFilter()))
@@ -3,9 +3,10 @@ import json
 import traceback
 from typing import Union
 
+from src.common.database.database import db_writer
 from src.common.database.database_model import Messages, Images
 from src.common.logger import get_logger
-from .chat_stream import ChatStream
+from .chat_stream import ChatStream, get_chat_manager
 from .message import MessageSending, MessageRecv
 
 logger = get_logger("message_storage")
@@ -103,7 +104,8 @@ class MessageStorage:
             # 安全地获取 user_info, 如果为 None 则视为空字典 (以防万一)
             user_info_from_chat = chat_info_dict.get("user_info") or {}
 
-            Messages.create(
+            created = await db_writer.write(
+                Messages.create,
                 message_id=msg_id,
                 time=float(message.message_info.time),  # type: ignore
                 chat_id=chat_stream.stream_id,
@@ -143,6 +145,7 @@ class MessageStorage:
                 key_words_lite=key_words_lite,
                 selected_expressions=selected_expressions,
             )
+            get_chat_manager().recent_messages.add(created)
         except Exception:
             logger.exception("存储消息失败")
             logger.error(f"消息：{message}")
@@ -150,17 +153,29 @@ class MessageStorage:
 
     # 如果需要其他存储相关的函数，可以在这里添加
     @staticmethod
-    def update_message(mmc_message_id: str | None, qq_message_id: str | None) -> bool:
+    def _update_message_id_sync(mmc_message_id: str | None, qq_message_id: str) -> Messages | None:
+        """在写线程中查找并更新消息ID，返回更新前的消息记录"""
+        matched_message = (
+            Messages.select().where((Messages.message_id == mmc_message_id)).order_by(Messages.time.desc()).first()
+        )
+        if matched_message:
+            Messages.update(message_id=qq_message_id).where(Messages.id == matched_message.id).execute()  # type: ignore
+        return matched_message
+
+    @staticmethod
+    async def update_message(mmc_message_id: str | None, qq_message_id: str | None) -> bool:
         """实时更新数据库的自身发送消息ID"""
         try:
             if not qq_message_id:
                 logger.info("消息不存在message_id，无法更新")
                 return False
-            if matched_message := (
-                Messages.select().where((Messages.message_id == mmc_message_id)).order_by(Messages.time.desc()).first()
+            # 与消息写入走同一个写队列，保证更新发生在消息落库之后
+            if matched_message := await db_writer.write(
+                MessageStorage._update_message_id_sync, mmc_message_id, qq_message_id, label="Messages.update_id"
             ):
-                # 更新找到的消息记录
-                Messages.update(message_id=qq_message_id).where(Messages.id == matched_message.id).execute()  # type: ignore
+                get_chat_manager().recent_messages.update_message_id(
+                    matched_message.chat_id, matched_message.id, qq_message_id
+                )
                 logger.debug(f"更新消息ID成功: {matched_message.message_id} -> {qq_message_id}")
                 return True
             else:
@@ -6,6 +6,7 @@ from maim_message import Seg
 
 from src.common.message.api import get_global_api
 from src.common.logger import get_logger
+from src.common.startup_profiler import startup_profiler
 from src.chat.message_receive.message import MessageSending
 from src.chat.message_receive.storage import MessageStorage
 from src.chat.utils.utils import truncate_message
@@ -328,6 +329,7 @@ class UniversalMessageSender:
             sent_msg = await _send_message(message, show_log=show_log)
             if not sent_msg:
                 return False
+            startup_profiler.mark("first_reply")
 
             continue_flag, modified_message = await events_manager.handle_mai_events(
                 EventType.AFTER_SEND, message=message, stream_id=chat_id
@@ -1,12 +1,11 @@
 import random
-import time
-from typing import List, Dict, TYPE_CHECKING, Tuple
+from typing import List, Dict, Optional, TYPE_CHECKING, Tuple
 
 from src.common.logger import get_logger
 from src.config.config import global_config
 from src.chat.message_receive.chat_stream import get_chat_manager, ChatMessageContext
 from src.chat.planner_actions.action_manager import ActionManager
-from src.chat.utils.chat_message_builder import get_raw_msg_before_timestamp_with_chat, build_readable_messages
+from src.chat.utils.message_window import MessageWindow
 from src.plugin_system.base.component_types import ActionInfo, ActionActivationType
 from src.plugin_system.core.global_announcement_manager import global_announcement_manager
 
@@ -35,6 +34,7 @@ class ActionModifier:
     async def modify_actions(
         self,
         message_content: str = "",
+        message_window: Optional[MessageWindow] = None,
     ):  # sourcery skip: use-named-expression
         """
         动作修改流程，整合传统观察处理和新的激活类型判定
@@ -44,6 +44,10 @@ class ActionModifier:
         2. 基于激活类型的智能动作判定，最终确定可用动作集
 
         处理后，ActionManager 将包含最终的可用动作集，供规划器直接使用
+
+        Args:
+            message_content: 最新的消息内容
+            message_window: 本次循环共享的消息窗口，为None时自行获取
         """
         logger.debug(f"{self.log_prefix}开始完整动作修改流程")
 
@@ -54,15 +58,12 @@ class ActionModifier:
         self.action_manager.restore_actions()
         all_actions = self.action_manager.get_using_actions()
 
-        message_list_before_now_half = get_raw_msg_before_timestamp_with_chat(
-            chat_id=self.chat_stream.stream_id,
-            timestamp=time.time(),
-            limit=min(int(global_config.chat.max_context_size * 0.33), 10),
-            filter_intercept_message_level=1,
-        )
+        half_limit = min(int(global_config.chat.max_context_size * 0.33), 10)
+        if message_window is None:
+            message_window = MessageWindow(chat_id=self.chat_stream.stream_id, limit=half_limit)
 
-        chat_content = build_readable_messages(
-            message_list_before_now_half,
+        chat_content = message_window.build_readable(
+            half_limit,
             replace_bot_name=True,
             timestamp_mode="relative",
             read_mark=0.0,
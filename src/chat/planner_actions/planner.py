@@ -13,11 +13,8 @@ from src.common.logger import get_logger
 from src.chat.logger.plan_reply_logger import PlanReplyLogger
 from src.common.data_models.info_data_model import ActionPlannerInfo
 from src.chat.utils.prompt_builder import Prompt, global_prompt_manager
-from src.chat.utils.chat_message_builder import (
-    build_readable_messages_with_id,
-    get_raw_msg_before_timestamp_with_chat,
-    replace_user_references,
-)
+from src.chat.utils.chat_message_builder import replace_user_references
+from src.chat.utils.message_window import MessageWindow
 from src.chat.utils.utils import get_chat_type_and_target_info, is_bot_self
 from src.chat.planner_actions.action_manager import ActionManager
 from src.chat.message_receive.chat_stream import get_chat_manager
@@ -323,32 +320,31 @@ class ActionPlanner:
         available_actions: Dict[str, ActionInfo],
         loop_start_time: float = 0.0,
         force_reply_message: Optional["DatabaseMessages"] = None,
+        message_window: Optional[MessageWindow] = None,
     ) -> List[ActionPlannerInfo]:
         # sourcery skip: use-named-expression
         """
         规划器 (Planner): 使用LLM根据上下文决定做出什么动作。
+
+        Args:
+            message_window: 本次循环共享的消息窗口，为None时自行获取
         """
         plan_start = time.perf_counter()
 
         # 获取聊天上下文
-        message_list_before_now = get_raw_msg_before_timestamp_with_chat(
-            chat_id=self.chat_id,
-            timestamp=time.time(),
-            limit=int(global_config.chat.max_context_size * 0.6),
-            filter_intercept_message_level=1,
-        )
+        if message_window is None:
+            message_window = MessageWindow(chat_id=self.chat_id, limit=int(global_config.chat.max_context_size * 0.6))
         message_id_list: list[Tuple[str, "DatabaseMessages"]] = []
-        chat_content_block, message_id_list = build_readable_messages_with_id(
-            messages=message_list_before_now,
+        chat_content_block, message_id_list = message_window.build_readable_with_id(
+            int(global_config.chat.max_context_size * 0.6),
             timestamp_mode="normal_no_YMD",
             read_mark=self.last_obs_time_mark,
             truncate=True,
             show_actions=True,
         )
 
-        message_list_before_now_short = message_list_before_now[-int(global_config.chat.max_context_size * 0.3) :]
-        chat_content_block_short, message_id_list_short = build_readable_messages_with_id(
-            messages=message_list_before_now_short,
+        chat_content_block_short, message_id_list_short = message_window.build_readable_with_id(
+            int(global_config.chat.max_context_size * 0.3),
             timestamp_mode="normal_no_YMD",
             truncate=False,
             show_actions=False,
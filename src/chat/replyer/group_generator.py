@@ -23,6 +23,7 @@ from src.chat.utils.chat_message_builder import (
     get_raw_msg_before_timestamp_with_chat,
     replace_user_references,
 )
+from src.chat.utils.message_window import MessageWindow
 from src.bw_learner.expression_selector import expression_selector
 from src.plugin_system.apis.message_api import translate_pid_to_description
 
@@ -76,6 +77,7 @@ class DefaultReplyer:
         think_level: int = 1,
         unknown_words: Optional[List[str]] = None,
         log_reply: bool = True,
+        message_window: Optional[MessageWindow] = None,
     ) -> Tuple[bool, LLMGenerationDataModel]:
         # sourcery skip: merge-nested-ifs
         """
@@ -89,6 +91,7 @@ class DefaultReplyer:
             chosen_actions: 已选动作
             enable_tool: 是否启用工具调用
             from_plugin: 是否来自插件
+            message_window: 本次思考循环共享的消息窗口，为None时自行获取
 
         Returns:
             Tuple[bool, Optional[Dict[str, Any]], Optional[str]]: (是否成功, 生成的回复, 使用的prompt)
@@ -118,6 +121,7 @@ class DefaultReplyer:
                     reply_time_point=reply_time_point,
                     think_level=think_level,
                     unknown_words=unknown_words,
+                    message_window=message_window,
                 )
             prompt_duration_ms = (time.perf_counter() - prompt_start) * 1000
             llm_response.prompt = prompt
@@ -757,6 +761,7 @@ class DefaultReplyer:
         reply_time_point: Optional[float] = time.time(),
         think_level: int = 1,
         unknown_words: Optional[List[str]] = None,
+        message_window: Optional[MessageWindow] = None,
     ) -> Tuple[str, List[int], List[str], str]:
         """
         构建回复器上下文
@@ -769,6 +774,7 @@ class DefaultReplyer:
             enable_timeout: 是否启用超时处理
             enable_tool: 是否启用工具调用
             reply_message: 回复的原始消息
+            message_window: 本次思考循环共享的消息窗口，为None时自行获取
         Returns:
             str: 构建好的上下文
         """
@@ -799,19 +805,13 @@ class DefaultReplyer:
         # 将[picid:xxx]替换为具体的图片描述
         target = self._replace_picids_with_descriptions(target)
 
-        message_list_before_now_long = get_raw_msg_before_timestamp_with_chat(
-            chat_id=chat_id,
-            timestamp=reply_time_point,
-            limit=global_config.chat.max_context_size * 1,
-            filter_intercept_message_level=1,
-        )
-
-        message_list_before_short = get_raw_msg_before_timestamp_with_chat(
-            chat_id=chat_id,
-            timestamp=reply_time_point,
-            limit=int(global_config.chat.max_context_size * 0.33),
-            filter_intercept_message_level=1,
-        )
+        # 长窗口和短窗口共用一次查询，短窗口为长窗口的切片
+        long_limit = global_config.chat.max_context_size
+        short_limit = int(global_config.chat.max_context_size * 0.33)
+        if message_window is None:
+            message_window = MessageWindow(chat_id=chat_id, timestamp=reply_time_point, limit=long_limit)
+        message_list_before_now_long = message_window.get_messages(long_limit, before=reply_time_point)
+        message_list_before_short = message_window.get_messages(short_limit, before=reply_time_point)
 
         person_list_short: List[Person] = []
         for msg in message_list_before_short:
@@ -831,8 +831,9 @@ class DefaultReplyer:
         # for person in person_list_short:
         #     print(person.person_name)
 
-        chat_talking_prompt_short = build_readable_messages(
-            message_list_before_short,
+        chat_talking_prompt_short = message_window.build_readable(
+            short_limit,
+            before=reply_time_point,
             replace_bot_name=True,
             timestamp_mode="relative",
             read_mark=0.0,
@@ -947,9 +948,9 @@ class DefaultReplyer:
 
 
         if message_list_before_now_long:
-            latest_msgs = message_list_before_now_long[-int(global_config.chat.max_context_size) :]
-            dialogue_prompt = build_readable_messages(
-                latest_msgs,
+            dialogue_prompt = message_window.build_readable(
+                long_limit,
+                before=reply_time_point,
                 replace_bot_name=True,
                 timestamp_mode="normal_no_YMD",
                 truncate=True,
@@ -23,6 +23,7 @@ from src.chat.utils.chat_message_builder import (
     get_raw_msg_before_timestamp_with_chat,
     replace_user_references,
 )
+from src.chat.utils.message_window import MessageWindow
 from src.bw_learner.expression_selector import expression_selector
 from src.plugin_system.apis.message_api import translate_pid_to_description
 
@@ -77,6 +78,7 @@ class PrivateReplyer:
         reply_time_point: Optional[float] = time.time(),
         unknown_words: Optional[List[str]] = None,
         log_reply: bool = True,
+        message_window: Optional[MessageWindow] = None,
     ) -> Tuple[bool, LLMGenerationDataModel]:
         # sourcery skip: merge-nested-ifs
         """
@@ -90,6 +92,7 @@ class PrivateReplyer:
             chosen_actions: 已选动作
             enable_tool: 是否启用工具调用
             from_plugin: 是否来自插件
+            message_window: 本次思考循环共享的消息窗口，为None时自行获取
 
         Returns:
             Tuple[bool, Optional[Dict[str, Any]], Optional[str]]: (是否成功, 生成的回复, 使用的prompt)
@@ -111,6 +114,7 @@ class PrivateReplyer:
                     reply_message=reply_message,
                     reply_reason=reply_reason,
                     unknown_words=unknown_words,
+                    message_window=message_window,
                 )
             llm_response.prompt = prompt
             llm_response.selected_expressions = selected_expressions
@@ -613,6 +617,7 @@ class PrivateReplyer:
         chosen_actions: Optional[List[ActionPlannerInfo]] = None,
         enable_tool: bool = True,
         unknown_words: Optional[List[str]] = None,
+        message_window: Optional[MessageWindow] = None,
     ) -> Tuple[str, List[int]]:
         """
         构建回复器上下文
@@ -625,6 +630,7 @@ class PrivateReplyer:
             enable_timeout: 是否启用超时处理
             enable_tool: 是否启用工具调用
             reply_message: 回复的原始消息
+            message_window: 本次思考循环共享的消息窗口，为None时自行获取
         Returns:
             str: 构建好的上下文
         """
@@ -654,15 +660,14 @@ class PrivateReplyer:
         # 将[picid:xxx]替换为具体的图片描述
         target = self._replace_picids_with_descriptions(target)
 
-        message_list_before_now_long = get_raw_msg_before_timestamp_with_chat(
-            chat_id=chat_id,
-            timestamp=time.time(),
-            limit=global_config.chat.max_context_size,
-            filter_intercept_message_level=1,
-        )
+        # 长窗口和短窗口共用一次查询，短窗口为长窗口的切片
+        long_limit = global_config.chat.max_context_size
+        short_limit = int(global_config.chat.max_context_size * 0.33)
+        if message_window is None:
+            message_window = MessageWindow(chat_id=chat_id, limit=long_limit)
 
-        dialogue_prompt = build_readable_messages(
-            message_list_before_now_long,
+        dialogue_prompt = message_window.build_readable(
+            long_limit,
             replace_bot_name=True,
             timestamp_mode="relative",
             read_mark=0.0,
@@ -670,12 +675,7 @@ class PrivateReplyer:
             long_time_notice=True
         )
 
-        message_list_before_short = get_raw_msg_before_timestamp_with_chat(
-            chat_id=chat_id,
-            timestamp=time.time(),
-            limit=int(global_config.chat.max_context_size * 0.33),
-            filter_intercept_message_level=1,
-        )
+        message_list_before_short = message_window.get_messages(short_limit)
 
         person_list_short: List[Person] = []
         for msg in message_list_before_short:
@@ -695,8 +695,8 @@ class PrivateReplyer:
         # for person in person_list_short:
         #     print(person.person_name)
 
-        chat_talking_prompt_short = build_readable_messages(
-            message_list_before_short,
+        chat_talking_prompt_short = message_window.build_readable(
+            short_limit,
             replace_bot_name=True,
             timestamp_mode="relative",
             read_mark=0.0,
@@ -2,7 +2,7 @@ import time
 import random
 import re
 
-from typing import List, Dict, Any, Tuple, Optional, Callable
+from typing import List, Dict, Any, Tuple, Optional, Callable, Sequence
 from rich.traceback import install
 
 from src.config.config import global_config
@@ -12,6 +12,9 @@ from src.common.data_models.database_data_model import DatabaseMessages, Databas
 from src.common.data_models.message_data_model import MessageAndActionModel
 from src.common.database.database_model import ActionRecords
 from src.common.database.database_model import Images
+from src.chat.message_receive.chat_stream import get_chat_manager
+from src.chat.message_receive.recent_messages import MessageFilter
+from src.chat.utils.image_description_queue import PENDING_DESCRIPTION
 from src.person_info.person_info import Person, get_person_id
 from src.chat.utils.utils import translate_timestamp_to_human_readable, assign_message_ids, is_bot_self
 
@@ -97,16 +100,86 @@ def replace_user_references(
     return content
 
 
-def get_raw_msg_by_timestamp(timestamp_start: float, timestamp_end: float, limit: int = 0, limit_mode: str = "latest"):
+def _find_chat_messages(
+    chat_id: str,
+    timestamp_start: float,
+    timestamp_end: float,
+    inclusive: bool = False,
+    limit: int = 0,
+    limit_mode: str = "latest",
+    filter_bot=False,
+    filter_command=False,
+    filter_intercept_message_level: Optional[int] = None,
+    person_ids: Optional[List[str]] = None,
+) -> List[DatabaseMessages]:
+    """
+    查询特定聊天在时间范围内的消息，按时间升序排序
+
+    最近的消息由 ChatManager 持有的消息缓冲区直接提供，只有早于缓冲区覆盖范围的部分才查询数据库。
+    """
+    start_op, end_op = ("$gte", "$lte") if inclusive else ("$gt", "$lt")
+
+    def build_filter(upper: Optional[float]) -> Dict[str, Any]:
+        time_filter: Dict[str, float] = {}
+        if timestamp_start != float("-inf"):
+            time_filter[start_op] = timestamp_start
+        if upper is not None and upper < timestamp_end:
+            time_filter["$lte"] = upper
+        else:
+            time_filter[end_op] = timestamp_end
+        filter_query: Dict[str, Any] = {"chat_id": chat_id, "time": time_filter}
+        if person_ids is not None:
+            filter_query["user_id"] = {"$in": person_ids}
+        return filter_query
+
+    def fetch(upper: Optional[float], fetch_limit: int, fetch_mode: str) -> List[DatabaseMessages]:
+        return find_messages(
+            message_filter=build_filter(upper),
+            # 只有当 limit 为 0 时才应用外部 sort
+            sort=[("time", 1)] if fetch_limit == 0 else None,
+            limit=fetch_limit,
+            limit_mode=fetch_mode,
+            filter_bot=filter_bot,
+            filter_command=filter_command,
+            filter_intercept_message_level=filter_intercept_message_level,
+        )
+
+    try:
+        return get_chat_manager().recent_messages.query(
+            chat_id,
+            timestamp_start,
+            timestamp_end,
+            fetch,
+            start_inclusive=inclusive,
+            end_inclusive=inclusive,
+            limit=limit,
+            limit_mode=limit_mode,
+            accept=MessageFilter(filter_bot, filter_command, filter_intercept_message_level, person_ids),
+        )
+    except Exception as e:
+        logger.warning(f"读取最近消息缓存失败，改为查询数据库: {e}")
+        return fetch(None, limit, limit_mode)
+
+
+def get_raw_msg_by_timestamp(
+    timestamp_start: float,
+    timestamp_end: float,
+    limit: int = 0,
+    limit_mode: str = "latest",
+    columns: Optional[Sequence[str]] = None,
+):
     """
     获取从指定时间戳到指定时间戳的消息，按时间升序排序，返回消息列表
     limit: 限制返回的消息数量，0为不限制
     limit_mode: 当 limit > 0 时生效。 'earliest' 表示获取最早的记录， 'latest' 表示获取最新的记录。默认为 'latest'。
+    columns: 只读取这些列，None 表示全部列
     """
     filter_query = {"time": {"$gt": timestamp_start, "$lt": timestamp_end}}
     # 只有当 limit 为 0 时才应用外部 sort
     sort_order = [("time", 1)] if limit == 0 else None
-    return find_messages(message_filter=filter_query, sort=sort_order, limit=limit, limit_mode=limit_mode)
+    return find_messages(
+        message_filter=filter_query, sort=sort_order, limit=limit, limit_mode=limit_mode, columns=columns
+    )
 
 
 def get_raw_msg_by_timestamp_with_chat(
@@ -123,14 +196,10 @@ def get_raw_msg_by_timestamp_with_chat(
     limit: 限制返回的消息数量，0为不限制
     limit_mode: 当 limit > 0 时生效。 'earliest' 表示获取最早的记录， 'latest' 表示获取最新的记录。默认为 'latest'。
     """
-    filter_query = {"chat_id": chat_id, "time": {"$gt": timestamp_start, "$lt": timestamp_end}}
-    # 只有当 limit 为 0 时才应用外部 sort
-    sort_order = [("time", 1)] if limit == 0 else None
-    # 直接将 limit_mode 传递给 find_messages
-    # print(f"get_raw_msg_by_timestamp_with_chat: {chat_id}, {timestamp_start}, {timestamp_end}, {limit}, {limit_mode}, {filter_bot}, {filter_command}")
-    return find_messages(
-        message_filter=filter_query,
-        sort=sort_order,
+    return _find_chat_messages(
+        chat_id,
+        timestamp_start,
+        timestamp_end,
         limit=limit,
         limit_mode=limit_mode,
         filter_bot=filter_bot,
@@ -153,13 +222,11 @@ def get_raw_msg_by_timestamp_with_chat_inclusive(
     limit: 限制返回的消息数量，0为不限制
     limit_mode: 当 limit > 0 时生效。 'earliest' 表示获取最早的记录， 'latest' 表示获取最新的记录。默认为 'latest'。
     """
-    filter_query = {"chat_id": chat_id, "time": {"$gte": timestamp_start, "$lte": timestamp_end}}
-    # 只有当 limit 为 0 时才应用外部 sort
-    sort_order = [("time", 1)] if limit == 0 else None
-    # 直接将 limit_mode 传递给 find_messages
-    return find_messages(
-        message_filter=filter_query,
-        sort=sort_order,
+    return _find_chat_messages(
+        chat_id,
+        timestamp_start,
+        timestamp_end,
+        inclusive=True,
         limit=limit,
         limit_mode=limit_mode,
         filter_bot=filter_bot,
@@ -180,14 +247,9 @@ def get_raw_msg_by_timestamp_with_chat_users(
     limit: 限制返回的消息数量，0为不限制
     limit_mode: 当 limit > 0 时生效。 'earliest' 表示获取最早的记录， 'latest' 表示获取最新的记录。默认为 'latest'。
     """
-    filter_query = {
-        "chat_id": chat_id,
-        "time": {"$gt": timestamp_start, "$lt": timestamp_end},
-        "user_id": {"$in": person_ids},
-    }
-    # 只有当 limit 为 0 时才应用外部 sort
-    sort_order = [("time", 1)] if limit == 0 else None
-    return find_messages(message_filter=filter_query, sort=sort_order, limit=limit, limit_mode=limit_mode)
+    return _find_chat_messages(
+        chat_id, timestamp_start, timestamp_end, limit=limit, limit_mode=limit_mode, person_ids=person_ids
+    )
 
 
 def get_actions_by_timestamp_with_chat(
@@ -265,8 +327,8 @@ def get_raw_msg_by_timestamp_random(
     """
     先在范围时间戳内随机选择一条消息，取得消息的chat_id，然后根据chat_id获取该聊天在指定时间戳范围内的消息
     """
-    # 获取所有消息，只取chat_id字段
-    all_msgs = get_raw_msg_by_timestamp(timestamp_start, timestamp_end)
+    # 获取所有消息，只取chat_id和time字段
+    all_msgs = get_raw_msg_by_timestamp(timestamp_start, timestamp_end, columns=("chat_id", "time"))
     if not all_msgs:
         return []
     # 随机选一条
@@ -305,11 +367,10 @@ def get_raw_msg_before_timestamp_with_chat(
     """获取指定时间戳之前的消息，按时间升序排序，返回消息列表
     limit: 限制返回的消息数量，0为不限制
     """
-    filter_query = {"chat_id": chat_id, "time": {"$lt": timestamp}}
-    sort_order = [("time", 1)]
-    return find_messages(
-        message_filter=filter_query,
-        sort=sort_order,
+    return _find_chat_messages(
+        chat_id,
+        float("-inf"),
+        timestamp,
         limit=limit,
         filter_intercept_message_level=filter_intercept_message_level,
     )
@@ -339,6 +400,14 @@ def num_new_messages_since(chat_id: str, timestamp_start: float = 0.0, timestamp
         # logger.warning(f"timestamp_start ({timestamp_start}) must be less than _timestamp_end ({_timestamp_end}). Returning 0.")
         return 0  # 起始时间大于等于结束时间，没有新消息
 
+    try:
+        cached_count = get_chat_manager().recent_messages.count(chat_id, timestamp_start, _timestamp_end)
+    except Exception as e:
+        logger.warning(f"读取最近消息缓存失败，改为查询数据库: {e}")
+        cached_count = None
+    if cached_count is not None:
+        return cached_count
+
     filter_query = {"chat_id": chat_id, "time": {"$gt": timestamp_start, "$lt": _timestamp_end}}
     return count_messages(message_filter=filter_query)
 
@@ -419,7 +488,7 @@ def _build_readable_messages_internal(
             pic_id = match.group(1)
             if pic_single:
                 if pic_id not in pic_description_cache:
-                    description = "内容正在阅读，请稍等"
+                    description = PENDING_DESCRIPTION
                     try:
                         image = Images.get_or_none(Images.image_id == pic_id)
                         if image and image.description:
@@ -590,7 +659,7 @@ def build_pic_mapping_info(pic_id_mapping: Dict[str, str]) -> str:
 
     for pic_id, display_name in sorted_items:
         # 从数据库中获取图片描述
-        description = "内容正在阅读，请稍等"
+        description = PENDING_DESCRIPTION
         try:
             image = Images.get_or_none(Images.image_id == pic_id)
             if image and image.description:
@@ -0,0 +1,259 @@
+import asyncio
+import heapq
+import itertools
+import time
+
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, List, Optional, Set, Tuple
+
+from src.common.logger import get_logger
+
+logger = get_logger("image_desc_queue")
+
+PRIORITY_HIGH = 0  # 即将回复的聊天中的图片
+PRIORITY_NORMAL = 1
+
+PENDING_DESCRIPTION = "内容正在阅读，请稍等"
+"""描述尚未生成时在提示词中显示的占位文本"""
+
+
+@dataclass
+class _DescriptionJob:
+    image_hash: str
+    image_base64: str
+    image_format: str
+    phash: str
+    priority: int
+    enqueue_time: float
+    image_ids: List[str] = field(default_factory=list)
+    chat_ids: Set[str] = field(default_factory=set)
+
+
+class ImageDescriptionQueue:
+    """
+    图片描述后台队列
+
+    - 消息入库时只登记图片，VLM识别在后台由有限数量的worker完成，不阻塞消息处理
+    - 同一哈希的图片合并为一个任务，只识别一次
+    - 即将回复的聊天中的图片优先识别
+    - 等待中的任务（含图片base64）数量有上限，积压满时丢弃优先级最低、最早登记的任务；
+      被丢弃的图片没有描述，下次再收到同一张图片时会重新登记
+    """
+
+    def __init__(self, max_workers: int = 3, max_queued: int = 200, metrics_window: int = 200):
+        self.max_workers = max_workers
+        self.max_queued = max_queued
+        self._jobs: Dict[str, _DescriptionJob] = {}  # 等待中和处理中的任务，按哈希索引
+        self._image_to_hash: Dict[str, str] = {}
+        self._heap: List[Tuple[int, int, str]] = []
+        self._seq = itertools.count()
+        self._queued: Set[str] = set()  # 还在等待的任务哈希
+        self._wakeup: Optional[asyncio.Event] = None
+        self._workers: List[asyncio.Task] = []
+
+        self._wait_times: Deque[float] = deque(maxlen=metrics_window)
+        self._process_times: Deque[float] = deque(maxlen=metrics_window)
+        self.processed_count = 0
+        self.coalesced_count = 0
+        self.failed_count = 0
+        self.dropped_count = 0
+
+    def _ensure_workers(self) -> None:
+        """在当前事件循环中启动worker（惰性启动）"""
+        self._workers = [task for task in self._workers if not task.done()]
+        if self._wakeup is None:
+            self._wakeup = asyncio.Event()
+        for index in range(len(self._workers), self.max_workers):
+            self._workers.append(asyncio.create_task(self._worker(), name=f"image-desc-worker-{index}"))
+
+    def _push(self, job: _DescriptionJob) -> None:
+        heapq.heappush(self._heap, (job.priority, next(self._seq), job.image_hash))
+
+    def submit(
+        self,
+        image_id: str,
+        image_base64: str,
+        image_hash: str,
+        image_format: str,
+        phash: str = "",
+        chat_id: Optional[str] = None,
+        priority: int = PRIORITY_NORMAL,
+    ) -> None:
+        """登记一张待识别的图片，立即返回
+
+        Args:
+            image_id: Images表中的图片ID
+            image_base64: 图片的base64编码
+            image_hash: 图片MD5哈希，相同哈希的请求会被合并
+            image_format: 图片格式
+            phash: 感知哈希
+            chat_id: 图片所在的聊天流ID，用于按聊天提升优先级
+            priority: 初始优先级
+        """
+        self._image_to_hash[image_id] = image_hash
+        if job := self._jobs.get(image_hash):
+            self.coalesced_count += 1
+            if image_id not in job.image_ids:
+                job.image_ids.append(image_id)
+            if chat_id:
+                job.chat_ids.add(chat_id)
+            if priority < job.priority and image_hash in self._queued:
+                job.priority = priority
+                self._push(job)
+            return
+
+        if len(self._queued) >= self.max_queued and not self._make_room(priority):
+            self._drop_images([image_id])
+            return
+
+        job = _DescriptionJob(
+            image_hash=image_hash,
+            image_base64=image_base64,
+            image_format=image_format,
+            phash=phash,
+            priority=priority,
+            enqueue_time=time.monotonic(),
+            image_ids=[image_id],
+            chat_ids={chat_id} if chat_id else set(),
+        )
+        self._jobs[image_hash] = job
+        self._queued.add(image_hash)
+        self._push(job)
+        self._ensure_workers()
+        self._wakeup.set()  # type: ignore
+
+        depth = len(self._queued)
+        if depth and depth % 20 == 0:
+            logger.warning(f"[图片识别队列] 积压 {depth} 张图片等待识别")
+
+    def _make_room(self, priority: int) -> bool:
+        """队列已满时丢弃一个等待中的任务：优先级最低的里面最早登记的；新任务优先级更低时不丢弃，返回False"""
+        victim = max(
+            (self._jobs[image_hash] for image_hash in self._queued),
+            key=lambda job: (job.priority, -job.enqueue_time),
+        )
+        if victim.priority < priority:
+            return False
+        self._queued.discard(victim.image_hash)
+        self._jobs.pop(victim.image_hash, None)
+        self._drop_images(victim.image_ids)
+        return True
+
+    def _drop_images(self, image_ids: List[str]) -> None:
+        for image_id in image_ids:
+            self._image_to_hash.pop(image_id, None)
+        self.dropped_count += 1
+        if self.dropped_count % 20 == 1:
+            logger.warning(
+                f"[图片识别队列] 积压已满 ({self.max_queued})，丢弃待识别图片，累计丢弃 {self.dropped_count} 张"
+            )
+
+    def prioritize_chat(self, chat_id: str) -> int:
+        """将某个聊天中等待识别的图片提到队首，在即将为该聊天回复时调用
+
+        Returns:
+            int: 被提升优先级的任务数
+        """
+        promoted = 0
+        for image_hash in self._queued:
+            job = self._jobs[image_hash]
+            if chat_id in job.chat_ids and job.priority > PRIORITY_HIGH:
+                job.priority = PRIORITY_HIGH
+                self._push(job)
+                promoted += 1
+        if promoted:
+            logger.debug(f"[图片识别队列] 提升 {promoted} 张图片的优先级 (chat: {chat_id})")
+        return promoted
+
+    def is_pending(self, image_id: Optional[str] = None, image_hash: Optional[str] = None) -> bool:
+        """图片是否在等待或正在识别"""
+        if image_hash is None and image_id is not None:
+            image_hash = self._image_to_hash.get(image_id)
+        return image_hash is not None and image_hash in self._jobs
+
+    def _pop(self) -> Optional[_DescriptionJob]:
+        while self._heap:
+            priority, _, image_hash = heapq.heappop(self._heap)
+            job = self._jobs.get(image_hash)
+            # 优先级提升后旧的堆条目作废
+            if job is None or image_hash not in self._queued or job.priority != priority:
+                continue
+            self._queued.discard(image_hash)
+            return job
+        return None
+
+    async def _worker(self) -> None:
+        while True:
+            job = self._pop()
+            if job is None:
+                # 单线程事件循环中取任务和清除信号之间不会插入新的任务
+                self._wakeup.clear()  # type: ignore
+                await self._wakeup.wait()  # type: ignore
+                continue
+            await self._run_job(job)
+
+    async def _run_job(self, job: _DescriptionJob) -> None:
+        start = time.monotonic()
+        wait_time = start - job.enqueue_time
+        self._wait_times.append(wait_time)
+        try:
+            from src.chat.utils.utils_image import get_image_manager
+
+            image_manager = get_image_manager()
+            # 同一哈希只调用一次VLM，其余图片ID会直接命中缓存；处理期间合并进来的图片ID也会被处理
+            index = 0
+            while index < len(job.image_ids):
+                await image_manager._process_image_with_vlm(
+                    job.image_ids[index], job.image_base64, job.image_hash, job.image_format, job.phash
+                )
+                index += 1
+            self.processed_count += 1
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.failed_count += 1
+            logger.error(f"[图片识别队列] 识别失败 (Hash: {job.image_hash[:8]}...): {e}")
+        finally:
+            self._jobs.pop(job.image_hash, None)
+            for image_id in job.image_ids:
+                self._image_to_hash.pop(image_id, None)
+            process_time = time.monotonic() - start
+            self._process_times.append(process_time)
+            logger.debug(
+                f"[图片识别队列] 完成 {job.image_hash[:8]}... 等待 {wait_time:.2f}s, 识别 {process_time:.2f}s, "
+                f"剩余 {len(self._queued)}"
+            )
+
+    @staticmethod
+    def _percentile(values: Deque[float], q: float) -> float:
+        if not values:
+            return 0.0
+        ordered = sorted(values)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """队列指标：深度、处理中数量、等待/识别耗时"""
+        return {
+            "queue_depth": len(self._queued),
+            "in_progress": len(self._jobs) - len(self._queued),
+            "workers": len([task for task in self._workers if not task.done()]),
+            "processed": self.processed_count,
+            "coalesced": self.coalesced_count,
+            "failed": self.failed_count,
+            "dropped": self.dropped_count,
+            "avg_wait_seconds": sum(self._wait_times) / len(self._wait_times) if self._wait_times else 0.0,
+            "p95_wait_seconds": self._percentile(self._wait_times, 0.95),
+            "avg_process_seconds": (
+                sum(self._process_times) / len(self._process_times) if self._process_times else 0.0
+            ),
+        }
+
+    def stop(self) -> None:
+        """停止所有worker，未完成的图片保持未识别状态"""
+        for task in self._workers:
+            task.cancel()
+        self._workers.clear()
+
+
+image_description_queue = ImageDescriptionQueue()
@@ -0,0 +1,182 @@
+import asyncio
+import importlib.machinery
+import multiprocessing
+import os
+import sys
+
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+from dataclasses import dataclass
+from functools import partial
+from typing import Any, Awaitable, Callable, Dict, Iterator, Optional, TypeVar
+
+from src.common import image_worker
+from src.common.logger import get_logger
+from src.chat.utils.phash_index import PHashIndex
+
+logger = get_logger("image_service")
+
+T = TypeVar("T")
+
+
+@contextmanager
+def _skip_main_reimport() -> Iterator[None]:
+    """
+    启动 spawn 子进程期间，让子进程跳过重新执行主脚本
+
+    spawn 子进程默认会以 __mp_main__ 的名字重新执行主脚本，bot.py 会因此再初始化一遍日志并导入整个麦麦。
+    主模块的 __spec__ 名为 "__main__" 时，子进程不会重新执行它；进程池中的函数都在 src.common.image_worker 中，用不到主模块。
+    """
+    main_module = sys.modules.get("__main__")
+    if main_module is None or getattr(main_module, "__spec__", None) is not None:
+        yield
+        return
+    main_module.__spec__ = importlib.machinery.ModuleSpec("__main__", None)
+    try:
+        yield
+    finally:
+        main_module.__spec__ = None
+
+
+@dataclass
+class DecodedImage:
+    """解码后的图片"""
+
+    data: bytes
+    """图片字节"""
+
+    hash: str
+    """图片MD5哈希"""
+
+    format: str
+    """小写的图片格式，无法识别时为空字符串"""
+
+    phash: str = ""
+    """感知哈希（64位dHash的十六进制），动图或无法计算时为空字符串"""
+
+
+class ImageProcessService:
+    """
+    图片处理服务
+
+    - 解码、哈希、GIF抽帧拼接等CPU密集型任务在进程池中执行，不阻塞事件循环
+    - 同一张图片（按哈希）的VLM描述请求合并为一次（single-flight）
+    - 在 ImageDescriptions / EmojiDescriptionCache 前维护一层内存LRU描述缓存
+    - 维护图片/表情包描述的感知哈希索引，重新压缩、缩放后的同一张图可以复用已有描述
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, cache_size: int = 2048):
+        self._max_workers = max_workers or min(4, os.cpu_count() or 1)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._description_cache: "OrderedDict[str, str]" = OrderedDict()
+        self._cache_size = cache_size
+        self.image_phash_index = PHashIndex()
+        """图片感知哈希索引，键为 Images.emoji_hash"""
+        self.emoji_phash_index = PHashIndex()
+        """表情包描述缓存的感知哈希索引，键为 EmojiDescriptionCache.emoji_hash"""
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # 不使用 fork：fork 出的子进程会继承日志写入线程等持有的锁
+            self._executor = ProcessPoolExecutor(
+                max_workers=self._max_workers, mp_context=multiprocessing.get_context("spawn")
+            )
+            logger.debug(f"图片处理进程池已启动，进程数: {self._max_workers}")
+        return self._executor
+
+    async def _run(self, func: Callable[..., T], *args: Any) -> T:
+        """在进程池中执行函数，进程池不可用时退回线程执行"""
+        loop = asyncio.get_running_loop()
+        try:
+            # 子进程在提交任务时按需启动
+            with _skip_main_reimport():
+                future = loop.run_in_executor(self._get_executor(), partial(func, *args))
+        except (OSError, RuntimeError) as e:
+            # 无法创建子进程（例如受限环境），使用线程兜底
+            logger.warning(f"图片处理进程池不可用，改用线程执行: {e}")
+            self._discard_executor()
+            return await asyncio.to_thread(func, *args)
+        try:
+            return await future
+        except BrokenProcessPool as e:
+            logger.warning(f"图片处理进程池崩溃，重建进程池并改用线程执行本次任务: {e}")
+            self._discard_executor()
+            return await asyncio.to_thread(func, *args)
+
+    def _discard_executor(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    async def decode(self, image_base64: str) -> DecodedImage:
+        """解码base64图片，计算MD5和格式"""
+        data, image_hash, image_format, phash = await self._run(image_worker.decode_image, image_base64)
+        return DecodedImage(data=data, hash=image_hash, format=image_format, phash=phash)
+
+    async def transform_gif(
+        self, gif_base64: str, similarity_threshold: float = 1000.0, max_frames: int = 15
+    ) -> Optional[str]:
+        """将GIF转换为水平拼接的静态JPG图像，失败时返回None"""
+        try:
+            return await self._run(image_worker.transform_gif, gif_base64, similarity_threshold, max_frames)
+        except MemoryError:
+            logger.error("GIF转换失败: 内存不足，可能是GIF太大或帧数太多")
+        except Exception as e:
+            logger.error(f"GIF转换失败: {str(e)}")
+        return None
+
+    def get_cached_description(self, key: str) -> Optional[str]:
+        """从内存LRU中获取描述"""
+        description = self._description_cache.get(key)
+        if description is not None:
+            self._description_cache.move_to_end(key)
+        return description
+
+    def cache_description(self, key: str, description: str) -> None:
+        """写入内存LRU，空描述不缓存"""
+        if not description:
+            return
+        self._description_cache[key] = description
+        self._description_cache.move_to_end(key)
+        while len(self._description_cache) > self._cache_size:
+            self._description_cache.popitem(last=False)
+
+    def invalidate_description(self, key: str) -> None:
+        """移除内存LRU中的描述"""
+        self._description_cache.pop(key, None)
+
+    async def single_flight(self, key: str, factory: Callable[[], Awaitable[T]]) -> T:
+        """同一个key同时只执行一次factory，并发的调用者共享同一个结果
+
+        factory 在独立的任务中执行：任何一个调用者（包括第一个）被取消都不会取消共享的请求，
+        其他调用者照常拿到结果。
+
+        Args:
+            key: 去重键，如 "image:<hash>"
+            factory: 生成协程的函数，只有第一个调用者会执行
+        """
+        if inflight := self._inflight.get(key):
+            logger.debug(f"[合并请求] 等待进行中的描述请求: {key}")
+            return await asyncio.shield(inflight)
+
+        task = asyncio.ensure_future(factory())
+        self._inflight[key] = task
+        task.add_done_callback(partial(self._finish_flight, key))
+        return await asyncio.shield(task)
+
+    def _finish_flight(self, key: str, task: asyncio.Future) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            # 标记异常已读取，避免无人等待时产生 "exception was never retrieved" 警告
+            task.exception()
+
+    def shutdown(self) -> None:
+        """关闭进程池"""
+        self._discard_executor()
+
+
+image_process_service = ImageProcessService()
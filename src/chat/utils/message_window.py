@@ -0,0 +1,129 @@
+import time
+from bisect import bisect_left
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.config.config import global_config
+from src.common.logger import get_logger
+from src.common.data_models.database_data_model import DatabaseMessages
+from src.chat.utils.chat_message_builder import (
+    build_readable_messages,
+    build_readable_messages_with_id,
+    get_raw_msg_before_timestamp_with_chat,
+    get_raw_msg_by_timestamp_with_chat_inclusive,
+)
+
+logger = get_logger("message_window")
+
+
+class MessageWindow:
+    """
+    单次思考循环内共享的消息窗口
+
+    只查询一次数据库获取最大的窗口，较小的窗口通过切片得到；
+    可读文本按 (切片, 格式化参数) 缓存，同一视图在一个循环内只格式化一次。
+    在 动作修改 -> 规划器 -> 回复器 之间传递。
+    """
+
+    def __init__(
+        self,
+        chat_id: str,
+        timestamp: Optional[float] = None,
+        limit: Optional[int] = None,
+        filter_intercept_message_level: Optional[int] = 1,
+    ):
+        """
+        Args:
+            chat_id: 聊天流ID
+            timestamp: 窗口锚点，获取该时间戳之前的消息，默认当前时间
+            limit: 初次获取的消息数量，默认 max_context_size
+            filter_intercept_message_level: 拦截消息过滤等级
+        """
+        self.chat_id = chat_id
+        self.timestamp = timestamp if timestamp is not None else time.time()
+        self.limit = limit if limit is not None else global_config.chat.max_context_size
+        self.filter_intercept_message_level = filter_intercept_message_level
+
+        self._messages: Optional[List[DatabaseMessages]] = None
+        self._times: List[float] = []
+        self._exhausted = False  # 数据库中已经没有更早的消息
+        self._readable_cache: Dict[Tuple[Any, ...], Any] = {}
+        self.query_count = 0
+
+    def _fetch(self, timestamp: float, limit: int, inclusive: bool = False) -> List[DatabaseMessages]:
+        self.query_count += 1
+        if inclusive:
+            return get_raw_msg_by_timestamp_with_chat_inclusive(
+                chat_id=self.chat_id,
+                timestamp_start=float("-inf"),
+                timestamp_end=timestamp,
+                limit=limit,
+                filter_intercept_message_level=self.filter_intercept_message_level,
+            )
+        return get_raw_msg_before_timestamp_with_chat(
+            chat_id=self.chat_id,
+            timestamp=timestamp,
+            limit=limit,
+            filter_intercept_message_level=self.filter_intercept_message_level,
+        )
+
+    def _ensure(self, size: int) -> List[DatabaseMessages]:
+        """保证窗口内至少有 size 条消息（除非数据库中已没有更早的消息）"""
+        if self._messages is None:
+            fetch_limit = max(size, self.limit)
+            self._messages = self._fetch(self.timestamp, fetch_limit)
+            self._exhausted = len(self._messages) < fetch_limit
+            self.limit = fetch_limit
+        elif size > len(self._messages) and not self._exhausted:
+            # 窗口不够大，只向前补齐缺少的部分，已有的消息保持不变
+            need = size - len(self._messages)
+            if self._messages:
+                # 与最早一条消息时间相同的消息可能还没取到，查询包含边界，再按消息ID去掉已有的
+                oldest = self._messages[0].time
+                known = {msg.message_id for msg in self._messages if msg.time == oldest}
+                fetched = self._fetch(oldest, need + len(known), inclusive=True)
+                older = [msg for msg in fetched if msg.message_id not in known]
+                self._exhausted = len(fetched) < need + len(known)
+            else:
+                older = self._fetch(self.timestamp, need)
+                self._exhausted = len(older) < need
+            self._messages = older + self._messages
+            self.limit = len(self._messages)
+        else:
+            return self._messages
+        self._times = [msg.time or 0.0 for msg in self._messages]
+        return self._messages
+
+    def get_messages(self, limit: int, before: Optional[float] = None) -> List[DatabaseMessages]:
+        """
+        获取窗口中最近的 limit 条消息，按时间升序
+
+        Args:
+            limit: 消息数量，<=0 表示整个窗口
+            before: 只返回该时间戳之前的消息，None 表示使用窗口锚点
+        """
+        messages = self._ensure(limit)
+        if before is None or before >= self.timestamp:
+            return messages[-limit:] if limit > 0 else list(messages)
+
+        end = bisect_left(self._times, before)
+        while limit > 0 and end < limit and not self._exhausted:
+            messages = self._ensure(len(messages) - end + limit)
+            end = bisect_left(self._times, before)
+        start = max(0, end - limit) if limit > 0 else 0
+        return messages[start:end]
+
+    def build_readable(self, limit: int, before: Optional[float] = None, **options: Any) -> str:
+        """获取切片的可读文本，参数同 build_readable_messages，结果按参数缓存"""
+        key = ("readable", limit, before, tuple(sorted(options.items())))
+        if key not in self._readable_cache:
+            self._readable_cache[key] = build_readable_messages(self.get_messages(limit, before), **options)
+        return self._readable_cache[key]
+
+    def build_readable_with_id(
+        self, limit: int, before: Optional[float] = None, **options: Any
+    ) -> Tuple[str, List[Tuple[str, DatabaseMessages]]]:
+        """获取切片的可读文本和消息ID列表，参数同 build_readable_messages_with_id，结果按参数缓存"""
+        key = ("readable_with_id", limit, before, tuple(sorted(options.items())))
+        if key not in self._readable_cache:
+            self._readable_cache[key] = build_readable_messages_with_id(self.get_messages(limit, before), **options)
+        return self._readable_cache[key]
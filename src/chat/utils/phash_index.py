@@ -0,0 +1,118 @@
+from typing import Dict, Iterable, List, Optional, Set, Tuple, Union
+
+PHASH_BITS = 64
+PHASH_MAX_DISTANCE = 3  # 默认视为近似重复的最大汉明距离
+
+
+def phash_to_int(phash: Union[str, int]) -> int:
+    """将十六进制感知哈希转换为整数"""
+    return phash if isinstance(phash, int) else int(phash, 16)
+
+
+def hamming_distance(a: Union[str, int], b: Union[str, int]) -> int:
+    """计算两个64位感知哈希的汉明距离"""
+    return (phash_to_int(a) ^ phash_to_int(b)).bit_count()
+
+
+class PHashIndex:
+    """
+    64位感知哈希的多索引哈希（Multi-Index Hashing）近邻索引
+
+    将哈希切分为 max_distance + 1 段，每段建立一张精确匹配表。
+    由抽屉原理，与查询距离不超过 max_distance 的哈希至少有一段与查询完全相同，
+    因此只需检查各段命中的候选，查询代价与索引规模基本无关。
+    """
+
+    def __init__(self, max_distance: int = PHASH_MAX_DISTANCE):
+        if not 0 <= max_distance < PHASH_BITS:
+            raise ValueError(f"max_distance 必须在 [0, {PHASH_BITS}) 范围内")
+        self.max_distance = max_distance
+        chunks = max_distance + 1
+        width = PHASH_BITS // chunks
+        # (偏移, 掩码)，最后一段吸收除不尽的位
+        self._segments: List[Tuple[int, int]] = []
+        for i in range(chunks):
+            bits = width if i < chunks - 1 else PHASH_BITS - width * (chunks - 1)
+            self._segments.append((i * width, (1 << bits) - 1))
+        self._tables: List[Dict[int, Set[str]]] = [{} for _ in range(chunks)]
+        self._hashes: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._hashes)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._hashes
+
+    def _parts(self, value: int) -> Iterable[Tuple[int, int]]:
+        for i, (offset, mask) in enumerate(self._segments):
+            yield i, (value >> offset) & mask
+
+    def add(self, key: str, phash: Union[str, int]) -> None:
+        """添加或更新一条记录，空哈希会被忽略"""
+        if phash in ("", None):
+            return
+        value = phash_to_int(phash)
+        if self._hashes.get(key) == value:
+            return
+        self.remove(key)
+        self._hashes[key] = value
+        for i, part in self._parts(value):
+            self._tables[i].setdefault(part, set()).add(key)
+
+    def add_many(self, items: Iterable[Tuple[str, Union[str, int]]]) -> None:
+        for key, phash in items:
+            self.add(key, phash)
+
+    def remove(self, key: str) -> None:
+        value = self._hashes.pop(key, None)
+        if value is None:
+            return
+        for i, part in self._parts(value):
+            bucket = self._tables[i].get(part)
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del self._tables[i][part]
+
+    def search(self, phash: Union[str, int], max_distance: Optional[int] = None) -> List[Tuple[str, int]]:
+        """查找距离不超过 max_distance 的记录
+
+        Returns:
+            List[Tuple[str, int]]: (键, 汉明距离) 列表，按距离升序
+        """
+        if phash in ("", None):
+            return []
+        value = phash_to_int(phash)
+        radius = self.max_distance if max_distance is None else max_distance
+
+        if radius > self.max_distance:
+            # 超出分段能保证的半径，退化为线性扫描
+            candidates: Iterable[str] = self._hashes.keys()
+        else:
+            candidate_set: Set[str] = set()
+            for i, part in self._parts(value):
+                if bucket := self._tables[i].get(part):
+                    candidate_set.update(bucket)
+            candidates = candidate_set
+
+        results = []
+        for key in candidates:
+            distance = (self._hashes[key] ^ value).bit_count()
+            if distance <= radius:
+                results.append((key, distance))
+        results.sort(key=lambda item: item[1])
+        return results
+
+    def nearest(self, phash: Union[str, int], max_distance: Optional[int] = None) -> Optional[Tuple[str, int]]:
+        """返回距离最近的一条记录，没有则返回None"""
+        results = self.search(phash, max_distance)
+        return results[0] if results else None
+
+    def items(self) -> List[Tuple[str, int]]:
+        """返回全部 (键, 整数哈希)"""
+        return list(self._hashes.items())
+
+    def clear(self) -> None:
+        for table in self._tables:
+            table.clear()
+        self._hashes.clear()
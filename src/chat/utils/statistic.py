@@ -7,7 +7,7 @@ from datetime import datetime, timedelta
 from typing import Any, Dict, Tuple, List
 
 from src.common.logger import get_logger
-from src.common.database.database import db
+from src.common.database.database import db, db_writer
 from src.common.database.database_model import OnlineTime, LLMUsage, Messages, ActionRecords
 from src.manager.async_task_manager import AsyncTask
 from src.manager.local_store_manager import local_storage
@@ -73,45 +73,49 @@ class OnlineTimeRecordTask(AsyncTask):
         with db.atomic():  # Use atomic operations for schema changes
             OnlineTime.create_table(safe=True)  # Creates table if it doesn't exist, Peewee handles indexes from model
 
-    async def run(self):  # sourcery skip: use-named-expression
+    async def run(self):
         try:
-            current_time = datetime.now()
-            extended_end_time = current_time + timedelta(minutes=1)
+            await db_writer.write(self._record_online_time, label="OnlineTime.record")
+        except Exception as e:
+            logger.error(f"在线时间记录失败，错误信息：{e}")
+
+    def _record_online_time(self):  # sourcery skip: use-named-expression
+        """更新或创建在线时间记录（在写线程中执行）"""
+        current_time = datetime.now()
+        extended_end_time = current_time + timedelta(minutes=1)
+
+        if self.record_id:
+            # 如果有记录，则更新结束时间
+            query = OnlineTime.update(end_timestamp=extended_end_time).where(OnlineTime.id == self.record_id)  # type: ignore
+            updated_rows = query.execute()
+            if updated_rows == 0:
+                # Record might have been deleted or ID is stale, try to find/create
+                self.record_id = None  # Reset record_id to trigger find/create logic below
+
+        if not self.record_id:  # Check again if record_id was reset or initially None
+            # 如果没有记录，检查一分钟以内是否已有记录
+            # Look for a record whose end_timestamp is recent enough to be considered ongoing
+            recent_record = (
+                OnlineTime.select()
+                .where(OnlineTime.end_timestamp >= (current_time - timedelta(minutes=1)))  # type: ignore
+                .order_by(OnlineTime.end_timestamp.desc())
+                .first()
+            )
 
-            if self.record_id:
+            if recent_record:
                 # 如果有记录，则更新结束时间
-                query = OnlineTime.update(end_timestamp=extended_end_time).where(OnlineTime.id == self.record_id)  # type: ignore
-                updated_rows = query.execute()
-                if updated_rows == 0:
-                    # Record might have been deleted or ID is stale, try to find/create
-                    self.record_id = None  # Reset record_id to trigger find/create logic below
-
-            if not self.record_id:  # Check again if record_id was reset or initially None
-                # 如果没有记录，检查一分钟以内是否已有记录
-                # Look for a record whose end_timestamp is recent enough to be considered ongoing
-                recent_record = (
-                    OnlineTime.select()
-                    .where(OnlineTime.end_timestamp >= (current_time - timedelta(minutes=1)))  # type: ignore
-                    .order_by(OnlineTime.end_timestamp.desc())
-                    .first()
+                self.record_id = recent_record.id
+                recent_record.end_timestamp = extended_end_time
+                recent_record.save()
+            else:
+                # 若没有记录，则插入新的在线时间记录
+                new_record = OnlineTime.create(
+                    timestamp=current_time.timestamp(),  # 添加此行
+                    start_timestamp=current_time,
+                    end_timestamp=extended_end_time,
+                    duration=5,  # 初始时长为5分钟
                 )
-
-                if recent_record:
-                    # 如果有记录，则更新结束时间
-                    self.record_id = recent_record.id
-                    recent_record.end_timestamp = extended_end_time
-                    recent_record.save()
-                else:
-                    # 若没有记录，则插入新的在线时间记录
-                    new_record = OnlineTime.create(
-                        timestamp=current_time.timestamp(),  # 添加此行
-                        start_timestamp=current_time,
-                        end_timestamp=extended_end_time,
-                        duration=5,  # 初始时长为5分钟
-                    )
-                    self.record_id = new_record.id
-        except Exception as e:
-            logger.error(f"在线时间记录失败，错误信息：{e}")
+                self.record_id = new_record.id
 
 
 def _format_online_time(online_seconds: int) -> str:
@@ -230,6 +234,7 @@ class StatisticOutputTask(AsyncTask):
             self._format_module_classified_stat(stats["last_hour"]),
             "",
             self._format_chat_stat(stats["last_hour"]),
+            self._format_db_writer_stat(),
             self.SEP_LINE,
             "",
         ]
@@ -854,6 +859,38 @@ class StatisticOutputTask(AsyncTask):
         output.append("")
         return "\n".join(output)
 
+    @staticmethod
+    def _format_db_writer_stat() -> str:
+        """
+        格式化数据库写线程的统计数据（自启动以来累计）
+        """
+        writer_stats = db_writer.get_stats()
+        if not writer_stats["statements"]:
+            return ""
+        data_fmt = "{:<32}  {:>10}  {:>8}  {:>14.2f}  {:>14.2f}  {:>14.2f}  {:>14.2f}"
+
+        output = [
+            f"数据库写入统计: 事务 {writer_stats['transactions']} 个，累计提交耗时 {writer_stats['commit_seconds']:.2f}秒，"
+            f"当前排队 {writer_stats['queued']} 个",
+            " 操作名称                          执行次数    失败次数  平均执行(毫秒)  最大执行(毫秒)  平均排队(毫秒)  最大排队(毫秒)",
+        ]
+        for label, stat in sorted(writer_stats["statements"].items()):
+            name = f"{label[:29]}..." if len(label) > 32 else label
+            output.append(
+                data_fmt.format(
+                    name,
+                    _format_large_number(stat["count"]),
+                    stat["errors"],
+                    stat["avg_exec_ms"],
+                    stat["max_exec_seconds"] * 1000,
+                    stat["avg_wait_ms"],
+                    stat["max_wait_seconds"] * 1000,
+                )
+            )
+
+        output.append("")
+        return "\n".join(output)
+
     def _format_chat_stat(self, stats: Dict[str, Any]) -> str:
         """
         格式化聊天统计数据
@@ -2282,6 +2319,10 @@ class AsyncStatisticOutputTask(AsyncTask):
     def _format_chat_stat(self, stats: Dict[str, Any]) -> str:
         return StatisticOutputTask._format_chat_stat(self, stats)  # type: ignore
 
+    @staticmethod
+    def _format_db_writer_stat() -> str:
+        return StatisticOutputTask._format_db_writer_stat()
+
     def _generate_chart_data(self, stat: dict[str, Any]) -> dict:
         return StatisticOutputTask._generate_chart_data(self, stat)  # type: ignore
 
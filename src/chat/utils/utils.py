@@ -1,7 +1,6 @@
 import random
 import re
 import time
-import jieba
 import json
 import ast
 import os
@@ -16,7 +15,6 @@ from src.chat.message_receive.message import MessageRecv
 from src.chat.message_receive.chat_stream import get_chat_manager
 from src.llm_models.utils_model import LLMRequest
 from src.person_info.person_info import Person
-from .typo_generator import ChineseTypoGenerator
 
 if TYPE_CHECKING:
     from src.common.data_models.info_data_model import TargetPersonInfo
@@ -473,6 +471,9 @@ def process_llm_response(text: str, enable_splitter: bool = True, enable_chinese
         logger.warning(f"回复过长 ({len(cleaned_text)} 字符)，返回默认回复")
         return [_get_random_default_reply()]
 
+    # jieba/pypinyin 导入较慢，在第一次生成错别字时才导入
+    from .typo_generator import ChineseTypoGenerator
+
     typo_generator = ChineseTypoGenerator(
         error_rate=global_config.chinese_typo.error_rate,
         min_freq=global_config.chinese_typo.min_freq,
@@ -879,6 +880,8 @@ def parse_keywords_string(keywords_input) -> list[str]:
 
 def cut_key_words(concept_name: str) -> list[str]:
     """对概念名称进行jieba分词，并过滤掉关键词列表中的关键词"""
+    import jieba
+
     concept_name_tokens = list(jieba.cut(concept_name))
 
     # 定义常见连词、停用词与标点
@@ -1,20 +1,19 @@
 import base64
 import os
 import time
-import hashlib
 import uuid
-import io
-import numpy as np
 
 from typing import Optional, Tuple
-from PIL import Image
 from rich.traceback import install
 
 from src.common.logger import get_logger
-from src.common.database.database import db
+from src.common.database.database import db, db_writer
 from src.common.database.database_model import Images, ImageDescriptions, EmojiDescriptionCache
 from src.config.config import global_config, model_config
 from src.llm_models.utils_model import LLMRequest
+from src.common import image_worker
+from src.chat.utils.image_service import image_process_service
+from src.chat.utils.image_description_queue import image_description_queue
 
 install(extra_lines=3)
 
@@ -54,6 +53,11 @@ class ImageManager:
             except Exception as e:
                 logger.warning(f"清理ImageDescriptions中的emoji记录失败: {e}")
 
+            try:
+                self._load_phash_indexes()
+            except Exception as e:
+                logger.warning(f"加载感知哈希索引失败: {e}")
+
             self._initialized = True
 
     def _ensure_image_dir(self):
@@ -147,15 +151,105 @@ class ImageManager:
             logger.error(f"清理Images和ImageDescriptions中的emoji记录时出错: {str(e)}")
             raise
 
+    @staticmethod
+    def _load_phash_indexes():
+        """从数据库加载图片和表情包描述缓存的感知哈希索引"""
+        image_rows = Images.select(Images.emoji_hash, Images.phash).where(Images.phash.is_null(False)).tuples()
+        image_process_service.image_phash_index.add_many(image_rows)
+        emoji_rows = (
+            EmojiDescriptionCache.select(EmojiDescriptionCache.emoji_hash, EmojiDescriptionCache.phash)
+            .where(EmojiDescriptionCache.phash.is_null(False))
+            .tuples()
+        )
+        image_process_service.emoji_phash_index.add_many(emoji_rows)
+        logger.info(
+            f"[感知哈希] 已加载图片索引 {len(image_process_service.image_phash_index)} 条, "
+            f"表情包索引 {len(image_process_service.emoji_phash_index)} 条"
+        )
+
+    @staticmethod
+    def _backfill_phash(record, phash: str) -> None:
+        """为缺少感知哈希的旧记录补全，并加入对应索引"""
+        if not phash or record.phash:
+            return
+        try:
+            record.phash = phash
+            record.save()
+        except Exception as e:
+            logger.debug(f"补全感知哈希失败: {e}")
+            return
+        if isinstance(record, EmojiDescriptionCache):
+            image_process_service.emoji_phash_index.add(record.emoji_hash, phash)
+        else:
+            image_process_service.image_phash_index.add(record.emoji_hash, phash)
+
+    def _find_similar_image_description(self, image_hash: str, phash: str) -> Optional[str]:
+        """通过感知哈希查找近似图片的已有描述
+
+        Args:
+            image_hash: 当前图片的MD5哈希，结果中会排除自身
+            phash: 当前图片的感知哈希
+
+        Returns:
+            Optional[str]: 近似图片的描述，没有则返回None
+        """
+        for similar_hash, distance in image_process_service.image_phash_index.search(phash):
+            if similar_hash == image_hash:
+                continue
+            description = self._get_cached_image_description(similar_hash)
+            if not description:
+                record = Images.get_or_none(
+                    (Images.emoji_hash == similar_hash) & (Images.description.is_null(False)) & (Images.description != "")
+                )
+                description = record.description if record else None
+            if description:
+                logger.info(f"[近似命中] 复用相似图片的描述 (距离: {distance}, Hash: {similar_hash[:8]}...)")
+                # 以当前哈希写入缓存，之后的精确查询直接命中
+                self._save_description_to_db(image_hash, description, "image")
+                image_process_service.cache_description(f"image:{image_hash}", description)
+                return description
+        return None
+
+    @staticmethod
+    def _find_similar_emoji_cache(image_hash: str, phash: str) -> Optional[EmojiDescriptionCache]:
+        """通过感知哈希查找近似表情包的描述缓存，并以当前哈希保存一份
+
+        Args:
+            image_hash: 当前表情包的MD5哈希，结果中会排除自身
+            phash: 当前表情包的感知哈希
+
+        Returns:
+            Optional[EmojiDescriptionCache]: 近似表情包的缓存记录，没有则返回None
+        """
+        for similar_hash, distance in image_process_service.emoji_phash_index.search(phash):
+            if similar_hash == image_hash:
+                continue
+            record = EmojiDescriptionCache.get_or_none(EmojiDescriptionCache.emoji_hash == similar_hash)
+            if not record or not record.description:
+                continue
+            logger.info(f"[近似命中] 复用相似表情包的描述 (距离: {distance}, Hash: {similar_hash[:8]}...)")
+            try:
+                EmojiDescriptionCache.get_or_create(
+                    emoji_hash=image_hash,
+                    defaults={
+                        "phash": phash,
+                        "description": record.description,
+                        "emotion_tags": record.emotion_tags,
+                        "timestamp": time.time(),
+                    },
+                )
+                image_process_service.emoji_phash_index.add(image_hash, phash)
+            except Exception as e:
+                logger.debug(f"保存近似表情包缓存失败: {e}")
+            return record
+        return None
+
     async def get_emoji_tag(self, image_base64: str) -> str:
         from src.chat.emoji_system.emoji_manager import get_emoji_manager
 
         emoji_manager = get_emoji_manager()
-        if isinstance(image_base64, str):
-            image_base64 = image_base64.encode("ascii", errors="ignore").decode("ascii")
-        image_bytes = base64.b64decode(image_base64)
-        image_hash = hashlib.md5(image_bytes).hexdigest()
-        emoji = await emoji_manager.get_emoji_from_manager(image_hash)
+        decoded = await image_process_service.decode(image_base64)
+        emoji = await emoji_manager.get_emoji_from_manager(decoded.hash)
         if not emoji:
             return "[表情包：未知]"
         emotion_list = emoji.emotion
@@ -204,15 +298,13 @@ class ImageManager:
             logger.warning(f"[自动保存] 保存表情包文件时出错: {save_error}")
 
     async def get_emoji_description(self, image_base64: str) -> str:
-        """获取表情包描述，优先使用EmojiDescriptionCache表中的缓存数据"""
+        """获取表情包描述，优先使用内存缓存和EmojiDescriptionCache表中的缓存数据"""
         try:
-            # 计算图片哈希
-            # 确保base64字符串只包含ASCII字符
-            if isinstance(image_base64, str):
-                image_base64 = image_base64.encode("ascii", errors="ignore").decode("ascii")
-            image_bytes = base64.b64decode(image_base64)
-            image_hash = hashlib.md5(image_bytes).hexdigest()
-            image_format = Image.open(io.BytesIO(image_bytes)).format.lower()  # type: ignore
+            # 解码和计算哈希在进程池中进行
+            image_base64 = image_worker.normalize_base64(image_base64)
+            decoded = await image_process_service.decode(image_base64)
+            image_hash = decoded.hash
+            image_format = decoded.format
 
             # 优先使用EmojiManager查询已注册表情包的描述
             try:
@@ -224,12 +316,27 @@ class ImageManager:
                     tag_str = ",".join(tags)
                     logger.info(f"[缓存命中] 使用已注册表情包描述: {tag_str}...")
                     return f"[表情包：{tag_str}]"
+                if decoded.phash and (similar_emoji := emoji_manager.find_similar_emoji(decoded.phash)):
+                    tag_str = ",".join(similar_emoji.emotion)
+                    logger.info(f"[近似命中] 使用相似的已注册表情包描述: {tag_str}...")
+                    return f"[表情包：{tag_str}]"
             except Exception as e:
                 logger.debug(f"查询EmojiManager时出错: {e}")
 
+            cache_key = f"emoji:{image_hash}"
+            if cached_tags := image_process_service.get_cached_description(cache_key):
+                logger.debug(f"[缓存命中] 使用内存缓存的表情包情感标签: {cached_tags[:50]}...")
+                await self._save_emoji_file_if_needed(image_base64, image_hash, image_format)
+                return f"[表情包：{cached_tags}]"
+
             # 查询EmojiDescriptionCache表的缓存（包含描述和情感标签）
             try:
                 cache_record = EmojiDescriptionCache.get_or_none(EmojiDescriptionCache.emoji_hash == image_hash)
+                if cache_record:
+                    self._backfill_phash(cache_record, decoded.phash)
+                elif decoded.phash:
+                    # 重新压缩、缩放过的同一表情包，复用已有描述，不再调用VLM
+                    cache_record = self._find_similar_emoji_cache(image_hash, decoded.phash)
                 if cache_record:
                     # 优先使用情感标签，如果没有则使用详细描述
                     result_text = ""
@@ -238,6 +345,7 @@ class ImageManager:
                             f"[缓存命中] 使用EmojiDescriptionCache表中的情感标签: {cache_record.emotion_tags[:50]}..."
                         )
                         result_text = f"[表情包：{cache_record.emotion_tags}]"
+                        image_process_service.cache_description(cache_key, cache_record.emotion_tags)
                     elif cache_record.description:
                         logger.info(
                             f"[缓存命中] 使用EmojiDescriptionCache表中的描述: {cache_record.description[:50]}..."
@@ -251,93 +359,15 @@ class ImageManager:
             except Exception as e:
                 logger.debug(f"查询EmojiDescriptionCache时出错: {e}")
 
-            # === 二步走识别流程 ===
-
-            # 第一步：VLM视觉分析 - 生成详细描述
-            if image_format in ["gif", "GIF"]:
-                image_base64_processed = self.transform_gif(image_base64)
-                if image_base64_processed is None:
-                    logger.warning("GIF转换失败，无法获取描述")
-                    return "[表情包(GIF处理失败)]"
-                vlm_prompt = """这是一个动态图表情包，每一张图代表了动态图的某一帧，黑色背景代表透明，请生成表情包所表达的情感和内容的详细描述，不要输出"好的"、"我们来"、"分析"等解释性文字，输出为一段**平文本**，请注意不要分点。"""
-                detailed_description, _ = await self.vlm.generate_response_for_image(
-                    vlm_prompt, image_base64_processed, "jpg", temperature=0.4
-                )
-            else:
-                vlm_prompt = (
-                    """这是一个表情包，请生成表情包所表达的情感和内容的详细描述,不要输出"好的"、"我们来"、"分析"等解释性文字，不要输出任何其他内容，输出为一段**平文本**，请注意不要分点。"""
-                )
-                detailed_description, _ = await self.vlm.generate_response_for_image(
-                    vlm_prompt, image_base64, image_format, temperature=0.4
-                )
-
-            if detailed_description is None:
-                logger.warning("VLM未能生成表情包详细描述")
+            # 同一表情包的并发识别请求只调用一次模型
+            final_emotion = await image_process_service.single_flight(
+                cache_key,
+                lambda: self._generate_emoji_emotion(image_base64, image_hash, image_format, decoded.phash),
+            )
+            if final_emotion is None:
                 return "[表情包(VLM描述生成失败)]"
-
-            # 第二步：LLM情感分析 - 基于详细描述生成简短的情感标签
-            emotion_prompt = f"""
-            请你基于这个表情包的详细描述，提取出最核心的情感含义，用1-2个词概括。
-            详细描述：'{detailed_description}'
-            
-            要求：
-            1. 只输出1-2个最核心的情感词汇
-            2. 从互联网梗、meme的角度理解
-            3. 输出简短精准，不要解释
-            4. 如果有多个词用逗号分隔
-            """
-
-            # 使用较低温度确保输出稳定
-            emotion_llm = LLMRequest(model_set=model_config.model_task_config.utils, request_type="emoji")
-            emotion_result, _ = await emotion_llm.generate_response_async(emotion_prompt, temperature=0.3)
-
-            if not emotion_result:
-                logger.warning("LLM未能生成情感标签，使用详细描述的前几个词")
-                # 降级处理：从详细描述中提取关键词
-                import jieba
-
-                words = list(jieba.cut(detailed_description))
-                emotion_result = "，".join(words[:2]) if len(words) >= 2 else (words[0] if words else "表情")
-
-            # 处理情感结果，取前1-2个最重要的标签
-            emotions = [e.strip() for e in emotion_result.replace("，", ",").split(",") if e.strip()]
-            final_emotion = emotions[0] if emotions else "表情"
-
-            # 如果有第二个情感且不重复，也包含进来
-            if len(emotions) > 1 and emotions[1] != emotions[0]:
-                final_emotion = f"{emotions[0]}，{emotions[1]}"
-
-            logger.debug(f"[emoji识别] 详细描述: {detailed_description[:50]}... -> 情感标签: {final_emotion}")
-
-            # 再次检查缓存（防止并发情况下其他线程已经保存）
-            try:
-                cache_record = EmojiDescriptionCache.get_or_none(EmojiDescriptionCache.emoji_hash == image_hash)
-                if cache_record and cache_record.emotion_tags:
-                    logger.warning(f"虽然生成了描述，但是找到缓存表情包情感标签: {cache_record.emotion_tags}")
-                    return f"[表情包：{cache_record.emotion_tags}]"
-            except Exception as e:
-                logger.debug(f"再次查询EmojiDescriptionCache时出错: {e}")
-
-            # 保存识别出的详细描述和情感标签到 emoji_description_cache
-            try:
-                current_timestamp = time.time()
-                cache_record, created = EmojiDescriptionCache.get_or_create(
-                    emoji_hash=image_hash,
-                    defaults={
-                        "description": detailed_description,
-                        "emotion_tags": final_emotion,
-                        "timestamp": current_timestamp,
-                    },
-                )
-                if not created:
-                    # 更新已有记录
-                    cache_record.description = detailed_description
-                    cache_record.emotion_tags = final_emotion
-                    cache_record.timestamp = current_timestamp
-                    cache_record.save()
-                logger.info(f"[缓存保存] 表情包描述和情感标签已保存到EmojiDescriptionCache: {image_hash[:8]}...")
-            except Exception as e:
-                logger.error(f"保存表情包描述和情感标签缓存失败: {str(e)}")
+            if not final_emotion:
+                return "[表情包(GIF处理失败)]"
 
             # 如果启用了steal_emoji，自动保存表情包文件到data/emoji目录
             await self._save_emoji_file_if_needed(image_base64, image_hash, image_format)
@@ -348,14 +378,118 @@ class ImageManager:
             logger.error(f"获取表情包描述失败: {str(e)}")
             return "[表情包(处理失败)]"
 
+    async def _generate_emoji_emotion(
+        self, image_base64: str, image_hash: str, image_format: str, phash: str = ""
+    ) -> Optional[str]:
+        """调用模型识别表情包并写入缓存
+
+        Returns:
+            Optional[str]: 情感标签；VLM失败时返回None，GIF处理失败时返回空字符串
+        """
+        # === 二步走识别流程 ===
+
+        # 第一步：VLM视觉分析 - 生成详细描述
+        if image_format in ["gif", "GIF"]:
+            image_base64_processed = await image_process_service.transform_gif(image_base64)
+            if image_base64_processed is None:
+                logger.warning("GIF转换失败，无法获取描述")
+                return ""
+            vlm_prompt = """这是一个动态图表情包，每一张图代表了动态图的某一帧，黑色背景代表透明，请生成表情包所表达的情感和内容的详细描述，不要输出"好的"、"我们来"、"分析"等解释性文字，输出为一段**平文本**，请注意不要分点。"""
+            detailed_description, _ = await self.vlm.generate_response_for_image(
+                vlm_prompt, image_base64_processed, "jpg", temperature=0.4
+            )
+        else:
+            vlm_prompt = (
+                """这是一个表情包，请生成表情包所表达的情感和内容的详细描述,不要输出"好的"、"我们来"、"分析"等解释性文字，不要输出任何其他内容，输出为一段**平文本**，请注意不要分点。"""
+            )
+            detailed_description, _ = await self.vlm.generate_response_for_image(
+                vlm_prompt, image_base64, image_format, temperature=0.4
+            )
+
+        if detailed_description is None:
+            logger.warning("VLM未能生成表情包详细描述")
+            return None
+
+        # 第二步：LLM情感分析 - 基于详细描述生成简短的情感标签
+        emotion_prompt = f"""
+        请你基于这个表情包的详细描述，提取出最核心的情感含义，用1-2个词概括。
+        详细描述：'{detailed_description}'
+        
+        要求：
+        1. 只输出1-2个最核心的情感词汇
+        2. 从互联网梗、meme的角度理解
+        3. 输出简短精准，不要解释
+        4. 如果有多个词用逗号分隔
+        """
+
+        # 使用较低温度确保输出稳定
+        emotion_llm = LLMRequest(model_set=model_config.model_task_config.utils, request_type="emoji")
+        emotion_result, _ = await emotion_llm.generate_response_async(emotion_prompt, temperature=0.3)
+
+        if not emotion_result:
+            logger.warning("LLM未能生成情感标签，使用详细描述的前几个词")
+            # 降级处理：从详细描述中提取关键词
+            import jieba
+
+            words = list(jieba.cut(detailed_description))
+            emotion_result = "，".join(words[:2]) if len(words) >= 2 else (words[0] if words else "表情")
+
+        # 处理情感结果，取前1-2个最重要的标签
+        emotions = [e.strip() for e in emotion_result.replace("，", ",").split(",") if e.strip()]
+        final_emotion = emotions[0] if emotions else "表情"
+
+        # 如果有第二个情感且不重复，也包含进来
+        if len(emotions) > 1 and emotions[1] != emotions[0]:
+            final_emotion = f"{emotions[0]}，{emotions[1]}"
+
+        logger.debug(f"[emoji识别] 详细描述: {detailed_description[:50]}... -> 情感标签: {final_emotion}")
+
+        # 再次检查缓存（防止其他进程或注册流程已经保存）
+        try:
+            cache_record = EmojiDescriptionCache.get_or_none(EmojiDescriptionCache.emoji_hash == image_hash)
+            if cache_record and cache_record.emotion_tags:
+                logger.warning(f"虽然生成了描述，但是找到缓存表情包情感标签: {cache_record.emotion_tags}")
+                image_process_service.cache_description(f"emoji:{image_hash}", cache_record.emotion_tags)
+                return cache_record.emotion_tags
+        except Exception as e:
+            logger.debug(f"再次查询EmojiDescriptionCache时出错: {e}")
+
+        # 保存识别出的详细描述和情感标签到 emoji_description_cache
+        try:
+            current_timestamp = time.time()
+            cache_record, created = EmojiDescriptionCache.get_or_create(
+                emoji_hash=image_hash,
+                defaults={
+                    "phash": phash or None,
+                    "description": detailed_description,
+                    "emotion_tags": final_emotion,
+                    "timestamp": current_timestamp,
+                },
+            )
+            if not created:
+                # 更新已有记录
+                cache_record.description = detailed_description
+                cache_record.emotion_tags = final_emotion
+                cache_record.timestamp = current_timestamp
+                cache_record.phash = cache_record.phash or phash or None
+                cache_record.save()
+            if phash:
+                image_process_service.emoji_phash_index.add(image_hash, phash)
+            logger.info(f"[缓存保存] 表情包描述和情感标签已保存到EmojiDescriptionCache: {image_hash[:8]}...")
+        except Exception as e:
+            logger.error(f"保存表情包描述和情感标签缓存失败: {str(e)}")
+
+        image_process_service.cache_description(f"emoji:{image_hash}", final_emotion)
+        return final_emotion
+
     async def get_image_description(self, image_base64: str) -> str:
-        """获取普通图片描述，优先使用Images表中的缓存数据"""
+        """获取普通图片描述，优先使用Images表和内存缓存中的数据"""
         try:
-            # 计算图片哈希
-            if isinstance(image_base64, str):
-                image_base64 = image_base64.encode("ascii", errors="ignore").decode("ascii")
-            image_bytes = base64.b64decode(image_base64)
-            image_hash = hashlib.md5(image_bytes).hexdigest()
+            # 解码和计算哈希在进程池中进行
+            image_base64 = image_worker.normalize_base64(image_base64)
+            decoded = await image_process_service.decode(image_base64)
+            image_bytes = decoded.data
+            image_hash = decoded.hash
 
             # 优先检查Images表中是否已有完整的描述
             existing_image = Images.get_or_none(Images.emoji_hash == image_hash)
@@ -365,26 +499,27 @@ class ImageManager:
                     existing_image.count += 1
                 else:
                     existing_image.count = 1
-                existing_image.save()
+                if decoded.phash and not existing_image.phash:
+                    existing_image.phash = decoded.phash
+                    image_process_service.image_phash_index.add(image_hash, decoded.phash)
+                await db_writer.write(existing_image.save)
 
                 # 如果已有描述，直接返回
                 if existing_image.description:
                     logger.debug(f"[缓存命中] 使用Images表中的图片描述: {existing_image.description[:50]}...")
                     return f"[图片：{existing_image.description}]"
 
-            if cached_description := self._get_description_from_db(image_hash, "image"):
-                logger.debug(f"[缓存命中] 使用ImageDescriptions表中的描述: {cached_description[:50]}...")
+            if cached_description := self._get_cached_image_description(image_hash):
+                logger.debug(f"[缓存命中] 使用缓存的图片描述: {cached_description[:50]}...")
                 return f"[图片：{cached_description}]"
 
-            # 调用AI获取描述
-            image_format = Image.open(io.BytesIO(image_bytes)).format.lower()  # type: ignore
-            prompt = global_config.personality.visual_style
-            logger.info(f"[VLM调用] 为图片生成新描述 (Hash: {image_hash[:8]}...)")
-            description, _ = await self.vlm.generate_response_for_image(
-                prompt, image_base64, image_format, temperature=0.4
-            )
+            # 调用AI获取描述（同一图片的并发请求只调用一次），近似图片已有描述时直接复用
+            image_format = decoded.format
+            description = (
+                decoded.phash and self._find_similar_image_description(image_hash, decoded.phash)
+            ) or await self._describe_image(image_hash, image_base64, image_format)
 
-            if description is None:
+            if not description:
                 logger.warning("AI未能生成图片描述")
                 return "[图片(描述生成失败)]"
 
@@ -409,12 +544,14 @@ class ImageManager:
                         existing_image.image_id = str(uuid.uuid4())
                     if not hasattr(existing_image, "vlm_processed") or existing_image.vlm_processed is None:
                         existing_image.vlm_processed = True
-                    existing_image.save()
+                    await db_writer.write(existing_image.save)
                     logger.debug(f"[数据库] 更新已有图片记录: {image_hash[:8]}...")
                 else:
-                    Images.create(
+                    await db_writer.write(
+                        Images.create,
                         image_id=str(uuid.uuid4()),
                         emoji_hash=image_hash,
+                        phash=decoded.phash or None,
                         path=file_path,
                         type="image",
                         description=description,
@@ -422,23 +559,61 @@ class ImageManager:
                         vlm_processed=True,
                         count=1,
                     )
+                    image_process_service.image_phash_index.add(image_hash, decoded.phash)
                     logger.debug(f"[数据库] 创建新图片记录: {image_hash[:8]}...")
             except Exception as e:
                 logger.error(f"保存图片文件或元数据失败: {str(e)}")
 
-            # 保存描述到ImageDescriptions表作为备用缓存
-            self._save_description_to_db(image_hash, description, "image")
-
-            logger.info(f"[VLM完成] 图片描述生成: {description[:50]}...")
             return f"[图片：{description}]"
         except Exception as e:
             logger.error(f"获取图片描述失败: {str(e)}")
             return "[图片(处理失败)]"
 
+    def _get_cached_image_description(self, image_hash: str) -> Optional[str]:
+        """依次从内存LRU和ImageDescriptions表获取图片描述"""
+        cache_key = f"image:{image_hash}"
+        if cached_description := image_process_service.get_cached_description(cache_key):
+            return cached_description
+        if cached_description := self._get_description_from_db(image_hash, "image"):
+            image_process_service.cache_description(cache_key, cached_description)
+            return cached_description
+        return None
+
+    async def _describe_image(self, image_hash: str, image_base64: str, image_format: str) -> str:
+        """调用VLM生成图片描述，同一哈希的并发请求合并为一次调用
+
+        Returns:
+            str: 图片描述，失败时为空字符串
+        """
+        return await image_process_service.single_flight(
+            f"image:{image_hash}", lambda: self._generate_image_description(image_hash, image_base64, image_format)
+        )
+
+    async def _generate_image_description(self, image_hash: str, image_base64: str, image_format: str) -> str:
+        prompt = global_config.personality.visual_style
+        logger.info(f"[VLM调用] 为图片生成新描述 (Hash: {image_hash[:8]}...)")
+        description, _ = await self.vlm.generate_response_for_image(prompt, image_base64, image_format, temperature=0.4)
+
+        if description is None:
+            logger.warning("VLM未能生成图片描述")
+            return ""
+
+        if cached_description := self._get_description_from_db(image_hash, "image"):
+            logger.info(f"虽然生成了描述，但是找到缓存图片描述: {cached_description}")
+            description = cached_description
+        else:
+            # 保存描述到ImageDescriptions表作为备用缓存
+            self._save_description_to_db(image_hash, description, "image")
+
+        image_process_service.cache_description(f"image:{image_hash}", description)
+        logger.info(f"[VLM完成] 图片描述生成: {description[:50]}...")
+        return description
+
     @staticmethod
     def transform_gif(gif_base64: str, similarity_threshold: float = 1000.0, max_frames: int = 15) -> Optional[str]:
-        # sourcery skip: use-contextlib-suppress
-        """将GIF转换为水平拼接的静态图像, 跳过相似的帧
+        """将GIF转换为水平拼接的静态图像, 跳过相似的帧（同步版本）
+
+        在异步代码中请使用 image_process_service.transform_gif，避免阻塞事件循环
 
         Args:
             gif_base64: GIF的base64编码字符串
@@ -449,131 +624,31 @@ class ImageManager:
             Optional[str]: 拼接后的JPG图像的base64编码字符串, 或者在失败时返回None
         """
         try:
-            # 确保base64字符串只包含ASCII字符
-            if isinstance(gif_base64, str):
-                gif_base64 = gif_base64.encode("ascii", errors="ignore").decode("ascii")
-            # 解码base64
-            gif_data = base64.b64decode(gif_base64)
-            gif = Image.open(io.BytesIO(gif_data))
-
-            # 收集所有帧
-            all_frames = []
-            try:
-                while True:
-                    gif.seek(len(all_frames))
-                    # 确保是RGB格式方便比较
-                    frame = gif.convert("RGB")
-                    all_frames.append(frame.copy())
-            except EOFError:
-                pass  # 读完啦
-
-            if not all_frames:
-                logger.warning("GIF中没有找到任何帧")
-                return None  # 空的GIF直接返回None
-
-            # --- 新的帧选择逻辑 ---
-            selected_frames = []
-            last_selected_frame_np = None
-
-            for i, current_frame in enumerate(all_frames):
-                current_frame_np = np.array(current_frame)
-
-                # 第一帧总是要选的
-                if i == 0:
-                    selected_frames.append(current_frame)
-                    last_selected_frame_np = current_frame_np
-                    continue
-
-                # 计算和上一张选中帧的差异（均方误差 MSE）
-                if last_selected_frame_np is not None:
-                    mse = np.mean((current_frame_np - last_selected_frame_np) ** 2)
-                    # logger.debug(f"帧 {i} 与上一选中帧的 MSE: {mse}") # 可以取消注释来看差异值
-
-                    # 如果差异够大，就选它！
-                    if mse > similarity_threshold:
-                        selected_frames.append(current_frame)
-                        last_selected_frame_np = current_frame_np
-                        # 检查是不是选够了
-                        if len(selected_frames) >= max_frames:
-                            # logger.debug(f"已选够 {max_frames} 帧，停止选择。")
-                            break
-                # 如果差异不大就跳过这一帧啦
-
-            # --- 帧选择逻辑结束 ---
-
-            # 如果选择后连一帧都没有（比如GIF只有一帧且后续处理失败？）或者原始GIF就没帧，也返回None
-            if not selected_frames:
-                logger.warning("处理后没有选中任何帧")
-                return None
-
-            # logger.debug(f"总帧数: {len(all_frames)}, 选中帧数: {len(selected_frames)}")
-
-            # 获取选中的第一帧的尺寸（假设所有帧尺寸一致）
-            frame_width, frame_height = selected_frames[0].size
-
-            # 计算目标尺寸，保持宽高比
-            target_height = 200  # 固定高度
-            # 防止除以零
-            if frame_height == 0:
-                logger.error("帧高度为0，无法计算缩放尺寸")
-                return None
-            target_width = int((target_height / frame_height) * frame_width)
-            # 宽度也不能是0
-            if target_width == 0:
-                logger.warning(f"计算出的目标宽度为0 (原始尺寸 {frame_width}x{frame_height})，调整为1")
-                target_width = 1
-
-            # 调整所有选中帧的大小
-            resized_frames = [
-                frame.resize((target_width, target_height), Image.Resampling.LANCZOS) for frame in selected_frames
-            ]
-
-            # 创建拼接图像
-            total_width = target_width * len(resized_frames)
-            # 防止总宽度为0
-            if total_width == 0 and resized_frames:
-                logger.warning("计算出的总宽度为0，但有选中帧，可能目标宽度太小")
-                # 至少给点宽度吧
-                total_width = len(resized_frames)
-            elif total_width == 0:
-                logger.error("计算出的总宽度为0且无选中帧")
-                return None
-
-            combined_image = Image.new("RGB", (total_width, target_height))
-
-            # 水平拼接图像
-            for idx, frame in enumerate(resized_frames):
-                combined_image.paste(frame, (idx * target_width, 0))
-
-            # 转换为base64
-            buffer = io.BytesIO()
-            combined_image.save(buffer, format="JPEG", quality=85)  # 保存为JPEG
-            return base64.b64encode(buffer.getvalue()).decode("utf-8")
+            return image_worker.transform_gif(gif_base64, similarity_threshold, max_frames)
         except MemoryError:
             logger.error("GIF转换失败: 内存不足，可能是GIF太大或帧数太多")
-            return None  # 内存不够啦
+            return None
         except Exception as e:
-            logger.error(f"GIF转换失败: {str(e)}", exc_info=True)  # 记录详细错误信息
-            return None  # 其他错误也返回None
+            logger.error(f"GIF转换失败: {str(e)}", exc_info=True)
+            return None
 
-    async def process_image(self, image_base64: str) -> Tuple[str, str]:
+    async def process_image(self, image_base64: str, chat_id: Optional[str] = None) -> Tuple[str, str]:
         # sourcery skip: hoist-if-from-if
-        """处理图片并返回图片ID和描述
+        """登记图片并立即返回图片ID，描述由后台队列生成
 
         Args:
             image_base64: 图片的base64编码
+            chat_id: 图片所在的聊天流ID，用于在即将回复时优先识别
 
         Returns:
-            Tuple[str, str]: (图片ID, 描述)
+            Tuple[str, str]: (图片ID, [picid:图片ID])
         """
         try:
-            # 生成图片ID
-            # 计算图片哈希
-            # 确保base64字符串只包含ASCII字符
-            if isinstance(image_base64, str):
-                image_base64 = image_base64.encode("ascii", errors="ignore").decode("ascii")
-            image_bytes = base64.b64decode(image_base64)
-            image_hash = hashlib.md5(image_bytes).hexdigest()
+            # 解码和计算哈希在进程池中进行
+            image_base64 = image_worker.normalize_base64(image_base64)
+            decoded = await image_process_service.decode(image_base64)
+            image_bytes = decoded.data
+            image_hash = decoded.hash
 
             if existing_image := Images.get_or_none(Images.emoji_hash == image_hash):
                 # 检查是否缺少必要字段，如果缺少则创建新记录
@@ -594,7 +669,16 @@ class ImageManager:
                         existing_image.vlm_processed = False
 
                 existing_image.count += 1
-                existing_image.save()
+                if decoded.phash and not existing_image.phash:
+                    existing_image.phash = decoded.phash
+                    image_process_service.image_phash_index.add(image_hash, decoded.phash)
+                await db_writer.write(existing_image.save)
+
+                # 之前的识别没有完成（如重启时仍在队列中），重新登记
+                if not existing_image.description:
+                    image_description_queue.submit(
+                        existing_image.image_id, image_base64, image_hash, decoded.format, decoded.phash, chat_id
+                    )
                 return existing_image.image_id, f"[picid:{existing_image.image_id}]"
             else:
                 # print(f"图片不存在: {image_hash}")
@@ -612,9 +696,11 @@ class ImageManager:
                 f.write(image_bytes)
 
             # 保存到数据库
-            Images.create(
+            await db_writer.write(
+                Images.create,
                 image_id=image_id,
                 emoji_hash=image_hash,
+                phash=decoded.phash or None,
                 path=file_path,
                 type="image",
                 timestamp=current_timestamp,
@@ -622,8 +708,10 @@ class ImageManager:
                 count=1,
             )
 
-            # 启动异步VLM处理
-            await self._process_image_with_vlm(image_id, image_base64)
+            image_process_service.image_phash_index.add(image_hash, decoded.phash)
+
+            # 交给后台队列进行VLM识别，不等待结果
+            image_description_queue.submit(image_id, image_base64, image_hash, decoded.format, decoded.phash, chat_id)
 
             return image_id, f"[picid:{image_id}]"
 
@@ -631,20 +719,30 @@ class ImageManager:
             logger.error(f"处理图片失败: {str(e)}")
             return "", "[图片]"
 
-    async def _process_image_with_vlm(self, image_id: str, image_base64: str) -> None:
+    async def _process_image_with_vlm(
+        self,
+        image_id: str,
+        image_base64: str,
+        image_hash: Optional[str] = None,
+        image_format: Optional[str] = None,
+        phash: Optional[str] = None,
+    ) -> None:
         """使用VLM处理图片并更新数据库
 
         Args:
             image_id: 图片ID
             image_base64: 图片的base64编码
+            image_hash: 图片哈希，未提供时重新计算
+            image_format: 图片格式，未提供时重新识别
+            phash: 图片感知哈希，未提供时重新计算
         """
         try:
-            # 计算图片哈希
-            # 确保base64字符串只包含ASCII字符
-            if isinstance(image_base64, str):
-                image_base64 = image_base64.encode("ascii", errors="ignore").decode("ascii")
-            image_bytes = base64.b64decode(image_base64)
-            image_hash = hashlib.md5(image_bytes).hexdigest()
+            image_base64 = image_worker.normalize_base64(image_base64)
+            if image_hash is None or image_format is None or phash is None:
+                decoded = await image_process_service.decode(image_base64)
+                image_hash = decoded.hash
+                image_format = decoded.format
+                phash = decoded.phash
 
             # 获取当前图片记录
             image = Images.get(Images.image_id == image_id)
@@ -657,45 +755,30 @@ class ImageManager:
                 logger.debug(f"[缓存复用] 从其他相同图片记录复用描述: {existing_with_description.description[:50]}...")
                 image.description = existing_with_description.description
                 image.vlm_processed = True
-                image.save()
+                await db_writer.write(image.save)
                 # 同时保存到ImageDescriptions表作为备用缓存
                 self._save_description_to_db(image_hash, existing_with_description.description, "image")
+                image_process_service.cache_description(f"image:{image_hash}", existing_with_description.description)
                 return
 
-            # 检查ImageDescriptions表的缓存描述
-            if cached_description := self._get_description_from_db(image_hash, "image"):
-                logger.debug(f"[缓存复用] 从ImageDescriptions表复用描述: {cached_description[:50]}...")
+            # 检查内存和ImageDescriptions表的缓存描述，以及感知哈希相近的图片
+            cached_description = self._get_cached_image_description(image_hash) or (
+                phash and self._find_similar_image_description(image_hash, phash)
+            )
+            if cached_description:
+                logger.debug(f"[缓存复用] 复用缓存的图片描述: {cached_description[:50]}...")
                 image.description = cached_description
                 image.vlm_processed = True
-                image.save()
+                await db_writer.write(image.save)
                 return
 
-            # 获取图片格式
-            image_format = Image.open(io.BytesIO(image_bytes)).format.lower()  # type: ignore
-
-            # 构建prompt
-            prompt = global_config.personality.visual_style
-
-            # 获取VLM描述
-            description, _ = await self.vlm.generate_response_for_image(
-                prompt, image_base64, image_format, temperature=0.4
-            )
-
-            if description is None:
-                logger.warning("VLM未能生成图片描述")
-                description = ""
-
-            if cached_description := self._get_description_from_db(image_hash, "image"):
-                logger.info(f"虽然生成了描述，但是找到缓存图片描述: {cached_description}")
-                description = cached_description
+            # 获取VLM描述（同一图片的并发请求只调用一次）
+            description = await self._describe_image(image_hash, image_base64, image_format)
 
             # 更新数据库
             image.description = description
             image.vlm_processed = True
-            image.save()
-
-            # 保存描述到ImageDescriptions表作为备用缓存
-            self._save_description_to_db(image_hash, description, "image")
+            await db_writer.write(image.save)
 
         except Exception as e:
             logger.error(f"VLM处理图片失败: {str(e)}")
@@ -3,6 +3,8 @@ from typing import Any
 
 
 class BaseDataModel:
+    __slots__ = ()
+
     def deepcopy(self):
         return copy.deepcopy(self)
 
@@ -1,5 +1,5 @@
 import json
-from typing import Optional, Any, Dict
+from typing import Any, Callable, Dict, Optional, Sequence, Tuple
 from dataclasses import dataclass, field
 
 from . import BaseDataModel
@@ -55,8 +55,68 @@ class DatabaseChatInfo(BaseDataModel):
     #     )
 
 
+# DatabaseMessages 的扁平字段：(字段名, 槽名, 默认值)
+# 发送者/聊天流/群信息只以扁平形式保存，嵌套的 user_info/group_info/chat_info 在首次访问时才构造
+MESSAGE_FIELDS: Tuple[Tuple[str, str, Any], ...] = (
+    ("message_id", "message_id", ""),
+    ("time", "time", 0.0),
+    ("chat_id", "chat_id", ""),
+    ("reply_to", "reply_to", None),
+    ("interest_value", "interest_value", None),
+    ("key_words", "key_words", None),
+    ("key_words_lite", "key_words_lite", None),
+    ("is_mentioned", "is_mentioned", None),
+    ("is_at", "is_at", None),
+    ("reply_probability_boost", "reply_probability_boost", None),
+    ("processed_plain_text", "processed_plain_text", None),
+    ("display_message", "display_message", None),
+    ("priority_mode", "priority_mode", None),
+    ("priority_info", "priority_info", None),
+    ("additional_config", "additional_config", None),
+    ("is_emoji", "is_emoji", False),
+    ("is_picid", "is_picid", False),
+    ("is_command", "is_command", False),
+    ("intercept_message_level", "intercept_message_level", 0),
+    ("is_notify", "is_notify", False),
+    ("selected_expressions", "selected_expressions", None),
+    ("user_id", "_user_id", ""),
+    ("user_nickname", "_user_nickname", ""),
+    ("user_cardname", "_user_cardname", None),
+    ("user_platform", "_user_platform", ""),
+    ("chat_info_group_id", "_chat_info_group_id", None),
+    ("chat_info_group_name", "_chat_info_group_name", None),
+    ("chat_info_group_platform", "_chat_info_group_platform", None),
+    ("chat_info_user_id", "_chat_info_user_id", ""),
+    ("chat_info_user_nickname", "_chat_info_user_nickname", ""),
+    ("chat_info_user_cardname", "_chat_info_user_cardname", None),
+    ("chat_info_user_platform", "_chat_info_user_platform", ""),
+    ("chat_info_stream_id", "_chat_info_stream_id", ""),
+    ("chat_info_platform", "_chat_info_platform", ""),
+    ("chat_info_create_time", "_chat_info_create_time", 0.0),
+    ("chat_info_last_active_time", "_chat_info_last_active_time", 0.0),
+)
+
+_FIELD_SLOTS: Dict[str, str] = {name: slot for name, slot, _ in MESSAGE_FIELDS}
+_ROW_FACTORIES: Dict[Tuple[str, ...], Callable[[Sequence[Any]], "DatabaseMessages"]] = {}
+
+
 @dataclass(init=False)
 class DatabaseMessages(BaseDataModel):
+    """
+    从数据库读取的消息
+
+    使用 __slots__ 保存扁平字段；数据库行可以通过 row_factory 直接从 .tuples() 游标构造，
+    不经过 peewee 模型实例化。未识别的关键字参数仍然作为普通属性保存。
+    """
+
+    __slots__ = tuple(slot for _, slot, _ in MESSAGE_FIELDS) + (
+        "id",
+        "_user_info",
+        "_group_info",
+        "_chat_info",
+        "__dict__",
+    )
+
     def __init__(
         self,
         message_id: str = "",
@@ -125,38 +185,121 @@ class DatabaseMessages(BaseDataModel):
 
         self.selected_expressions = selected_expressions
 
-        self.group_info: Optional[DatabaseGroupInfo] = None
-        self.user_info = DatabaseUserInfo(
-            user_id=user_id,
-            user_nickname=user_nickname,
-            user_cardname=user_cardname,
-            platform=user_platform,
-        )
-        if chat_info_group_id and chat_info_group_name:
-            self.group_info = DatabaseGroupInfo(
-                group_id=chat_info_group_id,
-                group_name=chat_info_group_name,
-                group_platform=chat_info_group_platform,
-            )
+        self._user_id = user_id
+        self._user_nickname = user_nickname
+        self._user_cardname = user_cardname
+        self._user_platform = user_platform
+
+        self._chat_info_group_id = chat_info_group_id
+        self._chat_info_group_name = chat_info_group_name
+        self._chat_info_group_platform = chat_info_group_platform
 
-        self.chat_info = DatabaseChatInfo(
-            stream_id=chat_info_stream_id,
-            platform=chat_info_platform,
-            create_time=chat_info_create_time,
-            last_active_time=chat_info_last_active_time,
-            user_info=DatabaseUserInfo(
-                user_id=chat_info_user_id,
-                user_nickname=chat_info_user_nickname,
-                user_cardname=chat_info_user_cardname,
-                platform=chat_info_user_platform,
-            ),
-            group_info=self.group_info,
-        )
+        self._chat_info_user_id = chat_info_user_id
+        self._chat_info_user_nickname = chat_info_user_nickname
+        self._chat_info_user_cardname = chat_info_user_cardname
+        self._chat_info_user_platform = chat_info_user_platform
+        self._chat_info_stream_id = chat_info_stream_id
+        self._chat_info_platform = chat_info_platform
+        self._chat_info_create_time = chat_info_create_time
+        self._chat_info_last_active_time = chat_info_last_active_time
 
         if kwargs:
             for key, value in kwargs.items():
                 setattr(self, key, value)
 
+    @classmethod
+    def row_factory(cls, columns: Sequence[str]) -> Callable[[Sequence[Any]], "DatabaseMessages"]:
+        """
+        返回把数据库行（按 columns 顺序的元组）转换为 DatabaseMessages 的函数
+
+        未选择的列使用默认值；同一列组合的转换函数会被缓存复用。
+        """
+        key = tuple(columns)
+        factory = _ROW_FACTORIES.get(key)
+        if factory is not None:
+            return factory
+
+        unknown = [name for name in key if name not in _FIELD_SLOTS and name != "id"]
+        if unknown:
+            raise ValueError(f"未知的消息字段: {unknown}")
+
+        setters = [getattr(cls, _FIELD_SLOTS.get(name, "id")).__set__ for name in key]
+        defaults = [
+            (getattr(cls, slot).__set__, default) for name, slot, default in MESSAGE_FIELDS if name not in key
+        ]
+        new = object.__new__
+
+        def factory(row: Sequence[Any]) -> "DatabaseMessages":
+            instance = new(cls)
+            for setter, value in defaults:
+                setter(instance, value)
+            for setter, value in zip(setters, row, strict=True):
+                setter(instance, value)
+            return instance
+
+        _ROW_FACTORIES[key] = factory
+        return factory
+
+    @property
+    def user_info(self) -> DatabaseUserInfo:
+        try:
+            return self._user_info
+        except AttributeError:
+            self._user_info = DatabaseUserInfo(
+                user_id=self._user_id,
+                user_nickname=self._user_nickname,
+                user_cardname=self._user_cardname,
+                platform=self._user_platform,
+            )
+            return self._user_info
+
+    @user_info.setter
+    def user_info(self, value: DatabaseUserInfo) -> None:
+        self._user_info = value
+
+    @property
+    def group_info(self) -> Optional[DatabaseGroupInfo]:
+        try:
+            return self._group_info
+        except AttributeError:
+            group_info = None
+            if self._chat_info_group_id and self._chat_info_group_name:
+                group_info = DatabaseGroupInfo(
+                    group_id=self._chat_info_group_id,
+                    group_name=self._chat_info_group_name,
+                    group_platform=self._chat_info_group_platform,
+                )
+            self._group_info = group_info
+            return group_info
+
+    @group_info.setter
+    def group_info(self, value: Optional[DatabaseGroupInfo]) -> None:
+        self._group_info = value
+
+    @property
+    def chat_info(self) -> DatabaseChatInfo:
+        try:
+            return self._chat_info
+        except AttributeError:
+            self._chat_info = DatabaseChatInfo(
+                stream_id=self._chat_info_stream_id,
+                platform=self._chat_info_platform,
+                create_time=self._chat_info_create_time,
+                last_active_time=self._chat_info_last_active_time,
+                user_info=DatabaseUserInfo(
+                    user_id=self._chat_info_user_id,
+                    user_nickname=self._chat_info_user_nickname,
+                    user_cardname=self._chat_info_user_cardname,
+                    platform=self._chat_info_user_platform,
+                ),
+                group_info=self.group_info,
+            )
+            return self._chat_info
+
+    @chat_info.setter
+    def chat_info(self, value: DatabaseChatInfo) -> None:
+        self._chat_info = value
+
     # def __post_init__(self):
     #     assert isinstance(self.message_id, str), "message_id must be a string"
     #     assert isinstance(self.time, float), "time must be a float"
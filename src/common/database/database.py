@@ -1,9 +1,37 @@
+"""
+数据库访问层
+
+- db：全局 Peewee SQLite 数据库访问点，模型都绑定在它上面
+- db_writer：唯一的写线程，消费写请求队列，把排队中的写操作合并到一个事务中提交。
+  异步代码用 await db_writer.write(...)，同步代码用 db_writer.execute(...)，不关心结果的写入用 db_writer.submit(...)
+- db_reader：只读连接的线程池（WAL 模式下读取互不阻塞，也不阻塞写线程），异步代码用 await db_reader.read(...)
+
+所有写操作都由同一个线程执行后，写与写之间不再竞争数据库锁（"database is locked"），事件循环也不再等待 busy_timeout。
+Peewee 为每个线程维护独立的连接，写线程与只读线程的连接在建立时按线程角色设置 PRAGMA。
+"""
+
+import asyncio
+import atexit
 import os
+import queue
+import threading
+import time
+
+from concurrent.futures import Future, InvalidStateError, ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from functools import partial
+from typing import Any, Awaitable, Callable, Dict, List, Optional, TypeVar
+
 from peewee import SqliteDatabase
 from rich.traceback import install
 
+from src.common.logger import get_logger
+
 install(extra_lines=3)
 
+logger = get_logger("database")
+
+T = TypeVar("T")
 
 # 定义数据库文件路径
 ROOT_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", ".."))
@@ -13,8 +41,33 @@ _DB_FILE = os.path.join(_DB_DIR, "MaiBot.db")
 # 确保数据库目录存在
 os.makedirs(_DB_DIR, exist_ok=True)
 
+# 一个事务最多合并的写请求数
+WRITE_BATCH_MAX_STATEMENTS = 200
+# 写线程连接的锁等待时间（毫秒）；写线程不在事件循环中，可以等得更久
+WRITER_BUSY_TIMEOUT_MS = 10000
+# 只读连接线程数
+READER_POOL_SIZE = 4
+# 超过该耗时（秒）的写操作记录警告
+SLOW_WRITE_SECONDS = 0.5
+
+# 当前线程的连接角色："writer" / "reader"，其他线程为 None
+_thread_role = threading.local()
+
+
+class _MaiBotDatabase(SqliteDatabase):
+    """按线程角色初始化新连接：只读线程的连接开启 query_only，写线程的连接使用更长的 busy_timeout"""
+
+    def _add_conn_hooks(self, conn):
+        super()._add_conn_hooks(conn)
+        role = getattr(_thread_role, "role", None)
+        if role == "reader":
+            conn.execute("PRAGMA query_only = 1")
+        elif role == "writer":
+            conn.execute(f"PRAGMA busy_timeout = {WRITER_BUSY_TIMEOUT_MS}")
+
+
 # 全局 Peewee SQLite 数据库访问点
-db = SqliteDatabase(
+db = _MaiBotDatabase(
     _DB_FILE,
     pragmas={
         "journal_mode": "wal",  # WAL模式提高并发性能
@@ -25,3 +78,268 @@ db = SqliteDatabase(
         "busy_timeout": 1000,  # 1秒超时而不是3秒
     },
 )
+
+
+@dataclass
+class WriteStats:
+    """单类写操作（按 label 汇总）的延迟统计"""
+
+    count: int = 0
+    errors: int = 0
+    exec_seconds: float = 0.0
+    """执行耗时（写线程中执行函数的时间，不含提交）"""
+    max_exec_seconds: float = 0.0
+    wait_seconds: float = 0.0
+    """排队耗时（提交请求到开始执行）"""
+    max_wait_seconds: float = 0.0
+
+
+class _WriteRequest:
+    __slots__ = ("func", "args", "kwargs", "label", "future", "enqueued_at")
+
+    def __init__(self, func: Callable[..., Any], args: tuple, kwargs: dict, label: str):
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.label = label
+        self.future: Future = Future()
+        self.enqueued_at = time.perf_counter()
+
+
+_STOP = object()
+
+
+def _label_of(func: Callable[..., Any]) -> str:
+    """默认的统计名称：绑定方法带上模型名（如 Messages.create、Images.save）"""
+    owner = getattr(func, "__self__", None)
+    if owner is not None:
+        owner_name = owner.__name__ if isinstance(owner, type) else type(owner).__name__
+        return f"{owner_name}.{func.__name__}"
+    return getattr(func, "__qualname__", repr(func))
+
+
+class DatabaseWriter:
+    """唯一的数据库写线程：按提交顺序执行写请求，并把排队中的请求合并到一个事务中"""
+
+    def __init__(self, database: SqliteDatabase, max_batch: int = WRITE_BATCH_MAX_STATEMENTS):
+        self._db = database
+        self._max_batch = max_batch
+        self._queue: "queue.SimpleQueue[Any]" = queue.SimpleQueue()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._stats: Dict[str, WriteStats] = {}
+        self._stats_lock = threading.Lock()
+        self.transactions = 0
+        self.commit_seconds = 0.0
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name="db_writer", daemon=True)
+                self._thread.start()
+                atexit.register(self.close)
+
+    def _enqueue(self, func: Callable[..., T], args: tuple, kwargs: dict, label: Optional[str]) -> "Future[T]":
+        request = _WriteRequest(func, args, kwargs, label or _label_of(func))
+        if threading.current_thread() is self._thread:
+            # 写操作内部再次提交写操作：直接执行，避免等待自己
+            self._execute(request)
+            return request.future
+        self._ensure_started()
+        self._queue.put(request)
+        return request.future
+
+    def write(self, func: Callable[..., T], *args: Any, label: Optional[str] = None, **kwargs: Any) -> Awaitable[T]:
+        """
+        在写线程中执行写操作，返回可在异步代码中等待的结果
+
+        Args:
+            func: 执行写入的同步函数（例如 Messages.create）
+            *args, **kwargs: 传给 func 的参数
+            label: 统计用的操作名称，默认为函数名
+
+        Returns:
+            Awaitable[T]: 所在事务提交后完成，结果为 func 的返回值；func 抛出的异常原样抛出
+        """
+        return asyncio.wrap_future(self._enqueue(func, args, kwargs, label))
+
+    def execute(self, func: Callable[..., T], *args: Any, label: Optional[str] = None, **kwargs: Any) -> T:
+        """在写线程中执行写操作并阻塞等待结果，供不在事件循环中的同步代码使用"""
+        return self._enqueue(func, args, kwargs, label).result()
+
+    def submit(self, func: Callable[..., Any], *args: Any, label: Optional[str] = None, **kwargs: Any) -> None:
+        """提交不需要等待结果的写操作，失败时记录日志"""
+        future = self._enqueue(func, args, kwargs, label)
+        future.add_done_callback(partial(self._log_failure, label or _label_of(func)))
+
+    @staticmethod
+    def _log_failure(label: str, future: Future) -> None:
+        if not future.cancelled() and (error := future.exception()) is not None:
+            logger.error(f"[DBWriter] 写入失败 ({label}): {error}")
+
+    def _loop(self) -> None:
+        _thread_role.role = "writer"
+        while True:
+            first = self._queue.get()
+            if first is _STOP:
+                break
+            batch: List[_WriteRequest] = [first]
+            stop = False
+            # 只合并已经在排队的请求，不为凑批而等待
+            while len(batch) < self._max_batch:
+                try:
+                    request = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if request is _STOP:
+                    stop = True
+                    break
+                batch.append(request)
+            self._run_batch(batch)
+            if stop:
+                break
+        if not self._db.is_closed():
+            self._db.close()
+
+    def _execute(self, request: _WriteRequest) -> None:
+        """在写线程中立即执行单个写请求（在保存点中，失败只回滚它自己）"""
+        if not request.future.set_running_or_notify_cancel():
+            return
+        start = time.perf_counter()
+        wait = start - request.enqueued_at
+        try:
+            with self._db.atomic():
+                result = request.func(*request.args, **request.kwargs)
+            error = None
+        except Exception as e:
+            result, error = None, e
+        self._record(request.label, wait, time.perf_counter() - start, error is not None)
+        self._resolve(request, result, error)
+
+    def _run_batch(self, batch: List[_WriteRequest]) -> None:
+        outcomes = []
+        try:
+            with self._db.atomic():
+                for request in batch:
+                    if not request.future.set_running_or_notify_cancel():
+                        continue
+                    start = time.perf_counter()
+                    wait = start - request.enqueued_at
+                    try:
+                        # 每个请求一个保存点，失败只回滚它自己
+                        with self._db.atomic():
+                            result = request.func(*request.args, **request.kwargs)
+                        outcomes.append((request, result, None))
+                    except Exception as e:
+                        outcomes.append((request, None, e))
+                    self._record(request.label, wait, time.perf_counter() - start, outcomes[-1][2] is not None)
+                commit_start = time.perf_counter()
+            self.commit_seconds += time.perf_counter() - commit_start
+            self.transactions += 1
+        except Exception as e:
+            logger.error(f"[DBWriter] 提交 {len(batch)} 个写操作的事务失败: {e}")
+            # 整个事务已回滚，所有请求都视为失败
+            outcomes = [(request, None, e) for request in batch]
+        # 事务提交后再公布结果，等待方拿到结果时数据已经落库
+        for request, result, error in outcomes:
+            self._resolve(request, result, error)
+
+    @staticmethod
+    def _resolve(request: _WriteRequest, result: Any, error: Optional[BaseException]) -> None:
+        try:
+            if error is not None:
+                request.future.set_exception(error)
+            else:
+                request.future.set_result(result)
+        except InvalidStateError:
+            pass
+
+    def _record(self, label: str, wait: float, elapsed: float, failed: bool) -> None:
+        with self._stats_lock:
+            stats = self._stats.setdefault(label, WriteStats())
+            stats.count += 1
+            stats.exec_seconds += elapsed
+            stats.max_exec_seconds = max(stats.max_exec_seconds, elapsed)
+            stats.wait_seconds += wait
+            stats.max_wait_seconds = max(stats.max_wait_seconds, wait)
+            if failed:
+                stats.errors += 1
+        if elapsed >= SLOW_WRITE_SECONDS:
+            logger.warning(f"[DBWriter] 慢写入 {label}: 执行 {elapsed:.2f}s，排队 {wait:.2f}s")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取写入统计
+
+        Returns:
+            Dict[str, Any]: {"transactions": 事务数, "commit_seconds": 累计提交耗时, "queued": 排队中的请求数,
+            "statements": {label: 统计字段（另含平均执行/排队毫秒 avg_exec_ms / avg_wait_ms）}}
+        """
+        with self._stats_lock:
+            statements = {label: asdict(stats) for label, stats in self._stats.items()}
+        for stats in statements.values():
+            stats["avg_exec_ms"] = stats["exec_seconds"] / stats["count"] * 1000 if stats["count"] else 0.0
+            stats["avg_wait_ms"] = stats["wait_seconds"] / stats["count"] * 1000 if stats["count"] else 0.0
+        return {
+            "transactions": self.transactions,
+            "commit_seconds": self.commit_seconds,
+            "queued": self._queue.qsize(),
+            "statements": statements,
+        }
+
+    def close(self, timeout: float = 10.0) -> None:
+        """写完已排队的请求后停止写线程"""
+        thread = self._thread
+        if thread is None or not thread.is_alive():
+            return
+        self._queue.put(_STOP)
+        thread.join(timeout)
+        if thread.is_alive():
+            logger.warning("[DBWriter] 写线程未能在超时内完成剩余写入")
+
+
+def _init_reader_thread() -> None:
+    _thread_role.role = "reader"
+
+
+class DatabaseReaderPool:
+    """只读连接线程池，每个线程持有一个 query_only 的 WAL 连接"""
+
+    def __init__(self, max_workers: int = READER_POOL_SIZE):
+        self._max_workers = max_workers
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._start_lock = threading.Lock()
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            with self._start_lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self._max_workers, thread_name_prefix="db_reader", initializer=_init_reader_thread
+                    )
+        return self._executor
+
+    def read(self, func: Callable[..., T], *args: Any, **kwargs: Any) -> Awaitable[T]:
+        """
+        在只读连接上执行查询
+
+        Args:
+            func: 只包含读取的同步函数（写入会被 query_only 拒绝）
+            *args, **kwargs: 传给 func 的参数
+
+        Returns:
+            Awaitable[T]: 结果为 func 的返回值
+        """
+        return asyncio.get_running_loop().run_in_executor(self.executor, partial(func, *args, **kwargs))
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+db_writer = DatabaseWriter(db)
+db_reader = DatabaseReaderPool()
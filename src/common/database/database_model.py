@@ -1,6 +1,7 @@
-from peewee import Model, DoubleField, IntegerField, BooleanField, TextField, FloatField, DateTimeField
+from peewee import Model, DoubleField, IntegerField, BooleanField, TextField, FloatField, DateTimeField, fn
 from .database import db
 import datetime
+import json
 from src.common.logger import get_logger
 
 logger = get_logger("database_model")
@@ -106,6 +107,7 @@ class Emoji(BaseModel):
     full_path = TextField(unique=True, index=True)  # 文件的完整路径 (包括文件名)
     format = TextField()  # 图片格式
     emoji_hash = TextField(index=True)  # 表情包的哈希值
+    phash = TextField(null=True, index=True)  # 感知哈希，用于识别重新压缩/缩放后的同一表情包
     description = TextField()  # 表情包的描述
     query_count = IntegerField(default=0)  # 查询次数（用于统计表情包被查询描述的次数）
     is_registered = BooleanField(default=False)  # 是否已注册
@@ -213,6 +215,7 @@ class Images(BaseModel):
 
     image_id = TextField(default="")  # 图片唯一ID
     emoji_hash = TextField(index=True)  # 图像的哈希值
+    phash = TextField(null=True, index=True)  # 感知哈希，用于识别重新压缩/缩放后的同一图片
     description = TextField(null=True)  # 图像的描述
     path = TextField(unique=True)  # 图像文件的路径
     # base64 = TextField()  # 图片的base64编码
@@ -246,6 +249,7 @@ class EmojiDescriptionCache(BaseModel):
     """
 
     emoji_hash = TextField(unique=True, index=True)
+    phash = TextField(null=True, index=True)  # 感知哈希
     description = TextField()  # 详细描述
     emotion_tags = TextField(null=True)  # 情感标签，逗号分隔
     timestamp = FloatField()
@@ -355,6 +359,24 @@ class Jargon(BaseModel):
         table_name = "jargon"
 
 
+class JargonChat(BaseModel):
+    """
+    黑话与聊天的关联表：记录每条黑话在哪些聊天中出现过以及出现次数
+    （取代 Jargon.chat_id 中的 JSON 列表，按聊天筛选时走 (chat_id, jargon_id) 索引）
+    """
+
+    jargon_id = IntegerField()
+    chat_id = TextField()
+    count = IntegerField(default=1)
+
+    class Meta:
+        table_name = "jargon_chat"
+        indexes = (
+            (("jargon_id", "chat_id"), True),
+            (("chat_id", "jargon_id"), False),
+        )
+
+
 class ChatHistory(BaseModel):
     """
     用于存储聊天历史概括的模型
@@ -407,6 +429,7 @@ MODELS = [
     Expression,
     ActionRecords,
     Jargon,
+    JargonChat,
     ChatHistory,
     ThinkingBack,
 ]
@@ -477,6 +500,12 @@ def initialize_database(sync_constraints=False):
                         try:
                             db.execute_sql(alter_sql)
                             logger.info(f"字段 '{field_name}' 添加成功")
+                            # ALTER TABLE 不会创建索引，为新增的索引字段补建（与 peewee 的索引命名一致）
+                            if field_obj.index and not field_obj.unique:
+                                db.execute_sql(
+                                    f"CREATE INDEX IF NOT EXISTS {table_name}_{field_name} "
+                                    f"ON {table_name} ({field_name})"
+                                )
                         except Exception as e:
                             logger.error(f"添加字段 '{field_name}' 失败: {e}")
 
@@ -498,6 +527,10 @@ def initialize_database(sync_constraints=False):
             sync_field_constraints()
             logger.debug("数据库字段约束同步完成")
 
+        # 在约束修复（可能重建表）之后迁移黑话聊天关联
+        with db:
+            migrate_jargon_chat()
+
     except Exception as e:
         logger.exception(f"检查表或字段是否存在时出错: {e}")
         # 如果检查失败（例如数据库不可用），则退出
@@ -506,6 +539,49 @@ def initialize_database(sync_constraints=False):
     logger.info("数据库初始化完成")
 
 
+def _parse_legacy_jargon_chat_id(chat_id_value) -> list:
+    """解析 Jargon.chat_id 中的旧格式（纯字符串或 [[chat_id, count], ...] JSON），返回 [(chat_id, count), ...]"""
+    if not chat_id_value:
+        return []
+    try:
+        parsed = json.loads(chat_id_value)
+    except (json.JSONDecodeError, TypeError):
+        return [(str(chat_id_value), 1)]
+    if not isinstance(parsed, list):
+        return [(str(parsed if isinstance(parsed, str) else chat_id_value), 1)]
+
+    counts: dict = {}
+    for item in parsed:
+        if not isinstance(item, list) or not item:
+            continue
+        count = item[1] if len(item) >= 2 and isinstance(item[1], (int, float)) else 1
+        counts[str(item[0])] = counts.get(str(item[0]), 0) + int(count)
+    return list(counts.items())
+
+
+def migrate_jargon_chat():
+    """
+    将 Jargon.chat_id 中的 JSON 聊天列表迁移到 jargon_chat 关联表。
+    只处理尚无任何关联记录的黑话，可重复执行（也能补齐旧版本程序写入的新词条）。
+    """
+    pending = Jargon.select(Jargon.id, Jargon.chat_id).where(
+        ~fn.EXISTS(JargonChat.select(JargonChat.id).where(JargonChat.jargon_id == Jargon.id))
+    )
+    rows = []
+    for jargon_id, chat_id_value in pending.tuples():
+        rows.extend(
+            {"jargon_id": jargon_id, "chat_id": chat_id, "count": count}
+            for chat_id, count in _parse_legacy_jargon_chat_id(chat_id_value)
+        )
+    if not rows:
+        return
+
+    with db.atomic():
+        for start in range(0, len(rows), 500):
+            JargonChat.insert_many(rows[start : start + 500]).on_conflict_ignore().execute()
+    logger.info(f"已将 {len(rows)} 条黑话聊天关联迁移到 jargon_chat 表")
+
+
 def sync_field_constraints():
     """
     同步数据库字段约束，确保现有数据库字段的 NULL 约束与模型定义一致。
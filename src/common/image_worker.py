@@ -0,0 +1,130 @@
+"""
+图片处理中的CPU密集型任务
+
+这些函数运行在 ImageProcessService 的进程池中。进程池以 spawn 方式启动子进程，子进程会重新导入本模块：
+本模块放在 __init__ 没有副作用的 src.common 包下，只依赖标准库、PIL 和 numpy，
+不要在这里导入 src 下的其他模块（例如 src.chat 的 __init__ 会加载配置和数据库）。
+"""
+
+import base64
+import hashlib
+import io
+import numpy as np
+
+from typing import Tuple
+from PIL import Image
+
+
+def normalize_base64(image_base64: str) -> str:
+    """确保base64字符串只包含ASCII字符"""
+    if isinstance(image_base64, str):
+        image_base64 = image_base64.encode("ascii", errors="ignore").decode("ascii")
+    return image_base64
+
+
+def dhash(img: Image.Image, hash_size: int = 8) -> str:
+    """计算图片的差值哈希（dHash），对重新压缩、缩放、轻微调色不敏感
+
+    Args:
+        img: PIL图像
+        hash_size: 哈希边长，默认8，即64位
+
+    Returns:
+        str: 16位十六进制字符串；纯色等信息量过低的图片返回空字符串
+    """
+    gray = img.convert("L").resize((hash_size + 1, hash_size), Image.Resampling.LANCZOS)
+    pixels = np.asarray(gray, dtype=np.int16)
+    bits = (pixels[:, 1:] > pixels[:, :-1]).flatten()
+    value = 0
+    for bit in bits:
+        value = (value << 1) | int(bit)
+    # 几乎全0或全1的哈希说明图片近似纯色，任何纯色图都会互相“命中”，不可用
+    ones = value.bit_count()
+    if ones <= 4 or ones >= hash_size * hash_size - 4:
+        return ""
+    return f"{value:0{hash_size * hash_size // 4}x}"
+
+
+def decode_image(image_base64: str) -> Tuple[bytes, str, str, str]:
+    """解码base64图片并计算哈希、格式和感知哈希
+
+    Args:
+        image_base64: 图片的base64编码
+
+    Returns:
+        Tuple[bytes, str, str, str]: (图片字节, MD5哈希, 小写的图片格式, 感知哈希)；
+            格式无法识别时为空字符串，动图或无法计算时感知哈希为空字符串
+    """
+    image_bytes = base64.b64decode(normalize_base64(image_base64))
+    image_hash = hashlib.md5(image_bytes).hexdigest()
+    image_format = ""
+    phash = ""
+    try:
+        with Image.open(io.BytesIO(image_bytes)) as img:
+            image_format = (img.format or "").lower()
+            # 动图只看第一帧会把不同的GIF误判为重复，不计算感知哈希
+            if not getattr(img, "is_animated", False):
+                phash = dhash(img)
+    except Exception:
+        pass
+    return image_bytes, image_hash, image_format, phash
+
+
+def transform_gif(gif_base64: str, similarity_threshold: float = 1000.0, max_frames: int = 15) -> str:
+    """将GIF转换为水平拼接的静态图像, 跳过相似的帧
+
+    Args:
+        gif_base64: GIF的base64编码字符串
+        similarity_threshold: 判定帧相似的阈值 (MSE)，越小表示要求差异越大才算不同帧，默认1000.0
+        max_frames: 最大抽取的帧数，默认15
+
+    Returns:
+        str: 拼接后的JPG图像的base64编码字符串
+
+    Raises:
+        ValueError: GIF中没有可用的帧或尺寸异常
+    """
+    gif_data = base64.b64decode(normalize_base64(gif_base64))
+    gif = Image.open(io.BytesIO(gif_data))
+
+    # 逐帧读取并立即做相似度筛选，不保留未选中的帧
+    selected_frames = []
+    last_selected_frame_np = None
+    frame_index = 0
+    try:
+        while len(selected_frames) < max_frames:
+            gif.seek(frame_index)
+            frame_index += 1
+            # 确保是RGB格式方便比较
+            current_frame = gif.convert("RGB")
+            current_frame_np = np.asarray(current_frame, dtype=np.int32)
+
+            # 第一帧总是要选的，之后计算和上一张选中帧的差异（均方误差 MSE）
+            if last_selected_frame_np is None or (
+                current_frame_np.shape == last_selected_frame_np.shape
+                and np.mean((current_frame_np - last_selected_frame_np) ** 2) > similarity_threshold
+            ):
+                selected_frames.append(current_frame)
+                last_selected_frame_np = current_frame_np
+    except EOFError:
+        pass  # 读完啦
+
+    if not selected_frames:
+        raise ValueError("GIF中没有找到任何帧")
+
+    # 获取选中的第一帧的尺寸（假设所有帧尺寸一致）
+    frame_width, frame_height = selected_frames[0].size
+    if frame_height == 0:
+        raise ValueError("帧高度为0，无法计算缩放尺寸")
+
+    # 计算目标尺寸，保持宽高比，宽度至少为1
+    target_height = 200
+    target_width = max(1, int((target_height / frame_height) * frame_width))
+
+    combined_image = Image.new("RGB", (target_width * len(selected_frames), target_height))
+    for idx, frame in enumerate(selected_frames):
+        combined_image.paste(frame.resize((target_width, target_height), Image.Resampling.LANCZOS), (idx * target_width, 0))
+
+    buffer = io.BytesIO()
+    combined_image.save(buffer, format="JPEG", quality=85)
+    return base64.b64encode(buffer.getvalue()).decode("utf-8")
@@ -0,0 +1,391 @@
+"""
+JSONL 日志文件的尾部读取与稀疏索引
+
+- 尾部读取：从文件末尾按块向前读取，只解析需要的最后若干行，不再整文件 readlines
+- 稀疏索引：每个日志文件在 logs/.index/<文件名>.idx 中保存一份偏移索引，
+  每 INDEX_EVERY_LINES 行或时间跨过一分钟切一个分块，记录分块的字节范围、起始行号、
+  时间范围和出现过的日志级别；按时间范围/级别查询时只读取可能命中的分块
+- 索引增量更新：日志文件只会追加，刷新时只扫描上次索引之后新增的完整行
+
+本模块只依赖标准库，WebUI 与独立的日志查看器（log_viewer）共用。
+"""
+
+import json
+import os
+import re
+
+from bisect import bisect_right
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+LOG_FILE_PATTERN = "app_*.log.jsonl"
+INDEX_DIR_NAME = ".index"
+INDEX_SUFFIX = ".idx"
+INDEX_VERSION = 1
+INDEX_EVERY_LINES = 1000
+READ_BLOCK_SIZE = 64 * 1024
+
+# 日志级别位掩码，分块记录其中出现过的级别
+LEVEL_BITS = {"debug": 1, "info": 2, "warning": 4, "error": 8, "critical": 16}
+OTHER_LEVEL_BIT = 32
+_LEVEL_ALIASES = {"warn": "warning", "exception": "error", "fatal": "critical"}
+
+# 控制台格式可配置（见 logger.get_timestamp_format），无法按 ISO 解析时依次尝试
+TIMESTAMP_FORMATS = ("%Y-%m-%d %H:%M:%S", "%m-%d %H:%M:%S", "%Y/%m/%d %H:%M:%S")
+_FILE_YEAR_PATTERN = re.compile(r"app_(\d{4})\d{4}_")
+
+PathLike = Union[str, Path]
+
+# 分块字段下标：[起始偏移, 结束偏移, 起始行号, 行数, 最早时间, 最晚时间, 级别掩码]
+_START, _END, _FIRST_LINE, _LINES, _MIN_TS, _MAX_TS, _MASK = range(7)
+
+
+def level_bit(level: Any) -> int:
+    """返回日志级别对应的位"""
+    name = str(level).lower()
+    return LEVEL_BITS.get(_LEVEL_ALIASES.get(name, name), OTHER_LEVEL_BIT)
+
+
+def levels_mask(levels: Optional[Iterable[str]]) -> int:
+    """将级别列表转换为位掩码，None 或空表示不限级别"""
+    if not levels:
+        return 0
+    mask = 0
+    for level in levels:
+        mask |= level_bit(level)
+    return mask
+
+
+def parse_timestamp(value: Any, default_year: Optional[int] = None) -> Optional[float]:
+    """
+    将日志中的时间戳解析为 epoch 秒
+
+    标准库日志写入的是 ISO 格式（UTC），structlog 日志写入的是本地时间的可配置格式，
+    后者不含年份时使用 default_year（默认当前年份）。无法解析时返回 None。
+    """
+    if not isinstance(value, str) or not value:
+        return None
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except ValueError:
+        pass
+    for fmt in TIMESTAMP_FORMATS:
+        try:
+            if "%Y" in fmt:
+                return datetime.strptime(value, fmt).timestamp()
+            year = default_year or datetime.now().year
+            return datetime.strptime(f"{year}-{value}", f"%Y-{fmt}").timestamp()
+        except ValueError:
+            continue
+    return None
+
+
+def _file_year(path: Path) -> Optional[int]:
+    """从 app_YYYYmmdd_HHMMSS.log.jsonl 文件名中取年份"""
+    match = _FILE_YEAR_PATTERN.match(path.name)
+    return int(match.group(1)) if match else None
+
+
+def iter_lines_reverse(path: PathLike, end: Optional[int] = None, block_size: int = READ_BLOCK_SIZE) -> Iterator[bytes]:
+    """
+    从文件末尾（或 end 偏移处）向前逐行读取
+
+    每次只读取一个块，返回去掉换行符的原始字节，跳过空行。
+    """
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        pos = f.tell() if end is None else min(end, f.tell())
+        remainder = b""
+        while pos > 0:
+            read_size = min(block_size, pos)
+            pos -= read_size
+            f.seek(pos)
+            lines = (f.read(read_size) + remainder).split(b"\n")
+            remainder = lines[0]
+            for line in reversed(lines[1:]):
+                line = line.rstrip(b"\r")
+                if line:
+                    yield line
+        remainder = remainder.rstrip(b"\r")
+        if remainder:
+            yield remainder
+
+
+def _parse_line(line: bytes) -> Optional[Dict[str, Any]]:
+    try:
+        entry = json.loads(line)
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        return None
+    return entry if isinstance(entry, dict) else None
+
+
+def list_log_files(log_dir: PathLike, pattern: str = LOG_FILE_PATTERN) -> List[Path]:
+    """按修改时间从新到旧列出日志文件"""
+    files = []
+    for path in Path(log_dir).glob(pattern):
+        try:
+            files.append((path.stat().st_mtime, path))
+        except OSError:
+            continue
+    files.sort(key=lambda item: item[0], reverse=True)
+    return [path for _, path in files]
+
+
+def iter_recent_entries(log_dir: PathLike, pattern: str = LOG_FILE_PATTERN) -> Iterator[Dict[str, Any]]:
+    """从最新的日志文件末尾开始，由新到旧逐条返回日志（调用方取够即停，不会读完整个目录）"""
+    for path in list_log_files(log_dir, pattern):
+        try:
+            for line in iter_lines_reverse(path):
+                entry = _parse_line(line)
+                if entry is not None:
+                    yield entry
+        except OSError:
+            continue
+
+
+class LogFileIndex:
+    """单个日志文件的稀疏偏移索引，保存在日志目录下的 .index/<文件名>.idx"""
+
+    def __init__(self, path: PathLike, index_dir: Optional[PathLike] = None, every_lines: int = INDEX_EVERY_LINES):
+        self.path = Path(path)
+        base_dir = Path(index_dir) if index_dir is not None else self.path.parent / INDEX_DIR_NAME
+        self.index_path = base_dir / f"{self.path.name}{INDEX_SUFFIX}"
+        self.every_lines = every_lines
+        self.default_year = _file_year(self.path)
+        self.chunks: List[List[Any]] = []
+        self.indexed_size = 0
+        self._loaded = False
+
+    @property
+    def line_count(self) -> int:
+        """已索引的完整行数"""
+        if not self.chunks:
+            return 0
+        last = self.chunks[-1]
+        return last[_FIRST_LINE] + last[_LINES]
+
+    @property
+    def time_range(self) -> Tuple[Optional[float], Optional[float]]:
+        """整个文件的 (最早, 最晚) 时间"""
+        min_values = [c[_MIN_TS] for c in self.chunks if c[_MIN_TS] is not None]
+        max_values = [c[_MAX_TS] for c in self.chunks if c[_MAX_TS] is not None]
+        return (min(min_values) if min_values else None, max(max_values) if max_values else None)
+
+    def _reset(self) -> None:
+        self.chunks = []
+        self.indexed_size = 0
+
+    def _load(self) -> None:
+        if self._loaded:
+            return
+        self._loaded = True
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") != INDEX_VERSION or data.get("every_lines") != self.every_lines:
+                return
+            self.chunks = [list(chunk) for chunk in data["chunks"]]
+            self.indexed_size = int(data["size"])
+        except (OSError, ValueError, KeyError, TypeError):
+            self._reset()
+
+    def _save(self) -> None:
+        data = {
+            "version": INDEX_VERSION,
+            "every_lines": self.every_lines,
+            "size": self.indexed_size,
+            "chunks": self.chunks,
+        }
+        tmp_path = self.index_path.with_name(self.index_path.name + ".tmp")
+        try:
+            self.index_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, separators=(",", ":"))
+            os.replace(tmp_path, self.index_path)
+        except OSError:
+            # 索引只是加速手段，日志目录不可写时仍可使用内存中的索引
+            pass
+
+    def refresh(self, progress_callback: Optional[Callable[[int, int], None]] = None) -> "LogFileIndex":
+        """
+        增量更新索引并保存
+
+        只扫描上次索引之后新增的完整行（正在写入的半行留到下次）；文件变小时视为被替换，重新建立索引。
+        最后一个分块可能未满，会从其起始位置重新扫描以便继续追加。
+
+        Args:
+            progress_callback: 进度回调 (已扫描字节数, 文件总字节数)
+        """
+        self._load()
+        try:
+            size = self.path.stat().st_size
+        except OSError:
+            return self
+        if size < self.indexed_size:
+            self._reset()
+        if size == self.indexed_size:
+            return self
+
+        offset, line_no = 0, 0
+        if self.chunks:
+            last = self.chunks.pop()
+            offset, line_no = last[_START], last[_FIRST_LINE]
+
+        current: Optional[List[Any]] = None
+        current_minute: Optional[int] = None
+        scanned = 0
+        with open(self.path, "rb") as f:
+            f.seek(offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                start = offset
+                offset += len(line)
+
+                entry = _parse_line(line)
+                ts = parse_timestamp(entry.get("timestamp"), self.default_year) if entry else None
+                minute = int(ts // 60) if ts is not None else None
+
+                if (
+                    current is None
+                    or current[_LINES] >= self.every_lines
+                    or (minute is not None and current_minute is not None and minute != current_minute)
+                ):
+                    current = [start, offset, line_no, 0, None, None, 0]
+                    current_minute = None
+                    self.chunks.append(current)
+
+                current[_END] = offset
+                current[_LINES] += 1
+                line_no += 1
+                if entry is not None:
+                    current[_MASK] |= level_bit(entry.get("level", ""))
+                if ts is not None:
+                    if current_minute is None:
+                        current_minute = minute
+                    if current[_MIN_TS] is None or ts < current[_MIN_TS]:
+                        current[_MIN_TS] = ts
+                    if current[_MAX_TS] is None or ts > current[_MAX_TS]:
+                        current[_MAX_TS] = ts
+
+                if progress_callback and line_no % self.every_lines == 0:
+                    progress_callback(offset, size)
+                scanned += 1
+
+        if self.chunks:
+            self.indexed_size = self.chunks[-1][_END]
+        if progress_callback:
+            progress_callback(self.indexed_size, size)
+        if scanned:
+            self._save()
+        return self
+
+    def offset_for_line(self, line_no: int) -> Tuple[int, int]:
+        """返回包含第 line_no 行的分块的 (起始偏移, 起始行号)，用于从某一行附近开始读取"""
+        if not self.chunks or line_no <= 0:
+            return 0, 0
+        first_lines = [chunk[_FIRST_LINE] for chunk in self.chunks]
+        chunk = self.chunks[max(0, bisect_right(first_lines, line_no) - 1)]
+        return chunk[_START], chunk[_FIRST_LINE]
+
+    def _chunk_matches(self, chunk: List[Any], start_time: Optional[float], end_time: Optional[float], mask: int) -> bool:
+        if mask and chunk[_MASK] and not chunk[_MASK] & mask:
+            return False
+        if start_time is not None or end_time is not None:
+            if chunk[_MIN_TS] is None:
+                # 整个分块都没有可解析的时间，时间过滤下不可能命中
+                return False
+            if start_time is not None and chunk[_MAX_TS] < start_time:
+                return False
+            if end_time is not None and chunk[_MIN_TS] > end_time:
+                return False
+        return True
+
+    def _read_chunk(self, f, chunk: List[Any]) -> List[Tuple[int, bytes]]:
+        f.seek(chunk[_START])
+        lines = f.read(chunk[_END] - chunk[_START]).split(b"\n")
+        return [(chunk[_FIRST_LINE] + i, line.rstrip(b"\r")) for i, line in enumerate(lines) if line]
+
+    def query(
+        self,
+        start_time: Optional[float] = None,
+        end_time: Optional[float] = None,
+        levels: Optional[Iterable[str]] = None,
+        predicate: Optional[Callable[[Dict[str, Any]], bool]] = None,
+        newest_first: bool = False,
+    ) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        """
+        按时间范围/级别/自定义条件流式查询，逐条返回 (行号, 日志)
+
+        只读取索引判断可能命中的分块，每次最多在内存中保留一个分块；查询前会先增量刷新索引。
+        """
+        self.refresh()
+        mask = levels_mask(levels)
+        chunks = reversed(self.chunks) if newest_first else iter(self.chunks)
+        with open(self.path, "rb") as f:
+            for chunk in chunks:
+                if not self._chunk_matches(chunk, start_time, end_time, mask):
+                    continue
+                lines = self._read_chunk(f, chunk)
+                if newest_first:
+                    lines.reverse()
+                for line_no, line in lines:
+                    entry = _parse_line(line)
+                    if entry is None:
+                        continue
+                    if mask and not level_bit(entry.get("level", "")) & mask:
+                        continue
+                    if start_time is not None or end_time is not None:
+                        ts = parse_timestamp(entry.get("timestamp"), self.default_year)
+                        if ts is None or (start_time is not None and ts < start_time):
+                            continue
+                        if end_time is not None and ts > end_time:
+                            continue
+                    if predicate is not None and not predicate(entry):
+                        continue
+                    yield line_no, entry
+
+
+def query_logs(
+    log_dir: PathLike,
+    start_time: Optional[float] = None,
+    end_time: Optional[float] = None,
+    levels: Optional[Iterable[str]] = None,
+    predicate: Optional[Callable[[Dict[str, Any]], bool]] = None,
+    newest_first: bool = True,
+    pattern: str = LOG_FILE_PATTERN,
+) -> Iterator[Dict[str, Any]]:
+    """跨日志目录下所有文件流式查询，时间范围与查询区间不相交的文件整个跳过"""
+    files = list_log_files(log_dir, pattern)
+    if not newest_first:
+        files.reverse()
+    for path in files:
+        index = LogFileIndex(path)
+        try:
+            index.refresh()
+            first_ts, last_ts = index.time_range
+            if start_time is not None and last_ts is not None and last_ts < start_time:
+                continue
+            if end_time is not None and first_ts is not None and first_ts > end_time:
+                continue
+            for _, entry in index.query(start_time, end_time, levels, predicate, newest_first):
+                yield entry
+        except OSError:
+            continue
+
+
+def prune_indexes(log_dir: PathLike) -> int:
+    """删除对应日志文件已不存在的索引文件，返回删除数量"""
+    index_dir = Path(log_dir) / INDEX_DIR_NAME
+    removed = 0
+    if not index_dir.is_dir():
+        return removed
+    for index_path in index_dir.glob(f"*{INDEX_SUFFIX}"):
+        if not (Path(log_dir) / index_path.name[: -len(INDEX_SUFFIX)]).exists():
+            try:
+                index_path.unlink()
+                removed += 1
+            except OSError:
+                continue
+    return removed
@@ -2,15 +2,20 @@
 
 import logging
 import json
+import os
+import queue
 import threading
 import time
 import structlog
 import tomlkit
 
+from collections import deque
 from pathlib import Path
 from typing import Callable, Optional
 from datetime import datetime, timedelta
 
+from src.common.log_reader import prune_indexes
+
 # 创建logs目录
 LOG_DIR = Path("logs")
 LOG_DIR.mkdir(exist_ok=True)
@@ -92,34 +97,75 @@ def initialize_ws_handler(loop):
         print("[日志系统] ✅ WebSocket 日志推送已启用")
 
 
+class _FlushRequest:
+    """写入线程处理到此项时通知等待者，用于 flush()"""
+
+    __slots__ = ("event",)
+
+    def __init__(self):
+        self.event = threading.Event()
+
+
+_WRITER_STOP = object()
+
+
 class TimestampedFileHandler(logging.Handler):
-    """基于时间戳的文件处理器，简单的轮转份数限制"""
+    """基于时间戳的文件处理器，简单的轮转份数限制
 
-    def __init__(self, log_dir, max_bytes=5 * 1024 * 1024, backup_count=30, encoding="utf-8"):
+    调用线程只负责格式化并入队，由后台线程批量写入：
+    - 一次写入队列中积压的所有记录，只 flush 一次
+    - 文件大小在内存中累计，不再每条记录 stat() 一次
+    - 每隔 fsync_interval 秒 fsync 一次
+    """
+
+    def __init__(
+        self,
+        log_dir,
+        max_bytes=5 * 1024 * 1024,
+        backup_count=30,
+        encoding="utf-8",
+        fsync_interval=1.0,
+        batch_size=1000,
+    ):
         super().__init__()
         self.log_dir = Path(log_dir)
         self.log_dir.mkdir(exist_ok=True)
         self.max_bytes = max_bytes
         self.backup_count = backup_count
         self.encoding = encoding
+        self.fsync_interval = fsync_interval
+        self.batch_size = batch_size
         self._lock = threading.Lock()
 
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._writer_thread: Optional[threading.Thread] = None
+        self._writer_pid: Optional[int] = None
+        self._closed = False
+        self._dirty = False  # 自上次 fsync 以来是否有写入
+        self._last_fsync = time.monotonic()
+
         # 当前活跃的日志文件
         self.current_file = None
         self.current_stream = None
+        self._current_size = 0
         self._init_current_file()
 
     def _init_current_file(self):
         """初始化当前日志文件"""
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        self.current_file = self.log_dir / f"app_{timestamp}.log.jsonl"
-        self.current_stream = open(self.current_file, "a", encoding=self.encoding)
+        new_file = self.log_dir / f"app_{timestamp}.log.jsonl"
+        # 同一秒内多次轮转时追加序号，避免写回已满的文件
+        suffix = 1
+        while new_file == self.current_file or (self.current_file is not None and new_file.exists()):
+            new_file = self.log_dir / f"app_{timestamp}_{suffix}.log.jsonl"
+            suffix += 1
+        self.current_file = new_file
+        self.current_stream = open(self.current_file, "ab")
+        self._current_size = self.current_stream.tell()
 
     def _should_rollover(self):
-        """检查是否需要轮转"""
-        if self.current_file and self.current_file.exists():
-            return self.current_file.stat().st_size >= self.max_bytes
-        return False
+        """检查是否需要轮转（使用内存中累计的文件大小）"""
+        return self.current_stream is not None and self._current_size >= self.max_bytes
 
     def _do_rollover(self):
         """执行轮转：关闭当前文件，创建新文件"""
@@ -149,29 +195,138 @@ class TimestampedFileHandler(logging.Handler):
                 except Exception as e:
                     print(f"[日志清理] 删除失败 {old_file}: {e}")
 
+            # 同时删除已轮转掉的日志文件的稀疏索引
+            prune_indexes(self.log_dir)
+
         except Exception as e:
             print(f"[日志清理] 清理过程出错: {e}")
 
-    def emit(self, record):
-        """发出日志记录"""
-        try:
-            with self._lock:
-                # 检查是否需要轮转
-                if self._should_rollover():
-                    self._do_rollover()
+    def _ensure_writer(self):
+        """确保写入线程在当前进程中运行（fork 出的子进程需要重新启动）"""
+        if self._writer_pid == os.getpid() and self._writer_thread is not None:
+            return
+        with self._lock:
+            if self._writer_pid == os.getpid() and self._writer_thread is not None:
+                return
+            if self._writer_pid is not None:
+                # 子进程不继承父进程的线程，父进程队列中的内容也不属于这里
+                self._queue = queue.SimpleQueue()
+            self._writer_pid = os.getpid()
+            self._writer_thread = threading.Thread(target=self._writer_loop, name="log-file-writer", daemon=True)
+            self._writer_thread.start()
+
+    def _write_batch(self, lines):
+        """写入一批已格式化的记录（调用方持有锁）"""
+        if not lines or not self.current_stream:
+            return
+        # 检查是否需要轮转
+        if self._should_rollover():
+            self._do_rollover()
+        data = ("\n".join(lines) + "\n").encode(self.encoding, errors="replace")
+        self.current_stream.write(data)
+        self.current_stream.flush()
+        self._current_size += len(data)
+        self._dirty = True
+
+    def _fsync_if_due(self, force=False):
+        """距上次 fsync 超过间隔时同步到磁盘（调用方持有锁）"""
+        if not self._dirty or not self.current_stream:
+            return
+        now = time.monotonic()
+        if force or now - self._last_fsync >= self.fsync_interval:
+            try:
+                os.fsync(self.current_stream.fileno())
+            except OSError:
+                pass
+            self._last_fsync = now
+            self._dirty = False
+
+    def _writer_loop(self):
+        """后台写入线程：阻塞等待记录，取出积压的一批后一次性写入"""
+        while True:
+            try:
+                item = self._queue.get(timeout=self.fsync_interval)
+            except queue.Empty:
+                with self._lock:
+                    self._fsync_if_due()
+                continue
 
-                # 写入日志
-                if self.current_stream:
-                    msg = self.format(record)
-                    self.current_stream.write(msg + "\n")
-                    self.current_stream.flush()
+            lines = []
+            waiters = []
+            stop = False
+            while True:
+                if item is _WRITER_STOP:
+                    stop = True
+                elif isinstance(item, _FlushRequest):
+                    waiters.append(item)
+                else:
+                    lines.append(item)
+                if stop or len(lines) >= self.batch_size:
+                    break
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+
+            try:
+                with self._lock:
+                    self._write_batch(lines)
+                    self._fsync_if_due(force=bool(waiters) or stop)
+            except Exception as e:
+                print(f"[日志系统] 写入日志文件失败: {e}")
+            for waiter in waiters:
+                waiter.event.set()
+            if stop:
+                return
 
+    def emit(self, record):
+        """格式化日志记录并交给写入线程"""
+        if self._closed:
+            return
+        try:
+            msg = self.format(record)
+            self._ensure_writer()
+            self._queue.put(msg)
         except Exception:
             self.handleError(record)
 
+    def flush(self, timeout=5.0):
+        """等待此前入队的记录全部写入并落盘"""
+        thread = self._writer_thread
+        if self._closed or thread is None or not thread.is_alive() or thread is threading.current_thread():
+            return
+        request = _FlushRequest()
+        self._queue.put(request)
+        request.event.wait(timeout)
+
     def close(self):
-        """关闭处理器"""
+        """关闭处理器，写完队列中剩余的记录"""
+        if self._closed:
+            super().close()
+            return
+        self._closed = True
+        thread = self._writer_thread
+        if thread is not None and thread.is_alive() and self._writer_pid == os.getpid():
+            self._queue.put(_WRITER_STOP)
+            thread.join(timeout=5.0)
+
         with self._lock:
+            # 写入线程退出后仍可能有残留记录（例如 join 超时或线程从未启动）
+            remaining = []
+            while True:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if isinstance(item, str):
+                    remaining.append(item)
+                elif isinstance(item, _FlushRequest):
+                    item.event.set()
+            try:
+                self._write_batch(remaining)
+                self._fsync_if_due(force=True)
+            except Exception as e:
+                print(f"[日志系统] 写入日志文件失败: {e}")
             if self.current_stream:
                 self.current_stream.close()
                 self.current_stream = None
@@ -179,41 +334,42 @@ class TimestampedFileHandler(logging.Handler):
 
 
 class WebSocketLogHandler(logging.Handler):
-    """WebSocket 日志处理器 - 将日志实时推送到前端"""
+    """WebSocket 日志处理器 - 将日志实时推送到前端
+
+    记录先进入有界缓冲区（满时丢弃最旧的），每个 tick 在事件循环中批量广播一次，
+    浏览器接收缓慢时只会丢日志，不会反压到产生日志的代码。
+    """
 
     _log_counter = 0  # 类级别计数器,确保 ID 唯一性
 
-    def __init__(self, loop=None):
+    def __init__(self, loop=None, buffer_size=1000, tick_interval=0.1):
         super().__init__()
         self.loop = loop
         self._initialized = False
+        self.tick_interval = tick_interval
+        self._buffer: deque = deque(maxlen=buffer_size)
+        self._buffer_lock = threading.Lock()
+        self._flush_scheduled = False
+        self.dropped_count = 0  # 因缓冲区已满被丢弃的日志数量
 
     def set_loop(self, loop):
         """设置事件循环"""
         self.loop = loop
         self._initialized = True
 
+    @staticmethod
+    def _extract_message(record) -> str:
+        """取出日志正文，structlog 的记录中 msg 是事件字典，无需先渲染成 JSON 再解析"""
+        if isinstance(record.msg, dict):
+            return str(record.msg.get("event", ""))
+        return record.getMessage()
+
     def emit(self, record):
-        """发送日志到 WebSocket 客户端"""
+        """将日志放入缓冲区，由事件循环批量推送到 WebSocket 客户端"""
         if not self._initialized or self.loop is None:
             return
 
         try:
-            # 获取格式化后的消息
-            # 对于 structlog,formatted message 包含完整的日志信息
-            formatted_msg = self.format(record) if self.formatter else record.getMessage()
-
-            # 如果是 JSON 格式(文件格式化器),解析它
-            message = formatted_msg
-            try:
-                import json
-
-                log_dict = json.loads(formatted_msg)
-                message = log_dict.get("event", formatted_msg)
-            except (json.JSONDecodeError, ValueError):
-                # 不是 JSON,直接使用消息
-                message = formatted_msg
-
             # 生成唯一 ID: 时间戳毫秒 + 自增计数器
             WebSocketLogHandler._log_counter += 1
             log_id = f"{int(record.created * 1000)}_{WebSocketLogHandler._log_counter}"
@@ -224,23 +380,52 @@ class WebSocketLogHandler(logging.Handler):
                 "timestamp": datetime.fromtimestamp(record.created).strftime("%Y-%m-%d %H:%M:%S"),
                 "level": record.levelname,
                 "module": record.name,
-                "message": message,
+                "message": self._extract_message(record),
             }
 
-            # 异步广播日志(不阻塞日志记录)
-            try:
-                import asyncio
-                from src.webui.logs_ws import broadcast_log
+            with self._buffer_lock:
+                if len(self._buffer) == self._buffer.maxlen:
+                    self.dropped_count += 1
+                self._buffer.append(log_data)
+                if self._flush_scheduled:
+                    return
+                self._flush_scheduled = True
 
-                asyncio.run_coroutine_threadsafe(broadcast_log(log_data), self.loop)
-            except Exception:
-                # WebSocket 推送失败不影响日志记录
-                pass
+            # 每个 tick 只调度一次批量广播(不阻塞日志记录)
+            try:
+                self.loop.call_soon_threadsafe(self._start_flush)
+            except RuntimeError:
+                # 事件循环已关闭
+                with self._buffer_lock:
+                    self._flush_scheduled = False
 
         except Exception:
             # 不要让 WebSocket 错误影响日志系统
             self.handleError(record)
 
+    def _start_flush(self):
+        self.loop.create_task(self._flush_after_tick())
+
+    async def _flush_after_tick(self):
+        import asyncio
+
+        try:
+            await asyncio.sleep(self.tick_interval)
+        finally:
+            with self._buffer_lock:
+                batch = list(self._buffer)
+                self._buffer.clear()
+                self._flush_scheduled = False
+        if not batch:
+            return
+        try:
+            from src.webui.logs_ws import broadcast_logs
+
+            await broadcast_logs(batch)
+        except Exception:
+            # WebSocket 推送失败不影响日志记录
+            pass
+
 
 # 旧的轮转文件处理器已移除，现在使用基于时间戳的处理器
 
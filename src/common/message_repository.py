@@ -1,7 +1,7 @@
 import traceback
 
-from typing import List, Any, Optional
-from peewee import Model  # 添加 Peewee Model 导入
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+from peewee import ModelSelect
 
 from src.config.config import global_config
 from src.common.data_models.database_data_model import DatabaseMessages
@@ -11,11 +11,24 @@ from src.common.logger import get_logger
 logger = get_logger(__name__)
 
 
-def _model_to_instance(model_instance: Model) -> DatabaseMessages:
+# Messages 表的全部列（含主键 id），按模型定义顺序
+MESSAGE_COLUMNS: Tuple[str, ...] = tuple(Messages._meta.sorted_field_names)
+
+
+def select_messages(
+    columns: Optional[Sequence[str]] = None,
+) -> Tuple[ModelSelect, Callable[[Sequence[Any]], DatabaseMessages]]:
     """
-    将 Peewee 模型实例转换为字典。
+    构造只选择指定列的 Messages 查询，以及把 .tuples() 行直接转换为 DatabaseMessages 的函数
+
+    不经过 peewee 模型实例化；未选择的列在 DatabaseMessages 中取默认值。
+
+    Args:
+        columns: 需要的列名，None 表示全部列
     """
-    return DatabaseMessages(**model_instance.__data__)
+    names = tuple(columns) if columns else MESSAGE_COLUMNS
+    fields = [Messages._meta.fields[name] for name in names]
+    return Messages.select(*fields), DatabaseMessages.row_factory(names)
 
 
 def find_messages(
@@ -26,6 +39,7 @@ def find_messages(
     filter_bot=False,
     filter_command=False,
     filter_intercept_message_level: Optional[int] = None,
+    columns: Optional[Sequence[str]] = None,
 ) -> List[DatabaseMessages]:
     """
     根据提供的过滤器、排序和限制条件查找消息。
@@ -35,12 +49,13 @@ def find_messages(
         sort: 排序条件列表，例如 [('time', 1)] (1 for asc, -1 for desc)。仅在 limit 为 0 时生效。
         limit: 返回的最大文档数，0表示不限制。
         limit_mode: 当 limit > 0 时生效。 'earliest' 表示获取最早的记录， 'latest' 表示获取最新的记录（结果仍按时间正序排列）。默认为 'latest'。
+        columns: 只读取这些列（其余字段为默认值），None 表示读取全部列。
 
     Returns:
         消息字典列表，如果出错则返回空列表。
     """
     try:
-        query = Messages.select()
+        query, to_instance = select_messages(columns)
 
         # 应用过滤器
         if message_filter:
@@ -92,14 +107,13 @@ def find_messages(
         if limit > 0:
             if limit_mode == "earliest":
                 # 获取时间最早的 limit 条记录，已经是正序
-                query = query.order_by(Messages.time.asc()).limit(limit)
-                peewee_results = list(query)
+                query = query.order_by(Messages.time.asc(), Messages.id.asc()).limit(limit)
+                rows = list(query.tuples())
             else:  # 默认为 'latest'
-                # 获取时间最晚的 limit 条记录
-                query = query.order_by(Messages.time.desc()).limit(limit)
-                latest_results_peewee = list(query)
-                # 将结果按时间正序排列
-                peewee_results = sorted(latest_results_peewee, key=lambda msg: msg.time)
+                # 获取时间最晚的 limit 条记录，再反转为时间正序
+                query = query.order_by(Messages.time.desc(), Messages.id.desc()).limit(limit)
+                rows = list(query.tuples())
+                rows.reverse()
         else:
             # limit 为 0 时，应用传入的 sort 参数
             if sort:
@@ -117,9 +131,9 @@ def find_messages(
                         logger.warning(f"排序字段 '{field_name}' 在 Messages 模型中未找到。将跳过此排序条件。")
                 if peewee_sort_terms:
                     query = query.order_by(*peewee_sort_terms)
-            peewee_results = list(query)
+            rows = query.tuples()
 
-        return [_model_to_instance(msg) for msg in peewee_results]
+        return [to_instance(row) for row in rows]
     except Exception as e:
         log_message = (
             f"使用 Peewee 查找消息失败 (filter={message_filter}, sort={sort}, limit={limit}, limit_mode={limit_mode}): {e}\n"
@@ -0,0 +1,214 @@
+"""
+启动耗时分析
+
+使用 `python bot.py --profile-startup`（或设置环境变量 MAIBOT_PROFILE_STARTUP=1）启动时：
+- 统计各模块的导入耗时（按顶层包汇总自身耗时）
+- 统计各初始化阶段的墙钟耗时及其所在线程
+- 记录从进程启动到初始化完成、收到第一条消息、发出第一条回复的时间
+
+报告输出到日志，并写入 logs/startup_profile.json。
+"""
+
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+
+from contextlib import contextmanager
+from importlib.machinery import ModuleSpec
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+
+PROFILE_FLAG = "--profile-startup"
+PROFILE_ENV = "MAIBOT_PROFILE_STARTUP"
+REPORT_PATH = os.path.join("logs", "startup_profile.json")
+
+
+class _ImportTimer:
+    """
+    sys.meta_path 上的计时查找器
+
+    只负责找到真正的spec并包装其加载器的 exec_module，不改变加载器类型；
+    以线程局部的栈记录嵌套导入，从而得到每个模块的自身耗时。
+    """
+
+    def __init__(self, profiler: "StartupProfiler"):
+        self._profiler = profiler
+        self._local = threading.local()
+
+    def find_spec(self, fullname: str, path=None, target=None) -> Optional[ModuleSpec]:
+        if getattr(self._local, "finding", False):
+            return None
+        self._local.finding = True
+        try:
+            for finder in sys.meta_path:
+                if finder is self or not hasattr(finder, "find_spec"):
+                    continue
+                spec = finder.find_spec(fullname, path, target)
+                if spec is not None:
+                    break
+            else:
+                return None
+        finally:
+            self._local.finding = False
+
+        loader = spec.loader
+        # 内置/冻结模块的加载器是类本身，不做包装
+        if loader is None or isinstance(loader, type) or not hasattr(loader, "exec_module"):
+            return spec
+        exec_module = loader.exec_module
+
+        def timed_exec_module(module):
+            stack: List[float] = self._local.__dict__.setdefault("children", [])
+            stack.append(0.0)
+            start = time.perf_counter()
+            try:
+                exec_module(module)
+            finally:
+                elapsed = time.perf_counter() - start
+                children = stack.pop()
+                if stack:
+                    stack[-1] += elapsed
+                self._profiler._record_import(fullname, elapsed, elapsed - children)
+
+        try:
+            loader.exec_module = timed_exec_module  # type: ignore
+        except (AttributeError, TypeError):
+            pass
+        return spec
+
+
+class StartupProfiler:
+    """启动耗时记录器，未启用时只做廉价的时间戳记录"""
+
+    def __init__(self):
+        self.enabled = PROFILE_FLAG in sys.argv or os.environ.get(PROFILE_ENV) == "1"
+        self.process_start = time.perf_counter()
+        self._stages: List[Tuple[str, float, float, str]] = []
+        self._marks: Dict[str, float] = {}
+        self._imports: Dict[str, Tuple[float, float]] = {}  # 模块名 -> (含子模块耗时, 自身耗时)
+        self._import_lock = threading.Lock()
+        self._import_timer: Optional[_ImportTimer] = None
+
+    def install_import_hook(self) -> None:
+        """开始统计模块导入耗时（仅在启用时生效），应尽早调用"""
+        if self.enabled and self._import_timer is None:
+            self._import_timer = _ImportTimer(self)
+            sys.meta_path.insert(0, self._import_timer)  # type: ignore
+
+    def uninstall_import_hook(self) -> None:
+        if self._import_timer is not None:
+            try:
+                sys.meta_path.remove(self._import_timer)  # type: ignore
+            except ValueError:
+                pass
+            self._import_timer = None
+
+    def _record_import(self, name: str, inclusive: float, self_time: float) -> None:
+        with self._import_lock:
+            self._imports[name] = (inclusive, self_time)
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """记录一个初始化阶段的耗时"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._stages.append((name, start, time.perf_counter(), threading.current_thread().name))
+
+    async def run_in_thread(self, name: str, func: Callable[..., T], *args: Any) -> T:
+        """在线程中执行一个同步初始化阶段并记录耗时"""
+
+        def _run() -> T:
+            with self.stage(name):
+                return func(*args)
+
+        return await asyncio.to_thread(_run)
+
+    async def run_async(self, name: str, coro) -> Any:
+        """执行一个异步初始化阶段并记录耗时"""
+        with self.stage(name):
+            return await coro
+
+    def mark(self, name: str) -> None:
+        """记录一个里程碑（只记录第一次），启用分析时输出距进程启动的时间"""
+        if name in self._marks:
+            return
+        self._marks[name] = time.perf_counter()
+        if self.enabled and name != "ready":
+            from src.common.logger import get_logger
+
+            get_logger("startup").info(
+                f"[启动分析] {name}: 进程启动后 {self._marks[name] - self.process_start:.2f}s"
+            )
+            self._write_json()
+
+    def _import_summary(self, limit: int) -> List[Tuple[str, float, int]]:
+        """按顶层包汇总导入的自身耗时；项目内模块按二级包汇总"""
+        totals: Dict[str, List[float]] = {}
+        with self._import_lock:
+            items = list(self._imports.items())
+        for name, (_, self_time) in items:
+            parts = name.split(".")
+            key = ".".join(parts[:3]) if parts[0] == "src" else parts[0]
+            entry = totals.setdefault(key, [0.0, 0])
+            entry[0] += self_time
+            entry[1] += 1
+        ordered = sorted(totals.items(), key=lambda item: item[1][0], reverse=True)
+        return [(key, seconds, int(count)) for key, (seconds, count) in ordered[:limit]]
+
+    def _as_dict(self) -> Dict[str, Any]:
+        base = self.process_start
+        return {
+            "marks": {name: round(t - base, 4) for name, t in self._marks.items()},
+            "stages": [
+                {
+                    "name": name,
+                    "start": round(start - base, 4),
+                    "seconds": round(end - start, 4),
+                    "thread": thread,
+                }
+                for name, start, end, thread in self._stages
+            ],
+            "imports": [
+                {"package": key, "seconds": round(seconds, 4), "modules": count}
+                for key, seconds, count in self._import_summary(limit=50)
+            ],
+        }
+
+    def _write_json(self) -> None:
+        try:
+            os.makedirs(os.path.dirname(REPORT_PATH), exist_ok=True)
+            with open(REPORT_PATH, "w", encoding="utf-8") as f:
+                json.dump(self._as_dict(), f, ensure_ascii=False, indent=2)
+        except OSError:
+            pass
+
+    def report(self, top_imports: int = 15) -> None:
+        """输出启动报告（仅在启用时）"""
+        if not self.enabled:
+            return
+        from src.common.logger import get_logger
+
+        logger = get_logger("startup")
+        base = self.process_start
+        lines = ["[启动分析] 初始化阶段（相对进程启动的开始时间 / 耗时 / 线程）:"]
+        for name, start, end, thread in sorted(self._stages, key=lambda stage: stage[1]):
+            lines.append(f"  {name:<24} +{start - base:7.2f}s  {end - start:7.3f}s  {thread}")
+        lines.append(f"[启动分析] 导入耗时最高的 {top_imports} 个包（自身耗时 / 模块数）:")
+        lines.extend(
+            f"  {key:<36} {seconds:7.3f}s  {count}" for key, seconds, count in self._import_summary(top_imports)
+        )
+        total_import = sum(self_time for _, self_time in self._imports.values())
+        lines.append(f"[启动分析] 模块导入总耗时 {total_import:.2f}s")
+        if "ready" in self._marks:
+            lines.append(f"[启动分析] 进程启动到初始化完成 {self._marks['ready'] - base:.2f}s")
+        logger.info("\n".join(lines))
+        self._write_json()
+
+
+startup_profiler = StartupProfiler()
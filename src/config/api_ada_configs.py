@@ -137,3 +137,44 @@ class ModelTaskConfig(ConfigBase):
         if hasattr(self, task_name):
             return getattr(self, task_name)
         raise ValueError(f"任务 '{task_name}' 未找到对应的配置")
+
+
+@dataclass
+class LLMSchedulerConfig(ConfigBase):
+    """LLM请求调度配置
+
+    请求按 request_type 分为三个优先级：
+    - foreground: 回复、规划等用户可见的请求
+    - normal: 工具调用、记忆检索、识图等
+    - background: 表达学习、黑话推断、聊天总结、做梦等后台任务
+    """
+
+    enable: bool = True
+    """是否启用调度，关闭后所有请求直接发出"""
+
+    foreground_max_concurrency: int = 8
+    """前台请求最大并发数"""
+
+    normal_max_concurrency: int = 6
+    """普通请求最大并发数"""
+
+    background_max_concurrency: int = 2
+    """后台请求最大并发数"""
+
+    foreground_tokens_per_minute: int = 0
+    """前台请求每分钟token预算，0为不限制"""
+
+    normal_tokens_per_minute: int = 0
+    """普通请求每分钟token预算，0为不限制"""
+
+    background_tokens_per_minute: int = 60000
+    """后台请求每分钟token预算，0为不限制"""
+
+    foreground_latency_threshold: float = 20.0
+    """前台请求平均耗时（含排队）超过此值（秒）时暂缓后台请求"""
+
+    max_background_defer: float = 300.0
+    """后台请求最长被暂缓的时间（秒），超过后不再因前台延迟而等待，避免饿死"""
+
+    request_type_priority: dict[str, str] = field(default_factory=dict)
+    """自定义 request_type 前缀到优先级（foreground/normal/background）的映射，优先于内置规则"""
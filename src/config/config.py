@@ -41,6 +41,7 @@ from .api_ada_configs import (
     ModelTaskConfig,
     ModelInfo,
     APIProvider,
+    LLMSchedulerConfig,
 )
 
 
@@ -372,6 +373,9 @@ class APIAdapterConfig(ConfigBase):
     api_providers: List[APIProvider] = field(default_factory=list)
     """API提供商列表"""
 
+    llm_scheduler: LLMSchedulerConfig = field(default_factory=LLMSchedulerConfig)
+    """LLM请求调度配置"""
+
     def __post_init__(self):
         if not self.models:
             raise ValueError("模型列表不能为空，请在配置中设置有效的模型列表。")
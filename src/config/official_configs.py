@@ -2,9 +2,15 @@ import re
 
 from dataclasses import dataclass, field
 from typing import Literal, Optional
-import time
 
+from src.common.logger import get_logger
 from src.config.config_base import ConfigBase
+from src.config.rule_tables import (
+    compile_minute_schedule,
+    get_compiled,
+    now_minutes,
+    parse_stream_config_to_chat_id,
+)
 
 """
 须知：
@@ -14,6 +20,8 @@ from src.config.config_base import ConfigBase
 4. 对于新增的字段，若为可选项，则应在其后添加field()并设置default_factory或default
 """
 
+logger = get_logger("config")
+
 
 @dataclass
 class BotConfig(ConfigBase):
@@ -125,121 +133,52 @@ class ChatConfig(ConfigBase):
     llm_quote: bool = False
     """是否在 reply action 中启用 quote 参数，启用后 LLM 可以控制是否引用消息"""
 
-    def _parse_stream_config_to_chat_id(self, stream_config_str: str) -> Optional[str]:
-        """与 ChatStream.get_stream_id 一致地从 "platform:id:type" 生成 chat_id。"""
-        try:
-            parts = stream_config_str.split(":")
-            if len(parts) != 3:
-                return None
-
-            platform = parts[0]
-            id_str = parts[1]
-            stream_type = parts[2]
-
-            is_group = stream_type == "group"
-
-            from src.chat.message_receive.chat_stream import get_chat_manager
+    @staticmethod
+    def _nonzero_talk_value(value: float) -> float:
+        # 防止返回0值，自动转换为0.0000001
+        return 0.0000001 if value == 0 else value
 
-            return get_chat_manager().get_stream_id(platform, str(id_str), is_group=is_group)
-
-        except (ValueError, IndexError):
-            return None
+    def _compile_talk_value_rules(self) -> dict[str, list[Optional[float]]]:
+        """将发言频率规则编译为 chat_id（全局为""） -> 按分钟索引的日程表"""
+        entries_by_target: dict[str, list[tuple[str, float]]] = {}
+        for rule in self.talk_value_rules:
+            if not isinstance(rule, dict) or "target" not in rule:
+                continue
+            try:
+                value = self._nonzero_talk_value(float(rule.get("value", None)))  # type: ignore
+            except Exception:
+                continue
+            target = rule["target"]
+            if target == "":
+                chat_id = ""
+            elif (chat_id := parse_stream_config_to_chat_id(str(target))) is None:
+                continue
+            entries_by_target.setdefault(chat_id, []).append((rule.get("time", ""), value))
 
-    def _now_minutes(self) -> int:
-        """返回本地时间的分钟数(0-1439)。"""
-        lt = time.localtime()
-        return lt.tm_hour * 60 + lt.tm_min
+        tables: dict[str, list[Optional[float]]] = {}
+        for chat_id, entries in entries_by_target.items():
+            if (schedule := compile_minute_schedule(entries)) is not None:
+                tables[chat_id] = schedule
+        return tables
 
-    def _parse_range(self, range_str: str) -> Optional[tuple[int, int]]:
-        """解析 "HH:MM-HH:MM" 到 (start_min, end_min)。"""
-        try:
-            start_str, end_str = [s.strip() for s in range_str.split("-")]
-            sh, sm = [int(x) for x in start_str.split(":")]
-            eh, em = [int(x) for x in end_str.split(":")]
-            return sh * 60 + sm, eh * 60 + em
-        except Exception:
-            return None
+    def get_talk_value(self, chat_id: Optional[str]) -> float:
+        """根据规则返回当前 chat 的动态 talk_value，未匹配则回退到基础值。
 
-    def _in_range(self, now_min: int, start_min: int, end_min: int) -> bool:
-        """
-        判断 now_min 是否在 [start_min, end_min] 区间内。
-        支持跨夜：如果 start > end，则表示跨越午夜。
+        匹配优先级: 先匹配指定 chat 流规则，再匹配全局规则("")；规则在首次访问时编译为查找表。
         """
-        if start_min <= end_min:
-            return start_min <= now_min <= end_min
-        # 跨夜：例如 23:00-02:00
-        return now_min >= start_min or now_min <= end_min
-
-    def get_talk_value(self, chat_id: Optional[str]) -> float:
-        """根据规则返回当前 chat 的动态 talk_value，未匹配则回退到基础值。"""
         if not self.enable_talk_value_rules or not self.talk_value_rules:
-            result = self.talk_value
-            # 防止返回0值，自动转换为0.0001
-            if result == 0:
-                return 0.0000001
-            return result
-
-        now_min = self._now_minutes()
-
-        # 1) 先尝试匹配指定 chat 的规则
-        if chat_id:
-            for rule in self.talk_value_rules:
-                if not isinstance(rule, dict):
-                    continue
-                target = rule.get("target", "")
-                time_range = rule.get("time", "")
-                value = rule.get("value", None)
-                if not isinstance(time_range, str):
-                    continue
-                # 跳过全局
-                if target == "":
-                    continue
-                config_chat_id = self._parse_stream_config_to_chat_id(str(target))
-                if config_chat_id is None or config_chat_id != chat_id:
-                    continue
-                parsed = self._parse_range(time_range)
-                if not parsed:
-                    continue
-                start_min, end_min = parsed
-                if self._in_range(now_min, start_min, end_min):
-                    try:
-                        result = float(value)
-                        # 防止返回0值，自动转换为0.0001
-                        if result == 0:
-                            return 0.0000001
-                        return result
-                    except Exception:
-                        continue
-
-        # 2) 再匹配全局规则("")
-        for rule in self.talk_value_rules:
-            if not isinstance(rule, dict):
-                continue
-            target = rule.get("target", None)
-            time_range = rule.get("time", "")
-            value = rule.get("value", None)
-            if target != "" or not isinstance(time_range, str):
-                continue
-            parsed = self._parse_range(time_range)
-            if not parsed:
-                continue
-            start_min, end_min = parsed
-            if self._in_range(now_min, start_min, end_min):
-                try:
-                    result = float(value)
-                    # 防止返回0值，自动转换为0.0001
-                    if result == 0:
-                        return 0.0000001
-                    return result
-                except Exception:
-                    continue
-
-        # 3) 未命中规则返回基础值
-        result = self.talk_value
-        # 防止返回0值，自动转换为0.0001
-        if result == 0:
-            return 0.0000001
-        return result
+            return self._nonzero_talk_value(self.talk_value)
+
+        tables = get_compiled(self, "talk_value_rules", self._compile_talk_value_rules)
+        if tables:
+            now_min = now_minutes()
+            if chat_id and (schedule := tables.get(chat_id)) and (value := schedule[now_min]) is not None:
+                return value
+            if (schedule := tables.get("")) and (value := schedule[now_min]) is not None:
+                return value
+
+        # 未命中规则返回基础值
+        return self._nonzero_talk_value(self.talk_value)
 
 
 @dataclass
@@ -289,12 +228,22 @@ class MemoryConfig(ConfigBase):
     - False: 沿用旧模式，使用 LLM 生成问题
     """
 
+    answer_cache_ttl_seconds: float = 1800.0
+    """记忆检索答案缓存的有效期（秒），语义相近的问题在有效期内直接复用之前的结论；设为0关闭缓存"""
+
+    answer_cache_similarity_threshold: float = 0.9
+    """问题嵌入向量的余弦相似度达到该值时视为同一问题"""
+
     def __post_init__(self):
         """验证配置值"""
         if self.max_agent_iterations < 1:
             raise ValueError(f"max_agent_iterations 必须至少为1，当前值: {self.max_agent_iterations}")
         if self.agent_timeout_seconds <= 0:
             raise ValueError(f"agent_timeout_seconds 必须大于0，当前值: {self.agent_timeout_seconds}")
+        if not 0 < self.answer_cache_similarity_threshold <= 1:
+            raise ValueError(
+                f"answer_cache_similarity_threshold 必须在 (0, 1] 范围内，当前值: {self.answer_cache_similarity_threshold}"
+            )
 
 
 @dataclass
@@ -376,6 +325,19 @@ class ExpressionConfig(ConfigBase):
     默认值：10条
     """
 
+    expression_auto_check_batch_size: int = 10
+    """
+    表达方式自动检查时每次LLM请求评估的表达方式数量
+    多条表达方式共用一份评估标准，逐条输出结果；设为1则逐条评估
+    默认值：10条
+    """
+
+    expression_auto_check_concurrency: int = 2
+    """
+    表达方式自动检查时同时进行的LLM请求数量（请求仍受后台LLM调度预算限制）
+    默认值：2
+    """
+
     expression_auto_check_custom_criteria: list[str] = field(default_factory=list)
     """
     表达方式自动检查的额外自定义评估标准
@@ -394,25 +356,38 @@ class ExpressionConfig(ConfigBase):
         Returns:
             str: 生成的 chat_id，如果解析失败则返回 None
         """
-        try:
-            parts = stream_config_str.split(":")
-            if len(parts) != 3:
-                return None
-
-            platform = parts[0]
-            id_str = parts[1]
-            stream_type = parts[2]
+        return parse_stream_config_to_chat_id(stream_config_str)
 
-            # 判断是否为群聊
-            is_group = stream_type == "group"
+    @staticmethod
+    def _parse_learning_item(config_item: list) -> Optional[tuple[bool, bool, bool]]:
+        try:
+            use_expression: bool = config_item[1].lower() == "enable"
+            enable_learning: bool = config_item[2].lower() == "enable"
+            enable_jargon_learning: bool = config_item[3].lower() == "enable"
+            return use_expression, enable_learning, enable_jargon_learning
+        except (ValueError, IndexError, AttributeError):
+            return None
 
-            # 使用 ChatManager 提供的接口生成 chat_id，避免在此重复实现逻辑
-            from src.chat.message_receive.chat_stream import get_chat_manager
+    def _compile_learning_list(self) -> dict[str, tuple[bool, bool, bool]]:
+        """将表达学习配置编译为 chat_id（全局为""） -> (是否使用表达, 是否学习表达, 是否启用jargon学习)
 
-            return get_chat_manager().get_stream_id(platform, str(id_str), is_group=is_group)
+        同一个聊天流配置了多次时以第一条为准
+        """
+        table: dict[str, tuple[bool, bool, bool]] = {}
+        for config_item in self.learning_list:
+            if not config_item or len(config_item) < 4:
+                continue
 
-        except (ValueError, IndexError):
-            return None
+            stream_config_str = config_item[0]  # 例如 "qq:1026294844:group"，空字符串为全局配置
+            if stream_config_str == "":
+                chat_id = ""
+            elif (chat_id := self._parse_stream_config_to_chat_id(stream_config_str)) is None:
+                continue
+            if chat_id in table:
+                continue
+            if (parsed := self._parse_learning_item(config_item)) is not None:
+                table[chat_id] = parsed
+        return table
 
     def get_expression_config_for_chat(self, chat_stream_id: Optional[str] = None) -> tuple[bool, bool, bool]:
         """
@@ -428,82 +403,56 @@ class ExpressionConfig(ConfigBase):
             # 如果没有配置，使用默认值：启用表达，启用学习，启用jargon学习
             return True, True, True
 
-        # 优先检查聊天流特定的配置
-        if chat_stream_id:
-            specific_expression_config = self._get_stream_specific_config(chat_stream_id)
-            if specific_expression_config is not None:
-                return specific_expression_config
-
-        # 检查全局配置（第一个元素为空字符串的配置）
-        global_expression_config = self._get_global_config()
-        if global_expression_config is not None:
-            return global_expression_config
-
-        # 如果都没有匹配，返回默认值：启用表达，启用学习，启用jargon学习
-        return True, True, True
+        table = get_compiled(self, "learning_list", self._compile_learning_list)
+        # 优先使用聊天流特定的配置，其次是全局配置，都没有则使用默认值
+        if chat_stream_id and (specific := table.get(chat_stream_id)) is not None:
+            return specific
+        return table.get("", (True, True, True))
 
-    def _get_stream_specific_config(self, chat_stream_id: str) -> Optional[tuple[bool, bool, bool]]:
-        """
-        获取特定聊天流的表达配置
-
-        Args:
-            chat_stream_id: 聊天流ID（哈希值）
+    def _compile_expression_groups(self) -> tuple[Optional[list[str]], dict[str, list[str]]]:
+        """编译表达互通组
 
         Returns:
-            tuple: (是否使用表达, 是否学习表达, 是否启用jargon学习)，如果没有配置则返回 None
-        """
-        for config_item in self.learning_list:
-            if not config_item or len(config_item) < 4:
-                continue
-
-            stream_config_str = config_item[0]  # 例如 "qq:1026294844:group"
-
-            # 如果是空字符串，跳过（这是全局配置）
-            if stream_config_str == "":
-                continue
-
-            # 解析配置字符串并生成对应的 chat_id
-            config_chat_id = self._parse_stream_config_to_chat_id(stream_config_str)
-            if config_chat_id is None:
-                continue
-
-            # 比较生成的 chat_id
-            if config_chat_id != chat_stream_id:
-                continue
-
-            # 解析配置
-            try:
-                use_expression: bool = config_item[1].lower() == "enable"
-                enable_learning: bool = config_item[2].lower() == "enable"
-                enable_jargon_learning: bool = config_item[3].lower() == "enable"
-                return use_expression, enable_learning, enable_jargon_learning  # type: ignore
-            except (ValueError, IndexError):
-                continue
-
-        return None
-
-    def _get_global_config(self) -> Optional[tuple[bool, bool, bool]]:
+            (全局共享时所有组内的chat_id，否则为None, chat_id -> 所在第一个组的chat_id列表)
         """
-        获取全局表达配置
-
-        Returns:
-            tuple: (是否使用表达, 是否学习表达, 是否启用jargon学习)，如果没有配置则返回 None
-        """
-        for config_item in self.learning_list:
-            if not config_item or len(config_item) < 4:
-                continue
-
-            # 检查是否为全局配置（第一个元素为空字符串）
-            if config_item[0] == "":
-                try:
-                    use_expression: bool = config_item[1].lower() == "enable"
-                    enable_learning: bool = config_item[2].lower() == "enable"
-                    enable_jargon_learning: bool = config_item[3].lower() == "enable"
-                    return use_expression, enable_learning, enable_jargon_learning  # type: ignore
-                except (ValueError, IndexError):
-                    continue
-
-        return None
+        groups = self.expression_groups
+        parsed_groups = [
+            [chat_id for stream_config_str in group if (chat_id := self._parse_stream_config_to_chat_id(stream_config_str))]
+            for group in groups
+        ]
+
+        # 存在全局共享组（包含"*"的组）时，所有组内的chat_id互通
+        if any("*" in group for group in groups):
+            all_chat_ids = list({chat_id for group in parsed_groups for chat_id in group})
+            return all_chat_ids, {}
+
+        related: dict[str, list[str]] = {}
+        for group_chat_ids in parsed_groups:
+            for chat_id in group_chat_ids:
+                related.setdefault(chat_id, group_chat_ids)
+        return None, related
+
+    def get_related_chat_ids(self, chat_id: str) -> list[str]:
+        """根据expression_groups配置，获取与当前chat_id相关的所有chat_id（包括自身）"""
+        global_chat_ids, related = get_compiled(self, "expression_groups", self._compile_expression_groups)
+        if global_chat_ids is not None:
+            return list(global_chat_ids) if global_chat_ids else [chat_id]
+        return list(related.get(chat_id, [chat_id]))
+
+    def _compile_allow_reflect(self) -> frozenset[str]:
+        chat_ids = set()
+        for stream_config in self.allow_reflect:
+            if parsed_chat_id := self._parse_stream_config_to_chat_id(stream_config):
+                chat_ids.add(parsed_chat_id)
+            else:
+                logger.warning(f"[Expression Reflection] 无法解析 allow_reflect 配置项: {stream_config}")
+        return frozenset(chat_ids)
+
+    def is_reflect_allowed(self, chat_id: str) -> bool:
+        """聊天流是否允许进行表达反思，allow_reflect 为空时所有聊天流都允许"""
+        if not self.allow_reflect:
+            return True
+        return chat_id in get_compiled(self, "allow_reflect", self._compile_allow_reflect)
 
 
 @dataclass
@@ -812,11 +761,17 @@ class LPMMKnowledgeConfig(ConfigBase):
     """每批嵌入的条数"""
 
     max_synonym_entities: int = 2000
-    """同义边参与的实体数上限，超限则跳过"""
+    """同义连接每批检索的实体数（分块大小，限制检索时的内存占用）"""
+
+    synonym_ann_min_entities: int = 0
+    """实体库规模达到该值时，同义连接改用HNSW近似索引检索；0 表示始终精确检索"""
 
     enable_ppr: bool = True
     """是否启用PPR，低配机器可关闭"""
 
+    startup_warmup: bool = True
+    """启动后是否在后台预加载知识库；关闭则在第一次查询知识时才加载"""
+
 
 @dataclass
 class DreamConfig(ConfigBase):
@@ -854,31 +809,6 @@ class DreamConfig(ConfigBase):
     支持跨夜区间，例如 "23:00-02:00" 表示从23:00到次日02:00。
     """
 
-    def _now_minutes(self) -> int:
-        """返回本地时间的分钟数(0-1439)。"""
-        lt = time.localtime()
-        return lt.tm_hour * 60 + lt.tm_min
-
-    def _parse_range(self, range_str: str) -> Optional[tuple[int, int]]:
-        """解析 "HH:MM-HH:MM" 到 (start_min, end_min)。"""
-        try:
-            start_str, end_str = [s.strip() for s in range_str.split("-")]
-            sh, sm = [int(x) for x in start_str.split(":")]
-            eh, em = [int(x) for x in end_str.split(":")]
-            return sh * 60 + sm, eh * 60 + em
-        except Exception:
-            return None
-
-    def _in_range(self, now_min: int, start_min: int, end_min: int) -> bool:
-        """
-        判断 now_min 是否在 [start_min, end_min] 区间内。
-        支持跨夜：如果 start > end，则表示跨越午夜。
-        """
-        if start_min <= end_min:
-            return start_min <= now_min <= end_min
-        # 跨夜：例如 23:00-02:00
-        return now_min >= start_min or now_min <= end_min
-
     def is_in_dream_time(self) -> bool:
         """
         检查当前时间是否在允许做梦的时间段内。
@@ -887,19 +817,10 @@ class DreamConfig(ConfigBase):
         if not self.dream_time_ranges:
             return True
 
-        now_min = self._now_minutes()
-
-        for time_range in self.dream_time_ranges:
-            if not isinstance(time_range, str):
-                continue
-            parsed = self._parse_range(time_range)
-            if not parsed:
-                continue
-            start_min, end_min = parsed
-            if self._in_range(now_min, start_min, end_min):
-                return True
-
-        return False
+        schedule = get_compiled(
+            self, "dream_time_ranges", lambda: compile_minute_schedule((r, True) for r in self.dream_time_ranges)
+        )
+        return bool(schedule and schedule[now_minutes()])
 
     dream_visible: bool = False
     """
@@ -0,0 +1,106 @@
+"""
+配置规则编译
+
+按聊天流/按时段生效的配置规则（发言频率规则、表达学习配置、表达互通组、做梦时段等）
+在首次访问时编译为 chat_id 查找表和按分钟索引的日程表，之后的查询都是字典/列表下标访问。
+配置热更新后调用 invalidate_rule_tables() 使所有编译结果失效，下次访问时重新编译。
+"""
+
+import time
+
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+
+MINUTES_PER_DAY = 24 * 60
+
+_rule_version = 0
+
+
+def invalidate_rule_tables() -> None:
+    """使所有已编译的规则表失效（配置重新加载或热更新后调用）"""
+    global _rule_version
+    _rule_version += 1
+
+
+def get_compiled(owner: Any, key: str, builder: Callable[[], T]) -> T:
+    """获取 owner 上缓存的编译结果，规则版本变化后重新编译
+
+    Args:
+        owner: 持有规则的配置对象
+        key: 编译结果的名称
+        builder: 编译函数
+    """
+    cache: Dict[str, Tuple[int, Any]] = owner.__dict__.setdefault("_compiled_rules", {})
+    entry = cache.get(key)
+    if entry is None or entry[0] != _rule_version:
+        entry = (_rule_version, builder())
+        cache[key] = entry
+    return entry[1]
+
+
+def now_minutes() -> int:
+    """返回本地时间的分钟数(0-1439)"""
+    lt = time.localtime()
+    return lt.tm_hour * 60 + lt.tm_min
+
+
+def parse_time_range(range_str: str) -> Optional[Tuple[int, int]]:
+    """解析 "HH:MM-HH:MM" 到 (start_min, end_min)"""
+    try:
+        start_str, end_str = [s.strip() for s in range_str.split("-")]
+        sh, sm = [int(x) for x in start_str.split(":")]
+        eh, em = [int(x) for x in end_str.split(":")]
+        return sh * 60 + sm, eh * 60 + em
+    except Exception:
+        return None
+
+
+def in_time_range(now_min: int, start_min: int, end_min: int) -> bool:
+    """
+    判断 now_min 是否在 [start_min, end_min] 区间内。
+    支持跨夜：如果 start > end，则表示跨越午夜。
+    """
+    if start_min <= end_min:
+        return start_min <= now_min <= end_min
+    # 跨夜：例如 23:00-02:00
+    return now_min >= start_min or now_min <= end_min
+
+
+def compile_minute_schedule(entries: Iterable[Tuple[str, T]]) -> Optional[List[Optional[T]]]:
+    """将按顺序排列的 (时间段, 值) 编译为按分钟索引的日程表
+
+    同一分钟命中多条规则时取第一条，与逐条匹配的语义一致；无法解析的时间段被跳过。
+
+    Returns:
+        长度为1440的列表，未命中任何规则的分钟为None；没有任何有效规则时返回None
+    """
+    schedule: List[Optional[T]] = [None] * MINUTES_PER_DAY
+    has_rule = False
+    for range_str, value in entries:
+        if not isinstance(range_str, str) or (parsed := parse_time_range(range_str)) is None:
+            continue
+        start_min, end_min = parsed
+        has_rule = True
+        for minute in range(MINUTES_PER_DAY):
+            if schedule[minute] is None and in_time_range(minute, start_min, end_min):
+                schedule[minute] = value
+    return schedule if has_rule else None
+
+
+def parse_stream_config_to_chat_id(stream_config_str: str) -> Optional[str]:
+    """与 ChatStream.get_stream_id 一致地从 "platform:id:type" 生成 chat_id，解析失败返回None"""
+    try:
+        parts = stream_config_str.split(":")
+        if len(parts) != 3:
+            return None
+
+        platform, id_str, stream_type = parts
+        is_group = stream_type == "group"
+
+        # 使用 ChatManager 提供的接口生成 chat_id，避免在此重复实现逻辑
+        from src.chat.message_receive.chat_stream import get_chat_manager
+
+        return get_chat_manager().get_stream_id(platform, str(id_str), is_group=is_group)
+    except (ValueError, IndexError, AttributeError):
+        return None
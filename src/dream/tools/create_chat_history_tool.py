@@ -2,6 +2,7 @@ import time
 
 from src.common.logger import get_logger
 from src.common.database.database_model import ChatHistory
+from src.memory_system.answer_cache import answer_cache
 
 logger = get_logger("dream_agent")
 
@@ -48,6 +49,7 @@ def make_create_chat_history(chat_id: str):
                 start_time=start_ts,
                 end_time=end_ts,
             )
+            answer_cache.invalidate(chat_id)
 
             msg = (
                 f"已创建新的 ChatHistory 记录，ID={record.id}，"
@@ -1,5 +1,6 @@
 from src.common.logger import get_logger
 from src.common.database.database_model import ChatHistory
+from src.memory_system.answer_cache import answer_cache
 
 logger = get_logger("dream_agent")
 
@@ -15,6 +16,7 @@ def make_delete_chat_history(chat_id: str):  # chat_id 目前未直接使用，
                 logger.info(f"[dream][tool] delete_chat_history 未找到记录: {msg}")
                 return msg
             rows = ChatHistory.delete().where(ChatHistory.id == memory_id).execute()
+            answer_cache.invalidate(record.chat_id)
             msg = f"已删除 ID={memory_id} 的 ChatHistory 记录，受影响行数={rows}。"
             logger.info(f"[dream][tool] delete_chat_history 完成: {msg}")
             return msg
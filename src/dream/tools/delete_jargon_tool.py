@@ -1,5 +1,7 @@
 from src.common.logger import get_logger
 from src.common.database.database_model import Jargon
+from src.bw_learner.jargon_matcher import jargon_matcher
+from src.bw_learner.learner_utils import delete_jargon_chats
 
 logger = get_logger("dream_agent")
 
@@ -15,6 +17,8 @@ def make_delete_jargon(chat_id: str):  # chat_id 目前未直接使用，预留
                 logger.info(f"[dream][tool] delete_jargon 未找到记录: {msg}")
                 return msg
             rows = Jargon.delete().where(Jargon.id == jargon_id).execute()
+            delete_jargon_chats([jargon_id])
+            jargon_matcher.remove([jargon_id])
             msg = f"已删除 ID={jargon_id} 的 Jargon 记录（内容：{record.content}），受影响行数={rows}。"
             logger.info(f"[dream][tool] delete_jargon 完成: {msg}")
             return msg
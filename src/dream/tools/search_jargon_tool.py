@@ -1,10 +1,14 @@
+from functools import reduce
+from operator import or_
 from typing import List
 
+from peewee import fn
+
 from src.common.logger import get_logger
 from src.common.database.database_model import Jargon
 from src.config.config import global_config
 from src.chat.utils.utils import parse_keywords_string
-from src.bw_learner.learner_utils import parse_chat_id_list, chat_id_list_contains
+from src.bw_learner.learner_utils import jargon_visible_in_chat
 
 logger = get_logger("dream_agent")
 
@@ -26,17 +30,8 @@ def make_search_jargon(chat_id: str):
                 # 开启全局黑话：只看 is_global=True 的记录，不区分 chat_id
                 query = query.where(Jargon.is_global)
             else:
-                # 关闭全局黑话：后续在 Python 层按 chat_id 列表过滤（包含 is_global=True）
-                pass
-
-            # 先按使用次数排序取一批候选，做一个安全上限
-            query = query.order_by(Jargon.count.desc()).limit(200)
-            candidates = list(query)
-
-            if not candidates:
-                msg = "未找到符合条件的 Jargon 记录。"
-                logger.info(f"[dream][tool] search_jargon 无记录: {msg}")
-                return msg
+                # 关闭全局黑话：只看全局黑话或在当前 chat_id 中出现过的记录
+                query = query.where(jargon_visible_in_chat(chat_id))
 
             # 关键词为必填，因此此处必然执行关键词过滤（支持多个关键词，大小写不敏感）
             keywords_list = parse_keywords_string(keyword) or []
@@ -44,36 +39,12 @@ def make_search_jargon(chat_id: str):
                 keywords_list = [keyword.strip()]
             keywords_lower = [kw.lower() for kw in keywords_list if kw.strip()]
 
-            # 先按关键词过滤（仅对 content 字段进行匹配）
-            filtered_keyword: List[Jargon] = []
-            for r in candidates:
-                content = (r.content or "").lower()
-
-                # 只要命中任意一个关键词即可视为匹配（OR 逻辑）
-                any_matched = False
-                for kw in keywords_lower:
-                    if not kw:
-                        continue
-                    if kw in content:
-                        any_matched = True
-                        break
+            # 仅对 content 字段进行匹配，只要命中任意一个关键词即可视为匹配（OR 逻辑）
+            if keywords_lower:
+                query = query.where(reduce(or_, [fn.LOWER(Jargon.content).contains(kw) for kw in keywords_lower]))
 
-                if any_matched:
-                    filtered_keyword.append(r)
-
-            if global_config.expression.all_global_jargon:
-                # 全局黑话模式：不再做 chat_id 过滤，直接使用关键词过滤结果
-                records = filtered_keyword
-            else:
-                # 非全局模式：仅保留全局黑话或 chat_id 列表中包含当前 chat_id 的记录
-                records = []
-                for r in filtered_keyword:
-                    if r.is_global:
-                        records.append(r)
-                        continue
-                    chat_id_list = parse_chat_id_list(r.chat_id)
-                    if chat_id_list_contains(chat_id_list, chat_id):
-                        records.append(r)
+            # 按使用次数排序，做一个安全上限
+            records: List[Jargon] = list(query.order_by(Jargon.count.desc()).limit(200))
 
             if not records:
                 scope_note = (
@@ -2,6 +2,7 @@ from typing import Any, Dict, Optional
 
 from src.common.logger import get_logger
 from src.common.database.database_model import ChatHistory
+from src.memory_system.answer_cache import answer_cache
 from src.plugin_system.apis import database_api
 
 logger = get_logger("dream_agent")
@@ -41,6 +42,7 @@ def make_update_chat_history(chat_id: str):  # chat_id 目前未直接使用，
                 return "未提供任何需要更新的字段。"
 
             await database_api.db_save(ChatHistory, data=data, key_field="id", key_value=memory_id)
+            answer_cache.invalidate(record.chat_id)
             msg = f"已更新 ChatHistory 记录 ID={memory_id}，更新字段={list(data.keys())}。"
             logger.info(f"[dream][tool] update_chat_history 完成: {msg}")
             return msg
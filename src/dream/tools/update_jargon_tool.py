@@ -2,6 +2,7 @@ from typing import Any, Dict, Optional
 
 from src.common.logger import get_logger
 from src.common.database.database_model import Jargon
+from src.bw_learner.jargon_matcher import jargon_matcher
 from src.plugin_system.apis import database_api
 
 logger = get_logger("dream_agent")
@@ -41,6 +42,8 @@ def make_update_jargon(chat_id: str):  # chat_id 目前未直接使用，预留
                 return "未提供任何需要更新的字段。"
 
             await database_api.db_save(Jargon, data=data, key_field="id", key_value=jargon_id)
+            if updated := Jargon.get_or_none(Jargon.id == jargon_id):
+                jargon_matcher.upsert(updated)
             msg = f"已更新 Jargon 记录 ID={jargon_id}，更新字段={list(data.keys())}。"
             logger.info(f"[dream][tool] update_jargon 完成: {msg}")
             return msg
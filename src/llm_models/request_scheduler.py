@@ -0,0 +1,366 @@
+import asyncio
+import time
+
+from collections import deque
+from contextlib import asynccontextmanager
+from enum import IntEnum
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional, Tuple
+
+from src.common.logger import get_logger
+from src.config.api_ada_configs import LLMSchedulerConfig
+from src.config.config import model_config
+
+logger = get_logger("llm_scheduler")
+
+TOKEN_WINDOW_SECONDS = 60.0
+LATENCY_STALE_SECONDS = 120.0
+"""超过这么久没有完成的前台请求，则认为前台延迟指标已过期，不再据此暂缓后台请求"""
+
+
+class RequestPriority(IntEnum):
+    """请求优先级，数值越小越优先"""
+
+    FOREGROUND = 0
+    NORMAL = 1
+    BACKGROUND = 2
+
+
+_BUILTIN_PRIORITY_RULES: Dict[str, RequestPriority] = {
+    # 用户可见：回复与规划
+    "replyer": RequestPriority.FOREGROUND,
+    "reply_generation": RequestPriority.FOREGROUND,
+    "reply_check": RequestPriority.FOREGROUND,
+    "generator_api": RequestPriority.FOREGROUND,
+    "planner": RequestPriority.FOREGROUND,
+    "action_planning": RequestPriority.FOREGROUND,
+    "conversation_goal": RequestPriority.FOREGROUND,
+    "emoji.select": RequestPriority.FOREGROUND,
+    # 回复过程中的辅助请求
+    "tool_executor": RequestPriority.NORMAL,
+    "memory": RequestPriority.NORMAL,
+    "knowledge_fetch": RequestPriority.NORMAL,
+    "jargon.explain": RequestPriority.NORMAL,
+    "expression.selector": RequestPriority.NORMAL,
+    "image": RequestPriority.NORMAL,
+    "emoji": RequestPriority.NORMAL,
+    "audio": RequestPriority.NORMAL,
+    "embedding": RequestPriority.NORMAL,
+    # 后台学习、总结与做梦
+    "chat_history_summarizer": RequestPriority.BACKGROUND,
+    "expression.learner": RequestPriority.BACKGROUND,
+    "expression.summary": RequestPriority.BACKGROUND,
+    "expression.check": RequestPriority.BACKGROUND,
+    "expression_check": RequestPriority.BACKGROUND,
+    "jargon.inference": RequestPriority.BACKGROUND,
+    "jargon.extract": RequestPriority.BACKGROUND,
+    "reflect": RequestPriority.BACKGROUND,
+    "dream": RequestPriority.BACKGROUND,
+}
+
+
+def _parse_priority(value: str) -> Optional[RequestPriority]:
+    try:
+        return RequestPriority[value.strip().upper()]
+    except KeyError:
+        return None
+
+
+class _ClassState:
+    """单个优先级的并发、token窗口与指标"""
+
+    def __init__(self, priority: RequestPriority, max_concurrency: int, tokens_per_minute: int, metrics_window: int):
+        self.priority = priority
+        self.max_concurrency = max(1, max_concurrency)
+        self.tokens_per_minute = max(0, tokens_per_minute)
+        self.active = 0
+        self.waiters: Deque[Tuple[asyncio.Future, float]] = deque()
+        self.token_window: Deque[Tuple[float, int]] = deque()
+        self.window_tokens = 0
+
+        self.completed = 0
+        self.failed = 0
+        self.deferred = 0
+        self.total_tokens = 0
+        self.wait_times: Deque[float] = deque(maxlen=metrics_window)
+        self.latencies: Deque[float] = deque(maxlen=metrics_window)
+
+    def trim_tokens(self, now: float) -> None:
+        while self.token_window and now - self.token_window[0][0] >= TOKEN_WINDOW_SECONDS:
+            self.window_tokens -= self.token_window.popleft()[1]
+
+    def token_budget_wait(self, now: float) -> float:
+        """距离token预算有余量还需等待的秒数，0表示可以立即发出"""
+        if not self.tokens_per_minute:
+            return 0.0
+        self.trim_tokens(now)
+        if self.window_tokens < self.tokens_per_minute:
+            return 0.0
+        # 等到足够多的旧记录滑出窗口
+        excess = self.window_tokens - self.tokens_per_minute
+        released = 0
+        for timestamp, tokens in self.token_window:
+            released += tokens
+            if released > excess:
+                return max(0.0, timestamp + TOKEN_WINDOW_SECONDS - now)
+        return TOKEN_WINDOW_SECONDS
+
+
+class _Ticket:
+    """一次请求占用的调度槽位，用于回报token用量"""
+
+    __slots__ = ("priority", "request_type", "tokens")
+
+    def __init__(self, priority: RequestPriority, request_type: str):
+        self.priority = priority
+        self.request_type = request_type
+        self.tokens = 0
+
+    def add_tokens(self, tokens: int) -> None:
+        self.tokens += tokens
+
+
+class LLMRequestScheduler:
+    """
+    LLM请求优先级调度器
+
+    - 按 request_type 将请求分为前台/普通/后台三个优先级，每个优先级独立限制并发数和每分钟token预算
+    - 槽位空出时按优先级唤醒等待者，同一优先级内先进先出
+    - 前台请求正在排队，或近期前台平均耗时超过阈值时，暂缓后台请求（最长 max_background_defer 秒）
+    - 调度器绑定到首次使用它的事件循环，其他事件循环（如脚本中的线程）中的请求直接放行
+    """
+
+    def __init__(self, config: Optional[LLMSchedulerConfig] = None, metrics_window: int = 200):
+        self.config = config or LLMSchedulerConfig()
+        self._classes: Dict[RequestPriority, _ClassState] = {
+            RequestPriority.FOREGROUND: _ClassState(
+                RequestPriority.FOREGROUND,
+                self.config.foreground_max_concurrency,
+                self.config.foreground_tokens_per_minute,
+                metrics_window,
+            ),
+            RequestPriority.NORMAL: _ClassState(
+                RequestPriority.NORMAL,
+                self.config.normal_max_concurrency,
+                self.config.normal_tokens_per_minute,
+                metrics_window,
+            ),
+            RequestPriority.BACKGROUND: _ClassState(
+                RequestPriority.BACKGROUND,
+                self.config.background_max_concurrency,
+                self.config.background_tokens_per_minute,
+                metrics_window,
+            ),
+        }
+        self._rules: Dict[str, RequestPriority] = dict(_BUILTIN_PRIORITY_RULES)
+        for prefix, value in self.config.request_type_priority.items():
+            if (priority := _parse_priority(value)) is None:
+                logger.warning(f"[LLM调度] 无效的优先级配置 {prefix} = {value}，应为 foreground/normal/background")
+                continue
+            self._rules[prefix] = priority
+        self._priority_cache: Dict[str, RequestPriority] = {}
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._timer_deadline = 0.0
+        self._foreground_latency = 0.0  # 前台请求耗时（含排队）的指数移动平均
+        self._foreground_last_done = 0.0
+        self.bypassed_count = 0
+
+    def classify(self, request_type: str) -> RequestPriority:
+        """按最长前缀匹配 request_type 的优先级，未知类型归为普通"""
+        if (cached := self._priority_cache.get(request_type)) is not None:
+            return cached
+        priority = RequestPriority.NORMAL
+        candidate = request_type
+        while candidate:
+            if (matched := self._rules.get(candidate)) is not None:
+                priority = matched
+                break
+            candidate = candidate.rpartition(".")[0]
+        self._priority_cache[request_type] = priority
+        return priority
+
+    def _bound_to_current_loop(self) -> bool:
+        loop = asyncio.get_running_loop()
+        if self._loop is None or self._loop.is_closed():
+            # 旧事件循环已关闭，其中的请求不会再归还槽位
+            for state in self._classes.values():
+                state.active = 0
+                state.waiters.clear()
+            self._loop = loop
+            self._timer = None
+        return self._loop is loop
+
+    def _foreground_pressure(self, now: float) -> bool:
+        """前台是否繁忙：有前台请求在排队，或近期前台平均耗时过高"""
+        if self._classes[RequestPriority.FOREGROUND].waiters:
+            return True
+        return (
+            now - self._foreground_last_done < LATENCY_STALE_SECONDS
+            and self._foreground_latency > self.config.foreground_latency_threshold
+        )
+
+    def _blocked_for(self, state: _ClassState, enqueue_time: float, now: float) -> Optional[float]:
+        """返回队首请求还需等待的秒数：None表示等待槽位释放，0表示可以立即发出"""
+        if state.active >= state.max_concurrency:
+            return None
+        if wait := state.token_budget_wait(now):
+            return wait
+        if state.priority == RequestPriority.BACKGROUND and self._foreground_pressure(now):
+            remaining = enqueue_time + self.config.max_background_defer - now
+            if remaining > 0:
+                # 前台延迟指标会随时间过期，定期重新检查
+                return min(remaining, 5.0)
+        return 0.0
+
+    def _dispatch(self) -> None:
+        """按优先级唤醒可以发出的等待者，并为受时间限制的等待者安排下一次检查"""
+        self._timer = None
+        now = time.monotonic()
+        next_check: Optional[float] = None
+        for priority in RequestPriority:
+            state = self._classes[priority]
+            while state.waiters:
+                future, enqueue_time = state.waiters[0]
+                if future.done():  # 已取消
+                    state.waiters.popleft()
+                    continue
+                wait = self._blocked_for(state, enqueue_time, now)
+                if wait is None:
+                    break
+                if wait > 0:
+                    next_check = wait if next_check is None else min(next_check, wait)
+                    break
+                state.waiters.popleft()
+                state.active += 1
+                future.set_result(None)
+        if next_check is not None:
+            self._schedule_dispatch(next_check)
+
+    def _schedule_dispatch(self, delay: float) -> None:
+        deadline = time.monotonic() + delay
+        if self._timer is not None:
+            if self._timer_deadline <= deadline:
+                return
+            self._timer.cancel()
+        self._timer_deadline = deadline
+        self._timer = self._loop.call_later(delay, self._dispatch)  # type: ignore
+
+    async def _acquire(self, state: _ClassState, request_type: str) -> float:
+        """获取槽位，返回排队耗时"""
+        enqueue_time = time.monotonic()
+        if not state.waiters and self._blocked_for(state, enqueue_time, enqueue_time) == 0:
+            state.active += 1
+            return 0.0
+
+        future = self._loop.create_future()  # type: ignore
+        state.waiters.append((future, enqueue_time))
+        if state.priority == RequestPriority.BACKGROUND and self._foreground_pressure(enqueue_time):
+            state.deferred += 1
+        self._dispatch()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # 已分到槽位但调用方被取消，归还槽位
+                state.active -= 1
+                self._dispatch()
+            raise
+        wait_time = time.monotonic() - enqueue_time
+        if wait_time > 5:
+            logger.debug(f"[LLM调度] {request_type} ({state.priority.name.lower()}) 排队 {wait_time:.1f}s")
+        return wait_time
+
+    def _release(self, state: _ClassState, ticket: _Ticket, wait_time: float, run_time: float, failed: bool) -> None:
+        now = time.monotonic()
+        state.active -= 1
+        if failed:
+            state.failed += 1
+        else:
+            state.completed += 1
+        if ticket.tokens:
+            state.total_tokens += ticket.tokens
+            if state.tokens_per_minute:
+                state.token_window.append((now, ticket.tokens))
+                state.window_tokens += ticket.tokens
+        state.wait_times.append(wait_time)
+        state.latencies.append(run_time)
+        if state.priority == RequestPriority.FOREGROUND:
+            total = wait_time + run_time
+            self._foreground_latency = (
+                total if not self._foreground_last_done else 0.8 * self._foreground_latency + 0.2 * total
+            )
+            self._foreground_last_done = now
+        self._dispatch()
+
+    @asynccontextmanager
+    async def slot(self, request_type: str) -> AsyncIterator[Optional[_Ticket]]:
+        """占用一个调度槽位执行LLM请求
+
+        Args:
+            request_type: LLMRequest的请求类型，用于确定优先级
+
+        Yields:
+            Optional[_Ticket]: 用于回报token用量；未经调度直接放行时为None
+        """
+        if not self.config.enable or not self._bound_to_current_loop():
+            self.bypassed_count += 1
+            yield None
+            return
+
+        state = self._classes[self.classify(request_type)]
+        wait_time = await self._acquire(state, request_type)
+        ticket = _Ticket(state.priority, request_type)
+        start = time.monotonic()
+        failed = True
+        try:
+            yield ticket
+            failed = False
+        finally:
+            self._release(state, ticket, wait_time, time.monotonic() - start, failed)
+
+    @staticmethod
+    def _avg(values: Deque[float]) -> float:
+        return sum(values) / len(values) if values else 0.0
+
+    @staticmethod
+    def _percentile(values: Deque[float], q: float) -> float:
+        if not values:
+            return 0.0
+        ordered = sorted(values)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """各优先级的排队、并发、token用量与耗时指标"""
+        now = time.monotonic()
+        classes: List[Dict[str, Any]] = []
+        for priority, state in self._classes.items():
+            state.trim_tokens(now)
+            classes.append(
+                {
+                    "priority": priority.name.lower(),
+                    "active": state.active,
+                    "queued": sum(1 for future, _ in state.waiters if not future.done()),
+                    "max_concurrency": state.max_concurrency,
+                    "tokens_last_minute": state.window_tokens if state.tokens_per_minute else None,
+                    "tokens_per_minute": state.tokens_per_minute,
+                    "total_tokens": state.total_tokens,
+                    "completed": state.completed,
+                    "failed": state.failed,
+                    "deferred": state.deferred,
+                    "avg_wait_seconds": self._avg(state.wait_times),
+                    "p95_wait_seconds": self._percentile(state.wait_times, 0.95),
+                    "avg_latency_seconds": self._avg(state.latencies),
+                    "p95_latency_seconds": self._percentile(state.latencies, 0.95),
+                }
+            )
+        return {
+            "enabled": self.config.enable,
+            "foreground_latency_seconds": self._foreground_latency,
+            "background_deferred": self._foreground_pressure(now),
+            "bypassed": self.bypassed_count,
+            "classes": classes,
+        }
+
+
+llm_scheduler = LLMRequestScheduler(model_config.llm_scheduler)
@@ -5,7 +5,7 @@ from PIL import Image
 from datetime import datetime
 
 from src.common.logger import get_logger
-from src.common.database.database import db  # 确保 db 被导入用于 create_tables
+from src.common.database.database import db, db_writer  # 确保 db 被导入用于 create_tables
 from src.common.database.database_model import LLMUsage
 from src.config.api_ada_configs import ModelInfo
 from .payload_content.message import Message, MessageBuilder
@@ -178,8 +178,9 @@ class LLMUsageRecorder:
         output_cost = (model_usage.completion_tokens / 1000000) * model_info.price_out
         total_cost = round(input_cost + output_cost, 6)
         try:
-            # 使用 Peewee 模型创建记录
-            LLMUsage.create(
+            # 交给写线程写入，不等待结果；写入失败由写线程记录日志
+            db_writer.submit(
+                LLMUsage.create,
                 model_name=model_info.model_identifier,
                 model_assign_name=model_info.name,
                 model_api_provider=model_info.api_provider,
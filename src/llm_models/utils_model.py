@@ -16,6 +16,7 @@ from .payload_content.resp_format import RespFormat
 from .payload_content.tool_option import ToolOption, ToolCall, ToolOptionBuilder, ToolParamType
 from .model_client.base_client import BaseClient, APIResponse, client_registry
 from .utils import compress_messages, llm_usage_recorder
+from .request_scheduler import llm_scheduler
 from .exceptions import (
     NetworkConnectionError,
     RespNotOkException,
@@ -458,8 +459,39 @@ class LLMRequest:
         audio_base64: str | None = None,
     ) -> Tuple[APIResponse, ModelInfo]:
         """
-        调度器函数，负责模型选择、故障切换。
+        调度器函数，按请求优先级排队后负责模型选择、故障切换。
         """
+        async with llm_scheduler.slot(self.request_type) as ticket:
+            response, model_info = await self._execute_request_with_failover(
+                request_type,
+                message_factory=message_factory,
+                tool_options=tool_options,
+                response_format=response_format,
+                stream_response_handler=stream_response_handler,
+                async_response_parser=async_response_parser,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                embedding_input=embedding_input,
+                audio_base64=audio_base64,
+            )
+            if ticket is not None and response.usage:
+                ticket.add_tokens(response.usage.total_tokens)
+            return response, model_info
+
+    async def _execute_request_with_failover(
+        self,
+        request_type: RequestType,
+        message_factory: Optional[Callable[[BaseClient], List[Message]]] = None,
+        tool_options: list[ToolOption] | None = None,
+        response_format: RespFormat | None = None,
+        stream_response_handler: Optional[Callable] = None,
+        async_response_parser: Optional[Callable] = None,
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+        embedding_input: str | None = None,
+        audio_base64: str | None = None,
+    ) -> Tuple[APIResponse, ModelInfo]:
+        """在任务的模型列表中依次尝试，直到成功或全部失败"""
         failed_models_this_request: Set[str] = set()
         max_attempts = len(self.model_for_task.model_list)
         last_exception: Optional[Exception] = None
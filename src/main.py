@@ -13,7 +13,8 @@ from src.config.config import global_config
 from src.chat.message_receive.bot import chat_bot
 from src.common.logger import get_logger
 from src.common.server import get_global_server, Server
-from src.chat.knowledge import lpmm_start_up
+from src.common.startup_profiler import startup_profiler
+from src.chat.knowledge import start_lpmm_warmup
 from rich.traceback import install
 
 # from src.api.main import start_api_server
@@ -64,7 +65,10 @@ class MainSystem:
         logger.info(f"正在唤醒{global_config.bot.nickname}......")
 
         # 其他初始化任务
-        await asyncio.gather(self._init_components())
+        with startup_profiler.stage("初始化组件"):
+            await self._init_components()
+        startup_profiler.mark("ready")
+        startup_profiler.report()
 
         logger.info(f"""
 --------------------------------
@@ -98,22 +102,29 @@ class MainSystem:
         # start_api_server()
         # logger.info("API服务器启动成功")
 
-        # 启动LPMM
-        lpmm_start_up()
+        # 相互独立的初始化阶段并发执行：数据库相关的阶段在线程中进行；
+        # 插件加载留在事件循环线程，因为插件注册时可能会访问事件循环
+        chat_manager_task = asyncio.create_task(
+            startup_profiler.run_async("聊天管理器", get_chat_manager()._initialize())
+        )
+        emoji_task = asyncio.create_task(startup_profiler.run_in_thread("表情包管理器", get_emoji_manager().initialize))
+        await asyncio.sleep(0)  # 让上面的任务先把工作提交到线程，再开始同步的插件加载
 
         # 加载所有actions，包括默认的和插件的
-        plugin_manager.load_all_plugins()
+        with startup_profiler.stage("插件加载"):
+            plugin_manager.load_all_plugins()
 
-        # 初始化表情管理器
-        get_emoji_manager().initialize()
+        await emoji_task
         logger.info("表情包管理器初始化成功")
 
-        # 初始化聊天管理器
-        await get_chat_manager()._initialize()
+        await chat_manager_task
         asyncio.create_task(get_chat_manager()._auto_save_task())
-
         logger.info("聊天管理器初始化成功")
 
+        # LPMM知识库在第一次查询时加载，这里按配置在后台预热
+        if global_config.lpmm_knowledge.startup_warmup:
+            start_lpmm_warmup()
+
         # await asyncio.sleep(0.5) #防止logger输出飞了
 
         # 将bot.py中的chat_bot.message_process消息处理函数注册到api.py的消息处理基类中
@@ -124,7 +135,8 @@ class MainSystem:
         from src.plugin_system.core.events_manager import events_manager
         from src.plugin_system.base.component_types import EventType
 
-        await events_manager.handle_mai_events(event_type=EventType.ON_START)
+        with startup_profiler.stage("ON_START事件"):
+            await events_manager.handle_mai_events(event_type=EventType.ON_START)
         # logger.info("已触发 ON_START 事件")
         try:
             init_time = int(1000 * (time.time() - init_start_time))
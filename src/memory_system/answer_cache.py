@@ -0,0 +1,209 @@
+"""
+记忆检索问题的语义答案缓存
+
+活跃的群聊里，同一个话题常在短时间内被换着说法反复问到，每次都要跑一遍多轮的 ReAct Agent。
+这里为每个聊天流在内存中保留最近的 (问题, 答案, 证据时间) 记录及问题的嵌入向量：
+新问题与缓存中某个问题足够相似、且记录仍然新鲜时，直接复用之前的结果，跳过 Agent。
+
+- 新鲜度：记录超过 answer_cache_ttl_seconds 即过期
+- 失效：该聊天流写入新的 ChatHistory 概括后，之前得出的结论（包括未找到答案）可能已经过时，清空该聊天流的缓存；
+  开启全局记忆时，任何聊天流的新概括都可能被检索到，清空全部缓存。
+  Agent 查询耗时数秒，期间发生的失效会使本次结论同样过时：lookup 返回当时的失效代数，add 时代数已变化则不缓存
+- 超时的查询不缓存
+"""
+
+import time
+
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from src.common.logger import get_logger
+from src.config.config import global_config
+from src.chat.utils.utils import get_embedding
+
+logger = get_logger("memory_retrieval")
+
+# 每个聊天流缓存的问题数量，超出后淘汰最旧的
+ANSWER_CACHE_CAPACITY = 32
+
+
+@dataclass
+class CachedAnswer:
+    """一条缓存的检索结果"""
+
+    question: str
+    found_answer: bool
+    answer: str
+    evidence_time: float
+    """得出结论的时间"""
+    iterations: int
+    """得出结论时 Agent 使用的迭代轮数"""
+
+
+class _ChatAnswerIndex:
+    """单个聊天流的缓存条目与问题向量（已归一化，按行排列）"""
+
+    __slots__ = ("entries", "vectors")
+
+    def __init__(self) -> None:
+        self.entries: List[CachedAnswer] = []
+        self.vectors: Optional[np.ndarray] = None
+
+    def prune(self, expire_before: float) -> None:
+        keep = [i for i, entry in enumerate(self.entries) if entry.evidence_time >= expire_before]
+        if len(keep) == len(self.entries):
+            return
+        self.entries = [self.entries[i] for i in keep]
+        self.vectors = self.vectors[keep] if keep and self.vectors is not None else None
+
+    def add(self, entry: CachedAnswer, vector: np.ndarray) -> None:
+        # 同一问题只保留最新的结论
+        for i, existing in enumerate(self.entries):
+            if existing.question == entry.question:
+                self.entries.pop(i)
+                self.vectors = np.delete(self.vectors, i, axis=0) if len(self.entries) else None
+                break
+        self.entries.append(entry)
+        row = vector[np.newaxis, :]
+        self.vectors = row if self.vectors is None else np.vstack([self.vectors, row])
+        overflow = len(self.entries) - ANSWER_CACHE_CAPACITY
+        if overflow > 0:
+            del self.entries[:overflow]
+            self.vectors = self.vectors[overflow:]
+
+
+def _normalize(embedding: List[float]) -> Optional[np.ndarray]:
+    vector = np.asarray(embedding, dtype=np.float32)
+    norm = float(np.linalg.norm(vector))
+    return vector / norm if norm > 0 else None
+
+
+class MemoryAnswerCache:
+    """所有聊天流的语义答案缓存"""
+
+    def __init__(self) -> None:
+        self._chats: Dict[str, _ChatAnswerIndex] = {}
+        # 失效代数：invalidate 时递增
+        self._chat_generations: Dict[str, int] = {}
+        self._global_generation = 0
+        self.lookups = 0
+        self.hits = 0
+        self.saved_iterations = 0
+
+    @staticmethod
+    def enabled() -> bool:
+        return global_config.memory.answer_cache_ttl_seconds > 0
+
+    def _generation(self, chat_id: str) -> Tuple[int, int]:
+        return self._global_generation, self._chat_generations.get(chat_id, 0)
+
+    def _log_stats(self, log_prefix: str, entry: CachedAnswer, similarity: float) -> None:
+        hit_rate = self.hits / self.lookups * 100 if self.lookups else 0.0
+        logger.info(
+            f"{log_prefix}记忆检索命中答案缓存（相似度 {similarity:.3f}，缓存问题: {entry.question[:50]}），"
+            f"跳过 {entry.iterations} 轮Agent迭代 | 命中率 {hit_rate:.1f}% ({self.hits}/{self.lookups})，"
+            f"累计节省 {self.saved_iterations} 轮迭代"
+        )
+
+    async def lookup(
+        self, chat_id: str, question: str, log_prefix: str = ""
+    ) -> Tuple[Optional[CachedAnswer], Optional[np.ndarray], Tuple[int, int]]:
+        """
+        查找与问题语义相近且仍然新鲜的缓存结果
+
+        Args:
+            chat_id: 聊天ID
+            question: 问题
+            log_prefix: 日志前缀
+
+        Returns:
+            Tuple[Optional[CachedAnswer], Optional[np.ndarray], Tuple[int, int]]: (命中的缓存结果, 问题向量, 失效代数)；
+            问题向量与失效代数在未命中时传给 add，问题向量避免重复获取嵌入，获取嵌入失败时为 None
+        """
+        generation = self._generation(chat_id)
+        if not self.enabled():
+            return None, None, generation
+
+        self.lookups += 1
+        index = self._chats.get(chat_id)
+        if index is not None:
+            index.prune(time.time() - global_config.memory.answer_cache_ttl_seconds)
+            # 完全相同的问题不需要获取嵌入
+            for entry in reversed(index.entries):
+                if entry.question == question:
+                    self.hits += 1
+                    self.saved_iterations += entry.iterations
+                    self._log_stats(log_prefix, entry, 1.0)
+                    return entry, None, generation
+
+        embedding = await get_embedding(question, request_type="memory.answer_cache")
+        vector = _normalize(embedding) if embedding else None
+        if vector is None:
+            return None, None, generation
+
+        index = self._chats.get(chat_id)
+        if index is None or not index.entries or index.vectors is None or index.vectors.shape[1] != vector.shape[0]:
+            return None, vector, generation
+
+        similarities = index.vectors @ vector
+        best = int(np.argmax(similarities))
+        similarity = float(similarities[best])
+        if similarity < global_config.memory.answer_cache_similarity_threshold:
+            logger.debug(f"{log_prefix}答案缓存未命中，最相近的问题相似度 {similarity:.3f}")
+            return None, vector, generation
+
+        entry = index.entries[best]
+        self.hits += 1
+        self.saved_iterations += entry.iterations
+        self._log_stats(log_prefix, entry, similarity)
+        return entry, vector, generation
+
+    def add(
+        self,
+        chat_id: str,
+        question: str,
+        vector: Optional[np.ndarray],
+        found_answer: bool,
+        answer: str,
+        iterations: int,
+        generation: Tuple[int, int],
+    ) -> None:
+        """缓存一次 Agent 查询的结论
+
+        vector、generation 为 lookup 返回的问题向量与失效代数；vector 为 None，
+        或查询期间该聊天流的缓存被失效过（结论可能基于旧的概括）时不缓存
+        """
+        if vector is None or not self.enabled():
+            return
+        if generation != self._generation(chat_id):
+            logger.debug(f"查询期间聊天概括已更新，不缓存本次结论: {question[:50]}")
+            return
+        index = self._chats.setdefault(chat_id, _ChatAnswerIndex())
+        if index.vectors is not None and index.vectors.shape[1] != vector.shape[0]:
+            # 嵌入模型变更，旧向量不再可比
+            index = self._chats[chat_id] = _ChatAnswerIndex()
+        entry = CachedAnswer(
+            question=question,
+            found_answer=found_answer,
+            answer=answer if found_answer else "",
+            evidence_time=time.time(),
+            iterations=max(1, iterations),
+        )
+        index.add(entry, vector)
+
+    def invalidate(self, chat_id: Optional[str] = None) -> None:
+        """写入新的聊天概括后调用，丢弃可能已过时的结论"""
+        if chat_id is None or global_config.memory.global_memory:
+            self._global_generation += 1
+            if self._chats:
+                logger.debug("聊天概括更新，清空全部记忆答案缓存")
+            self._chats.clear()
+            return
+        self._chat_generations[chat_id] = self._chat_generations.get(chat_id, 0) + 1
+        if self._chats.pop(chat_id, None) is not None:
+            logger.debug(f"聊天概括更新，清空记忆答案缓存: {chat_id}")
+
+
+answer_cache = MemoryAnswerCache()
@@ -23,6 +23,7 @@ from src.chat.utils.utils import is_bot_self
 from src.person_info.person_info import Person
 from src.chat.message_receive.chat_stream import get_chat_manager
 from src.chat.utils.prompt_builder import Prompt, global_prompt_manager
+from src.memory_system.answer_cache import answer_cache
 
 logger = get_logger("chat_history_summarizer")
 
@@ -973,6 +974,8 @@ class ChatHistorySummarizer:
 
             if saved_record:
                 logger.debug(f"{self.log_prefix} 成功存储聊天历史记录到数据库")
+                # 新的概括可能改变之前的检索结论
+                answer_cache.invalidate(self.chat_id)
             else:
                 logger.warning(f"{self.log_prefix} 存储聊天历史记录到数据库失败")
 
@@ -6,9 +6,11 @@ from src.common.logger import get_logger
 from src.config.config import global_config, model_config
 from src.chat.utils.prompt_builder import Prompt, global_prompt_manager
 from src.plugin_system.apis import llm_api
+from src.common.database.database import db_writer
 from src.common.database.database_model import ThinkingBack
 from src.memory_system.retrieval_tools import get_tool_registry, init_all_tools
 from src.memory_system.memory_utils import parse_questions_json
+from src.memory_system.answer_cache import answer_cache
 from src.llm_models.payload_content.message import MessageBuilder, RoleType, Message
 from src.chat.message_receive.chat_stream import get_chat_manager
 from src.bw_learner.jargon_explainer import retrieve_concepts_with_jargon
@@ -1056,7 +1058,19 @@ async def _process_single_question(
 
     question_initial_info = initial_info or ""
 
-    # 直接使用ReAct Agent查询（不再从thinking_back获取缓存）
+    try:
+        log_prefix = f"[{get_chat_manager().get_stream_name(chat_id) or chat_id}] "
+    except Exception:
+        log_prefix = f"[{chat_id}] "
+
+    # 语义相近的问题近期已经查询过，直接复用结论（返回缓存中的原问题，便于与最近答案去重）
+    cached, question_vector, cache_generation = await answer_cache.lookup(chat_id, question, log_prefix)
+    if cached is not None:
+        if cached.found_answer and cached.answer:
+            return f"问题：{cached.question}\n答案：{cached.answer}"
+        return None
+
+    # 使用ReAct Agent查询
     # logger.info(f"使用ReAct Agent查询，问题: {question[:50]}...")
 
     # 如果未指定max_iterations，使用配置的默认值
@@ -1073,13 +1087,25 @@ async def _process_single_question(
 
     # 存储查询历史到数据库（超时时不存储）
     if not is_timeout:
-        _store_thinking_back(
+        # 查询和更新在写线程的同一个事务中完成
+        await db_writer.write(
+            _store_thinking_back,
             chat_id=chat_id,
             question=question,
             context=context,
             found_answer=found_answer,
             answer=answer,
             thinking_steps=thinking_steps,
+            label="ThinkingBack.save",
+        )
+        answer_cache.add(
+            chat_id=chat_id,
+            question=question,
+            vector=question_vector,
+            found_answer=found_answer,
+            answer=answer,
+            iterations=max((step.get("iteration", 0) for step in thinking_steps), default=1),
+            generation=cache_generation,
         )
     else:
         logger.info(f"ReAct Agent超时，不存储到数据库，问题: {question[:50]}...")
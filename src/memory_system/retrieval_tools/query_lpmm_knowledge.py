@@ -4,7 +4,7 @@
 
 from src.common.logger import get_logger
 from src.config.config import global_config
-from src.chat.knowledge import get_qa_manager
+from src.chat.knowledge import ensure_qa_manager
 from .tool_registry import register_memory_retrieval_tool
 
 logger = get_logger("memory_retrieval_tools")
@@ -34,7 +34,7 @@ async def query_lpmm_knowledge(query: str, limit: int = 5) -> str:
             logger.debug("LPMM知识库未启用")
             return "LPMM知识库未启用"
 
-        qa_manager = get_qa_manager()
+        qa_manager = await ensure_qa_manager()
         if qa_manager is None:
             logger.debug("LPMM知识库未初始化，跳过查询")
             return "LPMM知识库未初始化"
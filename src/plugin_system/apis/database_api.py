@@ -5,23 +5,68 @@
     from src.plugin_system.apis import database_api
     records = await database_api.db_query(ActionRecords, query_type="get")
     record = await database_api.db_save(ActionRecords, data={"action_id": "123"})
+
+读取在只读数据库连接池中执行，写入交给数据库写线程，都不阻塞事件循环；查询按调用方插件统计，可通过 get_query_stats 查看。
+查询函数返回可等待对象（在调用时确定调用方插件），用法与 async 函数相同
 """
 
 import traceback
 import time
 import json
-from typing import Dict, List, Any, Union, Type, Optional
+from typing import Awaitable, Dict, Iterable, List, Any, Union, Type, Optional, TypeVar
 from src.common.logger import get_logger
-from peewee import Model, DoesNotExist
+from src.common.database.database_model import Messages
+from src.chat.message_receive.chat_stream import get_chat_manager
+from src.plugin_system.utils.db_executor import plugin_db_executor
+from peewee import SQL, Model, DoesNotExist, fn
 
 logger = get_logger("database_api")
 
+# 批量查询时每条 IN 子句的值数量
+_QUERY_CHUNK_SIZE = 500
+# 每条语句的绑定变量数上限（兼容旧版 SQLite 的 999）
+_SQLITE_MAX_VARIABLES = 900
+
+T = TypeVar("T")
+
+
+def _chat_ids_of(*values: Optional[Dict[str, Any]]) -> Optional[List[Any]]:
+    """从数据/过滤条件中取出 chat_id；任何一个缺少 chat_id 时返回 None（无法确定受影响的聊天流）"""
+    chat_ids = []
+    for value in values:
+        if not value or value.get("chat_id") is None:
+            return None
+        chat_ids.append(value["chat_id"])
+    return chat_ids
+
+
+def _run_write(model_class: Type[Model], chat_ids: Optional[Iterable[Any]], func: Any, *args: Any) -> Awaitable[T]:
+    """在写线程中执行写入；写入 Messages 表时，提交后使受影响聊天流的最近消息缓存失效（chat_ids 为 None 时全部失效）"""
+    awaitable = plugin_db_executor.run_write(func, *args)
+    if model_class is not Messages:
+        return awaitable
+    return _invalidate_recent_messages_after(awaitable, chat_ids)
+
+
+async def _invalidate_recent_messages_after(awaitable: Awaitable[T], chat_ids: Optional[Iterable[Any]]) -> T:
+    # 写线程在事务提交后才返回结果，此时失效，之后的回填一定能读到新数据
+    try:
+        return await awaitable
+    finally:
+        recent_messages = get_chat_manager().recent_messages
+        if chat_ids is None:
+            recent_messages.invalidate()
+        else:
+            for chat_id in set(chat_ids):
+                recent_messages.invalidate(chat_id)
+
+
 # =============================================================================
 # 通用数据库查询API函数
 # =============================================================================
 
 
-async def db_query(
+def db_query(
     model_class: Type[Model],
     data: Optional[Dict[str, Any]] = None,
     query_type: Optional[str] = "get",
@@ -29,7 +74,7 @@ async def db_query(
     limit: Optional[int] = None,
     order_by: Optional[List[str]] = None,
     single_result: Optional[bool] = False,
-) -> Union[List[Dict[str, Any]], Dict[str, Any], None]:
+) -> Awaitable[Union[List[Dict[str, Any]], Dict[str, Any], None]]:
     """执行数据库查询操作
 
     这个方法提供了一个通用接口来执行数据库操作，包括查询、创建、更新和删除记录。
@@ -91,6 +136,33 @@ async def db_query(
             filters={"chat_id": chat_stream.stream_id}
         )
     """
+    # 读取在只读连接池中执行，写入交给写线程
+    if query_type in ("get", "count"):
+        return plugin_db_executor.run_read(
+            _db_query_sync, model_class, data, query_type, filters, limit, order_by, single_result
+        )
+    if query_type == "create":
+        chat_ids = _chat_ids_of(data)
+    elif data and "chat_id" in data:
+        # 更新 chat_id 本身时原来所在的聊天流未知
+        chat_ids = None
+    else:
+        chat_ids = _chat_ids_of(filters)
+    return _run_write(
+        model_class, chat_ids, _db_query_sync, model_class, data, query_type, filters, limit, order_by, single_result
+    )
+
+
+def _db_query_sync(
+    model_class: Type[Model],
+    data: Optional[Dict[str, Any]],
+    query_type: Optional[str],
+    filters: Optional[Dict[str, Any]],
+    limit: Optional[int],
+    order_by: Optional[List[str]],
+    single_result: Optional[bool],
+) -> Union[List[Dict[str, Any]], Dict[str, Any], None]:
+    """db_query 的同步实现，在只读连接池或写线程中执行"""
     try:
         if query_type not in ["get", "create", "update", "delete", "count"]:
             raise ValueError("query_type must be 'get' or 'create' or 'update' or 'delete' or 'count'")
@@ -167,10 +239,9 @@ async def db_query(
         return None
 
 
-async def db_save(
+def db_save(
     model_class: Type[Model], data: Dict[str, Any], key_field: Optional[str] = None, key_value: Optional[Any] = None
-) -> Optional[Dict[str, Any]]:
-    # sourcery skip: inline-immediately-returned-variable
+) -> Awaitable[Optional[Dict[str, Any]]]:
     """保存数据到数据库（创建或更新）
 
     如果提供了key_field和key_value，会先尝试查找匹配的记录进行更新；
@@ -200,6 +271,16 @@ async def db_save(
             key_value="123"
         )
     """
+    # 按 key 更新已有记录时，记录原来所在的聊天流未知
+    chat_ids = None if key_field and key_value is not None else _chat_ids_of(data)
+    return _run_write(model_class, chat_ids, _db_save_sync, model_class, data, key_field, key_value)
+
+
+def _db_save_sync(
+    model_class: Type[Model], data: Dict[str, Any], key_field: Optional[str], key_value: Optional[Any]
+) -> Optional[Dict[str, Any]]:
+    # sourcery skip: inline-immediately-returned-variable
+    """db_save 的同步实现，在写线程中执行"""
     try:
         # 如果提供了key_field和key_value，尝试更新现有记录
         if key_field and key_value is not None:
@@ -229,13 +310,13 @@ async def db_save(
         return None
 
 
-async def db_get(
+def db_get(
     model_class: Type[Model],
     filters: Optional[Dict[str, Any]] = None,
     limit: Optional[int] = None,
     order_by: Optional[str] = None,
     single_result: Optional[bool] = False,
-) -> Union[List[Dict[str, Any]], Dict[str, Any], None]:
+) -> Awaitable[Union[List[Dict[str, Any]], Dict[str, Any], None]]:
     """从数据库获取记录
 
     这是db_query方法的简化版本，专注于数据检索操作。
@@ -267,6 +348,17 @@ async def db_get(
             order_by="-time",
         )
     """
+    return plugin_db_executor.run_read(_db_get_sync, model_class, filters, limit, order_by, single_result)
+
+
+def _db_get_sync(
+    model_class: Type[Model],
+    filters: Optional[Dict[str, Any]],
+    limit: Optional[int],
+    order_by: Optional[str],
+    single_result: Optional[bool],
+) -> Union[List[Dict[str, Any]], Dict[str, Any], None]:
+    """db_get 的同步实现，在只读连接池中执行"""
     try:
         # 构建查询
         query = model_class.select()
@@ -301,6 +393,163 @@ async def db_get(
         return None if single_result else []
 
 
+def db_save_many(
+    model_class: Type[Model], rows: List[Dict[str, Any]], key_field: Optional[str] = None
+) -> Awaitable[Optional[int]]:
+    """批量保存数据到数据库（创建或更新），所有记录在同一个事务中写入
+
+    如果提供了key_field，key_field 值已存在的记录会被更新（所有匹配的记录），其余记录批量创建；
+    同一批中 key_field 值相同的多条数据会合并，后面的字段覆盖前面的。
+
+    Args:
+        model_class: Peewee模型类
+        rows: 要保存的数据字典列表
+        key_field: 用于查找现有记录的字段名，例如"action_id"
+
+    Returns:
+        int: 保存的记录数（合并后）
+        None: 如果操作失败（事务回滚，没有记录被写入）
+
+    示例:
+        saved = await database_api.db_save_many(
+            ActionRecords,
+            [{"action_id": "1", "action_name": "A"}, {"action_id": "2", "action_name": "B"}],
+            key_field="action_id",
+        )
+    """
+    chat_ids = None if key_field else _chat_ids_of(*rows)
+    return _run_write(model_class, chat_ids, _db_save_many_sync, model_class, rows, key_field)
+
+
+def _db_save_many_sync(
+    model_class: Type[Model], rows: List[Dict[str, Any]], key_field: Optional[str]
+) -> Optional[int]:
+    """db_save_many 的同步实现，在写线程中执行"""
+    if not rows:
+        return 0
+    try:
+        database = model_class._meta.database  # type: ignore
+        with database.atomic():
+            if key_field:
+                field = getattr(model_class, key_field)
+                # 合并同一批中 key 相同的数据
+                keyed: Dict[Any, Dict[str, Any]] = {}
+                new_rows: List[Dict[str, Any]] = []
+                for row in rows:
+                    key = row.get(key_field)
+                    if key is None:
+                        new_rows.append(row)
+                    elif key in keyed:
+                        keyed[key].update(row)
+                    else:
+                        keyed[key] = dict(row)
+
+                saved_count = len(keyed) + len(new_rows)
+                keys = list(keyed)
+                existing = set()
+                for start in range(0, len(keys), _QUERY_CHUNK_SIZE):
+                    chunk = keys[start : start + _QUERY_CHUNK_SIZE]
+                    existing.update(value for (value,) in model_class.select(field).where(field.in_(chunk)).tuples())
+
+                for key, row in keyed.items():
+                    if key in existing:
+                        if update_data := {name: value for name, value in row.items() if name != key_field}:
+                            model_class.update(**update_data).where(field == key).execute()
+                    else:
+                        new_rows.append(row)
+            else:
+                new_rows = list(rows)
+                saved_count = len(new_rows)
+
+            # insert_many 要求同一条语句中的数据字段一致，按字段集合分组后分块插入
+            groups: Dict[tuple, List[Dict[str, Any]]] = {}
+            for row in new_rows:
+                groups.setdefault(tuple(sorted(row)), []).append(row)
+            for columns, group in groups.items():
+                chunk_size = max(1, _SQLITE_MAX_VARIABLES // max(len(columns), 1))
+                for start in range(0, len(group), chunk_size):
+                    model_class.insert_many(group[start : start + chunk_size]).execute()
+
+        return saved_count
+
+    except Exception as e:
+        logger.error(f"[DatabaseAPI] 批量保存数据库记录出错: {e}")
+        traceback.print_exc()
+        return None
+
+
+def db_count_by(
+    model_class: Type[Model],
+    group_field: str,
+    values: Optional[List[Any]] = None,
+    filters: Optional[Dict[str, Any]] = None,
+) -> Awaitable[Dict[Any, int]]:
+    """按字段分组批量计数，一次查询得到多个值的记录数
+
+    Args:
+        model_class: Peewee模型类
+        group_field: 分组字段名，例如"chat_id"
+        values: 只统计这些值（未出现的值计数为0）；为None时统计所有值
+        filters: 额外的过滤条件，字段名和值的字典
+
+    Returns:
+        Dict[Any, int]: 字段值 -> 记录数；操作失败时返回空字典
+
+    示例:
+        counts = await database_api.db_count_by(
+            ActionRecords,
+            "chat_id",
+            values=[chat_id1, chat_id2],
+            filters={"action_name": "reply"},
+        )
+    """
+    return plugin_db_executor.run_read(_db_count_by_sync, model_class, group_field, values, filters)
+
+
+def _db_count_by_sync(
+    model_class: Type[Model],
+    group_field: str,
+    values: Optional[List[Any]],
+    filters: Optional[Dict[str, Any]],
+) -> Dict[Any, int]:
+    """db_count_by 的同步实现，在只读连接池中执行"""
+    try:
+        field = getattr(model_class, group_field)
+
+        def count(value_chunk: Optional[List[Any]]) -> Dict[Any, int]:
+            query = model_class.select(field, fn.COUNT(SQL("*")))
+            if filters:
+                for name, value in filters.items():
+                    query = query.where(getattr(model_class, name) == value)
+            if value_chunk is not None:
+                query = query.where(field.in_(value_chunk))
+            return dict(query.group_by(field).tuples())
+
+        if values is None:
+            return count(None)
+
+        counts: Dict[Any, int] = dict.fromkeys(values, 0)
+        unique_values = list(counts)
+        for start in range(0, len(unique_values), _QUERY_CHUNK_SIZE):
+            counts.update(count(unique_values[start : start + _QUERY_CHUNK_SIZE]))
+        return counts
+
+    except Exception as e:
+        logger.error(f"[DatabaseAPI] 分组计数出错: {e}")
+        traceback.print_exc()
+        return {}
+
+
+def get_query_stats() -> Dict[str, Dict[str, Any]]:
+    """获取按调用方插件（插件目录名，非插件调用为"core"）汇总的数据库查询统计
+
+    Returns:
+        Dict[str, Dict[str, Any]]: 调用方 -> {calls, async_calls, errors, slow_calls, total_seconds,
+        max_seconds, blocking_seconds, avg_ms}；blocking_seconds 为同步接口在事件循环中阻塞的累计时间
+    """
+    return plugin_db_executor.get_stats()
+
+
 async def store_action_info(
     chat_stream=None,
     action_build_into_prompt: bool = False,
@@ -26,6 +26,7 @@ if TYPE_CHECKING:
     from src.common.data_models.info_data_model import ActionPlannerInfo
     from src.common.data_models.database_data_model import DatabaseMessages
     from src.common.data_models.llm_data_model import LLMGenerationDataModel
+    from src.chat.utils.message_window import MessageWindow
 
 install(extra_lines=3)
 
@@ -95,6 +96,7 @@ async def generate_reply(
     request_type: str = "generator_api",
     from_plugin: bool = True,
     reply_time_point: Optional[float] = None,
+    message_window: Optional["MessageWindow"] = None,
 ) -> Tuple[bool, Optional["LLMGenerationDataModel"]]:
     """生成回复
 
@@ -116,6 +118,7 @@ async def generate_reply(
         request_type: 请求类型（可选，记录LLM使用）
         from_plugin: 是否来自插件
         reply_time_point: 回复时间点
+        message_window: 本次思考循环共享的消息窗口（可选，避免重复查询聊天记录）
     Returns:
         Tuple[bool, List[Tuple[str, Any]], Optional[str]]: (是否成功, 回复集合, 提示词)
     """
@@ -164,6 +167,7 @@ async def generate_reply(
             stream_id=chat_stream.stream_id if chat_stream else chat_id,
             reply_time_point=reply_time_point,
             log_reply=False,
+            message_window=message_window,
         )
         if not success:
             logger.warning("[GeneratorAPI] 回复生成失败")
@@ -6,13 +6,19 @@
     from src.plugin_system.apis import message_api
     messages = message_api.get_messages_by_time_in_chat(chat_id, start_time, end_time)
     readable_text = message_api.build_readable_messages(messages)
+
+查询函数均有对应的 *_async 版本（返回可等待对象），在只读数据库连接池中执行，不阻塞事件循环，插件的异步处理函数中应优先使用：
+    messages = await message_api.get_messages_by_time_in_chat_async(chat_id, start_time, end_time)
+    messages_by_chat = await message_api.get_messages_in_chats_async([chat_id1, chat_id2], start_time, end_time)
 """
 
 import time
-from typing import List, Dict, Any, Tuple, Optional
+from typing import Awaitable, List, Dict, Any, Tuple, Optional
 from src.common.data_models.database_data_model import DatabaseMessages
 from src.common.database.database_model import Images
 from src.chat.utils.utils import is_bot_self
+from src.chat.utils.image_description_queue import image_description_queue, PENDING_DESCRIPTION
+from src.plugin_system.utils.db_executor import plugin_db_executor
 from src.chat.utils.chat_message_builder import (
     get_raw_msg_by_timestamp,
     get_raw_msg_by_timestamp_with_chat,
@@ -36,6 +42,7 @@ from src.chat.utils.chat_message_builder import (
 # =============================================================================
 
 
+@plugin_db_executor.track
 def get_messages_by_time(
     start_time: float, end_time: float, limit: int = 0, limit_mode: str = "latest", filter_mai: bool = False
 ) -> List[DatabaseMessages]:
@@ -64,6 +71,7 @@ def get_messages_by_time(
     return get_raw_msg_by_timestamp(start_time, end_time, limit, limit_mode)
 
 
+@plugin_db_executor.track
 def get_messages_by_time_in_chat(
     chat_id: str,
     start_time: float,
@@ -115,6 +123,7 @@ def get_messages_by_time_in_chat(
     )
 
 
+@plugin_db_executor.track
 def get_messages_by_time_in_chat_inclusive(
     chat_id: str,
     start_time: float,
@@ -165,6 +174,7 @@ def get_messages_by_time_in_chat_inclusive(
     return messages
 
 
+@plugin_db_executor.track
 def get_messages_by_time_in_chat_for_users(
     chat_id: str,
     start_time: float,
@@ -201,6 +211,7 @@ def get_messages_by_time_in_chat_for_users(
     return get_raw_msg_by_timestamp_with_chat_users(chat_id, start_time, end_time, person_ids, limit, limit_mode)
 
 
+@plugin_db_executor.track
 def get_random_chat_messages(
     start_time: float, end_time: float, limit: int = 0, limit_mode: str = "latest", filter_mai: bool = False
 ) -> List[DatabaseMessages]:
@@ -229,6 +240,7 @@ def get_random_chat_messages(
     return get_raw_msg_by_timestamp_random(start_time, end_time, limit, limit_mode)
 
 
+@plugin_db_executor.track
 def get_messages_by_time_for_users(
     start_time: float, end_time: float, person_ids: List[str], limit: int = 0, limit_mode: str = "latest"
 ) -> List[DatabaseMessages]:
@@ -255,6 +267,7 @@ def get_messages_by_time_for_users(
     return get_raw_msg_by_timestamp_with_users(start_time, end_time, person_ids, limit, limit_mode)
 
 
+@plugin_db_executor.track
 def get_messages_before_time(timestamp: float, limit: int = 0, filter_mai: bool = False) -> List[DatabaseMessages]:
     """
     获取指定时间戳之前的消息
@@ -279,6 +292,7 @@ def get_messages_before_time(timestamp: float, limit: int = 0, filter_mai: bool
     return get_raw_msg_before_timestamp(timestamp, limit)
 
 
+@plugin_db_executor.track
 def get_messages_before_time_in_chat(
     chat_id: str,
     timestamp: float,
@@ -320,6 +334,7 @@ def get_messages_before_time_in_chat(
     return messages
 
 
+@plugin_db_executor.track
 def get_messages_before_time_for_users(
     timestamp: float, person_ids: List[str], limit: int = 0
 ) -> List[DatabaseMessages]:
@@ -344,6 +359,7 @@ def get_messages_before_time_for_users(
     return get_raw_msg_before_timestamp_with_users(timestamp, person_ids, limit)
 
 
+@plugin_db_executor.track
 def get_recent_messages(
     chat_id: str, hours: float = 24.0, limit: int = 100, limit_mode: str = "latest", filter_mai: bool = False
 ) -> List[DatabaseMessages]:
@@ -383,6 +399,7 @@ def get_recent_messages(
 # =============================================================================
 
 
+@plugin_db_executor.track
 def count_new_messages(chat_id: str, start_time: float = 0.0, end_time: Optional[float] = None) -> int:
     """
     计算指定聊天中从开始时间到结束时间的新消息数量
@@ -407,6 +424,7 @@ def count_new_messages(chat_id: str, start_time: float = 0.0, end_time: Optional
     return num_new_messages_since(chat_id, start_time, end_time)
 
 
+@plugin_db_executor.track
 def count_new_messages_for_users(chat_id: str, start_time: float, end_time: float, person_ids: List[str]) -> int:
     """
     计算指定聊天中指定用户从开始时间到结束时间的新消息数量
@@ -432,6 +450,245 @@ def count_new_messages_for_users(chat_id: str, start_time: float, end_time: floa
     return num_new_messages_since_with_users(chat_id, start_time, end_time, person_ids)
 
 
+@plugin_db_executor.track
+def count_new_messages_in_chats(
+    chat_ids: List[str], start_time: float = 0.0, end_time: Optional[float] = None
+) -> Dict[str, int]:
+    """
+    批量计算多个聊天中从开始时间到结束时间的新消息数量
+
+    Args:
+        chat_ids: 聊天ID列表
+        start_time: 开始时间戳
+        end_time: 结束时间戳，如果为None则使用当前时间
+
+    Returns:
+        Dict[str, int]: 聊天ID -> 新消息数量
+
+    Raises:
+        ValueError: 如果参数不合法
+    """
+    if not isinstance(start_time, (int, float)):
+        raise ValueError("start_time 必须是数字类型")
+    if not isinstance(chat_ids, (list, tuple)) or not all(chat_id and isinstance(chat_id, str) for chat_id in chat_ids):
+        raise ValueError("chat_ids 必须是非空字符串列表")
+    end_time = end_time if end_time is not None else time.time()
+    return {chat_id: num_new_messages_since(chat_id, start_time, end_time) for chat_id in dict.fromkeys(chat_ids)}
+
+
+# =============================================================================
+# 批量消息查询API函数
+# =============================================================================
+
+
+@plugin_db_executor.track
+def get_messages_in_chats(
+    chat_ids: List[str],
+    start_time: float,
+    end_time: float,
+    limit: int = 0,
+    limit_mode: str = "latest",
+    filter_mai: bool = False,
+    filter_command: bool = False,
+    filter_intercept_message_level: Optional[int] = None,
+) -> Dict[str, List[DatabaseMessages]]:
+    """
+    批量获取多个聊天中指定时间范围内的消息，参数含义同 get_messages_by_time_in_chat
+
+    Args:
+        chat_ids: 聊天ID列表
+        limit: 每个聊天分别应用的数量限制，0为不限制
+
+    Returns:
+        Dict[str, List[DatabaseMessages]]: 聊天ID -> 消息列表
+
+    Raises:
+        ValueError: 如果参数不合法
+    """
+    if not isinstance(chat_ids, (list, tuple)) or not all(chat_id and isinstance(chat_id, str) for chat_id in chat_ids):
+        raise ValueError("chat_ids 必须是非空字符串列表")
+    return {
+        chat_id: get_messages_by_time_in_chat(
+            chat_id,
+            start_time,
+            end_time,
+            limit=limit,
+            limit_mode=limit_mode,
+            filter_mai=filter_mai,
+            filter_command=filter_command,
+            filter_intercept_message_level=filter_intercept_message_level,
+        )
+        for chat_id in dict.fromkeys(chat_ids)
+    }
+
+
+# =============================================================================
+# 异步消息查询API函数（在插件数据库线程池中执行，不阻塞事件循环）
+# =============================================================================
+
+
+def get_messages_by_time_async(
+    start_time: float, end_time: float, limit: int = 0, limit_mode: str = "latest", filter_mai: bool = False
+) -> Awaitable[List[DatabaseMessages]]:
+    """get_messages_by_time 的异步版本"""
+    return plugin_db_executor.run_read(get_messages_by_time, start_time, end_time, limit, limit_mode, filter_mai)
+
+
+def get_messages_by_time_in_chat_async(
+    chat_id: str,
+    start_time: float,
+    end_time: float,
+    limit: int = 0,
+    limit_mode: str = "latest",
+    filter_mai: bool = False,
+    filter_command: bool = False,
+    filter_intercept_message_level: Optional[int] = None,
+) -> Awaitable[List[DatabaseMessages]]:
+    """get_messages_by_time_in_chat 的异步版本"""
+    return plugin_db_executor.run_read(
+        get_messages_by_time_in_chat,
+        chat_id,
+        start_time,
+        end_time,
+        limit,
+        limit_mode,
+        filter_mai,
+        filter_command,
+        filter_intercept_message_level,
+    )
+
+
+def get_messages_by_time_in_chat_inclusive_async(
+    chat_id: str,
+    start_time: float,
+    end_time: float,
+    limit: int = 0,
+    limit_mode: str = "latest",
+    filter_mai: bool = False,
+    filter_command: bool = False,
+    filter_intercept_message_level: Optional[int] = None,
+) -> Awaitable[List[DatabaseMessages]]:
+    """get_messages_by_time_in_chat_inclusive 的异步版本"""
+    return plugin_db_executor.run_read(
+        get_messages_by_time_in_chat_inclusive,
+        chat_id,
+        start_time,
+        end_time,
+        limit,
+        limit_mode,
+        filter_mai,
+        filter_command,
+        filter_intercept_message_level,
+    )
+
+
+def get_messages_by_time_in_chat_for_users_async(
+    chat_id: str,
+    start_time: float,
+    end_time: float,
+    person_ids: List[str],
+    limit: int = 0,
+    limit_mode: str = "latest",
+) -> Awaitable[List[DatabaseMessages]]:
+    """get_messages_by_time_in_chat_for_users 的异步版本"""
+    return plugin_db_executor.run_read(
+        get_messages_by_time_in_chat_for_users, chat_id, start_time, end_time, person_ids, limit, limit_mode
+    )
+
+
+def get_random_chat_messages_async(
+    start_time: float, end_time: float, limit: int = 0, limit_mode: str = "latest", filter_mai: bool = False
+) -> Awaitable[List[DatabaseMessages]]:
+    """get_random_chat_messages 的异步版本"""
+    return plugin_db_executor.run_read(get_random_chat_messages, start_time, end_time, limit, limit_mode, filter_mai)
+
+
+def get_messages_by_time_for_users_async(
+    start_time: float, end_time: float, person_ids: List[str], limit: int = 0, limit_mode: str = "latest"
+) -> Awaitable[List[DatabaseMessages]]:
+    """get_messages_by_time_for_users 的异步版本"""
+    return plugin_db_executor.run_read(
+        get_messages_by_time_for_users, start_time, end_time, person_ids, limit, limit_mode
+    )
+
+
+def get_messages_before_time_async(
+    timestamp: float, limit: int = 0, filter_mai: bool = False
+) -> Awaitable[List[DatabaseMessages]]:
+    """get_messages_before_time 的异步版本"""
+    return plugin_db_executor.run_read(get_messages_before_time, timestamp, limit, filter_mai)
+
+
+def get_messages_before_time_in_chat_async(
+    chat_id: str,
+    timestamp: float,
+    limit: int = 0,
+    filter_mai: bool = False,
+    filter_intercept_message_level: Optional[int] = None,
+) -> Awaitable[List[DatabaseMessages]]:
+    """get_messages_before_time_in_chat 的异步版本"""
+    return plugin_db_executor.run_read(
+        get_messages_before_time_in_chat, chat_id, timestamp, limit, filter_mai, filter_intercept_message_level
+    )
+
+
+def get_messages_before_time_for_users_async(
+    timestamp: float, person_ids: List[str], limit: int = 0
+) -> Awaitable[List[DatabaseMessages]]:
+    """get_messages_before_time_for_users 的异步版本"""
+    return plugin_db_executor.run_read(get_messages_before_time_for_users, timestamp, person_ids, limit)
+
+
+def get_recent_messages_async(
+    chat_id: str, hours: float = 24.0, limit: int = 100, limit_mode: str = "latest", filter_mai: bool = False
+) -> Awaitable[List[DatabaseMessages]]:
+    """get_recent_messages 的异步版本"""
+    return plugin_db_executor.run_read(get_recent_messages, chat_id, hours, limit, limit_mode, filter_mai)
+
+
+def get_messages_in_chats_async(
+    chat_ids: List[str],
+    start_time: float,
+    end_time: float,
+    limit: int = 0,
+    limit_mode: str = "latest",
+    filter_mai: bool = False,
+    filter_command: bool = False,
+    filter_intercept_message_level: Optional[int] = None,
+) -> Awaitable[Dict[str, List[DatabaseMessages]]]:
+    """get_messages_in_chats 的异步版本，所有聊天在同一个只读连接池任务中查询"""
+    return plugin_db_executor.run_read(
+        get_messages_in_chats,
+        chat_ids,
+        start_time,
+        end_time,
+        limit,
+        limit_mode,
+        filter_mai,
+        filter_command,
+        filter_intercept_message_level,
+    )
+
+
+def count_new_messages_async(chat_id: str, start_time: float = 0.0, end_time: Optional[float] = None) -> Awaitable[int]:
+    """count_new_messages 的异步版本"""
+    return plugin_db_executor.run_read(count_new_messages, chat_id, start_time, end_time)
+
+
+def count_new_messages_for_users_async(
+    chat_id: str, start_time: float, end_time: float, person_ids: List[str]
+) -> Awaitable[int]:
+    """count_new_messages_for_users 的异步版本"""
+    return plugin_db_executor.run_read(count_new_messages_for_users, chat_id, start_time, end_time, person_ids)
+
+
+def count_new_messages_in_chats_async(
+    chat_ids: List[str], start_time: float = 0.0, end_time: Optional[float] = None
+) -> Awaitable[Dict[str, int]]:
+    """count_new_messages_in_chats 的异步版本"""
+    return plugin_db_executor.run_read(count_new_messages_in_chats, chat_ids, start_time, end_time)
+
+
 # =============================================================================
 # 消息格式化API函数
 # =============================================================================
@@ -520,6 +777,9 @@ def translate_pid_to_description(pid: str) -> str:
     description = ""
     if image and image.description and image.description.strip():
         description = image.description.strip()
+    elif image and image_description_queue.is_pending(image_id=pid):
+        # 图片还在后台识别队列中
+        description = PENDING_DESCRIPTION
     else:
         description = "[图片]"
     return description
@@ -0,0 +1,196 @@
+"""
+插件数据库访问调度
+
+插件通常在异步处理函数中调用 message_api / database_api，而这些 API 底层是同步的 peewee 查询，
+插件的一次慢查询会直接阻塞事件循环，拖慢整个麦麦的消息处理。这里把插件的数据库访问交给数据库访问层执行：
+
+- 异步 API（message_api 的 *_async 函数、database_api 的全部函数）中，读取在只读连接池（db_reader）中执行，
+  写入交给唯一的写线程（db_writer），都不阻塞事件循环
+- 单个插件同时进行的数据库操作数有上限，重负载插件（如 MCP 桥接、统计类插件）无法占满只读连接池
+- 按插件统计查询次数、耗时与错误；慢查询记录警告，同步 API 在事件循环中执行过慢时提示改用异步版本
+
+调用方插件由调用栈中最近的插件模块（plugins.* / src.plugins.built_in.*）确定，非插件调用归入 "core"。
+"""
+
+import asyncio
+import functools
+import sys
+import threading
+import time
+
+from dataclasses import asdict, dataclass
+from typing import Any, Awaitable, Callable, Dict, TypeVar
+
+from src.common.database.database import db_reader, db_writer
+from src.common.logger import get_logger
+
+logger = get_logger("plugin_db")
+
+T = TypeVar("T")
+
+# 单个插件同时进行的数据库操作上限
+PLUGIN_DB_MAX_CONCURRENCY_PER_PLUGIN = 2
+# 超过该耗时（秒）的查询记为慢查询
+PLUGIN_DB_SLOW_QUERY_SECONDS = 0.5
+# 非插件代码的调用方名称
+CORE_CALLER = "core"
+# 在调用栈中查找插件模块的最大深度
+_CALLER_SEARCH_DEPTH = 32
+
+
+@dataclass
+class PluginQueryStats:
+    """单个调用方的数据库查询统计"""
+
+    calls: int = 0
+    async_calls: int = 0
+    """通过只读连接池 / 写线程执行的调用数"""
+    errors: int = 0
+    slow_calls: int = 0
+    total_seconds: float = 0.0
+    max_seconds: float = 0.0
+    blocking_seconds: float = 0.0
+    """同步 API 在事件循环线程中执行的累计耗时（这段时间消息处理被阻塞）"""
+
+
+def caller_plugin(skip: int = 2) -> str:
+    """从调用栈中找出发起调用的插件（插件目录名），找不到时返回 CORE_CALLER"""
+    try:
+        frame = sys._getframe(skip)
+    except ValueError:
+        return CORE_CALLER
+    for _ in range(_CALLER_SEARCH_DEPTH):
+        if frame is None:
+            break
+        module = frame.f_globals.get("__name__", "")
+        if module.startswith("plugins."):
+            return module.split(".")[1]
+        if module.startswith("src.plugins.built_in."):
+            return module.split(".")[3]
+        frame = frame.f_back
+    return CORE_CALLER
+
+
+def _in_event_loop() -> bool:
+    try:
+        asyncio.get_running_loop()
+        return True
+    except RuntimeError:
+        return False
+
+
+class PluginDBExecutor:
+    """插件数据库访问的调度与按插件的查询统计"""
+
+    def __init__(self, max_concurrency_per_plugin: int = PLUGIN_DB_MAX_CONCURRENCY_PER_PLUGIN):
+        self._max_concurrency_per_plugin = max_concurrency_per_plugin
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._stats: Dict[str, PluginQueryStats] = {}
+        self._stats_lock = threading.Lock()
+        self._local = threading.local()
+
+    def _record(self, caller: str, name: str, elapsed: float, failed: bool, pooled: bool, blocking: bool) -> None:
+        slow = elapsed >= PLUGIN_DB_SLOW_QUERY_SECONDS
+        with self._stats_lock:
+            stats = self._stats.setdefault(caller, PluginQueryStats())
+            stats.calls += 1
+            stats.total_seconds += elapsed
+            stats.max_seconds = max(stats.max_seconds, elapsed)
+            if pooled:
+                stats.async_calls += 1
+            if failed:
+                stats.errors += 1
+            if slow:
+                stats.slow_calls += 1
+            if blocking:
+                stats.blocking_seconds += elapsed
+        if not slow or caller == CORE_CALLER:
+            return
+        if blocking:
+            logger.warning(
+                f"[PluginDB] 插件 {caller} 在事件循环中同步调用 {name} 耗时 {elapsed:.2f}s，期间消息处理被阻塞，"
+                f"建议改用对应的异步接口"
+            )
+        else:
+            logger.warning(f"[PluginDB] 插件 {caller} 的数据库查询 {name} 耗时 {elapsed:.2f}s")
+
+    def _call(self, caller: str, func: Callable[..., T], args: tuple, kwargs: dict, pooled: bool) -> T:
+        blocking = not pooled and _in_event_loop()
+        self._local.active = True
+        start = time.perf_counter()
+        failed = True
+        try:
+            result = func(*args, **kwargs)
+            failed = False
+            return result
+        finally:
+            self._local.active = False
+            self._record(
+                caller, getattr(func, "__name__", repr(func)), time.perf_counter() - start, failed, pooled, blocking
+            )
+
+    def run_read(self, func: Callable[..., T], *args: Any, **kwargs: Any) -> Awaitable[T]:
+        """
+        在只读连接池中执行只读的同步数据库函数，并统计到调用方插件
+
+        调用方在调用时（而不是协程开始执行时）确定：插件用 asyncio.gather / create_task 并发查询时，
+        协程开始执行时的调用栈中已经没有插件的帧。因此这里以及包装它的 API 函数都是返回可等待对象的普通函数。
+
+        Args:
+            func: 只读的同步函数（peewee 查询）
+            *args, **kwargs: 传给 func 的参数
+
+        Returns:
+            Awaitable[T]: 结果为 func 的返回值；func 抛出的异常原样抛出
+        """
+        return self._run(caller_plugin(), False, func, args, kwargs)
+
+    def run_write(self, func: Callable[..., T], *args: Any, **kwargs: Any) -> Awaitable[T]:
+        """在写线程中执行包含写入的同步数据库函数，并统计到调用方插件；其余同 run_read"""
+        return self._run(caller_plugin(), True, func, args, kwargs)
+
+    async def _run(self, caller: str, write: bool, func: Callable[..., T], args: tuple, kwargs: dict) -> T:
+        if caller == CORE_CALLER:
+            return await self._submit(caller, write, func, args, kwargs)
+        semaphore = self._semaphores.get(caller)
+        if semaphore is None:
+            semaphore = self._semaphores[caller] = asyncio.Semaphore(self._max_concurrency_per_plugin)
+        async with semaphore:
+            return await self._submit(caller, write, func, args, kwargs)
+
+    def _submit(self, caller: str, write: bool, func: Callable[..., T], args: tuple, kwargs: dict) -> Awaitable[T]:
+        call = functools.partial(self._call, caller, func, args, kwargs, True)
+        if write:
+            return db_writer.write(call, label=f"plugin:{caller}:{getattr(func, '__name__', repr(func))}")
+        return db_reader.read(call)
+
+    def track(self, func: Callable[..., T]) -> Callable[..., T]:
+        """装饰同步数据库 API：统计调用方插件的查询；已由异步版本调度执行时不重复统计"""
+
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> T:
+            if getattr(self._local, "active", False):
+                return func(*args, **kwargs)
+            return self._call(caller_plugin(), func, args, kwargs, False)
+
+        return wrapper
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        获取按调用方（插件目录名 / "core"）汇总的查询统计
+
+        Returns:
+            Dict[str, Dict[str, Any]]: 调用方 -> 统计字段（另含平均耗时 avg_ms）
+        """
+        with self._stats_lock:
+            snapshot = {caller: asdict(stats) for caller, stats in self._stats.items()}
+        for stats in snapshot.values():
+            stats["avg_ms"] = stats["total_seconds"] / stats["calls"] * 1000 if stats["calls"] else 0.0
+        return snapshot
+
+    def reset_stats(self) -> None:
+        with self._stats_lock:
+            self._stats.clear()
+
+
+plugin_db_executor = PluginDBExecutor()
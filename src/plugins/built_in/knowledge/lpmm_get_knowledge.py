@@ -2,7 +2,7 @@ from typing import Dict, Any
 
 from src.common.logger import get_logger
 from src.config.config import global_config
-from src.chat.knowledge import qa_manager
+from src.chat.knowledge import ensure_qa_manager
 from src.plugin_system import BaseTool, ToolParamType
 
 logger = get_logger("lpmm_get_knowledge_tool")
@@ -38,7 +38,8 @@ class SearchKnowledgeFromLPMMTool(BaseTool):
             limit_value = max(1, limit_value)
             # threshold = function_args.get("threshold", 0.4)
 
-            # 检查LPMM知识库是否启用
+            # 检查LPMM知识库是否启用（首次查询时加载知识库）
+            qa_manager = await ensure_qa_manager()
             if qa_manager is None:
                 logger.debug("LPMM知识库已禁用，跳过知识获取")
                 return {"type": "info", "id": query, "content": "LPMM知识库已禁用"}
@@ -3,16 +3,16 @@ WebUI 防爬虫模块
 提供爬虫检测和阻止功能，保护 WebUI 不被搜索引擎和恶意爬虫访问
 """
 
-import time
 import ipaddress
 import re
-from collections import deque
-from typing import Optional
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Set, Tuple, Union
 from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.requests import Request
 from starlette.responses import PlainTextResponse
 
 from src.common.logger import get_logger
+from src.webui.rate_limiter import DEFAULT_MAX_TRACKED_KEYS, SlidingWindowCounter
 
 logger = get_logger("webui.anti_crawler")
 
@@ -118,6 +118,35 @@ SCANNER_SPECIFIC_HEADERS = {
     "x-remote-addr",
 }
 
+# 允许直接放行的静态资源（特定前缀下的静态文件，或根路径下的静态文件如 /favicon.ico）
+# 注意：.json 已移除，避免 API 路径绕过防护
+STATIC_EXTENSIONS = (
+    ".css",
+    ".js",
+    ".png",
+    ".jpg",
+    ".jpeg",
+    ".gif",
+    ".svg",
+    ".ico",
+    ".woff",
+    ".woff2",
+    ".ttf",
+    ".eot",
+)
+STATIC_PREFIXES = ("/static/", "/assets/", "/dist/")
+
+
+def _compile_keyword_matcher(keywords: Iterable[str]) -> "re.Pattern[str]":
+    """将关键词集合编译为一个正则（长关键词优先），一次扫描即可判断是否包含任一关键词"""
+    ordered = sorted(set(keywords), key=lambda kw: (-len(kw), kw))
+    return re.compile("|".join(re.escape(kw) for kw in ordered))
+
+
+CRAWLER_UA_PATTERN = _compile_keyword_matcher(CRAWLER_USER_AGENTS)
+ASSET_SCANNER_PATTERN = _compile_keyword_matcher(ASSET_SCANNER_USER_AGENTS)
+
+
 # 防爬虫模式配置
 # false: 禁用
 # strict: 严格模式（更严格的检测，更低的频率限制）
@@ -233,6 +262,57 @@ def _convert_wildcard_to_regex(wildcard_pattern: str) -> Optional[str]:
     return regex
 
 
+@lru_cache(maxsize=8192)
+def _parse_ip(ip: str) -> Optional[Union[ipaddress.IPv4Address, ipaddress.IPv6Address]]:
+    """解析IP地址（带缓存），格式无效时返回None"""
+    try:
+        return ipaddress.ip_address(ip)
+    except (ValueError, AttributeError):
+        return None
+
+
+class IPMatcher:
+    """
+    预编译的IP名单匹配器
+
+    - 精确IP和CIDR统一按网络处理：按 (IP版本, 前缀长度) 分组保存网络地址的整数值，
+      匹配时每个前缀长度只做一次移位和集合查找，与名单条目数量无关
+    - 所有通配符模式合并为一个正则
+    """
+
+    def __init__(self, entries: list):
+        self._prefixes: Dict[int, List[Tuple[int, Set[int]]]] = {4: [], 6: []}
+        grouped: Dict[Tuple[int, int], Set[int]] = {}
+        wildcard_patterns: List[str] = []
+        for entry in entries:
+            if isinstance(entry, str):
+                wildcard_patterns.append(entry)
+                continue
+            # 精确IP视为 /32（IPv6 为 /128）的网络
+            network = ipaddress.ip_network(entry)
+            host_bits = network.max_prefixlen - network.prefixlen
+            grouped.setdefault((network.version, network.prefixlen), set()).add(
+                int(network.network_address) >> host_bits
+            )
+        for (version, prefixlen), prefixes in sorted(grouped.items()):
+            max_prefixlen = 32 if version == 4 else 128
+            self._prefixes[version].append((max_prefixlen - prefixlen, prefixes))
+        self._wildcard = re.compile("|".join(f"(?:{p})" for p in wildcard_patterns)) if wildcard_patterns else None
+        self.empty = not entries
+
+    def match(self, ip: str) -> bool:
+        """判断IP是否命中名单"""
+        if self.empty or ip == "unknown":
+            return False
+        if self._wildcard is not None and self._wildcard.match(ip):
+            return True
+        ip_obj = _parse_ip(ip)
+        if ip_obj is None:
+            return False
+        value = int(ip_obj)
+        return any(value >> host_bits in prefixes for host_bits, prefixes in self._prefixes[ip_obj.version])
+
+
 # 从配置读取防爬虫设置（延迟导入避免循环依赖）
 def _get_anti_crawler_config():
     """获取防爬虫配置"""
@@ -250,6 +330,8 @@ ANTI_CRAWLER_MODE = _config['mode']
 ALLOWED_IPS = _config['allowed_ips']
 TRUSTED_PROXIES = _config['trusted_proxies']
 TRUST_XFF = _config['trust_xff']
+ALLOWED_IP_MATCHER = IPMatcher(ALLOWED_IPS)
+TRUSTED_PROXY_MATCHER = IPMatcher(TRUSTED_PROXIES)
 
 
 def _get_mode_config(mode: str) -> dict:
@@ -334,13 +416,10 @@ class AntiCrawlerMiddleware(BaseHTTPMiddleware):
         self.check_rate_limit = config["check_rate_limit"]
         self.block_on_detect = config["block_on_detect"]  # 是否阻止检测到的恶意访问
 
-        # 用于存储每个IP的请求时间戳（使用deque提高性能）
-        self.request_times: dict[str, deque] = {}
-        # 上次清理时间
-        self.last_cleanup = time.time()
-        # 将关键词列表转换为集合以提高查找性能
-        self.crawler_keywords_set = set(CRAWLER_USER_AGENTS)
-        self.scanner_keywords_set = set(ASSET_SCANNER_USER_AGENTS)
+        # 每个IP的滑动窗口请求计数（固定内存，按LRU淘汰最久未访问的IP）
+        self.request_counter = SlidingWindowCounter(
+            self.rate_limit_window, max_keys=self.max_tracked_ips or DEFAULT_MAX_TRACKED_KEYS
+        )
 
     def _is_crawler_user_agent(self, user_agent: Optional[str]) -> bool:
         """
@@ -358,51 +437,33 @@ class AntiCrawlerMiddleware(BaseHTTPMiddleware):
             logger.debug("请求缺少User-Agent")
             return False  # 不再直接阻止无User-Agent的请求
 
-        user_agent_lower = user_agent.lower()
-
-        # 使用集合查找提高性能（检查是否包含爬虫关键词）
-        for crawler_keyword in self.crawler_keywords_set:
-            if crawler_keyword in user_agent_lower:
-                return True
+        # 单个预编译正则一次扫描所有爬虫关键词
+        return CRAWLER_UA_PATTERN.search(user_agent.lower()) is not None
 
-        return False
-
-    def _is_asset_scanner_header(self, request: Request) -> bool:
+    def _scan_scanner_headers(self, request: Request) -> Tuple[bool, Optional[str]]:
         """
-        检测是否为资产测绘工具的HTTP头（只检查特定头，收紧匹配）
+        检测资产测绘工具的HTTP头（只检查特定头，收紧匹配）
 
         Args:
             request: 请求对象
 
         Returns:
-            如果检测到资产测绘工具头则返回 True
+            (是否检测到, 头中出现的工具名称)
         """
-        # 只检查特定的扫描工具头，不检查所有头
-        for header_name, header_value in request.headers.items():
-            header_name_lower = header_name.lower()
-            header_value_lower = header_value.lower() if header_value else ""
-
-            # 检查已知的扫描工具头
-            if header_name_lower in ASSET_SCANNER_HEADERS:
-                # 如果该头有特定的工具集合，检查值是否匹配
-                expected_tools = ASSET_SCANNER_HEADERS[header_name_lower]
-                if expected_tools:
-                    for tool in expected_tools:
-                        if tool in header_value_lower:
-                            return True
-                else:
-                    # 如果没有特定工具集合，只要存在该头就视为可疑
-                    if header_value_lower:
-                        return True
-
-            # 只检查特定头中的可疑模式（收紧匹配）
-            if header_name_lower in SCANNER_SPECIFIC_HEADERS:
-                # 检查头值中是否包含已知扫描工具名称
-                for tool in self.scanner_keywords_set:
-                    if tool in header_value_lower:
-                        return True
-
-        return False
+        suspicious = False
+        for header_name in SCANNER_SPECIFIC_HEADERS:
+            for header_value in request.headers.getlist(header_name):
+                header_value_lower = header_value.lower()
+                if not header_value_lower:
+                    continue
+                # 检查头值中是否包含已知扫描工具名称（已涵盖各头的特定工具集合）
+                match = ASSET_SCANNER_PATTERN.search(header_value_lower)
+                if match:
+                    return True, match.group(0)
+                # 没有特定工具集合的头，只要存在即视为可疑
+                if not ASSET_SCANNER_HEADERS.get(header_name, True):
+                    suspicious = True
+        return suspicious, None
 
     def _detect_asset_scanner(self, request: Request) -> tuple[bool, Optional[str]]:
         """
@@ -416,38 +477,16 @@ class AntiCrawlerMiddleware(BaseHTTPMiddleware):
         """
         user_agent = request.headers.get("User-Agent")
 
-        # 检查 User-Agent（使用集合查找提高性能）
+        # 检查 User-Agent（单个预编译正则）
         if user_agent:
-            user_agent_lower = user_agent.lower()
-            for scanner_keyword in self.scanner_keywords_set:
-                if scanner_keyword in user_agent_lower:
-                    return True, scanner_keyword
+            match = ASSET_SCANNER_PATTERN.search(user_agent.lower())
+            if match:
+                return True, match.group(0)
 
         # 检查HTTP头
-        if self._is_asset_scanner_header(request):
-            # 尝试从User-Agent或头中提取工具名称
-            detected_tool = None
-            if user_agent:
-                user_agent_lower = user_agent.lower()
-                for tool in self.scanner_keywords_set:
-                    if tool in user_agent_lower:
-                        detected_tool = tool
-                        break
-
-            # 检查HTTP头中的工具标识（只检查特定头）
-            if not detected_tool:
-                for header_name, header_value in request.headers.items():
-                    header_name_lower = header_name.lower()
-                    if header_name_lower in SCANNER_SPECIFIC_HEADERS:
-                        header_value_lower = (header_value or "").lower()
-                        for tool in self.scanner_keywords_set:
-                            if tool in header_value_lower:
-                                detected_tool = tool
-                                break
-                        if detected_tool:
-                            break
-
-            return True, detected_tool or "unknown_scanner"
+        detected, tool = self._scan_scanner_headers(request)
+        if detected:
+            return True, tool or "unknown_scanner"
 
         return False, None
 
@@ -465,72 +504,8 @@ class AntiCrawlerMiddleware(BaseHTTPMiddleware):
         if self._is_ip_allowed(client_ip):
             return False
 
-        current_time = time.time()
-
-        # 定期清理过期的请求记录（每5分钟清理一次）
-        if current_time - self.last_cleanup > 300:
-            self._cleanup_old_requests(current_time)
-            self.last_cleanup = current_time
-
-        # 限制跟踪的IP数量，防止内存泄漏
-        if self.max_tracked_ips > 0 and len(self.request_times) > self.max_tracked_ips:
-            # 清理最旧的记录（删除最久未访问的IP）
-            self._cleanup_oldest_ips()
-
-        # 获取或创建该IP的请求时间deque（不使用maxlen，避免限流变松）
-        if client_ip not in self.request_times:
-            self.request_times[client_ip] = deque()
-
-        request_times = self.request_times[client_ip]
-
-        # 移除时间窗口外的请求记录（从左侧弹出过期记录）
-        while request_times and current_time - request_times[0] >= self.rate_limit_window:
-            request_times.popleft()
-
-        # 检查是否超过限制
-        if len(request_times) >= self.rate_limit_max_requests:
-            return True
-
-        # 记录当前请求时间
-        request_times.append(current_time)
-        return False
-
-    def _cleanup_old_requests(self, current_time: float):
-        """清理过期的请求记录（只清理当前需要检查的IP，不全量遍历）"""
-        # 这个方法现在主要用于定期清理，实际清理在_check_rate_limit中按需进行
-        # 清理最久未访问的IP记录
-        if len(self.request_times) > self.max_tracked_ips * 0.8:
-            self._cleanup_oldest_ips()
-
-    def _cleanup_oldest_ips(self):
-        """清理最久未访问的IP记录（全量遍历找真正的oldest）"""
-        if not self.request_times:
-            return
-
-        # 先收集空deque的IP（优先删除）
-        empty_ips = []
-        # 找到最久未访问的IP（最旧时间戳）
-        oldest_ip = None
-        oldest_time = float("inf")
-
-        # 全量遍历找真正的oldest（超限时性能可接受）
-        for ip, times in self.request_times.items():
-            if not times:
-                # 空deque，记录待删除
-                empty_ips.append(ip)
-            else:
-                # 找到最旧的时间戳
-                if times[0] < oldest_time:
-                    oldest_time = times[0]
-                    oldest_ip = ip
-
-        # 先删除空deque的IP
-        for ip in empty_ips:
-            del self.request_times[ip]
-
-        # 如果没有空deque可删除，且仍需要清理，删除最旧的一个IP
-        if not empty_ips and oldest_ip:
-            del self.request_times[oldest_ip]
+        allowed, _ = self.request_counter.try_acquire(client_ip, self.rate_limit_max_requests)
+        return not allowed
 
     def _is_trusted_proxy(self, ip: str) -> bool:
         """
@@ -542,36 +517,7 @@ class AntiCrawlerMiddleware(BaseHTTPMiddleware):
         Returns:
             如果是信任的代理则返回 True
         """
-        if not TRUSTED_PROXIES or ip == "unknown":
-            return False
-
-        # 检查代理列表中的每个条目
-        for trusted_entry in TRUSTED_PROXIES:
-            # 通配符模式（字符串，正则表达式）
-            if isinstance(trusted_entry, str):
-                try:
-                    if re.match(trusted_entry, ip):
-                        return True
-                except re.error:
-                    continue
-            # CIDR格式（网络对象）
-            elif isinstance(trusted_entry, (ipaddress.IPv4Network, ipaddress.IPv6Network)):
-                try:
-                    client_ip_obj = ipaddress.ip_address(ip)
-                    if client_ip_obj in trusted_entry:
-                        return True
-                except (ValueError, AttributeError):
-                    continue
-            # 精确IP（地址对象）
-            elif isinstance(trusted_entry, (ipaddress.IPv4Address, ipaddress.IPv6Address)):
-                try:
-                    client_ip_obj = ipaddress.ip_address(ip)
-                    if client_ip_obj == trusted_entry:
-                        return True
-                except (ValueError, AttributeError):
-                    continue
-
-        return False
+        return TRUSTED_PROXY_MATCHER.match(ip)
 
     def _get_client_ip(self, request: Request) -> str:
         """
@@ -629,11 +575,7 @@ class AntiCrawlerMiddleware(BaseHTTPMiddleware):
         Returns:
             如果格式有效则返回 True
         """
-        try:
-            ipaddress.ip_address(ip)
-            return True
-        except (ValueError, AttributeError):
-            return False
+        return _parse_ip(ip) is not None
 
     def _is_ip_allowed(self, ip: str) -> bool:
         """
@@ -645,39 +587,7 @@ class AntiCrawlerMiddleware(BaseHTTPMiddleware):
         Returns:
             如果IP在白名单中则返回 True
         """
-        if not ALLOWED_IPS or ip == "unknown":
-            return False
-
-        # 检查白名单中的每个条目
-        for allowed_entry in ALLOWED_IPS:
-            # 通配符模式（字符串，正则表达式）
-            if isinstance(allowed_entry, str):
-                try:
-                    if re.match(allowed_entry, ip):
-                        return True
-                except re.error:
-                    # 正则表达式错误，跳过
-                    continue
-            # CIDR格式（网络对象）
-            elif isinstance(allowed_entry, (ipaddress.IPv4Network, ipaddress.IPv6Network)):
-                try:
-                    client_ip_obj = ipaddress.ip_address(ip)
-                    if client_ip_obj in allowed_entry:
-                        return True
-                except (ValueError, AttributeError):
-                    # IP格式无效，跳过
-                    continue
-            # 精确IP（地址对象）
-            elif isinstance(allowed_entry, (ipaddress.IPv4Address, ipaddress.IPv6Address)):
-                try:
-                    client_ip_obj = ipaddress.ip_address(ip)
-                    if client_ip_obj == allowed_entry:
-                        return True
-                except (ValueError, AttributeError):
-                    # IP格式无效，跳过
-                    continue
-
-        return False
+        return ALLOWED_IP_MATCHER.match(ip)
 
     async def dispatch(self, request: Request, call_next):
         """
@@ -698,33 +608,11 @@ class AntiCrawlerMiddleware(BaseHTTPMiddleware):
         if request.url.path == "/robots.txt":
             return await call_next(request)
 
-        # 允许访问静态资源（CSS、JS、图片等）
-        # 注意：.json 已移除，避免 API 路径绕过防护
-        # 静态资源只在特定前缀下放行（/static/、/assets/、/dist/）
-        static_extensions = {
-            ".css",
-            ".js",
-            ".png",
-            ".jpg",
-            ".jpeg",
-            ".gif",
-            ".svg",
-            ".ico",
-            ".woff",
-            ".woff2",
-            ".ttf",
-            ".eot",
-        }
-        static_prefixes = {"/static/", "/assets/", "/dist/"}
-
-        # 检查是否是静态资源路径（特定前缀下的静态文件）
+        # 允许访问静态资源（CSS、JS、图片等）：特定前缀下的静态文件，以及根路径下的静态文件（如 /favicon.ico）
         path = request.url.path
-        is_static_path = any(path.startswith(prefix) for prefix in static_prefixes) and any(
-            path.endswith(ext) for ext in static_extensions
-        )
-
-        # 也允许根路径下的静态文件（如 /favicon.ico）
-        is_root_static = path.count("/") == 1 and any(path.endswith(ext) for ext in static_extensions)
+        is_static = path.endswith(STATIC_EXTENSIONS)
+        is_static_path = is_static and path.startswith(STATIC_PREFIXES)
+        is_root_static = is_static and path.count("/") == 1
 
         if is_static_path or is_root_static:
             return await call_next(request)
@@ -15,6 +15,7 @@ from src.common.logger import get_logger
 from src.common.database.database_model import Messages, PersonInfo
 from src.config.config import global_config
 from src.chat.message_receive.bot import chat_bot
+from src.chat.message_receive.chat_stream import get_chat_manager
 from src.webui.auth import verify_auth_token_from_cookie_or_header
 from src.webui.token_manager import get_token_manager
 from src.webui.ws_auth import verify_ws_token
@@ -140,6 +141,7 @@ class ChatHistoryManager:
         target_group_id = group_id if group_id else WEBUI_CHAT_GROUP_ID
         try:
             deleted = Messages.delete().where(Messages.chat_info_group_id == target_group_id).execute()
+            get_chat_manager().recent_messages.invalidate()
             logger.info(f"已清空 {deleted} 条聊天记录 (group_id={target_group_id})")
             return deleted
         except Exception as e:
@@ -8,6 +8,8 @@ from src.common.logger import get_logger
 from src.common.database.database_model import Emoji
 from .token_manager import get_token_manager
 from .auth import verify_auth_token_from_cookie_or_header
+from .list_pagination import list_count_cache, paginate_query
+from peewee import fn
 import time
 import os
 import hashlib
@@ -201,6 +203,7 @@ class EmojiListResponse(BaseModel):
     page: int
     page_size: int
     data: List[EmojiResponse]
+    next_cursor: Optional[str] = None  # 下一页游标，没有下一页时为 None
 
 
 class EmojiDetailResponse(BaseModel):
@@ -287,6 +290,7 @@ async def get_emoji_list(
     format: Optional[str] = Query(None, description="格式筛选"),
     sort_by: Optional[str] = Query("usage_count", description="排序字段"),
     sort_order: Optional[str] = Query("desc", description="排序方向"),
+    cursor: Optional[str] = Query(None, description="游标分页：上一页返回的 next_cursor，提供时忽略 page"),
     maibot_session: Optional[str] = Cookie(None),
     authorization: Optional[str] = Header(None),
 ):
@@ -302,6 +306,7 @@ async def get_emoji_list(
         format: 格式筛选
         sort_by: 排序字段 (usage_count, register_time, record_time, last_used_time)
         sort_order: 排序方向 (asc, desc)
+        cursor: 游标分页的游标 (上一页响应中的 next_cursor，需与 sort_by/sort_order 一致)
         authorization: Authorization header
 
     Returns:
@@ -340,23 +345,30 @@ async def get_emoji_list(
         # 获取排序字段，默认使用 usage_count
         sort_field = sort_field_map.get(sort_by, Emoji.usage_count)
 
-        # 应用排序
-        if sort_order == "asc":
-            query = query.order_by(sort_field.asc())
-        else:
-            query = query.order_by(sort_field.desc())
-
-        # 获取总数
-        total = query.count()
+        # 获取总数（短时缓存）
+        total = list_count_cache.count("emoji", query)
 
-        # 分页
-        offset = (page - 1) * page_size
-        emojis = query.offset(offset).limit(page_size)
+        # 应用排序（相同值按 id 排序以保证分页稳定）并分页
+        try:
+            emojis, next_cursor = paginate_query(
+                query,
+                sort_field,
+                Emoji.id,
+                descending=sort_order != "asc",
+                sort_name=sort_field.name,
+                page=page,
+                page_size=page_size,
+                cursor=cursor,
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e)) from e
 
         # 转换为响应对象
         data = [emoji_to_response(emoji) for emoji in emojis]
 
-        return EmojiListResponse(success=True, total=total, page=page, page_size=page_size, data=data)
+        return EmojiListResponse(
+            success=True, total=total, page=page, page_size=page_size, data=data, next_cursor=next_cursor
+        )
 
     except HTTPException:
         raise
@@ -439,6 +451,7 @@ async def update_emoji(
             setattr(emoji, field, value)
 
         emoji.save()
+        list_count_cache.invalidate("emoji")
 
         logger.info(f"表情包已更新: ID={emoji_id}, 字段: {list(update_data.keys())}")
 
@@ -480,6 +493,7 @@ async def delete_emoji(
 
         # 执行删除
         emoji.delete_instance()
+        list_count_cache.invalidate("emoji")
 
         logger.info(f"表情包已删除: ID={emoji_id}, hash={emoji_hash}")
 
@@ -506,27 +520,38 @@ async def get_emoji_stats(maibot_session: Optional[str] = Cookie(None), authoriz
     try:
         verify_auth_token(maibot_session, authorization)
 
-        total = Emoji.select().count()
-        registered = Emoji.select().where(Emoji.is_registered).count()
-        banned = Emoji.select().where(Emoji.is_banned).count()
-
-        # 按格式统计
-        formats = {}
-        for emoji in Emoji.select(Emoji.format):
-            fmt = emoji.format
-            formats[fmt] = formats.get(fmt, 0) + 1
-
-        # 获取最常用的表情包（前10）
-        top_used = Emoji.select().order_by(Emoji.usage_count.desc()).limit(10)
-        top_used_list = [
-            {
-                "id": emoji.id,
-                "emoji_hash": emoji.emoji_hash,
-                "description": emoji.description,
-                "usage_count": emoji.usage_count,
-            }
-            for emoji in top_used
-        ]
+        def _compute_stats():
+            # 按格式分组统计总数、已注册数、已禁用数，总体数据由分组结果汇总
+            rows = (
+                Emoji.select(
+                    Emoji.format,
+                    fn.COUNT(Emoji.id),
+                    fn.COALESCE(fn.SUM(Emoji.is_registered), 0),
+                    fn.COALESCE(fn.SUM(Emoji.is_banned), 0),
+                )
+                .group_by(Emoji.format)
+                .tuples()
+            )
+            formats = {}
+            total = registered = banned = 0
+            for fmt, count, registered_count, banned_count in rows:
+                formats[fmt] = count
+                total += count
+                registered += registered_count
+                banned += banned_count
+
+            # 获取最常用的表情包（前10）
+            top_used = (
+                Emoji.select(Emoji.id, Emoji.emoji_hash, Emoji.description, Emoji.usage_count)
+                .order_by(Emoji.usage_count.desc())
+                .limit(10)
+                .dicts()
+            )
+            return total, registered, banned, formats, list(top_used)
+
+        total, registered, banned, formats, top_used_list = list_count_cache.get_or_compute(
+            "emoji", "stats_summary", _compute_stats
+        )
 
         return {
             "success": True,
@@ -577,6 +602,7 @@ async def register_emoji(
         emoji.is_banned = False  # 注册时自动解除封禁
         emoji.register_time = time.time()
         emoji.save()
+        list_count_cache.invalidate("emoji")
 
         logger.info(f"表情包已注册: ID={emoji_id}")
 
@@ -615,6 +641,7 @@ async def ban_emoji(
         emoji.is_banned = True
         emoji.is_registered = False
         emoji.save()
+        list_count_cache.invalidate("emoji")
 
         logger.info(f"表情包已禁用: ID={emoji_id}")
 
@@ -766,6 +793,7 @@ async def batch_delete_emojis(
                 emoji = Emoji.get_or_none(Emoji.id == emoji_id)
                 if emoji:
                     emoji.delete_instance()
+                    list_count_cache.invalidate("emoji")
                     deleted_count += 1
                     logger.info(f"批量删除表情包: {emoji_id}")
                 else:
@@ -913,6 +941,7 @@ async def upload_emoji(
             usage_count=0,
             last_used_time=None,
         )
+        list_count_cache.invalidate("emoji")
 
         logger.info(f"表情包已上传并注册: ID={emoji.id}, hash={emoji_hash}")
 
@@ -1054,6 +1083,7 @@ async def batch_upload_emoji(
                     usage_count=0,
                     last_used_time=None,
                 )
+                list_count_cache.invalidate("emoji")
 
                 results["uploaded"] += 1
                 results["details"].append(
@@ -3,9 +3,11 @@
 from fastapi import APIRouter, HTTPException, Header, Query, Cookie
 from pydantic import BaseModel
 from typing import Optional, List, Dict
+from peewee import fn
 from src.common.logger import get_logger
 from src.common.database.database_model import Expression, ChatStreams
 from .auth import verify_auth_token_from_cookie_or_header
+from .list_pagination import list_count_cache, paginate_query
 import time
 
 logger = get_logger("webui.expression")
@@ -36,6 +38,7 @@ class ExpressionListResponse(BaseModel):
     page: int
     page_size: int
     data: List[ExpressionResponse]
+    next_cursor: Optional[str] = None  # 下一页游标，没有下一页时为 None
 
 
 class ExpressionDetailResponse(BaseModel):
@@ -200,6 +203,7 @@ async def get_expression_list(
     page_size: int = Query(20, ge=1, le=100, description="每页数量"),
     search: Optional[str] = Query(None, description="搜索关键词"),
     chat_id: Optional[str] = Query(None, description="聊天ID筛选"),
+    cursor: Optional[str] = Query(None, description="游标分页：上一页返回的 next_cursor，提供时忽略 page"),
     maibot_session: Optional[str] = Cookie(None),
     authorization: Optional[str] = Header(None),
 ):
@@ -211,6 +215,7 @@ async def get_expression_list(
         page_size: 每页数量 (1-100)
         search: 搜索关键词 (匹配 situation, style)
         chat_id: 聊天ID筛选
+        cursor: 游标分页的游标 (上一页响应中的 next_cursor)
         authorization: Authorization header
 
     Returns:
@@ -233,24 +238,30 @@ async def get_expression_list(
         if chat_id:
             query = query.where(Expression.chat_id == chat_id)
 
-        # 排序：最后活跃时间倒序（NULL 值放在最后）
-        from peewee import Case
-
-        query = query.order_by(
-            Case(None, [(Expression.last_active_time.is_null(), 1)], 0), Expression.last_active_time.desc()
-        )
-
-        # 获取总数
-        total = query.count()
-
-        # 分页
-        offset = (page - 1) * page_size
-        expressions = query.offset(offset).limit(page_size)
+        # 获取总数（短时缓存）
+        total = list_count_cache.count("expression", query)
+
+        # 排序：最后活跃时间倒序（SQLite 降序时 NULL 值在最后），分页
+        try:
+            expressions, next_cursor = paginate_query(
+                query,
+                Expression.last_active_time,
+                Expression.id,
+                descending=True,
+                sort_name="last_active_time",
+                page=page,
+                page_size=page_size,
+                cursor=cursor,
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e)) from e
 
         # 转换为响应对象
         data = [expression_to_response(expr) for expr in expressions]
 
-        return ExpressionListResponse(success=True, total=total, page=page, page_size=page_size, data=data)
+        return ExpressionListResponse(
+            success=True, total=total, page=page, page_size=page_size, data=data, next_cursor=next_cursor
+        )
 
     except HTTPException:
         raise
@@ -319,6 +330,7 @@ async def create_expression(
             last_active_time=current_time,
             create_date=current_time,
         )
+        list_count_cache.invalidate("expression")
 
         logger.info(f"表达方式已创建: ID={expression.id}, situation={request.situation}")
 
@@ -387,6 +399,7 @@ async def update_expression(
             setattr(expression, field, value)
 
         expression.save()
+        list_count_cache.invalidate("expression")
 
         logger.info(f"表达方式已更新: ID={expression_id}, 字段: {list(update_data.keys())}")
 
@@ -428,6 +441,7 @@ async def delete_expression(
 
         # 执行删除
         expression.delete_instance()
+        list_count_cache.invalidate("expression")
 
         logger.info(f"表达方式已删除: ID={expression_id}, situation={situation}")
 
@@ -479,6 +493,7 @@ async def batch_delete_expressions(
 
         # 执行批量删除
         deleted_count = Expression.delete().where(Expression.id.in_(found_ids)).execute()
+        list_count_cache.invalidate("expression")
 
         logger.info(f"批量删除了 {deleted_count} 个表达方式")
 
@@ -507,20 +522,32 @@ async def get_expression_stats(
     try:
         verify_auth_token(maibot_session, authorization)
 
-        total = Expression.select().count()
-
-        # 按 chat_id 统计
-        chat_stats = {}
-        for expr in Expression.select(Expression.chat_id):
-            chat_id = expr.chat_id
-            chat_stats[chat_id] = chat_stats.get(chat_id, 0) + 1
-
         # 获取最近创建的记录数（7天内）
         seven_days_ago = time.time() - (7 * 24 * 60 * 60)
-        recent = (
-            Expression.select()
-            .where((Expression.create_date.is_null(False)) & (Expression.create_date >= seven_days_ago))
-            .count()
+
+        def _compute_stats():
+            # 总数、近7天新增数、聊天数在一条聚合查询中完成
+            total, recent, chat_count = (
+                Expression.select(
+                    fn.COUNT(Expression.id),
+                    fn.COALESCE(fn.SUM(Expression.create_date >= seven_days_ago), 0),
+                    fn.COUNT(fn.DISTINCT(Expression.chat_id)),
+                )
+                .tuples()
+                .get()
+            )
+            # 按 chat_id 统计 TOP 10
+            top_chats = (
+                Expression.select(Expression.chat_id, fn.COUNT(Expression.id))
+                .group_by(Expression.chat_id)
+                .order_by(fn.COUNT(Expression.id).desc())
+                .limit(10)
+                .tuples()
+            )
+            return total, recent, chat_count, dict(top_chats)
+
+        total, recent, chat_count, top_chats = list_count_cache.get_or_compute(
+            "expression", "stats_summary", _compute_stats
         )
 
         return {
@@ -528,8 +555,8 @@ async def get_expression_stats(
             "data": {
                 "total": total,
                 "recent_7days": recent,
-                "chat_count": len(chat_stats),
-                "top_chats": dict(sorted(chat_stats.items(), key=lambda x: x[1], reverse=True)[:10]),
+                "chat_count": chat_count,
+                "top_chats": top_chats,
             },
         }
 
@@ -757,6 +784,7 @@ async def batch_review_expressions(
                 expression.modified_by = 'user'
                 expression.last_active_time = time.time()
                 expression.save()
+                list_count_cache.invalidate("expression")
 
                 results.append(BatchReviewResultItem(
                     id=item.id,
@@ -7,7 +7,15 @@ from pydantic import BaseModel, Field
 from peewee import fn
 
 from src.common.logger import get_logger
-from src.common.database.database_model import Jargon, ChatStreams
+from src.common.database.database_model import Jargon, JargonChat, ChatStreams
+from src.webui.list_pagination import list_count_cache, paginate_query
+from src.bw_learner.jargon_matcher import jargon_matcher
+from src.bw_learner.learner_utils import (
+    jargon_ids_in_chat,
+    add_jargon_chat,
+    set_jargon_chats,
+    delete_jargon_chats,
+)
 
 logger = get_logger("webui.jargon")
 
@@ -95,6 +103,7 @@ class JargonListResponse(BaseModel):
     page: int
     page_size: int
     data: List[JargonResponse]
+    next_cursor: Optional[str] = None  # 下一页游标，没有下一页时为 None
 
 
 class JargonDetailResponse(BaseModel):
@@ -216,6 +225,7 @@ async def get_jargon_list(
     chat_id: Optional[str] = Query(None, description="按聊天ID筛选"),
     is_jargon: Optional[bool] = Query(None, description="按是否是黑话筛选"),
     is_global: Optional[bool] = Query(None, description="按是否全局筛选"),
+    cursor: Optional[str] = Query(None, description="游标分页：上一页返回的 next_cursor，提供时忽略 page"),
 ):
     """获取黑话列表"""
     try:
@@ -230,16 +240,11 @@ async def get_jargon_list(
                 | (Jargon.raw_content.contains(search))
             )
 
-        # 按聊天ID筛选（使用 contains 匹配，因为 chat_id 是 JSON 格式）
+        # 按聊天ID筛选（通过 jargon_chat 关联表走索引）
         if chat_id:
             # 从传入的 chat_id 中解析出 stream_id
             stream_ids = parse_chat_id_to_stream_ids(chat_id)
-            if stream_ids:
-                # 使用第一个 stream_id 进行模糊匹配
-                query = query.where(Jargon.chat_id.contains(stream_ids[0]))
-            else:
-                # 如果无法解析，使用精确匹配
-                query = query.where(Jargon.chat_id == chat_id)
+            query = query.where(Jargon.id.in_(jargon_ids_in_chat(stream_ids[0] if stream_ids else chat_id)))
 
         # 按是否是黑话筛选
         if is_jargon is not None:
@@ -249,15 +254,26 @@ async def get_jargon_list(
         if is_global is not None:
             query = query.where(Jargon.is_global == is_global)
 
-        # 获取总数
-        total = query.count()
+        # 获取总数（短时缓存）
+        total = list_count_cache.count("jargon", query)
 
         # 分页和排序（按使用次数降序）
-        query = query.order_by(Jargon.count.desc(), Jargon.id.desc())
-        query = query.paginate(page, page_size)
+        try:
+            jargons, next_cursor = paginate_query(
+                query,
+                Jargon.count,
+                Jargon.id,
+                descending=True,
+                sort_name="count",
+                page=page,
+                page_size=page_size,
+                cursor=cursor,
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e)) from e
 
         # 转换为响应格式
-        data = [jargon_to_dict(j) for j in query]
+        data = [jargon_to_dict(j) for j in jargons]
 
         return JargonListResponse(
             success=True,
@@ -265,8 +281,11 @@ async def get_jargon_list(
             page=page,
             page_size=page_size,
             data=data,
+            next_cursor=next_cursor,
         )
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"获取黑话列表失败: {e}")
         raise HTTPException(status_code=500, detail=f"获取黑话列表失败: {str(e)}") from e
@@ -276,18 +295,8 @@ async def get_jargon_list(
 async def get_chat_list():
     """获取所有有黑话记录的聊天列表"""
     try:
-        # 获取所有不同的 chat_id
-        chat_ids = Jargon.select(Jargon.chat_id).distinct().where(Jargon.chat_id.is_null(False))
-
-        chat_id_list = [j.chat_id for j in chat_ids if j.chat_id]
-
-        # 用于按 stream_id 去重
-        seen_stream_ids: set[str] = set()
-
-        for chat_id in chat_id_list:
-            stream_ids = parse_chat_id_to_stream_ids(chat_id)
-            if stream_ids:
-                seen_stream_ids.add(stream_ids[0])
+        # 获取所有不同的 stream_id
+        seen_stream_ids = [chat_id for (chat_id,) in JargonChat.select(JargonChat.chat_id).distinct().tuples()]
 
         result = []
         for stream_id in seen_stream_ids:
@@ -323,49 +332,35 @@ async def get_chat_list():
 async def get_jargon_stats():
     """获取黑话统计数据"""
     try:
-        # 总数量
-        total = Jargon.select().count()
-
-        # 已确认是黑话的数量
-        confirmed_jargon = Jargon.select().where(Jargon.is_jargon).count()
-
-        # 已确认不是黑话的数量
-        confirmed_not_jargon = Jargon.select().where(~Jargon.is_jargon).count()
-
-        # 未判定的数量
-        pending = Jargon.select().where(Jargon.is_jargon.is_null()).count()
-
-        # 全局黑话数量
-        global_count = Jargon.select().where(Jargon.is_global).count()
-
-        # 已完成推断的数量
-        complete_count = Jargon.select().where(Jargon.is_complete).count()
+        def _compute_stats():
+            # 各类数量在一条聚合查询中完成
+            row = (
+                Jargon.select(
+                    fn.COUNT(Jargon.id).alias("total"),
+                    fn.COALESCE(fn.SUM(Jargon.is_jargon), 0).alias("confirmed_jargon"),
+                    fn.COALESCE(fn.SUM(~Jargon.is_jargon), 0).alias("confirmed_not_jargon"),
+                    fn.COALESCE(fn.SUM(Jargon.is_jargon.is_null()), 0).alias("pending"),
+                    fn.COALESCE(fn.SUM(Jargon.is_global), 0).alias("global_count"),
+                    fn.COALESCE(fn.SUM(Jargon.is_complete), 0).alias("complete_count"),
+                    JargonChat.select(fn.COUNT(fn.DISTINCT(JargonChat.chat_id))).alias("chat_count"),
+                )
+                .dicts()
+                .get()
+            )
 
-        # 关联的聊天数量
-        chat_count = Jargon.select(Jargon.chat_id).distinct().where(Jargon.chat_id.is_null(False)).count()
+            # 按聊天统计 TOP 5
+            top_chats = (
+                JargonChat.select(JargonChat.chat_id, fn.COUNT(JargonChat.jargon_id))
+                .group_by(JargonChat.chat_id)
+                .order_by(fn.COUNT(JargonChat.jargon_id).desc())
+                .limit(5)
+                .tuples()
+            )
+            return {**row, "chat_count": row["chat_count"] or 0, "top_chats": dict(top_chats)}
 
-        # 按聊天统计 TOP 5
-        top_chats = (
-            Jargon.select(Jargon.chat_id, fn.COUNT(Jargon.id).alias("count"))
-            .group_by(Jargon.chat_id)
-            .order_by(fn.COUNT(Jargon.id).desc())
-            .limit(5)
-        )
-        top_chats_dict = {j.chat_id: j.count for j in top_chats if j.chat_id}
+        stats = list_count_cache.get_or_compute("jargon", "stats_summary", _compute_stats)
 
-        return JargonStatsResponse(
-            success=True,
-            data={
-                "total": total,
-                "confirmed_jargon": confirmed_jargon,
-                "confirmed_not_jargon": confirmed_not_jargon,
-                "pending": pending,
-                "global_count": global_count,
-                "complete_count": complete_count,
-                "chat_count": chat_count,
-                "top_chats": top_chats_dict,
-            },
-        )
+        return JargonStatsResponse(success=True, data=stats)
 
     except Exception as e:
         logger.error(f"获取黑话统计失败: {e}")
@@ -394,7 +389,11 @@ async def create_jargon(request: JargonCreateRequest):
     """创建黑话"""
     try:
         # 检查是否已存在相同内容的黑话
-        existing = Jargon.get_or_none((Jargon.content == request.content) & (Jargon.chat_id == request.chat_id))
+        stream_ids = parse_chat_id_to_stream_ids(request.chat_id)
+        existing = Jargon.get_or_none(
+            (Jargon.content == request.content)
+            & Jargon.id.in_(jargon_ids_in_chat(stream_ids[0] if stream_ids else request.chat_id))
+        )
         if existing:
             raise HTTPException(status_code=400, detail="该聊天中已存在相同内容的黑话")
 
@@ -409,6 +408,10 @@ async def create_jargon(request: JargonCreateRequest):
             is_jargon=None,
             is_complete=False,
         )
+        for stream_id in stream_ids:
+            add_jargon_chat(jargon.id, stream_id, increment=0)
+        jargon_matcher.upsert(jargon)
+        list_count_cache.invalidate("jargon")
 
         logger.info(f"创建黑话成功: id={jargon.id}, content={request.content}")
 
@@ -440,6 +443,10 @@ async def update_jargon(jargon_id: int, request: JargonUpdateRequest):
                 if value is not None or field in ["meaning", "raw_content", "is_jargon"]:
                     setattr(jargon, field, value)
             jargon.save()
+            if update_data.get("chat_id") is not None:
+                set_jargon_chats(jargon.id, parse_chat_id_to_stream_ids(jargon.chat_id))
+            jargon_matcher.upsert(jargon)
+            list_count_cache.invalidate("jargon")
 
         logger.info(f"更新黑话成功: id={jargon_id}")
 
@@ -466,6 +473,9 @@ async def delete_jargon(jargon_id: int):
 
         content = jargon.content
         jargon.delete_instance()
+        delete_jargon_chats([jargon_id])
+        jargon_matcher.remove([jargon_id])
+        list_count_cache.invalidate("jargon")
 
         logger.info(f"删除黑话成功: id={jargon_id}, content={content}")
 
@@ -490,6 +500,9 @@ async def batch_delete_jargons(request: BatchDeleteRequest):
             raise HTTPException(status_code=400, detail="ID列表不能为空")
 
         deleted_count = Jargon.delete().where(Jargon.id.in_(request.ids)).execute()
+        delete_jargon_chats(request.ids)
+        jargon_matcher.remove(request.ids)
+        list_count_cache.invalidate("jargon")
 
         logger.info(f"批量删除黑话成功: 删除了 {deleted_count} 条记录")
 
@@ -517,6 +530,7 @@ async def batch_set_jargon_status(
             raise HTTPException(status_code=400, detail="ID列表不能为空")
 
         updated_count = Jargon.update(is_jargon=is_jargon).where(Jargon.id.in_(ids)).execute()
+        list_count_cache.invalidate("jargon")
 
         logger.info(f"批量更新黑话状态成功: 更新了 {updated_count} 条记录，is_jargon={is_jargon}")
 
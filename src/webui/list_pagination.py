@@ -0,0 +1,154 @@
+"""
+WebUI 列表分页与计数缓存
+
+- 游标（keyset）分页：按 (排序字段, id) 定位上一页的最后一行，翻到深页时不再扫描并丢弃 OFFSET 之前的所有行
+- 计数缓存：同一筛选条件的 COUNT 在短时间内复用，WebUI 自身的写操作会立即使对应表的缓存失效
+
+原有的 page/page_size 分页保持不变，游标分页是附加能力：列表响应中的 next_cursor
+可作为下一次请求的 cursor 参数。
+"""
+
+import base64
+import json
+import threading
+import time
+
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, List, Optional, Tuple, TypeVar
+
+from peewee import Field, ModelSelect
+
+T = TypeVar("T")
+
+COUNT_CACHE_TTL = 30.0
+COUNT_CACHE_MAX_ENTRIES = 256
+
+
+class ListCountCache:
+    """
+    列表总数缓存（带过期时间的近似计数）
+
+    以 (表名, 查询SQL与参数) 为键；机器人后台写入不会主动失效，最多滞后 ttl 秒。
+    """
+
+    def __init__(self, ttl: float = COUNT_CACHE_TTL, max_entries: int = COUNT_CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, Hashable], Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, table: str, key: Hashable, compute: Callable[[], T]) -> T:
+        """返回缓存值，过期或不存在时调用 compute 重新计算"""
+        cache_key = (table, key)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            if entry is not None and now - entry[0] < self.ttl:
+                self._entries.move_to_end(cache_key)
+                return entry[1]
+
+        value = compute()
+        with self._lock:
+            self._entries[cache_key] = (now, value)
+            self._entries.move_to_end(cache_key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return value
+
+    def count(self, table: str, query: ModelSelect) -> int:
+        """返回查询的总行数（使用缓存）"""
+        sql, params = query.sql()
+        return self.get_or_compute(table, (sql, tuple(params)), query.count)
+
+    def invalidate(self, table: str) -> None:
+        """使某张表的所有缓存失效（WebUI 写操作后调用）"""
+        with self._lock:
+            for cache_key in [k for k in self._entries if k[0] == table]:
+                del self._entries[cache_key]
+
+
+def encode_cursor(sort_name: str, descending: bool, value: Any, row_id: int) -> str:
+    """将上一页最后一行的排序键编码为不透明的游标字符串"""
+    raw = json.dumps([sort_name, descending, value, row_id], ensure_ascii=False, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, sort_name: str, descending: bool) -> Tuple[Any, int]:
+    """
+    解析游标，返回 (排序字段值, id)
+
+    Raises:
+        ValueError: 游标格式错误，或与当前排序方式不一致
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        cursor_sort, cursor_desc, value, row_id = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except Exception as e:
+        raise ValueError("无效的分页游标") from e
+    if cursor_sort != sort_name or cursor_desc != descending or not isinstance(row_id, int):
+        raise ValueError("分页游标与当前排序方式不一致")
+    if value is not None and not isinstance(value, (int, float, str)):
+        raise ValueError("无效的分页游标")
+    return value, row_id
+
+
+def _after_cursor(sort_field: Field, id_field: Field, descending: bool, value: Any, row_id: int):
+    """
+    构造“排在游标之后”的条件
+
+    SQLite 中 NULL 小于任何值：升序时 NULL 在最前，降序时 NULL 在最后，条件与之保持一致。
+    """
+    if descending:
+        if value is None:
+            return sort_field.is_null() & (id_field < row_id)
+        return (sort_field < value) | ((sort_field == value) & (id_field < row_id)) | sort_field.is_null()
+    if value is None:
+        return (sort_field.is_null() & (id_field > row_id)) | sort_field.is_null(False)
+    return (sort_field > value) | ((sort_field == value) & (id_field > row_id))
+
+
+def paginate_query(
+    query: ModelSelect,
+    sort_field: Field,
+    id_field: Field,
+    *,
+    descending: bool,
+    sort_name: str,
+    page: int,
+    page_size: int,
+    cursor: Optional[str] = None,
+) -> Tuple[List[Any], Optional[str]]:
+    """
+    按 (sort_field, id) 排序并取一页
+
+    提供 cursor 时使用游标分页（忽略 page），否则使用 OFFSET 分页；两种方式排序一致，
+    因此任意一页返回的 next_cursor 都可以继续用于游标分页。
+
+    Returns:
+        (本页记录, 下一页游标)，没有下一页时游标为 None
+
+    Raises:
+        ValueError: 游标无效
+    """
+    if descending:
+        query = query.order_by(sort_field.desc(), id_field.desc())
+    else:
+        query = query.order_by(sort_field.asc(), id_field.asc())
+
+    if cursor:
+        value, row_id = decode_cursor(cursor, sort_name, descending)
+        query = query.where(_after_cursor(sort_field, id_field, descending, value, row_id))
+    else:
+        query = query.offset((page - 1) * page_size)
+
+    # 多取一行用于判断是否还有下一页
+    rows = list(query.limit(page_size + 1))
+    if len(rows) <= page_size:
+        return rows, None
+
+    rows = rows[:page_size]
+    last = rows[-1]
+    return rows, encode_cursor(sort_name, descending, getattr(last, sort_field.name), getattr(last, id_field.name))
+
+
+list_count_cache = ListCountCache()
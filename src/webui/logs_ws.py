@@ -1,9 +1,11 @@
 """WebSocket 日志推送模块"""
 
+import asyncio
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Query
 from typing import Set, Optional
 import json
 from pathlib import Path
+from src.common.log_reader import iter_recent_entries, query_logs
 from src.common.logger import get_logger
 from src.webui.token_manager import get_token_manager
 from src.webui.ws_auth import verify_ws_token
@@ -14,10 +16,30 @@ router = APIRouter()
 # 全局 WebSocket 连接池
 active_connections: Set[WebSocket] = set()
 
+LOG_DIR = Path("logs")
+
+# 单次历史查询返回的最大条数
+HISTORY_QUERY_MAX_LIMIT = 2000
+
+
+def _format_log_entry(log_entry: dict, counter: int) -> dict:
+    """转换为前端期望的格式，使用时间戳 + 计数器生成唯一 ID"""
+    timestamp = str(log_entry.get("timestamp", ""))
+    timestamp_id = (timestamp or "0").replace("-", "").replace(" ", "").replace(":", "")
+    return {
+        "id": f"{timestamp_id}_{counter}",
+        "timestamp": timestamp,
+        "level": str(log_entry.get("level", "INFO")).upper(),
+        "module": log_entry.get("logger_name", ""),
+        "message": log_entry.get("event", ""),
+    }
+
 
 def load_recent_logs(limit: int = 100) -> list[dict]:
     """从日志文件中加载最近的日志
 
+    从最新文件的末尾向前按块读取，只解析需要的 limit 行。
+
     Args:
         limit: 返回的最大日志条数
 
@@ -25,53 +47,83 @@ def load_recent_logs(limit: int = 100) -> list[dict]:
         日志列表
     """
     logs = []
-    log_dir = Path("logs")
+    if limit <= 0 or not LOG_DIR.exists():
+        return logs
+
+    try:
+        for log_entry in iter_recent_entries(LOG_DIR):
+            logs.append(_format_log_entry(log_entry, len(logs)))
+            if len(logs) >= limit:
+                break
+    except Exception as e:
+        logger.error(f"读取日志文件失败: {e}")
+
+    # 反转列表，使其按时间顺序排列（旧到新）
+    return list(reversed(logs))
+
+
+def query_history_logs(
+    start_time: Optional[float] = None,
+    end_time: Optional[float] = None,
+    levels: Optional[list[str]] = None,
+    search: Optional[str] = None,
+    limit: int = HISTORY_QUERY_MAX_LIMIT,
+) -> list[dict]:
+    """按时间范围/级别/关键词查询历史日志（借助日志稀疏索引，只读取可能命中的分块）
+
+    Args:
+        start_time: 起始时间（epoch 秒）
+        end_time: 结束时间（epoch 秒）
+        levels: 日志级别列表，如 ["ERROR", "WARNING"]
+        search: 消息或模块名中包含的关键词（不区分大小写）
+        limit: 返回的最大条数（不超过 HISTORY_QUERY_MAX_LIMIT）
 
-    if not log_dir.exists():
+    Returns:
+        日志列表（旧到新）
+    """
+    logs = []
+    limit = max(0, min(limit, HISTORY_QUERY_MAX_LIMIT))
+    if limit == 0 or not LOG_DIR.exists():
         return logs
 
-    # 获取所有日志文件,按修改时间排序
-    log_files = sorted(log_dir.glob("app_*.log.jsonl"), key=lambda f: f.stat().st_mtime, reverse=True)
+    predicate = None
+    if search:
+        keyword = search.lower()
 
-    # 用于生成唯一 ID 的计数器
-    log_counter = 0
+        def predicate(entry: dict) -> bool:
+            return keyword in str(entry.get("event", "")).lower() or keyword in str(entry.get("logger_name", "")).lower()
 
-    # 从最新的文件开始读取
-    for log_file in log_files:
+    for log_entry in query_logs(LOG_DIR, start_time, end_time, levels, predicate):
+        logs.append(_format_log_entry(log_entry, len(logs)))
         if len(logs) >= limit:
             break
+    return list(reversed(logs))
 
-        try:
-            with open(log_file, "r", encoding="utf-8") as f:
-                lines = f.readlines()
-                # 从文件末尾开始读取
-                for line in reversed(lines):
-                    if len(logs) >= limit:
-                        break
-                    try:
-                        log_entry = json.loads(line.strip())
-                        # 转换为前端期望的格式
-                        # 使用时间戳 + 计数器生成唯一 ID
-                        timestamp_id = (
-                            log_entry.get("timestamp", "0").replace("-", "").replace(" ", "").replace(":", "")
-                        )
-                        formatted_log = {
-                            "id": f"{timestamp_id}_{log_counter}",
-                            "timestamp": log_entry.get("timestamp", ""),
-                            "level": log_entry.get("level", "INFO").upper(),
-                            "module": log_entry.get("logger_name", ""),
-                            "message": log_entry.get("event", ""),
-                        }
-                        logs.append(formatted_log)
-                        log_counter += 1
-                    except (json.JSONDecodeError, KeyError):
-                        continue
-        except Exception as e:
-            logger.error(f"读取日志文件失败 {log_file}: {e}")
-            continue
 
-    # 反转列表，使其按时间顺序排列（旧到新）
-    return list(reversed(logs))
+async def _handle_history_query(websocket: WebSocket, request: dict) -> None:
+    """处理客户端的历史日志查询，结果逐条推送后发送一条 history_done 消息"""
+    try:
+        limit = int(request.get("limit", 500))
+        start_time = request.get("start_time")
+        end_time = request.get("end_time")
+        levels = request.get("levels") or None
+        if isinstance(levels, str):
+            levels = [levels]
+        results = await asyncio.to_thread(
+            query_history_logs,
+            float(start_time) if start_time is not None else None,
+            float(end_time) if end_time is not None else None,
+            levels,
+            request.get("search") or None,
+            limit,
+        )
+    except (TypeError, ValueError) as e:
+        await websocket.send_text(json.dumps({"type": "history_error", "message": f"查询参数无效: {e}"}, ensure_ascii=False))
+        return
+
+    for log_entry in results:
+        await websocket.send_text(json.dumps(log_entry, ensure_ascii=False))
+    await websocket.send_text(json.dumps({"type": "history_done", "count": len(results)}))
 
 
 @router.websocket("/ws/logs")
@@ -120,7 +172,7 @@ async def websocket_logs(websocket: WebSocket, token: Optional[str] = Query(None
 
     # 连接建立后，立即发送历史日志
     try:
-        recent_logs = load_recent_logs(limit=100)
+        recent_logs = await asyncio.to_thread(load_recent_logs, 100)
         logger.info(f"发送 {len(recent_logs)} 条历史日志到客户端")
 
         for log_entry in recent_logs:
@@ -134,11 +186,19 @@ async def websocket_logs(websocket: WebSocket, token: Optional[str] = Query(None
             # 接收客户端消息（用于心跳或控制指令）
             data = await websocket.receive_text()
 
-            # 可以处理客户端的控制消息，例如：
+            # 客户端控制消息：
             # - "ping" -> 心跳检测
-            # - {"filter": "ERROR"} -> 设置日志级别过滤
+            # - {"type": "history", "start_time": ..., "end_time": ..., "levels": [...], "search": "...", "limit": 500}
+            #   -> 查询历史日志
             if data == "ping":
                 await websocket.send_text("pong")
+                continue
+            try:
+                request = json.loads(data)
+            except json.JSONDecodeError:
+                continue
+            if isinstance(request, dict) and request.get("type") == "history":
+                await _handle_history_query(websocket, request)
 
     except WebSocketDisconnect:
         active_connections.discard(websocket)
@@ -148,30 +208,51 @@ async def websocket_logs(websocket: WebSocket, token: Optional[str] = Query(None
         active_connections.discard(websocket)
 
 
-async def broadcast_log(log_data: dict):
-    """广播日志到所有连接的 WebSocket 客户端
+# 单个客户端发送一批日志的超时时间（秒），超时视为连接卡死
+SEND_TIMEOUT = 5.0
+
+
+async def _send_batch(connection: WebSocket, messages: list[str]) -> None:
+    for message in messages:
+        await connection.send_text(message)
+
+
+async def broadcast_logs(batch: list[dict]):
+    """批量广播日志到所有连接的 WebSocket 客户端
+
+    每条日志只序列化一次，各客户端并发发送，单个客户端发送缓慢或失败不影响其他客户端。
 
     Args:
-        log_data: 日志数据字典
+        batch: 日志数据字典列表
     """
-    if not active_connections:
+    if not active_connections or not batch:
         return
 
-    # 格式化为 JSON
-    message = json.dumps(log_data, ensure_ascii=False)
-
-    # 记录需要断开的连接
-    disconnected = set()
+    # 格式化为 JSON（与逐条推送时的消息格式一致）
+    messages = [json.dumps(log_data, ensure_ascii=False) for log_data in batch]
 
-    # 广播到所有客户端
-    for connection in active_connections:
-        try:
-            await connection.send_text(message)
-        except Exception:
-            # 发送失败，标记为断开
-            disconnected.add(connection)
+    connections = list(active_connections)
+    results = await asyncio.gather(
+        *(asyncio.wait_for(_send_batch(connection, messages), SEND_TIMEOUT) for connection in connections),
+        return_exceptions=True,
+    )
 
-    # 清理断开的连接
+    # 发送失败或超时的连接视为断开
+    disconnected = {connection for connection, result in zip(connections, results, strict=True) if result is not None}
     if disconnected:
         active_connections.difference_update(disconnected)
+        for connection in disconnected:
+            try:
+                await connection.close()
+            except Exception:
+                pass
         logger.debug(f"清理了 {len(disconnected)} 个断开的 WebSocket 连接")
+
+
+async def broadcast_log(log_data: dict):
+    """广播单条日志到所有连接的 WebSocket 客户端
+
+    Args:
+        log_data: 日志数据字典
+    """
+    await broadcast_logs([log_data])
@@ -3,9 +3,11 @@
 from fastapi import APIRouter, HTTPException, Header, Query, Cookie
 from pydantic import BaseModel
 from typing import Optional, List, Dict
+from peewee import fn
 from src.common.logger import get_logger
 from src.common.database.database_model import PersonInfo
 from .auth import verify_auth_token_from_cookie_or_header
+from .list_pagination import list_count_cache, paginate_query
 import json
 import time
 
@@ -41,6 +43,7 @@ class PersonListResponse(BaseModel):
     page: int
     page_size: int
     data: List[PersonInfoResponse]
+    next_cursor: Optional[str] = None  # 下一页游标，没有下一页时为 None
 
 
 class PersonDetailResponse(BaseModel):
@@ -135,6 +138,7 @@ async def get_person_list(
     search: Optional[str] = Query(None, description="搜索关键词"),
     is_known: Optional[bool] = Query(None, description="是否已认识筛选"),
     platform: Optional[str] = Query(None, description="平台筛选"),
+    cursor: Optional[str] = Query(None, description="游标分页：上一页返回的 next_cursor，提供时忽略 page"),
     maibot_session: Optional[str] = Cookie(None),
     authorization: Optional[str] = Header(None),
 ):
@@ -147,6 +151,7 @@ async def get_person_list(
         search: 搜索关键词 (匹配 person_name, nickname, user_id)
         is_known: 是否已认识筛选
         platform: 平台筛选
+        cursor: 游标分页的游标 (上一页响应中的 next_cursor)
         authorization: Authorization header
 
     Returns:
@@ -174,23 +179,30 @@ async def get_person_list(
         if platform:
             query = query.where(PersonInfo.platform == platform)
 
-        # 排序：最后更新时间倒序（NULL 值放在最后）
-        # Peewee 不支持 nulls_last，使用 CASE WHEN 来实现
-        from peewee import Case
-
-        query = query.order_by(Case(None, [(PersonInfo.last_know.is_null(), 1)], 0), PersonInfo.last_know.desc())
-
-        # 获取总数
-        total = query.count()
-
-        # 分页
-        offset = (page - 1) * page_size
-        persons = query.offset(offset).limit(page_size)
+        # 获取总数（短时缓存）
+        total = list_count_cache.count("person_info", query)
+
+        # 排序：最后更新时间倒序（SQLite 降序时 NULL 值在最后），分页
+        try:
+            persons, next_cursor = paginate_query(
+                query,
+                PersonInfo.last_know,
+                PersonInfo.id,
+                descending=True,
+                sort_name="last_know",
+                page=page,
+                page_size=page_size,
+                cursor=cursor,
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e)) from e
 
         # 转换为响应对象
         data = [person_to_response(person) for person in persons]
 
-        return PersonListResponse(success=True, total=total, page=page, page_size=page_size, data=data)
+        return PersonListResponse(
+            success=True, total=total, page=page, page_size=page_size, data=data, next_cursor=next_cursor
+        )
 
     except HTTPException:
         raise
@@ -270,6 +282,7 @@ async def update_person(
             setattr(person, field, value)
 
         person.save()
+        list_count_cache.invalidate("person_info")
 
         logger.info(f"人物信息已更新: {person_id}, 字段: {list(update_data.keys())}")
 
@@ -311,6 +324,7 @@ async def delete_person(
 
         # 执行删除
         person.delete_instance()
+        list_count_cache.invalidate("person_info")
 
         logger.info(f"人物信息已删除: {person_id} ({person_name})")
 
@@ -337,16 +351,28 @@ async def get_person_stats(maibot_session: Optional[str] = Cookie(None), authori
     try:
         verify_auth_token(maibot_session, authorization)
 
-        total = PersonInfo.select().count()
-        known = PersonInfo.select().where(PersonInfo.is_known).count()
+        def _compute_stats():
+            # 按平台分组统计总数与已认识数，总体数据由分组结果汇总
+            rows = (
+                PersonInfo.select(
+                    PersonInfo.platform,
+                    fn.COUNT(PersonInfo.id),
+                    fn.COALESCE(fn.SUM(PersonInfo.is_known), 0),
+                )
+                .group_by(PersonInfo.platform)
+                .tuples()
+            )
+            platforms = {}
+            total = known = 0
+            for platform, count, known_count in rows:
+                platforms[platform] = count
+                total += count
+                known += known_count
+            return total, known, platforms
+
+        total, known, platforms = list_count_cache.get_or_compute("person_info", "stats_summary", _compute_stats)
         unknown = total - known
 
-        # 按平台统计
-        platforms = {}
-        for person in PersonInfo.select(PersonInfo.platform):
-            platform = person.platform
-            platforms[platform] = platforms.get(platform, 0) + 1
-
         return {"success": True, "data": {"total": total, "known": known, "unknown": unknown, "platforms": platforms}}
 
     except HTTPException:
@@ -387,6 +413,7 @@ async def batch_delete_persons(
                 person = PersonInfo.get_or_none(PersonInfo.person_id == person_id)
                 if person:
                     person.delete_instance()
+                    list_count_cache.invalidate("person_info")
                     deleted_count += 1
                     logger.info(f"批量删除: {person_id}")
                 else:
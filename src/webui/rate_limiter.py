@@ -3,27 +3,148 @@ WebUI 请求频率限制模块
 防止暴力破解和 API 滥用
 """
 
+import math
 import time
-from collections import defaultdict
-from typing import Dict, Tuple, Optional
+from collections import OrderedDict
+from typing import Dict, List, Tuple, Optional
 from fastapi import Request, HTTPException
 from src.common.logger import get_logger
 
 logger = get_logger("webui.rate_limiter")
 
+# 每个滑动窗口划分的桶数（桶越多越精确，每个键占用的内存越多）
+DEFAULT_WINDOW_BUCKETS = 10
+# 每个计数器最多跟踪的键数量（超出后淘汰最久未访问的键）
+DEFAULT_MAX_TRACKED_KEYS = 10000
+
+
+class _WindowState:
+    """单个键的环形桶计数"""
+
+    __slots__ = ("buckets", "head", "total")
+
+    def __init__(self, bucket_count: int, head: int):
+        self.buckets: List[int] = [0] * bucket_count
+        self.head = head  # 最新一个桶的绝对编号
+        self.total = 0
+
+
+class SlidingWindowCounter:
+    """
+    固定内存的滑动窗口计数器
+
+    每个键只保存 buckets+1 个整数的环形数组：窗口被切成若干等宽的桶，
+    最旧的桶按其落在窗口内的比例计入（滑动窗口近似），因此计数与时间精度
+    无关、不随请求数增长；键按 LRU 淘汰，内存上限为 max_keys 个键。
+    """
+
+    def __init__(
+        self,
+        window_seconds: float,
+        buckets: int = DEFAULT_WINDOW_BUCKETS,
+        max_keys: int = DEFAULT_MAX_TRACKED_KEYS,
+    ):
+        self.window_seconds = float(window_seconds)
+        self.bucket_count = max(1, buckets)
+        self.bucket_width = self.window_seconds / self.bucket_count
+        self.max_keys = max_keys
+        self._states: "OrderedDict[str, _WindowState]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._states)
+
+    def _advance(self, state: _WindowState, bucket: int) -> None:
+        """将环形数组推进到绝对编号为 bucket 的桶，清空期间经过的旧桶"""
+        size = len(state.buckets)
+        steps = bucket - state.head
+        if steps <= 0:
+            return
+        if steps >= size:
+            state.buckets = [0] * size
+            state.total = 0
+        else:
+            for i in range(state.head + 1, bucket + 1):
+                idx = i % size
+                state.total -= state.buckets[idx]
+                state.buckets[idx] = 0
+        state.head = bucket
+
+    def _get_state(self, key: str, now: float, create: bool) -> Optional[_WindowState]:
+        bucket = int(now // self.bucket_width)
+        state = self._states.get(key)
+        if state is None:
+            if not create:
+                return None
+            state = _WindowState(self.bucket_count + 1, bucket)
+            self._states[key] = state
+            if self.max_keys > 0 and len(self._states) > self.max_keys:
+                self._states.popitem(last=False)
+        else:
+            self._states.move_to_end(key)
+            self._advance(state, bucket)
+        return state
+
+    def _weighted_total(self, state: _WindowState, now: float) -> float:
+        # 最旧的桶只有一部分仍在窗口内
+        elapsed = (now - state.head * self.bucket_width) / self.bucket_width
+        oldest = state.buckets[(state.head + 1) % len(state.buckets)]
+        return state.total - oldest * min(1.0, max(0.0, elapsed))
+
+    def count(self, key: str, now: Optional[float] = None) -> int:
+        """返回键在当前窗口内的计数"""
+        now = time.time() if now is None else now
+        state = self._get_state(key, now, create=False)
+        if state is None:
+            return 0
+        return math.ceil(self._weighted_total(state, now) - 1e-9)
+
+    def hit(self, key: str, amount: int = 1, now: Optional[float] = None) -> int:
+        """记录 amount 次事件，返回记录后窗口内的计数"""
+        now = time.time() if now is None else now
+        state = self._get_state(key, now, create=True)
+        state.buckets[state.head % len(state.buckets)] += amount
+        state.total += amount
+        return math.ceil(self._weighted_total(state, now) - 1e-9)
+
+    def try_acquire(self, key: str, limit: int, now: Optional[float] = None) -> Tuple[bool, int]:
+        """
+        未达到 limit 时记录一次事件
+
+        Returns:
+            (是否允许, 剩余次数)
+        """
+        now = time.time() if now is None else now
+        current = self.count(key, now)
+        if current >= limit:
+            return False, 0
+        current = self.hit(key, 1, now)
+        return True, max(0, limit - current)
+
+    def reset(self, key: str) -> None:
+        self._states.pop(key, None)
+
 
 class RateLimiter:
     """
-    简单的内存请求频率限制器
+    内存请求频率限制器
 
-    使用滑动窗口算法实现
+    使用固定内存的滑动窗口计数器实现，跟踪的 IP 数量有上限
     """
 
-    def __init__(self):
-        # 存储格式: {key: [(timestamp, count), ...]}
-        self._requests: Dict[str, list] = defaultdict(list)
+    def __init__(self, max_tracked_keys: int = DEFAULT_MAX_TRACKED_KEYS):
+        self.max_tracked_keys = max_tracked_keys
+        # 按 (规则后缀, 窗口秒数) 区分的计数器
+        self._counters: Dict[Tuple[str, int], SlidingWindowCounter] = {}
         # 被封禁的 IP: {ip: unblock_timestamp}
         self._blocked: Dict[str, float] = {}
+        self._last_block_sweep = time.time()
+
+    def _get_counter(self, key_suffix: str, window_seconds: int) -> SlidingWindowCounter:
+        counter = self._counters.get((key_suffix, window_seconds))
+        if counter is None:
+            counter = SlidingWindowCounter(window_seconds, max_keys=self.max_tracked_keys)
+            self._counters[(key_suffix, window_seconds)] = counter
+        return counter
 
     def _get_client_ip(self, request: Request) -> str:
         """获取客户端 IP 地址"""
@@ -43,15 +164,12 @@ class RateLimiter:
 
         return "unknown"
 
-    def _cleanup_old_requests(self, key: str, window_seconds: int):
-        """清理过期的请求记录"""
-        now = time.time()
-        cutoff = now - window_seconds
-        self._requests[key] = [(ts, count) for ts, count in self._requests[key] if ts > cutoff]
-
     def _cleanup_expired_blocks(self):
-        """清理过期的封禁"""
+        """清理过期的封禁（最多每分钟全量清理一次，单个 IP 的过期在查询时处理）"""
         now = time.time()
+        if now - self._last_block_sweep < 60:
+            return
+        self._last_block_sweep = now
         expired = [ip for ip, unblock_time in self._blocked.items() if now > unblock_time]
         for ip in expired:
             del self._blocked[ip]
@@ -67,9 +185,13 @@ class RateLimiter:
         self._cleanup_expired_blocks()
         ip = self._get_client_ip(request)
 
-        if ip in self._blocked:
-            remaining = int(self._blocked[ip] - time.time())
-            return True, max(0, remaining)
+        unblock_time = self._blocked.get(ip)
+        if unblock_time is not None:
+            remaining = int(unblock_time - time.time())
+            if remaining >= 0:
+                return True, remaining
+            del self._blocked[ip]
+            logger.info(f"🔓 IP {ip} 封禁已解除")
 
         return False, None
 
@@ -89,23 +211,7 @@ class RateLimiter:
             (是否允许, 剩余请求数)
         """
         ip = self._get_client_ip(request)
-        key = f"{ip}:{key_suffix}" if key_suffix else ip
-
-        # 清理过期记录
-        self._cleanup_old_requests(key, window_seconds)
-
-        # 计算当前窗口内的请求数
-        current_count = sum(count for _, count in self._requests[key])
-
-        if current_count >= max_requests:
-            return False, 0
-
-        # 记录新请求
-        now = time.time()
-        self._requests[key].append((now, 1))
-
-        remaining = max_requests - current_count - 1
-        return True, remaining
+        return self._get_counter(key_suffix, window_seconds).try_acquire(ip, max_requests)
 
     def block_ip(self, request: Request, duration_seconds: int):
         """
@@ -137,18 +243,9 @@ class RateLimiter:
             (是否被封禁, 剩余尝试次数)
         """
         ip = self._get_client_ip(request)
-        key = f"{ip}:auth_failures"
-
-        # 清理过期记录
-        self._cleanup_old_requests(key, window_seconds)
 
-        # 计算当前失败次数
-        current_failures = sum(count for _, count in self._requests[key])
-
-        # 记录本次失败
-        now = time.time()
-        self._requests[key].append((now, 1))
-        current_failures += 1
+        # 记录本次失败并获取窗口内的失败次数
+        current_failures = self._get_counter("auth_failures", window_seconds).hit(ip)
 
         remaining = max_failures - current_failures
 
@@ -168,9 +265,9 @@ class RateLimiter:
         重置失败计数（认证成功后调用）
         """
         ip = self._get_client_ip(request)
-        key = f"{ip}:auth_failures"
-        if key in self._requests:
-            del self._requests[key]
+        for (key_suffix, _), counter in self._counters.items():
+            if key_suffix == "auth_failures":
+                counter.reset(ip)
 
 
 # 全局单例
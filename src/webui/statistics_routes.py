@@ -317,3 +317,23 @@ async def get_model_stats(hours: int = 24, _auth: bool = Depends(require_auth)):
     except Exception as e:
         logger.error(f"获取模型统计失败: {e}")
         raise HTTPException(status_code=500, detail=str(e)) from e
+
+
+@router.get("/queues")
+async def get_queue_metrics(_auth: bool = Depends(require_auth)):
+    """
+    获取后台队列指标：LLM请求调度（按优先级的排队、并发、token用量、耗时）、图片识别队列与数据库写线程
+    """
+    from src.chat.utils.image_description_queue import image_description_queue
+    from src.common.database.database import db_writer
+    from src.llm_models.request_scheduler import llm_scheduler
+
+    try:
+        return {
+            "llm_scheduler": llm_scheduler.get_metrics(),
+            "image_description": image_description_queue.get_metrics(),
+            "db_writer": db_writer.get_stats(),
+        }
+    except Exception as e:
+        logger.error(f"获取队列指标失败: {e}")
+        raise HTTPException(status_code=500, detail=str(e)) from e